@@ -1,16 +1,12 @@
-from langchain_google_vertexai import ChatVertexAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from app.core import clients, metrics
 from app.core.config import settings
+from app.core.sessions import render_history
 
 class GeneralAgent:
     def __init__(self):
-        self.llm = ChatVertexAI(
-            model_name="gemini-2.5-flash",
-            project=settings.PROJECT_ID,
-            location=settings.LOCATION,
-            temperature=0.6,  # general은 0.5~0.7 사이 권장
-        )
+        self.llm = clients.llm("gemini-2.5-flash", temperature=0.6, cache="general")  # general은 0.5~0.7 사이 권장
 
         self.prompt = ChatPromptTemplate.from_template("""
         You are **"Willog Intelligent Assistant"**, an AI assistant for logistics and cold-chain monitoring.
@@ -55,19 +51,14 @@ class GeneralAgent:
         """)
 
 
-        self.chain = self.prompt | self.llm | StrOutputParser()
+        self.chain = self.prompt | self.llm | metrics.track_usage("general") | StrOutputParser()
 
     def process_query(self, question: str, chat_history: list = None):
-        history_str = ""
-        if chat_history:
-            recent_history = chat_history[-10:]
-            for msg in recent_history:
-                role = "User" if msg.get("role") == "user" else "Assistant"
-                content = msg.get("content", "")
-                history_str += f"{role}: {content}\n"
+        history_str = render_history(chat_history, settings.HISTORY_TOKEN_BUDGET)
 
         try:
-            return self.chain.invoke({"question": question, "chat_history": history_str})
+            with metrics.stage("general"):
+                return self.chain.invoke({"question": question, "chat_history": history_str})
         except Exception as e:
             return f"죄송합니다. 일반 대화를 처리하는 중 오류가 발생했습니다: {str(e)}"
 
@@ -0,0 +1,30 @@
+import textwrap
+from typing import Any, Dict, List
+
+# Built-in term definitions. Always part of the retrieval corpus: indexed in memory when no index has
+# been built, and ingested alongside the documents by scripts/ingest_documents.py.
+GLOSSARY_SOURCE = "Global Glossary (Memory)"
+
+GLOSSARY = {
+    "운송 건수": """
+    [용어 정의] 운송 건수
+    - 의미: 조회기간 동안 운송 완료되거나 운송 중인 운송 물량의 총 합을 의미합니다.
+    """,
+    "출고 건수": """
+    [용어 정의] 출고 건수
+    - 의미: 조회기간 동안 출고가 된 운송 물량의 총 합을 의미합니다.
+    - 주의사항: 조회기간 이전에 출고된 건은 합계에서 제외됩니다.
+    """,
+    "일탈률": """
+    [용어 정의] 일탈률 (Deviation Rate)
+    - 의미: 전체 센싱 횟수(로그 수) 대비 충격 이슈 발생 비율을 의미합니다.
+    - 공식: (충격 이벤트 발생 횟수 / 전체 로그 수) * 100
+    """
+}
+
+
+def glossary_chunks() -> List[Dict[str, Any]]:
+    return [
+        {"id": f"glossary#{term}", "title": term, "text": textwrap.dedent(definition).strip(), "source": GLOSSARY_SOURCE}
+        for term, definition in GLOSSARY.items()
+    ]
@@ -1,4 +1,6 @@
 
+import concurrent.futures
+import contextvars
 import sys
 import os
 
@@ -6,44 +8,154 @@ import os
 # Ensure app is in path (project root)
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 
-from app.agents.router import route_query
+from app.agents.router import SQL_AND_RETRIEVAL, route_query, sql_confidence
 from app.agents.sql_agent import agent as sql_agent_instance
 from app.agents.retrieval_agent import retrieval_agent as retrieval_agent_instance
 from app.agents.general_agent import general_agent as general_agent_instance
+from app.core import admission, cancellation, metrics
+from app.core.config import settings
+from app.core.jobs import in_background_job, report_progress
+from app.core.singleflight import SingleFlight, request_key
+from app.core.slow_log import slow_log
+from app.core.speculation import SPECULATIONS, Speculation
+from app.core.suggestions import suggestion_store
+
+# Agents of a multi-agent route run here, each under its own child scope. Interactive requests bound each branch
+# by AGENT_BRANCH_DEADLINE_S; in a background job the branches share the job's own deadline.
+_branch_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=2 * settings.MAX_CONCURRENT_REQUESTS, thread_name_prefix="agent-branch"
+)
+
+
+def _start_branch(fn):
+    deadline_s = None if in_background_job() else settings.AGENT_BRANCH_DEADLINE_S
+    scope = cancellation.CancelScope(deadline_s, parent=cancellation.current_scope())
+    context = contextvars.copy_context()
+
+    def run():
+        try:
+            with cancellation.active(scope):
+                return fn()
+        finally:
+            scope.close()
+
+    return _branch_executor.submit(context.run, run), scope
 
 class Orchestrator:
-    def run(self, question: str, chat_history: list = None):
+    def __init__(self):
+        self._flights = SingleFlight()
+
+    def run(self, question: str, chat_history: list = None, deadline_s: float = None, precomputed: bool = True,
+            approximate: bool = False):
+        # approximate: the caller accepts sampled answers with confidence intervals for exploratory SQL questions
+        # Suggestion buttons are answered from their precomputed results (see app/core/suggestions.py)
+        if precomputed:
+            result = self._precomputed(question)
+            if result is not None:
+                if approximate:
+                    # Precomputed answers are exact (and already cheap): say so instead of implying an estimate
+                    result["text"] += "\n\nℹ️ 미리 계산된 정확한 값입니다 (근사 조회를 적용하지 않았습니다)."
+                return result
+        # Every LLM and BigQuery call below is bounded by this deadline (and by the caller's scope, if any)
+        with cancellation.scope(deadline_s):
+            return self._run_traced(question, chat_history, approximate)
+
+    def _precomputed(self, question: str):
+        result = suggestion_store.get(question)
+        if result is None:
+            return None
+        with metrics.request_trace(question) as trace:
+            trace.agent = result.get("agent")
+            trace.sql = result.get("sql")
+            report_progress("precomputed", agent=trace.agent)
+        print(f"Precomputed answer for: {question}")
+        result["trace"] = trace
+        return result
+
+    def _run_traced(self, question: str, chat_history: list, approximate: bool = False):
+        trace = None
+        try:
+            # Every stage below records its timing on this request's trace (see app/core/metrics.py)
+            with metrics.request_trace(question) as trace:
+                try:
+                    result, shared = self._run_coalesced(question, chat_history, trace, approximate)
+                except cancellation.Cancelled as e:
+                    scope = cancellation.current_scope()
+                    reason = scope.reason if scope is not None and scope.cancelled else str(e)
+                    trace.outcome = "timeout" if reason == cancellation.DEADLINE_EXCEEDED else "cancelled"
+                    trace.error = reason
+                    raise
+                except Exception as e:
+                    trace.outcome = "timeout" if isinstance(e, TimeoutError) else "error"
+                    trace.error = f"{type(e).__name__}: {e}"
+                    raise
+                if shared:
+                    trace.coalesced = True
+                    trace.agent = result.get("agent")
+            # Each caller gets its own response dict (the DataFrame is shared read-only)
+            result = dict(result)
+            trace.sql = result.get("sql")
+            if result.get("data") is not None:
+                trace.result_shape = list(result["data"].shape)
+            result["trace"] = trace
+            return result
+        finally:
+            # Cancelled and failed requests are logged too: one cut at its deadline is the slowest kind
+            if trace is not None:
+                slow_log.maybe_record(trace)
+
+    def _run_coalesced(self, question: str, chat_history: list, trace: metrics.RequestTrace, approximate: bool):
+        # Identical concurrent questions (same rendered history and day) share one execution
+        key = request_key(question, chat_history) + (":approximate" if approximate else "")
+        try:
+            return self._flights.do(
+                key, lambda: self._run(question, chat_history, trace, approximate), poll=cancellation.check_cancelled
+            )
+        except cancellation.Cancelled:
+            if cancellation.is_cancelled():
+                raise
+            # The shared execution was cancelled by its own caller (a background job); this one still wants an answer
+            return self._run(question, chat_history, trace, approximate), False
+
+    def _run(self, question: str, chat_history: list, trace: metrics.RequestTrace, approximate: bool = False):
         print(f"User Query: {question}")
+
+        # SQL generation does not depend on the routing decision, so likely SQL questions start it now
+        speculation = self._speculate_sql(question, chat_history, trace)
         
         # 1. Route
-        target_agent = route_query(question)
+        try:
+            with metrics.stage("routing"):
+                target_agent = route_query(question)
+        except BaseException:
+            if speculation is not None:
+                speculation.discard()
+            raise
+        trace.agent = target_agent
+        report_progress("routed", agent=target_agent)
         print(f"Selected Agent: {target_agent}")
+
+        if speculation is not None:
+            if target_agent in ("SQL_AGENT", SQL_AND_RETRIEVAL):
+                trace.speculation = "used"
+            else:
+                speculation.discard()
+                trace.speculation = "discarded"
         
         # 2. Execute
         response = None
         if target_agent == "SQL_AGENT":
-            print("--- Invoking SQL Agent ---")
-            response = sql_agent_instance.process_query(question, chat_history)
-            
-            # Use natural language response from synthesis
-            if response.get("natural_response"):
-                final_answer = response.get("natural_response")
-            elif response.get("error"):
-                final_answer = f"죄송합니다. 데이터베이스 조회 중 오류가 발생했습니다: {response['error']}"
-            else:
-                final_answer = f"생성된 SQL:\n{response.get('generated_sql')}"
-            
-            # Also show the SQL for debugging
-            print(f"\n[Generated SQL]\n{response.get('generated_sql')}")
+            final_answer, response = self._sql_answer(question, chat_history, speculation, approximate)
                 
         elif target_agent == "RETRIEVAL_AGENT":
-            print("--- Invoking Retrieval Agent ---")
-            response = retrieval_agent_instance.process_query(question)
-            final_answer = response.get("answer")
+            final_answer, _ = self._retrieval_answer(question)
             
         elif target_agent == "GENERAL_AGENT":
             print("--- Invoking General Agent ---")
             final_answer = general_agent_instance.process_query(question, chat_history)
+
+        elif target_agent == SQL_AND_RETRIEVAL:
+            final_answer, response = self._sql_and_retrieval_answer(question, chat_history, speculation, approximate)
             
         else:
             final_answer = "Unknown agent selected."
@@ -52,11 +164,87 @@ class Orchestrator:
         print(final_answer)
         return {
             "text": final_answer,
-            "data": response.get("result") if target_agent == "SQL_AGENT" and response and isinstance(response, dict) else None,
-            "sql": response.get("generated_sql") if target_agent == "SQL_AGENT" and response and isinstance(response, dict) else None,
-            "agent": target_agent
+            "data": response.get("result") if response else None,
+            "sql": response.get("generated_sql") if response else None,
+            "agent": target_agent,
+            "approximation": response.get("approximation") if response else None
         }
 
+    def _sql_answer(self, question: str, chat_history: list, speculation: Speculation = None,
+                    approximate: bool = False):
+        print("--- Invoking SQL Agent ---")
+        generated_sql = speculation.join() if speculation is not None else None
+        response = sql_agent_instance.process_query(
+            question, chat_history, generated_sql=generated_sql, approximate=approximate
+        )
+
+        # Use natural language response from synthesis
+        if response.get("natural_response"):
+            final_answer = response.get("natural_response")
+        elif response.get("error"):
+            final_answer = f"죄송합니다. 데이터베이스 조회 중 오류가 발생했습니다: {response['error']}"
+        else:
+            final_answer = f"생성된 SQL:\n{response.get('generated_sql')}"
+
+        # Also show the SQL for debugging
+        print(f"\n[Generated SQL]\n{response.get('generated_sql')}")
+        return final_answer, response
+
+    def _retrieval_answer(self, question: str):
+        print("--- Invoking Retrieval Agent ---")
+        response = retrieval_agent_instance.process_query(question)
+        return response.get("answer"), response
+
+    def _sql_and_retrieval_answer(self, question: str, chat_history: list, speculation: Speculation = None,
+                                  approximate: bool = False):
+        """Runs both agents at once; a branch that fails or misses its deadline (see _start_branch) is left out."""
+        branches = {
+            "SQL_AGENT": _start_branch(lambda: self._sql_answer(question, chat_history, speculation, approximate)),
+            "RETRIEVAL_AGENT": _start_branch(lambda: self._retrieval_answer(question)),
+        }
+        results, missing = {}, []
+        for agent, (future, scope) in branches.items():
+            try:
+                # The branch's scope cancels it at its deadline; the grace covers a backend call that ignores it
+                remaining = scope.remaining()
+                results[agent] = future.result(timeout=None if remaining is None else remaining + 1.0)
+                metrics.AGENT_BRANCHES.labels(agent, "ok").inc()
+            except (cancellation.Cancelled, concurrent.futures.TimeoutError):
+                cancellation.check_cancelled()  # the whole request was cancelled, not just this branch
+                scope.cancel(cancellation.DEADLINE_EXCEEDED)
+                metrics.AGENT_BRANCHES.labels(agent, "timeout").inc()
+                print(f"Warning: {agent} branch missed its deadline")
+                missing.append(agent)
+            except Exception as e:
+                metrics.AGENT_BRANCHES.labels(agent, "error").inc()
+                print(f"Warning: {agent} branch failed: {e}")
+                missing.append(agent)
+
+        sql_answer, response = results.get("SQL_AGENT", (None, None))
+        retrieval_answer, _ = results.get("RETRIEVAL_AGENT", (None, None))
+        parts = []
+        if sql_answer:
+            parts.append(sql_answer)
+        if retrieval_answer:
+            parts.append(f"📘 기준 및 정의\n{retrieval_answer}")
+        if "SQL_AGENT" in missing:
+            parts.append("⚠️ 데이터 조회 결과를 시간 내에 받지 못했습니다. 잠시 후 다시 질문해 주세요.")
+        if "RETRIEVAL_AGENT" in missing:
+            parts.append("⚠️ 기준 및 정의 설명을 시간 내에 준비하지 못했습니다. 필요하시면 따로 질문해 주세요.")
+        return "\n\n".join(parts), response
+
+    def _speculate_sql(self, question: str, chat_history: list, trace: metrics.RequestTrace):
+        mode = settings.SPECULATIVE_SQL
+        if mode == "off":
+            return None
+        if mode == "auto":
+            # Only when the router will likely agree, and never by queueing behind real LLM calls
+            if sql_confidence(question) < settings.SPECULATION_MIN_CONFIDENCE or not admission.stage_has_capacity("llm"):
+                trace.speculation = "skipped"
+                SPECULATIONS.labels("sql_generation", "skipped").inc()
+                return None
+        return Speculation("sql_generation", lambda: sql_agent_instance.generate_sql(question, chat_history))
+
 if __name__ == "__main__":
     if len(sys.argv) < 2:
         print("Usage: python app/agents/orchestrator.py 'Question'")
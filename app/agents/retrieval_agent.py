@@ -1,38 +1,20 @@
-from typing import Dict, Any, List
-# Removing FAISS and VertexEmbeddings dependencies to prevent initialization errors in restricted environments.
-# Using simple Keyword/Semantic matching logic via LLM directly or Python strings for small glossary.
+import os
+from typing import Dict, Any, List, Tuple
+# Retrieval uses the local BM25 index in packages/vectordb (no FAISS / Vertex embeddings at query time),
+# built by scripts/ingest_documents.py. Without one, the built-in glossary is indexed in memory on first use.
 
-from langchain_google_vertexai import ChatVertexAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from app.core import cancellation, clients, metrics
+from app.agents.glossary import GLOSSARY, GLOSSARY_SOURCE, glossary_chunks
 from app.core.config import settings
 
 class RetrievalAgent:
     def __init__(self):
-        self.llm = ChatVertexAI(
-            model_name="gemini-2.5-flash",
-            project=settings.PROJECT_ID,
-            location=settings.LOCATION,
-            temperature=0.2
-        )
+        self.llm = clients.llm("gemini-2.5-flash", temperature=0.2, cache="retrieval")
         
-        # In-memory Glossary (Simple Text)
-        self.glossary_data = {
-            "운송 건수": """
-            [용어 정의] 운송 건수
-            - 의미: 조회기간 동안 운송 완료되거나 운송 중인 운송 물량의 총 합을 의미합니다.
-            """,
-            "출고 건수": """
-            [용어 정의] 출고 건수
-            - 의미: 조회기간 동안 출고가 된 운송 물량의 총 합을 의미합니다.
-            - 주의사항: 조회기간 이전에 출고된 건은 합계에서 제외됩니다.
-            """,
-            "일탈률": """
-            [용어 정의] 일탈률 (Deviation Rate)
-            - 의미: 전체 센싱 횟수(로그 수) 대비 충격 이슈 발생 비율을 의미합니다.
-            - 공식: (충격 이벤트 발생 횟수 / 전체 로그 수) * 100
-            """
-        }
+        # Built-in definitions (app/agents/glossary.py), also part of the ingested index
+        self.glossary_data = GLOSSARY
         
         # Simple RAG Prompt
         self.prompt = ChatPromptTemplate.from_template("""
@@ -51,37 +33,57 @@ class RetrievalAgent:
         Answer (Korean):
         """)
         
-        self.chain = self.prompt | self.llm | StrOutputParser()
+        self.chain = self.prompt | self.llm | metrics.track_usage("retrieval") | StrOutputParser()
+        self._index = None
+        self._index_version = None
 
-    def _retrieve_context(self, question: str) -> str:
-        # Simple keyword matching
-        relevant_texts = []
-        for term, definition in self.glossary_data.items():
-            if term in question or term.replace(" ", "") in question.replace(" ", ""):
-                relevant_texts.append(definition)
-        
-        # If no exact keyword match, return all (since it's small) or let LLM decide
-        if not relevant_texts:
-            return "\n\n".join(self.glossary_data.values())
-            
-        return "\n\n".join(relevant_texts)
+    @property
+    def index(self):
+        # Memory-mapped, so loading is instant; built lazily to keep numpy out of the import path.
+        # Reopened when the ingestion command points the index symlink at a new version.
+        from packages.vectordb.index import BM25Index
+        index_dir = settings.RETRIEVAL_INDEX_DIR
+        meta_path = os.path.join(index_dir or "", "meta.json")
+        version = os.path.realpath(meta_path) if index_dir and os.path.exists(meta_path) else None
+        if self._index is None or version != self._index_version:
+            if version is None:
+                self._index = BM25Index.build(glossary_chunks())
+            else:
+                try:
+                    self._index = BM25Index.load(index_dir)
+                except Exception as e:
+                    # Keep answering from the index already loaded (the glossary on a first load)
+                    print(f"Warning: Could not load retrieval index {index_dir}: {e}")
+                    if self._index is None:
+                        self._index = BM25Index.build(glossary_chunks())
+            self._index_version = version
+        return self._index
+
+    def _retrieve_context(self, question: str) -> Tuple[str, List[str]]:
+        """Top-k chunks for the question within the context token budget, and their sources."""
+        hits = self.index.search(question, k=settings.RETRIEVAL_TOP_K, token_budget=settings.RETRIEVAL_CONTEXT_TOKENS)
+        sources = list(dict.fromkeys(hit.get("source") or GLOSSARY_SOURCE for hit in hits))
+        return "\n\n".join(hit["text"] for hit in hits), sources
 
     def process_query(self, question: str, chat_history: list = None) -> Dict[str, Any]:
         """
         Retrieves relevant documents and answers the question.
         """
         try:
-            # Simple Retrieval
-            context = self._retrieve_context(question)
+            with metrics.stage("retrieval_search"):
+                context, sources = self._retrieve_context(question)
             
             # Generate Answer
-            answer = self.chain.invoke({"context": context, "question": question})
+            with metrics.stage("retrieval"):
+                answer = self.chain.invoke({"context": context, "question": question})
             
             return {
                 "question": question,
                 "answer": answer,
-                "source_documents": ["Global Glossary (Memory)"]
+                "source_documents": sources
             }
+        except cancellation.Cancelled:
+            raise
         except Exception as e:
             return {
                 "question": question,
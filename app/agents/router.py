@@ -1,8 +1,11 @@
 
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_google_vertexai import ChatVertexAI
+import re
+from app.core import clients
 from app.core.config import settings
+from app.core.entities import entity_resolver
+from app.core.metrics import track_usage
 
 
 
@@ -11,17 +14,9 @@ from app.core.config import settings
 
 
 
-# Initialize Vertex AI Model
-try:
-    llm = ChatVertexAI(
-        model_name="gemini-2.5-flash",
-        project=settings.PROJECT_ID,
-        location=settings.LOCATION,
-        temperature=0,
-    )
-except Exception as e:
-    print(f"Warning: Router LLM init failed: {e}")
-    llm = None
+# Shared Vertex AI model (created on first use). Same parameters as the SQL agent's, so one client serves both;
+# routing decisions are cached (app/core/llm_cache.py), SQL generation is not.
+llm = clients.llm("gemini-2.5-flash", temperature=0, max_output_tokens=2048, cache="router")
 
 # Router Prompt (omitted for brevity, assume existing)
 template_router = """
@@ -53,15 +48,21 @@ You are a routing assistant for Willog's Intelligent Assistant. Your task is to
 - 물류 일반 상식이나 Willog 서비스 자체에 대한 추상적 질문
 예시: "안녕", "고마워", "윌로그 서비스에 대해 소개해줘", "물류가 뭐야?"
 
+4. SQL_AGENT+RETRIEVAL_AGENT
+목적: 한 질문에서 데이터 조회와 그 기준/정의/정책 설명을 함께 요청할 때 (두 에이전트가 동시에 답변)
+판단 기준:
+- 수치·통계 요청과 "기준", "정의", "계산 방법", "지침" 설명 요청이 모두 명시된 경우
+예시: "지난주 일탈률과 그 기준을 알려줘", "베트남행 파손율이랑 파손 판정 기준도 같이 보여줘"
+
 ━━━━━━━━━━━━━━━━━━━━ Priority Rules (우선순위) ━━━━━━━━━━━━━━━━━━━━
 
-수치 vs 로직: "지난주 일탈률(데이터)과 그 기준(로직)을 알려줘"처럼 복합적인 경우, SQL_AGENT를 우선합니다. (데이터 확인이 우선순위가 높음)
+수치 vs 로직: "지난주 일탈률(데이터)과 그 기준(로직)을 알려줘"처럼 둘 다 명시적으로 요청한 경우 SQL_AGENT+RETRIEVAL_AGENT, 설명 요청 없이 데이터만 묻는 경우는 SQL_AGENT입니다.
 원인 파악: "왜 온도가 높아?"라고 물었을 때, 실제 온도 데이터를 확인해야 하면 SQL_AGENT, 일반적인 원인(여름철 특성 등)을 묻는 것이면 RETRIEVAL_AGENT로 보냅니다. 모호하면 SQL_AGENT로 분류합니다.
 고유 명사: 특정 ID, 노선명, 지점명이 언급되면 99% 확률로 SQL_AGENT입니다.
 
 ━━━━━━━━━━━━━━━━━━━━ Output Rules (Strictly Enforced) ━━━━━━━━━━━━━━━━━━━━
 
-Output MUST be exactly one of the following strings: SQL_AGENT RETRIEVAL_AGENT GENERAL_AGENT
+Output MUST be exactly one of the following strings: SQL_AGENT RETRIEVAL_AGENT GENERAL_AGENT SQL_AGENT+RETRIEVAL_AGENT
 DO NOT include any other text, explanation, punctuation, or markdown.
 DO NOT translate the agent names.
 DO NOT respond in Korean (ONLY output the English agent name).
@@ -72,6 +73,9 @@ Agent:
 
 prompt_router = ChatPromptTemplate.from_template(template_router)
 
+# Multi-agent route: the Orchestrator runs both agents concurrently and merges their answers
+SQL_AND_RETRIEVAL = "SQL_AGENT+RETRIEVAL_AGENT"
+
 # Fallback for classification if LLM is unavailable
 # Fallback for classification if LLM is unavailable
 def mock_router(question: str):
@@ -80,28 +84,57 @@ def mock_router(question: str):
         return "GENERAL_AGENT"
 
     keywords_sql = ["count", "amount", "volume", "rate", "temperature", "humidity", "shock", "stats", "data", "how many", "percentage", "average", "통계", "수량", "건수", "파손율", "온도", "습도", "충격"]
+    keywords_policy = ["definition", "criteria", "guideline", "기준", "정의", "지침", "계산 방법", "어떻게 계산"]
     if any(k in question.lower() for k in keywords_sql):
+        if any(k in question.lower() for k in keywords_policy) and any(k in question.lower() for k in ["과 ", "와 ", "랑", "도 ", " and "]):
+            return SQL_AND_RETRIEVAL
         return "SQL_AGENT"
         
     return "RETRIEVAL_AGENT"
 
-if llm:
-    router_chain = prompt_router | llm | StrOutputParser()
-else:
-    # Use fallback mock
-    class MockRouterChain:
-        def invoke(self, input_dict):
-            return mock_router(input_dict["question"])
-    router_chain = MockRouterChain()
+# Local cues for sql_confidence(): a guess made before the router answers, used to decide whether
+# SQL generation is worth starting speculatively (see app/core/speculation.py)
+_SQL_CUES = ["몇", "건수", "평균", "비율", "율", "합계", "추이", "순위", "top", "최근", "이번", "지난", "어제", "오늘",
+             "일별", "월별", "별 ", "비교", "현황", "how many", "count", "average", "rate", "trend", "온도", "습도", "충격"]
+_RETRIEVAL_CUES = ["방법", "기준", "정의", "이유", "매뉴얼", "지침", "가이드", "어떻게 계산", "란?", "이란", "뭐야", "무엇",
+                   "설명", "대처", "정책", "why", "how to", "what is", "definition"]
+_GENERAL_CUES = ["안녕", "고마워", "감사", "반가워", "누구", "뭐 할 수", "소개", "hello", "hi ", "thank", "who are you"]
+_NUMBER = re.compile(r"\d")
+
+
+def sql_confidence(question: str) -> float:
+    """Rough local probability (0..1) that the router will pick SQL_AGENT; takes well under a millisecond."""
+    text = question.lower() + " "
+    score = 0.3
+    if entity_resolver.resolve(question):
+        score += 0.3
+    sql_cues = sum(cue in text for cue in _SQL_CUES)
+    score += min(0.4, 0.2 * sql_cues)
+    if _NUMBER.search(text):
+        score += 0.1
+    if any(cue in text for cue in _RETRIEVAL_CUES):
+        # "파손율과 그 기준" still needs SQL (SQL_AGENT+RETRIEVAL_AGENT); a bare "기준이 뭐야" does not
+        score -= 0.1 if sql_cues >= 2 else 0.4
+    if any(cue in text for cue in _GENERAL_CUES):
+        score -= 0.5
+    return max(0.0, min(1.0, score))
+
+router_chain = prompt_router | llm | track_usage("router") | StrOutputParser()
 
 def route_query(question: str) -> str:
-    """Classifies the query and returns 'SQL_AGENT', 'RETRIEVAL_AGENT', or 'GENERAL_AGENT'."""
+    """Classifies the query and returns 'SQL_AGENT', 'RETRIEVAL_AGENT', 'GENERAL_AGENT' or SQL_AND_RETRIEVAL."""
+    decision = _classify(question)
+    if decision == SQL_AND_RETRIEVAL and not settings.MULTI_AGENT_ROUTING:
+        return "SQL_AGENT"
+    return decision
+
+def _classify(question: str) -> str:
     try:
         decision = router_chain.invoke({"question": question}).strip()
         # Clean up potential markdown formatting
-        decision = decision.replace("`", "").replace("csv", "").strip()
+        decision = decision.replace("`", "").replace("csv", "").replace(" ", "").strip()
         
-        valid_agents = ["SQL_AGENT", "RETRIEVAL_AGENT", "GENERAL_AGENT"]
+        valid_agents = ["SQL_AGENT", "RETRIEVAL_AGENT", "GENERAL_AGENT", SQL_AND_RETRIEVAL]
         if decision not in valid_agents:
              # If LLM hallucinates, try fallback keyword matching
              print(f"Router Warning: Invalid agent '{decision}', falling back to keyword search.")
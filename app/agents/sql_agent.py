@@ -1,35 +1,28 @@
 
-from typing import Any, Dict
+import concurrent.futures
+import contextvars
+import re
+from typing import Any, Dict, List, Tuple
+
+import pandas as pd
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
-from langchain_google_vertexai import ChatVertexAI
+from app.core import cancellation, clients, metrics
 from app.core.config import settings
-from packages.bq_wrapper.schema import get_table_info
-from packages.bq_wrapper.client import BigQueryWrapper
+from app.core.entities import entity_resolver
+from app.core.jobs import report_progress
+from app.core.sessions import render_history
+from packages.bq_wrapper import approximate as approx
+from packages.bq_wrapper.schema import schema_catalog
+from packages.bq_wrapper.client import bq_client
 
 
 
 
-# Initialize Vertex AI Chat Model
+# Shared Vertex AI chat model and BigQuery client (both created on first use, see app/core/clients.py)
 # Ensure your environment has Google Cloud credentials set up
-
-try:
-
-
-
-    llm = ChatVertexAI(
-        model_name="gemini-2.5-flash",
-        project=settings.PROJECT_ID,
-        location=settings.LOCATION,
-        temperature=0,
-        max_output_tokens=2048
-    )
-except Exception as e:
-    print(f"Warning: Could not initialize Vertex AI: {e}")
-    llm = None
-
-bq_client = BigQueryWrapper()
+llm = clients.llm("gemini-2.5-flash", temperature=0, max_output_tokens=2048)
 
 # 1. SQL Generation Step
 template_sql_gen = """
@@ -47,44 +40,7 @@ Dataset: `willog-prod-data-gold.rag`
 
 Available tables (always use fully qualified names with backticks):
 
-1. `willog-prod-data-gold.rag.mart_logistics_master` (Fact Table)
-   - Purpose: Master transport stats, volume, damage rates, RISK LEVELS, FATIGUE.
-   - Columns: 
-     - code (STRING): Shipment ID
-     - departure_date (DATE): Partition Key - use for time filtering (e.g., "이번 달", "최근 1주일")
-     - arrival_date (DATE): Arrival Date (CRITICAL for "운송 건수" / active shipments queries)
-     - destination (STRING): Port code (e.g., 'CNSHG')
-     - product (STRING)
-     - transport_mode (STRING): 'air', 'truck', 'ocean+ferry', 'ocean+rail' (Note: Raw data is lowercase. 'ocean' often appears in composites.)
-     - package_type (STRING): Packaging type
-     - cumulative_shock_index (FLOAT): "Fatigue" or "Cumulative Stress" score
-     - risk_level (STRING): 'Low', 'Medium', 'High', 'Critical'
-     - temp_excursion_duration_min (INT64): Minutes outside valid temp range
-     - is_damaged (BOOL): Damage flag
-     - receive_name (STRING): Transport Route Name (Mapped from 'receiver_name'). e.g. 'Customer A'. Use for "운송경로".
-
-2. `willog-prod-data-gold.rag.mart_sensor_detail` (Big Data / Granular)
-   - Purpose: Dynamic Threshold Queries (e.g. "Shock > 7G"), Multi-variable Correlation, Directional Analysis.
-   - Columns: 
-     - event_date (DATE): Partition Key - use for time filtering
-     - event_timestamp (TIMESTAMP)
-     - code (STRING): Shipment ID (Join Key)
-     - destination (STRING): Destination port code.
-     - location_fin_corrected (STRING): Transport Segment / Corrected Location Name. Use for "운송구간".
-     - destination_country (STRING): 'China', 'Japan', 'Vietnam', 'Korea', 'USA', 'Other'
-     - transport_mode (STRING): Copied from master.
-     - shock_g (FLOAT), temperature (FLOAT), humidity (FLOAT)
-     - acc_x, acc_y, acc_z (FLOAT): Directional acceleration
-     - tilt_x, tilt_y (FLOAT): Tilt angles
-     - lat, lon (FLOAT): Geolocation
-
-3. `willog-prod-data-gold.rag.mart_risk_heatmap` (Geospatial)
-   - Purpose: "Heatmap", "Risk Map", "Where do shocks occur?".
-   - Columns: lat_center, lon_center, location_label, risk_score, high_impact_events
-
-4. `willog-prod-data-gold.rag.mart_quality_matrix` (Benchmarking)
-   - Purpose: Compare Performance (A vs B), Benchmarking Packaging/Routes.
-   - Columns: transport_mode, package_type, route, damage_rate, avg_fatigue_score, safety_score
+{schema}
 
 Scenario Guidelines (Whitepaper Analytics):
 - **Fatigue/Stress**: Query `cumulative_shock_index` from `mart_logistics_master`.
@@ -112,20 +68,7 @@ Scenario Guidelines (Whitepaper Analytics):
      -> If by Shipment/Code ("관리번호별 일탈률"): Calculate Sensor Log Excursion Rate.
         Query: `SELECT code, SAFE_DIVIDE(COUNTIF(shock_g >= 5 OR temperature < 2 OR temperature > 8), COUNT(*)) as excursion_rate FROM mart_sensor_detail GROUP BY code`
 
-Code Mapping Guide (Fuzzy Matching & Entity Resolution):
-- Shanghai, Sanghai, Sanghi, Shanhai, 상해, 상하이, SH -> 'CNSHG' (or destination LIKE '%Shanghai%')
-- Osaka, Osaca, Osk, 오사카, 오사카항 -> 'JPOSA'
-- Rizhao, Rizo, 일조, 리자오 -> 'CNRZH'
-- Lianyungang, Lianyun, 연운항 -> 'CNLYG'
-- Ningbo, Ningpo, 닝보 -> 'CNNBG'
-- Hochiminh, HCMC, VN SGN, 호치민 -> 'VNSGN'
-- Haiphong, VN HPH, 하이퐁 -> 'VNHPH'
-- Incheon, ICN, 인천 -> 'KRICN'
-- Busan, Pusan, 부산 -> 'KRPUS'
-- "중국", "China", "CN" -> destination_country = 'China' OR destination LIKE 'CN%'
-- "베트남", "Vietnam", "VN" -> destination_country = 'Vietnam' OR destination LIKE 'VN%'
-- "일본", "Japan", "JP" -> destination_country = 'Japan' OR destination LIKE 'JP%'
-- "미국", "USA", "US" -> destination_country = 'USA' OR destination LIKE 'US%'
+Term Mapping Guide:
 - "배송 건수", "배송량" -> Same as "출고 건수" (Departed Shipments)
 - "물동량" -> Can be "출고 건수" or "운송 건수" depending on context, default to "출고 건수".
 - "운송경로", "경로" -> Use `receive_name` column.
@@ -143,8 +86,7 @@ Code Mapping Guide (Fuzzy Matching & Entity Resolution):
   Query: `SELECT receive_name as carrier, COUNT(*) as total_shipments, AVG(cumulative_shock_index) as avg_fatigue, countif(is_damaged)/count(*) as damage_rate FROM mart_logistics_master WHERE departure_date BETWEEN 'START' AND 'END' GROUP BY 1`
 - "과도한 기울기", "Tilt" -> If no degree specified, default to > 45 degrees.
   Query: `SELECT code, COUNT(*) as tilt_events FROM mart_sensor_detail WHERE (ABS(tilt_x) > 45 OR ABS(tilt_y) > 45) ...`
-- "최근", "Latest" -> Refers to the latest available data period (Nov-Dec 2025), NOT 2026.
-  -> `arrival_date BETWEEN '2025-11-01' AND '2025-12-31'`
+- "최근", "Latest" -> Refers to the latest available data period (see each table's "data from ... to ..." range), NOT today's date.
 
 Example SQLs (Few-shot Learning):
 1. "🛳️ 해상 운송 중 5G 이상 충격 발생 비율" (Ratio Calculation)
@@ -287,7 +229,11 @@ LIMIT 10
 - If METRIC is unclear ("물동량 알려줘"), ask: `CLARIFICATION_NEEDED: '출고 건수'(출발 기준)를 원하시나요, 아니면 '운송 건수'(운송 중 포함)를 원하시나요?`
 - For Flow/Connection queries ("~별 ~", "흐름", "연결"), ALWAYS return `source_node` and `target_node` columns to show Sankey Chart.
 - For Ratio Trend queries ("비중 추이", "점유율 추이"), ALWAYS calculate `SAFE_DIVIDE(..., SUM(...) OVER(PARTITION BY date)) * 100 AS share_percentage` to trigger Stacked Bar Chart.
+{decomposition}
 
+Resolved Entities (ports, countries, transport modes, products and carriers in the question, matched
+against the mart values; use exactly these filters, and filter on the column with LIKE for names not listed):
+{entities}
 
 Previous Conversation Context:
 {chat_history}
@@ -298,23 +244,68 @@ SQL Query:
 
 prompt_sql_gen = ChatPromptTemplate.from_template(template_sql_gen)
 
-def get_schema(_):
-    return get_table_info()
-
-
+# Comparison questions get independent sub-queries instead of one query computing every figure
+# (see split_parts / combine_parts); other questions get no extra prompt text
+template_decomposition = """
+**Comparison Questions (independent sub-queries)**:
+This question compares figures that can be computed independently (different metrics, or the same metric for
+different periods, routes or modes). Do NOT compute them in one query with CASE WHEN over a wide date range or a
+self-join. Write one simple SELECT per figure (at most {max_parts}), each preceded by a line `-- part: <short label>`.
+Each part filters only the partitions it needs. Parts comparing the same metric return the same column names.
+Example ("이번 달 출고 건수와 운송 건수 비교"):
+-- part: 출고 건수
+SELECT COUNT(DISTINCT code) AS departed_count
+FROM `willog-prod-data-gold.rag.mart_logistics_master`
+WHERE departure_date BETWEEN '2025-11-01' AND '2025-11-30'
+-- part: 운송 건수
+SELECT COUNT(DISTINCT code) AS active_transport_count
+FROM `willog-prod-data-gold.rag.mart_logistics_master`
+WHERE departure_date <= '2025-11-30' AND (arrival_date >= '2025-11-01' OR arrival_date IS NULL)
+"""
 
-if llm:
-    sql_generator_chain = (
-        prompt_sql_gen
-        | llm
-        | StrOutputParser()
-    )
-else:
-    # Mock chain if LLM is not available
-    class MockSQLChain:
-        def invoke(self, input_dict):
-            return "```sql\n-- Mock SQL (LLM unavailable)\nSELECT * FROM view_transport_stats LIMIT 10\n```"
-    sql_generator_chain = MockSQLChain()
+_COMPARISON_CUES = ["비교", "대비", "차이", " vs", "vs.", "versus", "compare", "전년", "전월", "전주", "증감"]
+_PART_MARKER = re.compile(r"^\s*--\s*part:\s*(.*)$", re.IGNORECASE | re.MULTILINE)
+
+
+def is_comparison(question: str) -> bool:
+    text = question.lower()
+    return any(cue in text for cue in _COMPARISON_CUES)
+
+
+def split_parts(sql: str) -> List[Tuple[str, str]]:
+    """(label, sql) per `-- part:` block of a decomposed query; empty for an ordinary single query."""
+    markers = list(_PART_MARKER.finditer(sql))
+    parts = []
+    for i, marker in enumerate(markers):
+        end = markers[i + 1].start() if i + 1 < len(markers) else len(sql)
+        body = sql[marker.end():end].strip().rstrip(";").strip()
+        if body:
+            parts.append((marker.group(1).strip() or f"part {i + 1}", body))
+    return parts
+
+
+def combine_parts(results: List[Tuple[str, pd.DataFrame]]) -> pd.DataFrame:
+    """
+    One-row parts (separate figures) become one row with all their columns, like the monolithic query would
+    return; other parts are stacked with a leading `part` column holding their label.
+    """
+    if all(len(df) == 1 for _, df in results):
+        # A column name used by several parts (the same metric for two periods) is prefixed with the part label
+        counts = pd.Series([column for _, df in results for column in df.columns]).value_counts()
+        return pd.concat([
+            df.reset_index(drop=True).rename(columns={c: f"{label} {c}" for c in df.columns if counts[c] > 1})
+            for label, df in results
+        ], axis=1)
+    combined = pd.concat([df.assign(part=label) for label, df in results], ignore_index=True)
+    return combined[["part"] + [c for c in combined.columns if c != "part"]]
+
+
+sql_generator_chain = (
+    prompt_sql_gen
+    | llm
+    | metrics.track_usage("sql_generation")
+    | StrOutputParser()
+)
 
 # 2. Response Synthesis Prompt
 template_synthesis = """
@@ -335,40 +326,102 @@ Answer:
 
 prompt_synthesis = ChatPromptTemplate.from_template(template_synthesis)
 
-if llm:
-    synthesis_chain = prompt_synthesis | llm | StrOutputParser()
-else:
-    synthesis_chain = None
+synthesis_chain = prompt_synthesis | llm | metrics.track_usage("synthesis") | StrOutputParser()
+
+def _validate(sql: str) -> List[str]:
+    return [problem for _, part in split_parts(sql) or [("", sql)] for problem in schema_catalog.validate(part)]
+
+
+# Parts of a decomposed query run here, as separate BigQuery jobs (still bounded by the "bigquery" stage limit)
+_part_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=settings.BQ_MAX_CONCURRENCY, thread_name_prefix="sql-part"
+)
+
 
 class SQLAgent:
     def __init__(self):
         self.chain = sql_generator_chain
         self.synthesis_chain = synthesis_chain
     
-    def process_query(self, question: str, chat_history: list = None) -> Dict[str, Any]:
+    def generate_sql(self, question: str, chat_history: list = None) -> str:
+        """Generated (and validated) SQL for the question, or its CLARIFICATION_NEEDED reply.
+        Has no side effects besides the LLM calls, so the Orchestrator may run it speculatively."""
         from datetime import date
         current_date = date.today().isoformat()
         
-        # Format history logic
-        history_str = ""
-        if chat_history:
-            recent_history = chat_history[-6:] # Context window 6
-            for msg in recent_history:
-                role = "User" if msg.get("role") == "user" else "Assistant"
-                content = msg.get("content", "")
-                history_str += f"{role}: {content}\n"
+        # Summary + most recent turns (with their SQL and result shape) under the history token budget
+        history_str = render_history(chat_history, settings.HISTORY_TOKEN_BUDGET)
 
-        # 1. Generate SQL
-        generated_sql = self.chain.invoke({
+        # Ports, countries, modes, products and carriers are resolved locally, not by the LLM
+        entities = []
+        if settings.ENTITY_RESOLUTION_ENABLED:
+            with metrics.stage("entity_resolution"):
+                entities = entity_resolver.resolve(question)
+
+        inputs = {
             "question": question, 
             "current_date": current_date,
-            "chat_history": history_str
-        })
+            "chat_history": history_str,
+            "entities": entity_resolver.annotate(entities),
+            "schema": schema_catalog.prompt_text(),
+            "decomposition": template_decomposition.format(max_parts=settings.SQL_DECOMPOSITION_MAX_PARTS)
+            if settings.SQL_DECOMPOSITION_ENABLED and is_comparison(question) else ""
+        }
+
+        # 1. Generate SQL
+        with metrics.stage("sql_generation"):
+            generated_sql = self.chain.invoke(inputs)
         
         print(f"DEBUG: Generated SQL for '{question}': [{generated_sql}]") # Debug log
         
         clean_sql = generated_sql.replace("```sql", "").replace("```", "").strip()
-        
+
+        # SQL the catalog can already tell is wrong (unknown column, a value the column never holds) is
+        # regenerated once with the problems, instead of costing a failed or empty BigQuery job
+        problems = []
+        if settings.SQL_VALIDATION_ENABLED and clean_sql and "CLARIFICATION_NEEDED:" not in clean_sql:
+            problems = _validate(clean_sql)
+        if problems:
+            print(f"DEBUG: Generated SQL failed validation: {problems}")
+            metrics.SQL_VALIDATION_FAILURES.labels("first").inc()
+            feedback = "\n".join(f"- {problem}" for problem in problems)
+            with metrics.stage("sql_regeneration"):
+                generated_sql = self.chain.invoke({
+                    **inputs,
+                    "question": f"{question}\n\nA previous attempt produced this SQL:\n{clean_sql}\n"
+                                f"Write it again without these problems:\n{feedback}"
+                })
+            clean_sql = generated_sql.replace("```sql", "").replace("```", "").strip()
+            if clean_sql and "CLARIFICATION_NEEDED:" not in clean_sql and _validate(clean_sql):
+                # Still flagged: BigQuery has the final say
+                metrics.SQL_VALIDATION_FAILURES.labels("retry").inc()
+        return clean_sql
+
+    def _execute(self, sql: str) -> pd.DataFrame:
+        """Runs the query, or the parts of a decomposed query concurrently, combining their results."""
+        parts = split_parts(sql)
+        if len(parts) <= 1:
+            return bq_client.run_query(parts[0][1] if parts else sql)
+        print(f"DEBUG: Running {len(parts)} sub-queries concurrently: {[label for label, _ in parts]}")
+        # Each part sees the request's trace (bytes per job) and cancellation scope
+        futures = [_part_executor.submit(contextvars.copy_context().run, bq_client.run_query, part)
+                   for _, part in parts]
+        results = []
+        for (label, _), future in zip(parts, futures):
+            try:
+                results.append((label, future.result()))
+            except cancellation.Cancelled:
+                raise
+            except Exception as e:
+                raise RuntimeError(f"Sub-query '{label}' failed: {e}") from e
+        return combine_parts(results)
+
+    def process_query(self, question: str, chat_history: list = None, generated_sql: str = None,
+                      approximate: bool = False) -> Dict[str, Any]:
+        # generated_sql: the result of generate_sql() when the Orchestrator already ran it speculatively
+        # approximate: the caller opted in to sampled / sketch-based answers (packages/bq_wrapper/approximate.py)
+        clean_sql = self.generate_sql(question, chat_history) if generated_sql is None else generated_sql
+
         if "CLARIFICATION_NEEDED:" in clean_sql:
             return {
                 "question": question,
@@ -386,18 +439,35 @@ class SQLAgent:
                 "natural_response": "질문을 이해하는데 어려움이 있습니다. 조금 더 구체적으로(기간, 조건 등) 말씀해 주실 수 있나요?",
                 "error": "Empty SQL generated"
             }
+
+        # Eligible exploratory aggregates run on a sample (or with sketches) and come back with confidence intervals
+        approx_plan = None
+        if approximate and settings.APPROX_QUERY_ENABLED:
+            approx_plan = approx.plan(clean_sql, settings.APPROX_TABLES, settings.APPROX_SAMPLE_PERCENT,
+                                      settings.APPROX_REPLICATES)
+            if approx_plan is not None:
+                print(f"DEBUG: Approximate execution ({approx_plan['method']}):\n{approx_plan['sql']}")
+                clean_sql = approx_plan["sql"]
         
+        report_progress("sql_generated", sql=clean_sql)
+
         # 2. Execute SQL against BigQuery
         result_df = None
         error = None
         try:
-            if bq_client.client:
+            if bq_client.available:
                 print(f"DEBUG: Executing query on BigQuery...")
-                result_df = bq_client.run_query(clean_sql)
+                with metrics.stage("sql_execution"):
+                    result_df = self._execute(clean_sql)
+                if approx_plan is not None:
+                    result_df = approx.combine(result_df, approx_plan)
                 print(f"DEBUG: Query executed. Result shape: {result_df.shape if result_df is not None else 'None'}")
+                report_progress("query_completed", data=result_df)
             else:
-                error = "BigQuery Client is not initialized (client object is None)."
+                error = "BigQuery Client is not initialized (client object is None) and no local snapshots are available."
                 print(f"DEBUG: {error}")
+        except cancellation.Cancelled:
+            raise
         except Exception as e:
             error = str(e)
             print(f"DEBUG: Query execution failed: {error}")
@@ -407,15 +477,25 @@ class SQLAgent:
         if result_df is not None and self.synthesis_chain:
             try:
                 # Convert DataFrame to string for LLM
-                result_str = result_df.to_string() if not result_df.empty else "(empty)"
+                with metrics.stage("result_serialization"):
+                    result_str = result_df.to_string() if not result_df.empty else "(empty)"
+                if approx_plan is not None and approx_plan["method"] == "sample":
+                    result_str = (f"(Estimates from a ~{approx_plan['sample_percent']:g}% sample; <column>_ci_low / "
+                                  f"<column>_ci_high are 95% confidence intervals. Present values as approximate.)\n"
+                                  f"{result_str}")
                 print(f"DEBUG: Synthesis Input Result:\n{result_str}")
-                natural_response = self.synthesis_chain.invoke({
-                    "question": question,
-                    "sql": clean_sql,
-                    "result": result_str
-                })
+                with metrics.stage("synthesis"):
+                    natural_response = self.synthesis_chain.invoke({
+                        "question": question,
+                        "sql": clean_sql,
+                        "result": result_str
+                    })
+            except cancellation.Cancelled:
+                raise
             except Exception as e:
                 natural_response = f"결과 해석 중 오류: {e}"
+            if approx_plan is not None and natural_response:
+                natural_response = f"{natural_response}\n\n{approx.describe(approx_plan)}"
         elif error:
             natural_response = f"쿼리 실행 중 오류가 발생했습니다: {error}"
         elif result_df is None:
@@ -433,7 +513,8 @@ class SQLAgent:
             "generated_sql": clean_sql,
             "result": result_df,
             "natural_response": natural_response,
-            "error": error
+            "error": error,
+            "approximation": {k: v for k, v in approx_plan.items() if k not in ("sql", "columns")} if approx_plan else None
         }
 
 agent = SQLAgent()
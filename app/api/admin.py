@@ -0,0 +1,59 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+import json
+
+from app.core.config import settings
+from app.core.llm_cache import llm_cache
+from app.core.slow_log import slow_log, to_corpus
+
+# Most entries a single listing or export returns
+MAX_ENTRIES = 1000
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    # Fail closed: without a configured token the admin endpoints are disabled
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN is not set)")
+    if x_admin_token != settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+@router.get("/slow-requests")
+def list_slow_requests(limit: int = 50, agent: Optional[str] = None,
+                       min_duration_s: Optional[float] = None, since: Optional[float] = None):
+    """Newest-first slow requests with stage timings, SQL, job ids, bytes processed and query plans."""
+    slow_log.flush()
+    entries = slow_log.entries(limit=min(limit, MAX_ENTRIES), agent=agent, min_duration_s=min_duration_s, since=since)
+    return {"threshold_s": slow_log.threshold_s, "count": len(entries), "entries": entries}
+
+@router.get("/slow-requests/export")
+def export_slow_requests(format: str = "jsonl", limit: int = MAX_ENTRIES, agent: Optional[str] = None,
+                         min_duration_s: Optional[float] = None, since: Optional[float] = None):
+    """
+    Exports slow requests as raw JSON lines, or (format=corpus) as a question corpus that
+    scripts/bench_pipeline.py --corpus and the load generator can replay.
+    """
+    slow_log.flush()
+    entries = slow_log.entries(limit=min(limit, MAX_ENTRIES), agent=agent, min_duration_s=min_duration_s, since=since)
+    if format == "corpus":
+        return to_corpus(entries)
+    if format != "jsonl":
+        raise HTTPException(status_code=400, detail="format must be 'jsonl' or 'corpus'")
+    body = "".join(json.dumps(e, ensure_ascii=False, default=str) + "\n" for e in entries)
+    return PlainTextResponse(
+        body,
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=slow_requests.jsonl"},
+    )
+
+@router.get("/llm-cache")
+def llm_cache_stats():
+    """Per-agent hit rates, entry counts and TTLs of the LLM response cache."""
+    return llm_cache.stats()
+
+@router.delete("/llm-cache")
+def clear_llm_cache(agent: Optional[str] = None):
+    """Drops cached responses (of one agent, or all). Prompt edits need no clearing: they change the key."""
+    llm_cache.clear(agent)
+    return llm_cache.stats()
@@ -0,0 +1,93 @@
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+
+from app.api.routes import ChatRequest, ChatResponse, orchestrator, record_turn, resolve_conversation, serialize_data
+from app.core.config import settings
+from app.core.jobs import Job, JobManager, JobQueueFull
+
+router = APIRouter()
+
+
+def _run_and_record(question: str, chat_history: list = None, session_id: str = None, approximate: bool = False):
+    result = orchestrator.run(question, chat_history=chat_history, approximate=approximate)
+    record_turn(session_id, question, result)
+    return result
+
+
+# Heavy questions (e.g. over mart_sensor_detail) run here instead of inside the HTTP request
+job_manager = JobManager(
+    _run_and_record,
+    workers=settings.JOB_WORKERS,
+    max_pending=settings.JOB_MAX_PENDING,
+    ttl_s=settings.JOB_RESULT_TTL_S,
+    deadline_s=settings.JOB_DEADLINE_S,
+)
+
+
+class JobStatus(BaseModel):
+    job_id: str
+    status: str
+    stage: str
+    question: str
+    created: float
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    partial: Dict[str, Any] = {}
+    session_id: Optional[str] = None
+    result: Optional[ChatResponse] = None
+    stages: Optional[Dict[str, float]] = None
+    error: Optional[str] = None
+
+
+def _status(job: Job) -> JobStatus:
+    partial = dict(job.partial)
+    if "data" in partial:
+        partial["data"] = serialize_data(partial["data"])
+
+    result, stages = None, None
+    if job.result is not None:
+        result = ChatResponse(
+            answer=job.result.get("text", ""),
+            data=serialize_data(job.result.get("data")),
+            sql=job.result.get("sql"),
+            agent=job.result.get("agent"),
+            session_id=job.session_id,
+            refreshed=job.result.get("refreshed"),
+            approximation=job.result.get("approximation"),
+        )
+        if job.result.get("trace") is not None:
+            stages = job.result["trace"].stages
+    return JobStatus(
+        job_id=job.id, status=job.status, stage=job.stage, question=job.question, session_id=job.session_id,
+        created=job.created,
+        started=job.started, finished=job.finished, partial=partial, result=result, stages=stages, error=job.error,
+    )
+
+
+@router.post("", response_model=JobStatus, status_code=202)
+def submit_job(request: ChatRequest):
+    question, history, session_id = resolve_conversation(request)
+    try:
+        job = job_manager.submit(question, chat_history=history, session_id=session_id,
+                                 approximate=request.approximate)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+    return _status(job)
+
+
+@router.get("/{job_id}", response_model=JobStatus)
+def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found (unknown or expired)")
+    return _status(job)
+
+
+@router.delete("/{job_id}", response_model=JobStatus)
+def cancel_job(job_id: str):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found (unknown or expired)")
+    return _status(job)
@@ -1,9 +1,32 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.routes import router as api_router
+from app.api.routes import orchestrator, router as api_router
+from app.api.admin import router as admin_router
+from app.api.jobs import router as jobs_router
+from app.core import clients
 from app.core.config import settings
+from app.core.suggestions import suggestion_warmer
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
 
-app = FastAPI(title="Willog Intelligence Assistant API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.WARM_UP_ON_STARTUP:
+        # Runs before the server accepts traffic, so the first request finds every client ready
+        await run_in_threadpool(clients.warm_up)
+    warmer = None
+    if settings.SUGGESTION_WARMER_ENABLED:
+        # Precomputes the suggestion buttons now and every SUGGESTION_REFRESH_INTERVAL_S, in the background
+        warmer = suggestion_warmer(orchestrator)
+        warmer.start()
+    yield
+    if warmer is not None:
+        warmer.stop()
+
+app = FastAPI(title="Willog Intelligence Assistant API", version="1.0.0", lifespan=lifespan)
 
 # CORS Configuration
 # In production, replace "*" with specific domain
@@ -19,11 +42,18 @@ app.add_middleware(
 
 # Include API Routes
 app.include_router(api_router, prefix="/api")
+app.include_router(jobs_router, prefix="/api/jobs")
+app.include_router(admin_router, prefix="/api/admin")
 
 @app.get("/health")
 def health_check():
     return {"status": "ok", "version": "1.0.0"}
 
+@app.get("/metrics")
+def metrics_endpoint():
+    # Prometheus scrape target: stage latency histograms, BigQuery usage and LLM token counters
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 # Serve Static Files (Frontend)
 from fastapi.staticfiles import StaticFiles
 import os
@@ -1,9 +1,16 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import List, Optional
+import asyncio
 import logging
 
 from app.agents.orchestrator import Orchestrator
+from app.core import cancellation, metrics
+from app.core.config import settings
+from app.core.admission import Overloaded, request_admission
+from app.core.sessions import assistant_turn, session_store
+from app.core.suggestions import suggestion_store
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -16,57 +23,130 @@ class ChatMessage(BaseModel):
     content: str
     
 class ChatRequest(BaseModel):
-    messages: List[ChatMessage]
-    # user_id or session_id could be added here
+    # Preferred: the new user message plus the session id from the previous response (omit it to
+    # start a new session); the conversation history is kept server-side
+    message: Optional[str] = None
+    session_id: Optional[str] = None
+    # Legacy: the full message list, last message being the question (no server-side session)
+    messages: Optional[List[ChatMessage]] = None
+    # Opt-in: exploratory aggregates may be answered from a sample, with confidence intervals in the data
+    # (see packages/bq_wrapper/approximate.py); send the question again without it for the exact answer
+    approximate: bool = False
 
 class ChatResponse(BaseModel):
     answer: str
     data: Optional[List[dict]] = None
     sql: Optional[str] = None
     agent: Optional[str] = None
+    session_id: Optional[str] = None
+    # Set for precomputed suggestion answers: when they were computed (epoch seconds)
+    refreshed: Optional[float] = None
+    # Set for approximate answers: method ("sample" or "sketch"), table and sample percent
+    approximation: Optional[dict] = None
+
+def resolve_conversation(request: ChatRequest):
+    """(question, history, session_id) for a request; session_id is None for legacy full-history requests."""
+    if request.message is not None or request.session_id:
+        question = request.message if request.message is not None else (
+            request.messages[-1].content if request.messages else None
+        )
+        if not question:
+            raise HTTPException(status_code=400, detail="No message provided")
+        session_id = request.session_id or session_store.new_id()
+        return question, session_store.history(session_id), session_id
+    if not request.messages:
+        raise HTTPException(status_code=400, detail="No messages provided")
+    history = [{"role": m.role, "content": m.content} for m in request.messages[:-1]]
+    return request.messages[-1].content, history, None
+
+def record_turn(session_id: Optional[str], question: str, result: dict):
+    if session_id:
+        session_store.append(session_id, {"role": "user", "content": question}, assistant_turn(result))
+
+def serialize_data(raw_data) -> Optional[List[dict]]:
+    """DataFrame -> JSON records (NaN becomes null)."""
+    if raw_data is None:
+        return None
+    # Assuming raw_data is a Pandas DataFrame
+    # Convert NaN to None for invalid JSON fix
+    try:
+        import pandas as pd
+        if isinstance(raw_data, pd.DataFrame):
+            with metrics.stage("response_serialization"):
+                # Replace NaN with None (which becomes null in JSON)
+                df_clean = raw_data.where(pd.notnull(raw_data), None)
+                return df_clean.to_dict(orient="records")
+    except Exception as e:
+        logger.warning(f"Failed to serialize DataFrame: {e}")
+    return None
+
+@router.get("/suggestions")
+def list_suggestions():
+    """The suggestion buttons, with when each precomputed answer was refreshed (None: answered live)."""
+    return {"suggestions": [
+        {"question": question, "refreshed": suggestion_store.refreshed(question)} for question in settings.SUGGESTIONS
+    ]}
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
+async def chat_endpoint(request: ChatRequest, http_request: Request):
+    # Bounded queue in front of the Orchestrator: shed load early instead of slowing everyone down
     try:
-        if not request.messages:
-            raise HTTPException(status_code=400, detail="No messages provided")
-        
-        last_message = request.messages[-1]
-        
-        user_query = last_message.content
-        
-        history = [
-            {"role": m.role, "content": m.content} 
-            for m in request.messages[:-1]
-        ]
+        async with request_admission.admit():
+            return await _process_chat(request, http_request)
+    except Overloaded as e:
+        metrics.CHAT_REQUESTS.labels("rejected").inc()
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+async def _cancel_on_disconnect(http_request: Request, scope: cancellation.CancelScope):
+    while not scope.cancelled:
+        if await http_request.is_disconnected():
+            scope.cancel(cancellation.CLIENT_DISCONNECTED)
+            return
+        await asyncio.sleep(0.5)
+
+def _run_in_scope(scope: cancellation.CancelScope, question: str, history: list, approximate: bool = False):
+    with cancellation.active(scope):
+        return orchestrator.run(question, chat_history=history, approximate=approximate)
+
+async def _process_chat(request: ChatRequest, http_request: Request) -> ChatResponse:
+    try:
+        user_query, history, session_id = resolve_conversation(request)
         
         logger.info(f"Processing query: {user_query}")
-        result = orchestrator.run(user_query, chat_history=history)
+        # The pipeline is blocking; run it off the event loop so concurrent requests overlap
+        # (and identical ones can be coalesced by the Orchestrator). Its LLM calls and BigQuery job are
+        # cancelled at the request deadline or as soon as the client goes away.
+        scope = cancellation.CancelScope(settings.REQUEST_DEADLINE_S)
+        watcher = asyncio.create_task(_cancel_on_disconnect(http_request, scope))
+        try:
+            result = await run_in_threadpool(_run_in_scope, scope, user_query, history, request.approximate)
+        finally:
+            watcher.cancel()
+            scope.close()
+        record_turn(session_id, user_query, result)
         
         # Extract data
         answer_text = result.get("text", "")
-        data_payload = None
-        
-        raw_data = result.get("data")
-        if raw_data is not None:
-            # Assuming raw_data is a Pandas DataFrame
-            # Convert NaN to None for invalid JSON fix
-            try:
-                import pandas as pd
-                if isinstance(raw_data, pd.DataFrame):
-                    # Replace NaN with None (which becomes null in JSON)
-                    df_clean = raw_data.where(pd.notnull(raw_data), None)
-                    data_payload = df_clean.to_dict(orient="records")
-            except Exception as e:
-                logger.warning(f"Failed to serialize DataFrame: {e}")
+        data_payload = serialize_data(result.get("data"))
         
+        metrics.CHAT_REQUESTS.labels("ok").inc()
         return ChatResponse(
             answer=answer_text,
             data=data_payload,
             sql=result.get("sql"),
-            agent=result.get("agent")
+            agent=result.get("agent"),
+            session_id=session_id,
+            refreshed=result.get("refreshed"),
+            approximation=result.get("approximation"),
         )
         
+    except HTTPException:
+        raise
+    except (cancellation.Cancelled, TimeoutError) as e:
+        metrics.CHAT_REQUESTS.labels("cancelled").inc()
+        logger.warning(f"Chat request cancelled: {e}")
+        raise HTTPException(status_code=504, detail=f"Request cancelled: {e}")
     except Exception as e:
+        metrics.CHAT_REQUESTS.labels("error").inc()
         logger.error(f"Error processing chat request: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
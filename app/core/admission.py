@@ -0,0 +1,158 @@
+"""
+Admission control for the chat pipeline.
+
+`/api/chat` admits at most MAX_CONCURRENT_REQUESTS requests into the Orchestrator; up to
+REQUEST_QUEUE_SIZE more wait in a bounded queue and anything beyond that is rejected immediately
+(429 + Retry-After) instead of slowing every admitted request down. Inside the pipeline, calls to
+Vertex AI and BigQuery additionally pass through per-stage semaphores (`stage_slot("llm")`,
+`stage_slot("bigquery")`) sized below the backends' quotas.
+"""
+import asyncio
+import contextlib
+import math
+import threading
+import time
+from typing import Dict
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.core import cancellation
+from app.core.config import settings
+from app.core.metrics import LATENCY_BUCKETS
+
+QUEUE_DEPTH = Gauge("willog_admission_queue_depth", "Requests/calls waiting for a slot", ["stage"])
+IN_FLIGHT = Gauge("willog_admission_in_flight", "Requests/calls holding a slot", ["stage"])
+QUEUE_WAIT = Histogram(
+    "willog_admission_wait_seconds", "Time spent waiting for a slot", ["stage"], buckets=LATENCY_BUCKETS
+)
+REJECTED = Counter("willog_admission_rejected_total", "Requests rejected because the queue was full", ["reason"])
+
+
+class Overloaded(Exception):
+    """The request queue is full (or the queue wait timed out); retry after `retry_after` seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Server is busy ({reason}); retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded concurrency + bounded FIFO queue for async request handlers."""
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout_s: float, stage: str = "request"):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self.stage = stage
+        self._slots = None
+        self._loop = None
+        self._waiting = 0
+        self._running = 0
+        # Moving average of how long an admitted request holds its slot, for Retry-After
+        self._avg_service_s = 1.0
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # asyncio primitives belong to one event loop; tests and load scripts may start several
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._slots, self._loop = asyncio.Semaphore(self.max_concurrent), loop
+        return self._slots
+
+    def retry_after(self) -> int:
+        backlog = self._waiting + 1
+        return max(1, math.ceil(backlog * self._avg_service_s / self.max_concurrent))
+
+    @contextlib.asynccontextmanager
+    async def admit(self):
+        slots = self._semaphore()
+        if slots.locked() and self._waiting >= self.max_queue:
+            REJECTED.labels("queue_full").inc()
+            raise Overloaded("queue full", self.retry_after())
+
+        self._waiting += 1
+        QUEUE_DEPTH.labels(self.stage).set(self._waiting)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout=self.queue_timeout_s)
+        except asyncio.TimeoutError:
+            REJECTED.labels("queue_timeout").inc()
+            raise Overloaded("queue timeout", self.retry_after())
+        finally:
+            self._waiting -= 1
+            QUEUE_DEPTH.labels(self.stage).set(self._waiting)
+        QUEUE_WAIT.labels(self.stage).observe(time.perf_counter() - start)
+
+        self._running += 1
+        IN_FLIGHT.labels(self.stage).set(self._running)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._avg_service_s = 0.8 * self._avg_service_s + 0.2 * (time.perf_counter() - started)
+            self._running -= 1
+            IN_FLIGHT.labels(self.stage).set(self._running)
+            slots.release()
+
+
+class StageLimiter:
+    """Thread-side semaphore around one backend (the pipeline itself runs in worker threads)."""
+
+    def __init__(self, stage: str, limit: int):
+        self.stage = stage
+        self.limit = limit
+        self._slots = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._running = 0
+
+    def _update(self, waiting: int = 0, running: int = 0):
+        with self._lock:
+            self._waiting += waiting
+            self._running += running
+            QUEUE_DEPTH.labels(self.stage).set(self._waiting)
+            IN_FLIGHT.labels(self.stage).set(self._running)
+
+    def has_capacity(self) -> bool:
+        """True if a slot is free right now (nobody would have to queue for it)."""
+        with self._lock:
+            return self._waiting == 0 and self._running < self.limit
+
+    @contextlib.contextmanager
+    def slot(self):
+        cancellation.check_cancelled()
+        self._update(waiting=1)
+        start = time.perf_counter()
+        try:
+            # Never wait past the request's deadline for a backend slot
+            acquired = self._slots.acquire(timeout=cancellation.remaining())
+        finally:
+            self._update(waiting=-1)
+        if not acquired:
+            raise cancellation.Cancelled(cancellation.DEADLINE_EXCEEDED)
+        QUEUE_WAIT.labels(self.stage).observe(time.perf_counter() - start)
+        self._update(running=1)
+        try:
+            yield
+        finally:
+            self._update(running=-1)
+            self._slots.release()
+
+
+request_admission = AdmissionController(
+    settings.MAX_CONCURRENT_REQUESTS, settings.REQUEST_QUEUE_SIZE, settings.REQUEST_QUEUE_TIMEOUT_S
+)
+
+_stage_limiters: Dict[str, StageLimiter] = {
+    "llm": StageLimiter("llm", settings.LLM_MAX_CONCURRENCY),
+    "bigquery": StageLimiter("bigquery", settings.BQ_MAX_CONCURRENCY),
+}
+
+
+def stage_slot(stage: str):
+    """Context manager holding one of the stage's slots for the duration of a backend call."""
+    return _stage_limiters[stage].slot()
+
+
+def stage_has_capacity(stage: str) -> bool:
+    return _stage_limiters[stage].has_capacity()
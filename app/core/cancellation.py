@@ -0,0 +1,142 @@
+"""
+Cooperative cancellation and deadlines for a running pipeline.
+
+A `CancelScope` is activated for the duration of a piece of work (`with active(scope): ...`). Backend
+wrappers register how to abort their in-flight operation (`on_cancel`, e.g. cancelling the BigQuery
+job), check the scope between calls (`check()`) and bound their own waits by `remaining()`, so
+cancelling stops the pipeline at the next step and releases the backend work instead of letting it
+run to completion unobserved. A scope with a deadline cancels itself when the deadline passes; a
+scope created inside another one is cancelled with its parent and never outlives its deadline.
+"""
+import contextlib
+import contextvars
+import threading
+import time
+from typing import Callable, List, Optional
+
+from prometheus_client import Counter
+
+CANCELLED_SCOPES = Counter("willog_cancelled_requests_total", "Requests/jobs cancelled, by reason", ["reason"])
+
+DEADLINE_EXCEEDED = "deadline exceeded"
+CLIENT_DISCONNECTED = "client disconnected"
+
+
+class Cancelled(Exception):
+    """The active scope was cancelled."""
+
+
+class CancelScope:
+
+    def __init__(self, deadline_s: Optional[float] = None, parent: Optional["CancelScope"] = None):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+        self.reason: Optional[str] = None
+
+        self.deadline = None if deadline_s is None else time.monotonic() + deadline_s
+        if parent is not None and parent.deadline is not None:
+            self.deadline = parent.deadline if self.deadline is None else min(self.deadline, parent.deadline)
+        self._timer = None
+        if self.deadline is not None:
+            self._timer = threading.Timer(max(0.0, self.deadline - time.monotonic()), self.cancel, [DEADLINE_EXCEEDED])
+            self._timer.daemon = True
+            self._timer.start()
+        self._detach_parent = (
+            parent.on_cancel(lambda: self.cancel(parent.reason, _propagated=True)) if parent else (lambda: None)
+        )
+
+    def remaining(self) -> Optional[float]:
+        """Seconds until the deadline (never negative), or None without a deadline."""
+        return None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+
+    def close(self):
+        """Stops the deadline timer and detaches from the parent once the work is over."""
+        if self._timer is not None:
+            self._timer.cancel()
+        self._detach_parent()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled", _propagated: bool = False):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        if not _propagated:
+            CANCELLED_SCOPES.labels(reason or "cancelled").inc()
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Warning: Cancellation callback failed: {e}")
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Registers callback (run immediately if already cancelled); returns a function that unregisters it."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._discard(callback)
+        callback()
+        return lambda: None
+
+    def _discard(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def check(self):
+        if self._event.is_set():
+            raise Cancelled(self.reason)
+
+
+_current_scope: contextvars.ContextVar[Optional[CancelScope]] = contextvars.ContextVar("cancel_scope", default=None)
+
+
+def current_scope() -> Optional[CancelScope]:
+    return _current_scope.get()
+
+
+@contextlib.contextmanager
+def active(scope: CancelScope):
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+
+
+@contextlib.contextmanager
+def scope(deadline_s: Optional[float] = None):
+    """Activates a new scope (child of the active one, if any) with an optional deadline."""
+    new_scope = CancelScope(deadline_s, parent=_current_scope.get())
+    try:
+        with active(new_scope):
+            yield new_scope
+    finally:
+        new_scope.close()
+
+
+def remaining(default: Optional[float] = None) -> Optional[float]:
+    """Time left before the active scope's deadline, capped at `default` (either may be None)."""
+    current = _current_scope.get()
+    left = current.remaining() if current is not None else None
+    if left is None:
+        return default
+    return left if default is None else min(left, default)
+
+
+def check_cancelled():
+    """Raises Cancelled if the active scope (if any) was cancelled."""
+    current = _current_scope.get()
+    if current is not None:
+        current.check()
+
+
+def is_cancelled() -> bool:
+    current = _current_scope.get()
+    return current is not None and current.cancelled
@@ -0,0 +1,138 @@
+"""
+Central registry of the backend clients shared by every agent.
+
+Nothing is created at import time: `llm(...)` returns a lightweight handle that composes into
+LangChain chains, and the underlying ChatVertexAI (one per model/temperature/options) is built on
+first use. The BigQuery client is likewise shared and created on first query. `warm_up()` builds
+everything declared so far, e.g. from the API startup hook, so the first request does not pay for it.
+"""
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from app.core import cancellation
+from app.core.admission import stage_slot
+from app.core.config import settings
+from app.core.llm_cache import cache_key, enabled_for, llm_cache
+from app.core.resilience import ResilientCaller, TokenBucket
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+
+_lock = threading.Lock()
+_llm_clients: Dict[Tuple, Any] = {}
+_declared: Dict[Tuple, Dict[str, Any]] = {}
+
+# One bucket for every LLM call in the process: the Vertex AI quota is per project, not per agent
+_rate_limiter = TokenBucket(settings.LLM_RATE_LIMIT_QPS, settings.LLM_RATE_LIMIT_BURST)
+
+
+def call_policy() -> ResilientCaller:
+    """A caller with the configured retry/deadline/hedging policy, sharing the process-wide rate limiter."""
+    return ResilientCaller(
+        limiter=_rate_limiter,
+        max_retries=settings.LLM_MAX_RETRIES,
+        backoff_base_s=settings.LLM_BACKOFF_BASE_S,
+        backoff_max_s=settings.LLM_BACKOFF_MAX_S,
+        deadline_s=settings.LLM_CALL_DEADLINE_S,
+        hedge=settings.LLM_HEDGING_ENABLED,
+        hedge_quantile=settings.LLM_HEDGE_QUANTILE,
+        hedge_min_delay_s=settings.LLM_HEDGE_MIN_DELAY_S,
+    )
+
+
+def _key(model_name: str, temperature: float, options: Dict[str, Any]) -> Tuple:
+    return (model_name, float(temperature), tuple(sorted(options.items())))
+
+
+def get_llm(model_name: str = DEFAULT_MODEL, temperature: float = 0.0, **options):
+    """Returns the shared ChatVertexAI for these parameters, creating it on first call."""
+    key = _key(model_name, temperature, options)
+    client = _llm_clients.get(key)
+    if client is None:
+        with _lock:
+            client = _llm_clients.get(key)
+            if client is None:
+                # Heavy import (Vertex AI SDK), deferred until a model is actually needed
+                from langchain_google_vertexai import ChatVertexAI
+                # Retries belong to the call policy (app/core/resilience.py); the HTTP timeout bounds
+                # calls the policy has already abandoned at their deadline
+                options = {"max_retries": 1, "timeout": settings.LLM_CALL_DEADLINE_S, **options}
+                client = ChatVertexAI(
+                    model_name=model_name,
+                    project=settings.PROJECT_ID,
+                    location=settings.LOCATION,
+                    temperature=temperature,
+                    **options,
+                )
+                _llm_clients[key] = client
+    return client
+
+
+class LazyChatModel(Runnable):
+    """
+    Chain-composable handle to a shared chat model; the model is created on first invoke.
+    Every call goes through the rate-limit/retry/deadline/hedging policy (own latency history per handle).
+    Handles named with `cache="<agent>"` answer repeated prompts from the LLM cache (app/core/llm_cache.py).
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, temperature: float = 0.0, cache: Optional[str] = None,
+                 **options):
+        self.model_name = model_name
+        self.temperature = temperature
+        self.options = options
+        self.cache = cache if enabled_for(cache, temperature) else None
+        self.policy = call_policy()
+        _declared[_key(model_name, temperature, options)] = {
+            "model_name": model_name, "temperature": temperature, **options
+        }
+
+    @property
+    def client(self):
+        return get_llm(self.model_name, self.temperature, **self.options)
+
+    def invoke(self, input, config: Optional[RunnableConfig] = None, **kwargs):
+        cancellation.check_cancelled()
+        key = None
+        if self.cache:
+            key = cache_key(input, self.model_name, self.temperature, self.options)
+            cached = llm_cache.get(self.cache, key)
+            if cached is not None:
+                from langchain_core.messages import AIMessage
+                # No usage_metadata: a cache hit spends no tokens
+                return AIMessage(content=cached["content"], response_metadata={"cache_hit": True})
+        client = self.client
+
+        def call():
+            cancellation.check_cancelled()
+            return client.invoke(input, config=config, **kwargs)
+
+        with stage_slot("llm"):
+            # Per-call deadline, shortened to whatever is left of the request's deadline
+            message = self.policy.call(call, deadline_s=cancellation.remaining(settings.LLM_CALL_DEADLINE_S))
+        if key is not None and isinstance(getattr(message, "content", None), str) and message.content:
+            llm_cache.put(self.cache, key, {"content": message.content})
+        return message
+
+
+def llm(model_name: str = DEFAULT_MODEL, temperature: float = 0.0, cache: Optional[str] = None,
+        **options) -> LazyChatModel:
+    return LazyChatModel(model_name, temperature, cache=cache, **options)
+
+
+def bigquery():
+    """The process-wide BigQueryWrapper (its google.cloud.bigquery.Client is created on first use)."""
+    from packages.bq_wrapper.client import bq_client
+    return bq_client
+
+
+def warm_up():
+    """Creates every declared LLM client and the BigQuery client ahead of the first request."""
+    for params in list(_declared.values()):
+        try:
+            get_llm(**params)
+        except Exception as e:
+            print(f"Warning: LLM warm-up failed for {params}: {e}")
+    bigquery().client
+    # Needed to materialize the first query result; import it now rather than on the request path
+    import pandas  # noqa: F401
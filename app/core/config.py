@@ -1,5 +1,6 @@
 
 import os
+from typing import Dict, List, Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -11,7 +12,171 @@ class Settings(BaseSettings):
     DATASET_ID: str = "rag"
     LOCATION: str = "asia-northeast3"  # For Vertex AI LLM (Seoul)
     BQ_LOCATION: str = "asia-northeast3"  # For BigQuery (Seoul)
-    
+
+    # Local analytic engine: DuckDB over Parquet snapshots exported by scripts/sync_data.py
+    LOCAL_ENGINE_ENABLED: bool = True
+    LOCAL_SNAPSHOT_DIR: str = "data/snapshots"
+    LOCAL_SNAPSHOT_TABLES: List[str] = ["mart_quality_matrix", "mart_risk_heatmap", "mart_logistics_master"]
+    LOCAL_SNAPSHOT_MAX_AGE_HOURS: float = 24  # Older snapshots are ignored while BigQuery is reachable
+
+    # Slow-request log (app/core/slow_log.py); a negative threshold disables it
+    SLOW_REQUEST_THRESHOLD_S: float = 10.0
+    SLOW_LOG_PATH: str = "logs/slow_requests.jsonl"
+    SLOW_LOG_MAX_BYTES: int = 5_000_000
+    SLOW_LOG_BACKUPS: int = 3
+
+    # Admin endpoints (/api/admin/*) require this token in X-Admin-Token; they answer 403 while it is unset
+    ADMIN_TOKEN: Optional[str] = None
+
+    # Create the LLM and BigQuery clients during API startup instead of on the first request
+    # (clients are otherwise created lazily, see app/core/clients.py)
+    WARM_UP_ON_STARTUP: bool = False
+
+    # Admission control (app/core/admission.py): requests in the Orchestrator at once, how many may
+    # wait for a slot (beyond that /api/chat answers 429) and how long, plus per-backend call limits
+    MAX_CONCURRENT_REQUESTS: int = 16
+    REQUEST_QUEUE_SIZE: int = 32
+    REQUEST_QUEUE_TIMEOUT_S: float = 30.0
+    LLM_MAX_CONCURRENCY: int = 8
+    BQ_MAX_CONCURRENCY: int = 4
+
+    # LLM call policy (app/core/resilience.py): shared token bucket across all agents, retries with
+    # exponential backoff on quota errors, per-call deadline and optional p95-based hedging
+    LLM_RATE_LIMIT_QPS: float = 10.0
+    LLM_RATE_LIMIT_BURST: int = 20
+    LLM_MAX_RETRIES: int = 3
+    LLM_BACKOFF_BASE_S: float = 0.5
+    LLM_BACKOFF_MAX_S: float = 8.0
+    LLM_CALL_DEADLINE_S: float = 60.0
+    LLM_HEDGING_ENABLED: bool = False
+    LLM_HEDGE_QUANTILE: float = 0.95
+    LLM_HEDGE_MIN_DELAY_S: float = 1.0
+
+    # Background jobs (/api/jobs): worker threads, max unfinished jobs, retention of finished results
+    JOB_WORKERS: int = 4
+    JOB_MAX_PENDING: int = 100
+    JOB_RESULT_TTL_S: float = 3600.0
+    JOB_DEADLINE_S: float = 1800.0
+
+    # Deadlines: /api/chat requests are cancelled (LLM calls abandoned, BigQuery job cancelled) after
+    # REQUEST_DEADLINE_S or when the client disconnects; no BigQuery job may run longer than BQ_JOB_TIMEOUT_S
+    REQUEST_DEADLINE_S: float = 120.0
+    BQ_JOB_TIMEOUT_S: float = 300.0
+    # Cost guard: a BigQuery job that would bill more than this fails without being charged (None: no limit)
+    BQ_MAX_BYTES_BILLED: Optional[int] = None
+    # Execution path: "standard" (always a job: insert, poll, download), "short" (jobs.query with optional job
+    # creation; small results come back inline without a job) or "auto" (short for queries over the small marts
+    # in BQ_SHORT_QUERY_TABLES). Short-path results over BQ_SHORT_QUERY_MAX_ROWS are re-run as standard jobs.
+    BQ_QUERY_MODE: str = "auto"
+    BQ_SHORT_QUERY_TABLES: List[str] = ["mart_quality_matrix", "mart_risk_heatmap"]
+    BQ_SHORT_QUERY_MAX_ROWS: int = 10000
+    BQ_USE_QUERY_CACHE: bool = True
+
+    # Conversation sessions (app/core/sessions.py): LRU size, inactivity expiry, optional SQLite file
+    # (e.g. "data/sessions.sqlite3") and the token budget history is compacted to and rendered within
+    SESSION_MAX_SESSIONS: int = 10000
+    SESSION_TTL_S: float = 86400.0
+    SESSION_DB_PATH: Optional[str] = None
+    HISTORY_TOKEN_BUDGET: int = 1200
+
+    # LLM response cache (app/core/llm_cache.py): SQLite file, size limit (LRU eviction beyond it) and
+    # per-agent TTLs. Handles with temperature > 0 are cached only for agents listed in LLM_CACHE_OPT_IN.
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_PATH: Optional[str] = "data/llm_cache.sqlite3"
+    LLM_CACHE_MAX_BYTES: int = 50_000_000
+    LLM_CACHE_DEFAULT_TTL_S: float = 3600.0
+    LLM_CACHE_TTLS: Dict[str, float] = {"router": 7 * 86400, "retrieval": 86400, "general": 86400}
+    LLM_CACHE_OPT_IN: List[str] = []
+
+    # Retrieval (packages/vectordb): index directory built offline (falls back to the built-in glossary),
+    # chunks per answer and the token budget of the retrieved context
+    RETRIEVAL_INDEX_DIR: Optional[str] = "data/retrieval_index"
+    RETRIEVAL_TOP_K: int = 5
+    RETRIEVAL_CONTEXT_TOKENS: int = 1500
+    # Ingestion (scripts/ingest_documents.py): default documents, chunk/term store, chunk size
+    RETRIEVAL_SOURCES: List[str] = ["DATA_PROCESS_DOCUMENTATION_KR.md", "DATA_MART_DESIGN.md", "docs"]
+    RETRIEVAL_STORE_PATH: str = "data/retrieval_chunks.sqlite3"
+    RETRIEVAL_CHUNK_TOKENS: int = 400
+
+    # Entity resolution (app/core/entities.py): ports, countries, modes, products and carriers found in the
+    # question are resolved locally before SQL generation. The catalog of mart values is refreshed by
+    # scripts/sync_data.py into ENTITY_CATALOG_PATH; the built-in aliases are used until then.
+    ENTITY_RESOLUTION_ENABLED: bool = True
+    ENTITY_CATALOG_PATH: str = "data/entities.json"
+
+    # Schema catalog (packages/bq_wrapper/schema.py): mart columns, row counts, partition ranges and the values of
+    # low-cardinality columns, loaded from BigQuery metadata into SCHEMA_CATALOG_PATH. Re-checked against the
+    # tables' last-modified times every SCHEMA_CATALOG_TTL_S (in the background); column values are read from
+    # the last SCHEMA_STATS_RECENT_DAYS of partitions within SCHEMA_STATS_MAX_BYTES.
+    SCHEMA_CATALOG_PATH: str = "data/schema_catalog.json"
+    SCHEMA_CATALOG_TTL_S: float = 3600.0
+    SCHEMA_TABLES: List[str] = ["mart_logistics_master", "mart_sensor_detail", "mart_risk_heatmap", "mart_quality_matrix"]
+    SCHEMA_ENUM_COLUMNS: Dict[str, List[str]] = {
+        "mart_logistics_master": ["transport_mode", "risk_level", "package_type"],
+        "mart_sensor_detail": ["destination_country", "status"],
+        "mart_quality_matrix": ["transport_mode", "package_type"],
+    }
+    SCHEMA_ENUM_MAX_VALUES: int = 30
+    SCHEMA_STATS_RECENT_DAYS: int = 90
+    SCHEMA_STATS_MAX_BYTES: int = 1024 ** 3
+    # Generated SQL is checked against the catalog; a query with problems is regenerated once with them
+    SQL_VALIDATION_ENABLED: bool = True
+    # Comparison questions ("A와 B 비교", two periods) are generated as independent `-- part:` sub-queries that run
+    # as concurrent BigQuery jobs and are combined locally before synthesis
+    SQL_DECOMPOSITION_ENABLED: bool = True
+    SQL_DECOMPOSITION_MAX_PARTS: int = 4
+    # Approximate mode (packages/bq_wrapper/approximate.py), opted in per request: aggregates over APPROX_TABLES run
+    # on a TABLESAMPLE of APPROX_SAMPLE_PERCENT split into APPROX_REPLICATES sub-samples (for 95% confidence
+    # intervals); COUNT(DISTINCT) becomes APPROX_COUNT_DISTINCT. Ineligible queries run exactly.
+    APPROX_QUERY_ENABLED: bool = True
+    APPROX_TABLES: List[str] = ["mart_sensor_detail"]
+    APPROX_SAMPLE_PERCENT: float = 10.0
+    APPROX_REPLICATES: int = 10
+
+    # Speculative SQL generation (app/core/speculation.py): SQL generation starts while the router is still
+    # deciding, and is discarded if it picks another agent. "auto" speculates when the local SQL confidence of
+    # the question (app/agents/router.py) reaches SPECULATION_MIN_CONFIDENCE and an LLM slot is free.
+    SPECULATIVE_SQL: str = "auto"  # "off", "auto" or "always"
+    SPECULATION_MIN_CONFIDENCE: float = 0.5
+
+    # Multi-agent routes: questions asking for data and for its definition/policy at once are routed to
+    # SQL_AGENT+RETRIEVAL_AGENT; both agents run concurrently and their answers are merged. A branch still
+    # running after AGENT_BRANCH_DEADLINE_S is cancelled and the answer goes out without it (interactive requests only;
+    # in background jobs the branches run until JOB_DEADLINE_S).
+    MULTI_AGENT_ROUTING: bool = True
+    AGENT_BRANCH_DEADLINE_S: float = 45.0
+
+    # Chart data reduction (app/ui/chart_reduction.py): time series are downsampled with LTTB to CHART_MAX_POINTS
+    # points per metric, maps with more points than CHART_MAP_MAX_CELLS are binned into at most that many lat/lon
+    # cells, and line charts above CHART_WEBGL_THRESHOLD points are drawn with WebGL (and without markers)
+    CHART_MAX_POINTS: int = 2000
+    CHART_MAP_MAX_CELLS: int = 2500
+    CHART_WEBGL_THRESHOLD: int = 1000
+
+    # Suggestion buttons shown by the UI. Their answers are precomputed by the warmer (app/core/suggestions.py)
+    # every SUGGESTION_REFRESH_INTERVAL_S and after scripts/sync_data.py, and served while fresher than
+    # SUGGESTION_MAX_AGE_S (and from the same day). Warm runs are capped per query and per run in bytes billed.
+    SUGGESTIONS: List[str] = [
+        "📉 상하이행 총 운송건수 및 파손율",
+        "📊 포장 타입별 파손율 비교",
+        "🛳️ 해상 운송 5G 이상 충격 비율",
+        "📅 이번 달 전체 운송 건수",
+        "🚨 최근 1주일 High Risk 운송 건",
+        "📈 최근 30일 일별 충격 발생 추이",
+        "🇨🇳 중국행 화물 평균 충격 강도",
+        "🇻🇳 베트남행 온도 이탈 건수",
+        "🌍 국가별 운송 현황 요약",
+        "🔥 충격 리스크 히트맵 Top 10 지역",
+        "⚠️ 누적 피로도 Top 5 운송 건",
+        "❄️ 영하 온도 + 충격 동시 발생 건수",
+    ]
+    SUGGESTION_STORE_PATH: str = "data/suggestions.json"
+    SUGGESTION_WARMER_ENABLED: bool = False
+    SUGGESTION_REFRESH_INTERVAL_S: float = 3600.0
+    SUGGESTION_MAX_AGE_S: float = 6 * 3600.0
+    SUGGESTION_MAX_BYTES_PER_QUERY: int = 2 * 1024 ** 3
+    SUGGESTION_MAX_BYTES_PER_RUN: int = 20 * 1024 ** 3
+
     # Optional: LLM settings
     # OPENAI_API_KEY: str = ...
 
@@ -0,0 +1,364 @@
+"""
+Local entity resolution for the SQL agent.
+
+Users write ports, countries, transport modes, products and carriers in many ways ("Sanghai", "상해",
+"오사카항으로", "호찌민", "해상 운송"). Instead of asking the LLM to map them on every call, the resolver
+finds them in the question and hands the SQL prompt the exact filters ("destination = 'CNSHG'").
+
+Matching works on spans of up to three words, joined without spaces and with Korean particles and
+place suffixes (항, 행, ...) stripped: first an exact lookup of the alias table, then a fuzzy lookup
+through a deletion-neighbourhood index (SymSpell) verified with an optimal-string-alignment distance.
+Hangul is compared jamo by jamo, so "호찌민" is one edit away from "호치민" rather than a whole syllable.
+A typo resolves only when the closest alias is unambiguous. Everything is in-memory dict lookups, so a
+question resolves in well under a millisecond.
+
+The built-in aliases cover the known ports, countries and modes; the values actually present in the
+marts (ports, modes, products, carriers) are refreshed into ENTITY_CATALOG_PATH by scripts/sync_data.py.
+"""
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from prometheus_client import Counter
+
+from app.core.config import settings
+
+ENTITIES_RESOLVED = Counter("willog_entities_resolved_total", "Entities resolved in questions", ["kind", "match"])
+
+# Port code -> (name, aliases)
+PORTS = {
+    "KRPUS": ("Busan", ["Busan", "Pusan", "부산"]),
+    "KRICN": ("Incheon", ["Incheon", "Inchon", "ICN", "인천"]),
+    "CNSHG": ("Shanghai", ["Shanghai", "Sanghai", "Sanghi", "Shanhai", "SH", "상해", "상하이"]),
+    "CNNBG": ("Ningbo", ["Ningbo", "Ningpo", "닝보", "영파"]),
+    "CNRZH": ("Rizhao", ["Rizhao", "Rizo", "일조", "리자오", "르자오"]),
+    "CNLYG": ("Lianyungang", ["Lianyungang", "Lianyun", "연운항", "롄윈강", "리엔윈강"]),
+    "JPOSA": ("Osaka", ["Osaka", "Osaca", "Osk", "오사카"]),
+    "VNSGN": ("Ho Chi Minh", ["Ho Chi Minh", "Hochiminh", "HCMC", "Saigon", "VN SGN", "호치민", "호찌민", "사이공"]),
+    "VNHPH": ("Haiphong", ["Haiphong", "Hai Phong", "VN HPH", "하이퐁"]),
+    "USLAX": ("Los Angeles", ["Los Angeles", "LA", "로스앤젤레스", "로스엔젤레스", "엘에이"]),
+}
+
+# destination_country value -> (port code prefix, aliases)
+COUNTRIES = {
+    "China": ("CN", ["China", "CN", "중국"]),
+    "Japan": ("JP", ["Japan", "JP", "일본"]),
+    "Vietnam": ("VN", ["Vietnam", "Viet Nam", "VN", "베트남", "월남"]),
+    "Korea": ("KR", ["Korea", "South Korea", "KR", "한국", "대한민국"]),
+    "USA": ("US", ["USA", "United States", "America", "US", "미국"]),
+}
+
+# transport_mode value -> aliases; "ocean" stands for every ocean+... composite
+MODES = {
+    "ocean": ["Ocean", "Sea", "해상", "해운", "선박", "해상운송"],
+    "ocean+ferry": ["Ferry", "페리", "카페리"],
+    "ocean+rail": ["Rail", "철도", "기차"],
+    "air": ["Air", "Airfreight", "항공", "항공편", "비행기", "항공운송"],
+    "truck": ["Truck", "트럭", "육상", "육송", "육로"],
+}
+
+# product value -> Korean aliases (the product name itself is always an alias)
+PRODUCT_ALIASES = {
+    "Display Glass Substrate": ["디스플레이 글라스", "디스플레이 유리기판", "디스플레이 기판", "유리기판"],
+    "Cover Glass": ["커버글라스", "커버 유리"],
+    "Optical Fiber": ["Optical Fibre", "광섬유"],
+    "Pharma Glass Vial": ["Vial", "바이알", "약병", "의약품 유리병"],
+    "Ceramic Substrate": ["세라믹 기판", "세라믹"],
+}
+
+KINDS = ("port", "country", "mode", "product", "carrier")
+
+# Mart columns the catalog is refreshed from (mart_logistics_master, clustered by destination and product)
+CATALOG_COLUMNS = {"port": "destination", "mode": "transport_mode", "product": "product", "carrier": "receive_name"}
+
+_WORD_RE = re.compile(r"[0-9A-Za-z]+|[가-힣]+")
+_CUSTOMER_RE = re.compile(r"^customer\s+(\S+)$", re.IGNORECASE)
+# Longest first; a suffix is only stripped when at least two syllables remain
+_PARTICLES = ["에서는", "으로는", "에서", "으로", "까지", "부터", "에게", "에는", "로", "은", "는", "이", "가",
+              "을", "를", "의", "에", "와", "과", "도", "만"]
+_PLACE_SUFFIXES = ["항", "행", "향", "발", "착"]
+_MAX_SPAN_WORDS = 3
+
+_CHOSEONG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+_JUNGSEONG = "ㅏㅐㅑㅒㅓㅔㅕㅖㅗㅘㅙㅚㅛㅜㅝㅞㅟㅠㅡㅢㅣ"
+_JONGSEONG = ["", "ㄱ", "ㄲ", "ㄳ", "ㄴ", "ㄵ", "ㄶ", "ㄷ", "ㄹ", "ㄺ", "ㄻ", "ㄼ", "ㄽ", "ㄾ", "ㄿ", "ㅀ", "ㅁ",
+              "ㅂ", "ㅄ", "ㅅ", "ㅆ", "ㅇ", "ㅈ", "ㅊ", "ㅋ", "ㅌ", "ㅍ", "ㅎ"]
+_JAMO_TABLE = {
+    0xAC00 + i: _CHOSEONG[i // 588] + _JUNGSEONG[(i % 588) // 28] + _JONGSEONG[i % 28] for i in range(11172)
+}
+
+
+def jamo(text: str) -> str:
+    """Hangul syllables decomposed into their jamo ("상해" -> "ㅅㅏㅇㅎㅐ"); other characters unchanged."""
+    return text.translate(_JAMO_TABLE)
+
+
+def _key(text: str) -> str:
+    """Lookup key of an alias or span: NFKC, case-folded, without spaces or punctuation, in jamo."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return jamo("".join(_WORD_RE.findall(text)))
+
+
+def max_distance(key: str) -> int:
+    """
+    Edits tolerated for a key of this length (jamo count for Hangul); short keys must match exactly. Hangul
+    keys of one or two syllables never match fuzzily: one jamo off turns ordinary words into entities
+    (일반 -> 일본, 선반 -> 선박).
+    """
+    if any("ㄱ" <= c <= "ㅣ" for c in key):
+        if sum(c in _JUNGSEONG for c in key) <= 2:
+            return 0
+        return 2 if len(key) >= 10 else 1
+    return 2 if len(key) >= 9 else 1 if len(key) >= 5 else 0
+
+
+def osa_distance(a: str, b: str, limit: int = 2) -> int:
+    """Optimal string alignment distance (edits plus adjacent transpositions); limit + 1 once above `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def _deletes(key: str, distance: int) -> Set[str]:
+    variants, frontier = {key}, {key}
+    for _ in range(distance):
+        frontier = {v[:i] + v[i + 1:] for v in frontier for i in range(len(v))}
+        variants |= frontier
+    return variants
+
+
+def sql_filter(kind: str, value: str) -> str:
+    """The WHERE condition an entity stands for."""
+    quoted = "'" + value.replace("'", "\\'") + "'"
+    if kind == "port":
+        return f"destination = {quoted}"
+    if kind == "country":
+        prefix = COUNTRIES.get(value, (None,))[0]
+        condition = f"destination_country = {quoted}"
+        if prefix:
+            # destination_country only exists in mart_sensor_detail
+            return f"{condition} (mart_sensor_detail) / destination LIKE '{prefix}%' (other marts)"
+        return condition
+    if kind == "mode":
+        return "transport_mode LIKE 'ocean%'" if value == "ocean" else f"transport_mode = {quoted}"
+    if kind == "product":
+        return f"product = {quoted}"
+    return f"receive_name = {quoted}"
+
+
+def _catalog_entities(values: Dict[str, List[str]]) -> List[Dict[str, Any]]:
+    """Built-in entities plus the mart values they don't cover, each with its aliases."""
+    entities = []
+    for code, (name, aliases) in PORTS.items():
+        entities.append({"kind": "port", "value": code, "label": name, "aliases": [code] + aliases})
+    for country, (_, aliases) in COUNTRIES.items():
+        entities.append({"kind": "country", "value": country, "label": country, "aliases": aliases})
+    for mode, aliases in MODES.items():
+        entities.append({"kind": "mode", "value": mode, "label": mode, "aliases": [mode] + aliases})
+    for product, aliases in PRODUCT_ALIASES.items():
+        entities.append({"kind": "product", "value": product, "label": product, "aliases": [product] + aliases})
+
+    known = {(e["kind"], e["value"]) for e in entities}
+    for kind in KINDS:
+        for value in values.get(kind) or []:
+            if not value or (kind, value) in known:
+                continue
+            known.add((kind, value))
+            aliases = [value]
+            match = _CUSTOMER_RE.match(value)
+            if kind == "carrier" and match:
+                aliases += [f"고객사 {match.group(1)}", f"고객 {match.group(1)}"]
+            entities.append({"kind": kind, "value": value, "label": value, "aliases": aliases})
+    return entities
+
+
+class EntityResolver:
+
+    def __init__(self, catalog_path: Optional[str] = None):
+        self.catalog_path = catalog_path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self.values: Dict[str, List[str]] = {}
+        self.refreshed: Optional[float] = None
+        self._build({})
+
+    def _build(self, values: Dict[str, List[str]]):
+        exact: Dict[str, Dict[str, Any]] = {}
+        codes: Dict[str, Dict[str, Any]] = {}
+        deletes: Dict[str, Set[str]] = {}
+        for entity in _catalog_entities(values):
+            for alias in entity["aliases"]:
+                # Two-letter codes ("SH", "LA", "US") are ordinary words in lower case
+                if len(alias) <= 2 and alias.isascii():
+                    codes.setdefault(alias.upper(), entity)
+                    continue
+                key = _key(alias)
+                if not key or key in exact:
+                    continue
+                exact[key] = entity
+                for variant in _deletes(key, max_distance(key)):
+                    deletes.setdefault(variant, set()).add(key)
+        self._exact, self._codes, self._deletes = exact, codes, deletes
+
+    def _reload(self):
+        # Picks up a catalog refreshed by another process; cheap stat when nothing changed
+        if not self.catalog_path:
+            return
+        try:
+            mtime = os.path.getmtime(self.catalog_path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            try:
+                with open(self.catalog_path, encoding="utf-8") as f:
+                    catalog = json.load(f)
+                self._build(catalog.get("values", {}))
+                self.values, self.refreshed = catalog.get("values", {}), catalog.get("refreshed")
+            except Exception as e:
+                print(f"Warning: Could not read entity catalog {self.catalog_path}: {e}")
+            self._mtime = mtime
+
+    def _fuzzy(self, key: str) -> Optional[Tuple[Dict[str, Any], int]]:
+        limit = max_distance(key)
+        if not limit:
+            return None
+        candidates = set()
+        for variant in _deletes(key, limit):
+            candidates |= self._deletes.get(variant, set())
+        best: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        best_distance = limit + 1
+        for candidate in candidates:
+            allowed = min(limit, max_distance(candidate))
+            distance = osa_distance(key, candidate, allowed)
+            if distance > allowed or distance > best_distance:
+                continue
+            if distance < best_distance:
+                best, best_distance = {}, distance
+            entity = self._exact[candidate]
+            best[(entity["kind"], entity["value"])] = entity
+        # "customerz" is as close to Customer A as to Customer B: better no filter than a wrong one
+        if len(best) != 1:
+            return None
+        return next(iter(best.values())), best_distance
+
+    @staticmethod
+    def _variants(words: List[str]) -> List[str]:
+        """The span as written, then with a particle and/or place suffix stripped from its last word."""
+        head, last = words[:-1], words[-1]
+        stems = [last]
+        if "가" <= last[-1] <= "힣":
+            for particle in _PARTICLES:
+                if last.endswith(particle) and len(last) - len(particle) >= 2:
+                    stems.append(last[:-len(particle)])
+                    break
+            for stem in list(stems):
+                if stem[-1] in _PLACE_SUFFIXES and len(stem) >= 3:
+                    stems.append(stem[:-1])
+        return [_key("".join(head + [stem])) for stem in stems]
+
+    def resolve(self, question: str) -> List[Dict[str, Any]]:
+        """
+        Entities mentioned in `question`, in order: {"text", "kind", "value", "label", "filter", "match"}
+        where match is "exact" or "fuzzy". Each (kind, value) is reported once.
+        """
+        self._reload()
+        words = _WORD_RE.findall(unicodedata.normalize("NFKC", question or ""))
+        found, seen, i = [], set(), 0
+        while i < len(words):
+            hit = None
+            for size in range(min(_MAX_SPAN_WORDS, len(words) - i), 0, -1):
+                if hit:
+                    break
+                for key in self._variants(words[i:i + size]):
+                    if key in self._exact:
+                        hit = (self._exact[key], size, "exact")
+                        break
+            if not hit and len(words[i]) <= 2 and words[i].isupper() and words[i] in self._codes:
+                hit = (self._codes[words[i]], 1, "exact")
+            # Typos: the single word first, so a trailing particle word is not absorbed into the match
+            for size in range(1, min(2, len(words) - i) + 1):
+                if hit:
+                    break
+                for key in self._variants(words[i:i + size]):
+                    fuzzy = self._fuzzy(key)
+                    if fuzzy:
+                        hit = (fuzzy[0], size, "fuzzy")
+                        break
+            if not hit:
+                i += 1
+                continue
+            entity, size, match = hit
+            if (entity["kind"], entity["value"]) not in seen:
+                seen.add((entity["kind"], entity["value"]))
+                found.append({
+                    "text": " ".join(words[i:i + size]), "kind": entity["kind"], "value": entity["value"],
+                    "label": entity["label"], "filter": sql_filter(entity["kind"], entity["value"]), "match": match,
+                })
+                ENTITIES_RESOLVED.labels(entity["kind"], match).inc()
+            i += size
+        return found
+
+    @staticmethod
+    def annotate(entities: List[Dict[str, Any]]) -> str:
+        """Prompt lines for the resolved entities ("(none)" when nothing was found)."""
+        if not entities:
+            return "(none)"
+        lines = []
+        for e in entities:
+            label = f" ({e['label']})" if e["label"] != e["value"] else ""
+            lines.append(f"- \"{e['text']}\" -> {e['kind']} {e['value']}{label}: {e['filter']}")
+        return "\n".join(lines)
+
+    def refresh(self, run_query: Callable[[str], Any], dataset_id: Optional[str] = None) -> Dict[str, int]:
+        """
+        Reloads the distinct mart values with `run_query` (SQL -> DataFrame, e.g. bq_client.run_query) and
+        writes them to the catalog file. A column that cannot be read keeps its previous values.
+        """
+        dataset_id = dataset_id or f"{settings.PROJECT_ID}.{settings.DATASET_ID}"
+        self._reload()
+        values = {kind: list(vals) for kind, vals in self.values.items()}
+        for kind, column in CATALOG_COLUMNS.items():
+            try:
+                df = run_query(
+                    f"SELECT DISTINCT {column} AS value FROM `{dataset_id}.mart_logistics_master` "
+                    f"WHERE {column} IS NOT NULL"
+                )
+                values[kind] = sorted(str(v) for v in df["value"].tolist())
+            except Exception as e:
+                print(f"Warning: Could not refresh {kind} values from {column}: {e}")
+        # Countries follow the port codes (mart_sensor_detail derives destination_country the same way)
+        prefixes = {prefix: country for country, (prefix, _) in COUNTRIES.items()}
+        values["country"] = sorted({prefixes[code[:2]] for code in values.get("port", []) if code[:2] in prefixes})
+
+        with self._lock:
+            self._build(values)
+            self.values, self.refreshed = values, time.time()
+            if self.catalog_path:
+                os.makedirs(os.path.dirname(self.catalog_path) or ".", exist_ok=True)
+                with open(self.catalog_path + ".tmp", "w", encoding="utf-8") as f:
+                    json.dump({"version": 1, "refreshed": self.refreshed, "values": values}, f, ensure_ascii=False)
+                os.replace(self.catalog_path + ".tmp", self.catalog_path)
+                self._mtime = os.path.getmtime(self.catalog_path)
+        return {kind: len(vals) for kind, vals in values.items()}
+
+
+entity_resolver = EntityResolver(settings.ENTITY_CATALOG_PATH)
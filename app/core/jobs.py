@@ -0,0 +1,158 @@
+"""
+Background execution of long-running questions (`/api/jobs`).
+
+A submitted job gets an id immediately and runs the pipeline on a small worker pool, outside any
+HTTP/Cloud Run request timeout. While it runs, the pipeline reports progress (`report_progress`:
+routed agent, generated SQL, a preview of the rows) so pollers see partial results before the final
+answer. Cancelling a job cancels its scope, which also cancels its in-flight BigQuery job. Finished
+jobs are kept for JOB_RESULT_TTL_S and evicted lazily.
+"""
+import contextvars
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from prometheus_client import Counter, Gauge
+
+from app.core import cancellation
+
+JOBS = Counter("willog_jobs_total", "Background jobs by final status", ["status"])
+JOBS_ACTIVE = Gauge("willog_jobs_active", "Background jobs queued or running")
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINAL_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+PREVIEW_ROWS = 20
+
+
+class JobQueueFull(Exception):
+    """Too many unfinished jobs; the caller should retry later."""
+
+
+class Job:
+
+    def __init__(self, question: str, chat_history: Optional[List[Dict[str, Any]]] = None,
+                 deadline_s: Optional[float] = None, session_id: Optional[str] = None, approximate: bool = False):
+        self.id = uuid.uuid4().hex
+        self.question = question
+        self.chat_history = chat_history or []
+        self.session_id = session_id
+        self.approximate = approximate
+        self.status = QUEUED
+        self.stage = QUEUED
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.partial: Dict[str, Any] = {}
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.scope = cancellation.CancelScope(deadline_s)
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINAL_STATES
+
+
+_current_job: contextvars.ContextVar[Optional[Job]] = contextvars.ContextVar("job", default=None)
+
+
+def in_background_job() -> bool:
+    """True while running inside a background job (which has its own, much longer JOB_DEADLINE_S)."""
+    return _current_job.get() is not None
+
+
+def report_progress(stage: str, **partial):
+    """Called by the pipeline at stage boundaries; a no-op outside of a background job."""
+    job = _current_job.get()
+    if job is None:
+        return
+    job.stage = stage
+    if "data" in partial and partial["data"] is not None:
+        partial["rows"] = len(partial["data"])
+        partial["data"] = partial["data"].head(PREVIEW_ROWS)
+    job.partial.update(partial)
+
+
+class JobManager:
+
+    def __init__(self, runner: Callable[..., Dict[str, Any]], workers: int = 4, max_pending: int = 100,
+                 ttl_s: float = 3600, deadline_s: Optional[float] = None):
+        self.runner = runner
+        self.deadline_s = deadline_s
+        self.max_pending = max_pending
+        self.ttl_s = ttl_s
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job-worker")
+
+    def submit(self, question: str, chat_history: Optional[List[Dict[str, Any]]] = None,
+               session_id: Optional[str] = None, approximate: bool = False) -> Job:
+        self.evict_expired()
+        job = Job(question, chat_history, deadline_s=self.deadline_s, session_id=session_id, approximate=approximate)
+        with self._lock:
+            if sum(1 for j in self._jobs.values() if not j.done) >= self.max_pending:
+                raise JobQueueFull(f"{self.max_pending} jobs are already queued or running")
+            self._jobs[job.id] = job
+        JOBS_ACTIVE.inc()
+        self._pool.submit(self._execute, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self.evict_expired()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Requests cancellation. A queued job never starts; a running one stops at its next backend call."""
+        job = self.get(job_id)
+        if job is not None and not job.done:
+            job.scope.cancel("cancelled by client")
+        return job
+
+    def evict_expired(self):
+        now = time.time()
+        with self._lock:
+            expired = [j.id for j in self._jobs.values() if j.done and now - j.finished > self.ttl_s]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def _finish(self, job: Job, status: str, error: Optional[str] = None):
+        job.scope.close()
+        if status == CANCELLED and job.scope.reason:
+            error = job.scope.reason
+        job.status = status
+        job.stage = status
+        job.error = error
+        job.finished = time.time()
+        JOBS.labels(status).inc()
+        JOBS_ACTIVE.dec()
+
+    def _execute(self, job: Job):
+        if job.scope.cancelled:
+            self._finish(job, CANCELLED)
+            return
+        job.status = RUNNING
+        job.stage = "routing"
+        job.started = time.time()
+        token = _current_job.set(job)
+        try:
+            with cancellation.active(job.scope):
+                kwargs = {"session_id": job.session_id} if job.session_id else {}
+                if job.approximate:
+                    kwargs["approximate"] = True
+                result = self.runner(job.question, chat_history=job.chat_history, **kwargs)
+            if job.scope.cancelled:
+                self._finish(job, CANCELLED)
+            else:
+                job.result = result
+                self._finish(job, SUCCEEDED)
+        except Exception as e:
+            if job.scope.cancelled:
+                self._finish(job, CANCELLED)
+            else:
+                print(f"Job {job.id} failed: {e}")
+                self._finish(job, FAILED, f"{type(e).__name__}: {e}")
+        finally:
+            _current_job.reset(token)
@@ -0,0 +1,185 @@
+"""
+Persistent cache of LLM responses, shared by every chain built on a registry handle.
+
+A handle created with `clients.llm(..., cache="<agent>")` looks up the fully rendered prompt plus the
+model parameters before calling the model, so repeated router decisions, glossary definitions and
+greetings are answered locally. Entries live in a SQLite file (LLM_CACHE_PATH) with a per-agent TTL
+(LLM_CACHE_TTLS) and least-recently-used eviction once the file holds more than LLM_CACHE_MAX_BYTES.
+
+Only deterministic (temperature 0) handles are cached by default; agents sampling at a higher
+temperature must be listed in LLM_CACHE_OPT_IN.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from prometheus_client import Counter, Gauge
+
+from app.core.config import settings
+
+LLM_CACHE_LOOKUPS = Counter("willog_llm_cache_lookups_total", "LLM cache lookups by agent and result", ["agent", "result"])
+LLM_CACHE_EVICTIONS = Counter("willog_llm_cache_evictions_total", "LLM cache entries evicted to stay under the size limit")
+LLM_CACHE_BYTES = Gauge("willog_llm_cache_bytes", "Size of the cached LLM responses")
+
+
+def _prompt_payload(prompt: Any) -> Any:
+    if hasattr(prompt, "to_messages"):
+        return [[m.type, m.content] for m in prompt.to_messages()]
+    if isinstance(prompt, list):
+        return [[getattr(m, "type", None), getattr(m, "content", m)] for m in prompt]
+    return str(prompt)
+
+
+def cache_key(prompt: Any, model_name: str, temperature: float, options: Dict[str, Any]) -> str:
+    """Hash of the rendered prompt messages and every parameter that changes the model's output."""
+    raw = json.dumps(
+        {"prompt": _prompt_payload(prompt), "model": model_name, "temperature": float(temperature), "options": options},
+        sort_keys=True, ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+
+    def __init__(self, path: Optional[str] = None, max_bytes: int = 50_000_000,
+                 ttls: Optional[Dict[str, float]] = None, default_ttl_s: float = 3600):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = dict(ttls or {})
+        self.default_ttl_s = default_ttl_s
+        self._lock = threading.Lock()
+        self._db = None
+        self._size = 0
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _conn(self):
+        # Opened on first lookup, not at import (keeps the API cold start cheap)
+        if self._db is None:
+            db = None
+            if self.path:
+                try:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    db = sqlite3.connect(self.path, check_same_thread=False)
+                except Exception as e:
+                    print(f"Warning: LLM cache file {self.path} unavailable, caching in memory only: {e}")
+            if db is None:
+                db = sqlite3.connect(":memory:", check_same_thread=False)
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, agent TEXT NOT NULL, "
+                "value TEXT NOT NULL, size INTEGER NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+            db.commit()
+            self._size = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            LLM_CACHE_BYTES.set(self._size)
+            self._db = db
+        return self._db
+
+    def _count(self, agent: str, result: str):
+        LLM_CACHE_LOOKUPS.labels(agent, result).inc()
+        counts = self._stats.setdefault(agent, {"hits": 0, "misses": 0})
+        counts["hits" if result == "hit" else "misses"] += 1
+
+    def get(self, agent: str, key: str) -> Optional[Dict[str, Any]]:
+        ttl = self.ttls.get(agent, self.default_ttl_s)
+        now = time.time()
+        try:
+            with self._lock:
+                db = self._conn()
+                row = db.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None and now - row[1] > ttl:
+                    self._delete(db, key)
+                    row = None
+                if row is None:
+                    self._count(agent, "miss")
+                    return None
+                db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                db.commit()
+                self._count(agent, "hit")
+                return json.loads(row[0])
+        except Exception as e:
+            print(f"Warning: LLM cache lookup failed: {e}")
+            return None
+
+    def put(self, agent: str, key: str, value: Dict[str, Any]):
+        raw = json.dumps(value, ensure_ascii=False, default=str)
+        now = time.time()
+        try:
+            with self._lock:
+                db = self._conn()
+                self._delete(db, key)
+                db.execute(
+                    "INSERT INTO responses (key, agent, value, size, created, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, agent, raw, len(raw.encode("utf-8")), now, now),
+                )
+                self._size += len(raw.encode("utf-8"))
+                self._evict(db)
+                db.commit()
+                LLM_CACHE_BYTES.set(self._size)
+        except Exception as e:
+            print(f"Warning: LLM cache write failed: {e}")
+
+    def _delete(self, db, key: str):
+        row = db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._size -= row[0]
+
+    def _evict(self, db):
+        # Least recently used first, down to 90% of the limit so eviction does not run on every write
+        if self._size <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        for key, size in db.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall():
+            if self._size <= target:
+                break
+            db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._size -= size
+            LLM_CACHE_EVICTIONS.inc()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit rates per agent since startup, plus the entry count and size of the store."""
+        with self._lock:
+            db = self._conn()
+            entries = dict(db.execute("SELECT agent, COUNT(*) FROM responses GROUP BY agent").fetchall())
+            agents = {}
+            for agent in sorted(set(self._stats) | set(entries)):
+                counts = self._stats.get(agent, {"hits": 0, "misses": 0})
+                lookups = counts["hits"] + counts["misses"]
+                agents[agent] = {
+                    **counts,
+                    "hit_rate": round(counts["hits"] / lookups, 3) if lookups else None,
+                    "entries": entries.get(agent, 0),
+                    "ttl_s": self.ttls.get(agent, self.default_ttl_s),
+                }
+            return {"bytes": self._size, "max_bytes": self.max_bytes, "agents": agents}
+
+    def clear(self, agent: Optional[str] = None):
+        with self._lock:
+            db = self._conn()
+            if agent is None:
+                db.execute("DELETE FROM responses")
+            else:
+                db.execute("DELETE FROM responses WHERE agent = ?", (agent,))
+            db.commit()
+            self._size = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            LLM_CACHE_BYTES.set(self._size)
+
+
+def enabled_for(agent: Optional[str], temperature: float) -> bool:
+    """Deterministic handles are cached when named; sampling ones only when opted in."""
+    if not agent or not settings.LLM_CACHE_ENABLED:
+        return False
+    return temperature == 0 or agent in settings.LLM_CACHE_OPT_IN
+
+
+llm_cache = LLMCache(
+    path=settings.LLM_CACHE_PATH,
+    max_bytes=settings.LLM_CACHE_MAX_BYTES,
+    ttls=settings.LLM_CACHE_TTLS,
+    default_ttl_s=settings.LLM_CACHE_DEFAULT_TTL_S,
+)
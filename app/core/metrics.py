@@ -0,0 +1,162 @@
+"""
+Prometheus metrics and per-request stage timing.
+
+Stages are timed with `stage("name")`, which observes a histogram and, when a request trace is
+active (see `request_trace`), also records the timing on that trace so a single request can be
+inspected end to end. Everything here is a few dict lookups and a perf_counter call per stage.
+"""
+import contextlib
+import contextvars
+import time
+from typing import Any, Dict, Optional
+
+from prometheus_client import Counter, Histogram
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+
+STAGE_LATENCY = Histogram(
+    "willog_stage_latency_seconds", "Latency of pipeline stages", ["stage"], buckets=LATENCY_BUCKETS
+)
+REQUEST_LATENCY = Histogram(
+    "willog_request_latency_seconds", "End-to-end Orchestrator latency by routed agent", ["agent"],
+    buckets=LATENCY_BUCKETS,
+)
+CHAT_REQUESTS = Counter("willog_chat_requests_total", "Chat API requests by outcome", ["status"])
+
+BQ_QUERIES = Counter("willog_bigquery_queries_total", "Queries executed by backend and cache hit", ["backend", "cache_hit"])
+BQ_BYTES = Counter("willog_bigquery_bytes_processed_total", "Bytes processed by BigQuery jobs")
+BQ_SLOT_MS = Counter("willog_bigquery_slot_milliseconds_total", "Slot milliseconds consumed by BigQuery jobs")
+BQ_SHORT_QUERY_FALLBACKS = Counter(
+    "willog_bigquery_short_query_fallbacks_total", "Short-path queries re-run as standard jobs (result too large)"
+)
+BQ_CANCELLED = Counter("willog_bigquery_jobs_cancelled_total", "BigQuery jobs cancelled because their request was")
+
+LLM_TOKENS = Counter("willog_llm_tokens_total", "LLM token usage by chain", ["chain", "kind"])
+SQL_VALIDATION_FAILURES = Counter(
+    "willog_sql_validation_failures_total", "Generated SQL rejected by the schema catalog, by attempt", ["attempt"]
+)
+AGENT_BRANCHES = Counter(
+    "willog_agent_branches_total", "Agents run concurrently for a multi-agent route, by outcome", ["agent", "outcome"]
+)
+
+_current_trace: contextvars.ContextVar[Optional["RequestTrace"]] = contextvars.ContextVar("request_trace", default=None)
+
+
+class RequestTrace:
+    """Everything measured while serving one question (stage timings, SQL, BigQuery job stats, tokens)."""
+
+    def __init__(self, question: str = ""):
+        self.question = question
+        self.started = time.time()
+        self.duration_s = 0.0
+        self.agent = None
+        self.sql = None
+        self.result_shape = None
+        self.coalesced = False
+        self.speculation = None
+        # "ok", "timeout" (deadline exceeded), "cancelled" or "error", with the reason in `error`
+        self.outcome = "ok"
+        self.error = None
+        self.stages: Dict[str, float] = {}
+        self.queries = []
+        self.tokens: Dict[str, Dict[str, int]] = {}
+
+    def add_stage(self, name: str, elapsed: float):
+        self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "question": self.question,
+            "started": self.started,
+            "duration_s": self.duration_s,
+            "agent": self.agent,
+            "sql": self.sql,
+            "result_shape": self.result_shape,
+            "coalesced": self.coalesced,
+            "speculation": self.speculation,
+            "outcome": self.outcome,
+            "error": self.error,
+            "stages": self.stages,
+            "queries": self.queries,
+            "tokens": self.tokens,
+        }
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+@contextlib.contextmanager
+def request_trace(question: str = ""):
+    """Activates a RequestTrace for the duration of one request (context-local, so thread/async safe)."""
+    trace = RequestTrace(question)
+    token = _current_trace.set(trace)
+    start = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        trace.duration_s = time.perf_counter() - start
+        REQUEST_LATENCY.labels(trace.agent or "unknown").observe(trace.duration_s)
+        _current_trace.reset(token)
+
+
+@contextlib.contextmanager
+def stage(name: str):
+    """Times a pipeline stage into STAGE_LATENCY and the active request trace."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.labels(name).observe(elapsed)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add_stage(name, elapsed)
+
+
+def record_query(backend: str, job_id: str = None, bytes_processed: int = None, slot_ms: int = None,
+                 cache_hit: bool = None, rows: int = None, plan: list = None):
+    """Counts an executed query and attaches its job statistics to the active request trace."""
+    BQ_QUERIES.labels(backend, str(bool(cache_hit)).lower()).inc()
+    if bytes_processed:
+        BQ_BYTES.inc(bytes_processed)
+    if slot_ms:
+        BQ_SLOT_MS.inc(slot_ms)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.queries.append({
+            "backend": backend,
+            "job_id": job_id,
+            "bytes_processed": bytes_processed,
+            "slot_ms": slot_ms,
+            "cache_hit": cache_hit,
+            "rows": rows,
+            "plan": plan,
+        })
+
+
+def record_tokens(chain: str, input_tokens: int = 0, output_tokens: int = 0):
+    if input_tokens:
+        LLM_TOKENS.labels(chain, "prompt").inc(input_tokens)
+    if output_tokens:
+        LLM_TOKENS.labels(chain, "completion").inc(output_tokens)
+    trace = _current_trace.get()
+    if trace is not None:
+        usage = trace.tokens.setdefault(chain, {"prompt": 0, "completion": 0})
+        usage["prompt"] += input_tokens or 0
+        usage["completion"] += output_tokens or 0
+
+
+def track_usage(chain: str):
+    """
+    Chain step placed between the LLM and its output parser (`prompt | llm | track_usage(...) | parser`)
+    that records the message's token usage and passes it through unchanged.
+    """
+    from langchain_core.runnables import RunnableLambda
+
+    def _record(message):
+        usage = getattr(message, "usage_metadata", None) or {}
+        record_tokens(chain, usage.get("input_tokens", 0), usage.get("output_tokens", 0))
+        return message
+
+    return RunnableLambda(_record, name=f"track_usage[{chain}]")
@@ -0,0 +1,194 @@
+"""
+Call policy for rate-limited, latency-variable backends (Vertex AI).
+
+`ResilientCaller.call(fn)` runs one logical call with:
+- a shared token bucket, so bursts across all agents stay under the project's request quota;
+- exponential backoff with jitter on quota/availability errors (429, 503, "Resource exhausted");
+- a per-call deadline, after which the caller gets `DeadlineExceeded` instead of waiting on a stuck call;
+- optional hedging: if the first attempt is slower than the recent p95, a second identical request is
+  fired and whichever answers first wins. Python threads cannot be killed, so the losing attempt runs
+  to completion in the background and its result is discarded.
+"""
+import concurrent.futures
+import contextvars
+import random
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from prometheus_client import Counter, Histogram
+
+from app.core.metrics import LATENCY_BUCKETS
+
+LLM_RETRIES = Counter("willog_llm_retries_total", "LLM attempts retried after a quota/availability error")
+LLM_HEDGES = Counter("willog_llm_hedged_requests_total", "Hedged LLM requests", ["outcome"])
+LLM_DEADLINES = Counter("willog_llm_deadline_exceeded_total", "LLM calls abandoned at their deadline")
+RATE_LIMIT_WAIT = Histogram(
+    "willog_llm_rate_limit_wait_seconds", "Time spent waiting for the LLM token bucket", buckets=LATENCY_BUCKETS
+)
+
+_QUOTA_MARKERS = ("429", "503", "resource exhausted", "resourceexhausted", "quota", "rate limit", "unavailable")
+
+
+class DeadlineExceeded(TimeoutError):
+    """The call did not complete before its deadline."""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Quota and transient availability errors (google.api_core raises ResourceExhausted/ServiceUnavailable)."""
+    if type(error).__name__ in ("ResourceExhausted", "TooManyRequests", "ServiceUnavailable"):
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in _QUOTA_MARKERS)
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Takes a token, possibly going into debt; returns how long the caller must wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def _refund(self):
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + 1)
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until a token is available; False (token returned) if that would exceed `timeout`."""
+        if not self.rate or self.rate <= 0:
+            return True
+        wait = self._reserve()
+        if timeout is not None and wait > timeout:
+            self._refund()
+            return False
+        if wait > 0:
+            time.sleep(wait)
+        RATE_LIMIT_WAIT.observe(wait)
+        return True
+
+
+class LatencyTracker:
+    """Sliding window of recent call latencies, for the hedging delay."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q: float, min_samples: int = 20) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=64, thread_name_prefix="llm-call")
+
+
+class ResilientCaller:
+
+    def __init__(self, limiter: Optional[TokenBucket] = None, max_retries: int = 3, backoff_base_s: float = 0.5,
+                 backoff_max_s: float = 8.0, deadline_s: Optional[float] = 60.0, hedge: bool = False,
+                 hedge_quantile: float = 0.95, hedge_min_delay_s: float = 1.0, tracker: Optional[LatencyTracker] = None):
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.deadline_s = deadline_s
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay_s = hedge_min_delay_s
+        self.tracker = tracker or LatencyTracker()
+
+    def _remaining(self, deadline: Optional[float]) -> Optional[float]:
+        return None if deadline is None else deadline - time.monotonic()
+
+    def _submit(self, fn: Callable):
+        # Each attempt runs in its own copy of the caller's context (request trace, deadlines)
+        context = contextvars.copy_context()
+        started = time.monotonic()
+
+        def attempt():
+            result = context.run(fn)
+            self.tracker.observe(time.monotonic() - started)
+            return result
+
+        return _executor.submit(attempt)
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.hedge:
+            return None
+        p = self.tracker.quantile(self.hedge_quantile)
+        return None if p is None else max(p, self.hedge_min_delay_s)
+
+    def _attempt(self, fn: Callable, deadline: Optional[float]):
+        """One (possibly hedged) attempt; returns the first successful result or raises."""
+        if self.limiter and not self.limiter.acquire(self._remaining(deadline)):
+            raise DeadlineExceeded("deadline reached while waiting for the LLM rate limiter")
+        futures = [self._submit(fn)]
+
+        delay = self._hedge_delay()
+        if delay is not None:
+            remaining = self._remaining(deadline)
+            done, _ = concurrent.futures.wait(futures, timeout=delay if remaining is None else min(delay, remaining))
+            # Only hedge slow attempts, and only if a token is available right now
+            if not done and (remaining is None or remaining > delay) and (
+                    self.limiter is None or self.limiter.acquire(timeout=0)):
+                LLM_HEDGES.labels("fired").inc()
+                futures.append(self._submit(fn))
+
+        error = None
+        pending = set(futures)
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, timeout=self._remaining(deadline), return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            if not done:
+                LLM_DEADLINES.inc()
+                raise DeadlineExceeded(f"LLM call exceeded its {self.deadline_s}s deadline")
+            for future in done:
+                if future.exception() is None:
+                    if len(futures) > 1 and future is futures[1]:
+                        LLM_HEDGES.labels("won").inc()
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def call(self, fn: Callable, deadline_s: Optional[float] = None):
+        """Runs fn() under the policy. `deadline_s` overrides the default per-call deadline."""
+        budget = self.deadline_s if deadline_s is None else deadline_s
+        deadline = None if budget is None else time.monotonic() + budget
+        attempt = 0
+        while True:
+            try:
+                return self._attempt(fn, deadline)
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                backoff = min(self.backoff_max_s, self.backoff_base_s * (2 ** attempt)) * random.uniform(0.5, 1.0)
+                remaining = self._remaining(deadline)
+                if remaining is not None and backoff >= remaining:
+                    raise
+                attempt += 1
+                LLM_RETRIES.inc()
+                print(f"Warning: LLM call failed ({e}); retry {attempt}/{self.max_retries} in {backoff:.1f}s")
+                time.sleep(backoff)
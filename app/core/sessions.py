@@ -0,0 +1,211 @@
+"""
+Server-side conversation store.
+
+Clients send a session id and only the new message; the history lives here, keyed by session id, in an
+in-memory LRU with an optional SQLite file behind it (SESSION_DB_PATH) so sessions survive restarts and
+LRU eviction. Assistant turns keep the SQL they ran and the shape of their result, so a follow-up
+question ("그중 베트남만") can build on the previous query.
+
+Every stored conversation is kept under HISTORY_TOKEN_BUDGET: when it grows past the budget, the
+oldest turns are folded into a compact summary message (one line per turn: the question, a clipped
+answer, the SQL and the result shape) and the recent turns stay verbatim. The summary is extractive,
+so compaction costs no LLM call.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from prometheus_client import Counter, Gauge
+
+from app.core.config import settings
+from app.core.tokens import estimate_tokens
+
+SESSIONS_IN_MEMORY = Gauge("willog_sessions_in_memory", "Conversation sessions held in the in-memory LRU")
+HISTORY_COMPACTIONS = Counter("willog_history_compactions_total", "Turns folded into a conversation summary")
+
+SUMMARY_ROLE = "summary"
+MAX_RESULT_COLUMNS = 12
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def _clip(text: Optional[str], limit: int) -> str:
+    text = _SPACE_RE.sub(" ", text or "").strip()
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def assistant_turn(result: Dict[str, Any]) -> Dict[str, Any]:
+    """The assistant message stored for an Orchestrator result, with its SQL and result shape."""
+    message = {"role": "assistant", "content": result.get("text") or "", "agent": result.get("agent")}
+    if result.get("sql"):
+        message["sql"] = result["sql"]
+    data = result.get("data")
+    if data is not None:
+        message["result"] = {"rows": len(data), "columns": [str(c) for c in data.columns[:MAX_RESULT_COLUMNS]]}
+    return message
+
+
+def _result_note(result: Dict[str, Any]) -> str:
+    return f"{result.get('rows')} rows ({', '.join(result.get('columns') or [])})"
+
+
+def render_message(message: Dict[str, Any]) -> str:
+    """One history entry as prompt text."""
+    role = message.get("role")
+    if role == SUMMARY_ROLE:
+        return f"Summary of earlier conversation:\n{message.get('content', '')}"
+    if role == "user":
+        return f"User: {message.get('content', '')}"
+    text = f"Assistant: {message.get('content', '')}"
+    if message.get("sql"):
+        text += f"\n  [SQL] {_clip(message['sql'], 600)}"
+    if message.get("result"):
+        text += f"\n  [Result] {_result_note(message['result'])}"
+    return text
+
+
+def _summary_line(message: Dict[str, Any]) -> str:
+    if message.get("role") == "user":
+        return f"- User: {_clip(message.get('content'), 120)}"
+    line = f"- Assistant: {_clip(message.get('content'), 160)}"
+    if message.get("sql"):
+        line += f" | SQL: {_clip(message['sql'], 240)}"
+    if message.get("result"):
+        line += f" | result: {_result_note(message['result'])}"
+    return line
+
+
+def render_history(messages: Optional[List[Dict[str, Any]]], budget_tokens: int) -> str:
+    """
+    Prompt text for a history: the summary (if any) plus as many of the most recent messages as fit in
+    `budget_tokens`. Works for stored (compacted) histories and for raw message lists alike.
+    """
+    if not messages:
+        return ""
+    summary = messages[0] if messages[0].get("role") == SUMMARY_ROLE else None
+    turns = messages[1:] if summary else messages
+
+    parts, used = [], 0
+    if summary:
+        text = render_message(summary)
+        used = estimate_tokens(text)
+    for message in reversed(turns):
+        text = render_message(message)
+        cost = estimate_tokens(text)
+        if parts and used + cost > budget_tokens:
+            break
+        parts.append(text)
+        used += cost
+    if summary:
+        parts.append(render_message(summary))
+    return "\n".join(reversed(parts)) + "\n"
+
+
+def compact(messages: List[Dict[str, Any]], budget_tokens: int, keep_recent: int = 2) -> List[Dict[str, Any]]:
+    """Folds the oldest turns into the summary until the rendered history fits `budget_tokens`."""
+    if estimate_tokens(render_history(messages, 10 ** 9)) <= budget_tokens:
+        return messages
+    summary_lines = []
+    turns = list(messages)
+    if turns and turns[0].get("role") == SUMMARY_ROLE:
+        summary_lines = turns.pop(0)["content"].splitlines()
+
+    def rendered_tokens():
+        summary = [{"role": SUMMARY_ROLE, "content": "\n".join(summary_lines)}] if summary_lines else []
+        return estimate_tokens(render_history(summary + turns, 10 ** 9))
+
+    while len(turns) > keep_recent and rendered_tokens() > budget_tokens:
+        summary_lines.append(_summary_line(turns.pop(0)))
+        HISTORY_COMPACTIONS.inc()
+    # The summary itself gets at most half the budget; the oldest lines go first
+    while len(summary_lines) > 1 and estimate_tokens("\n".join(summary_lines)) > budget_tokens // 2:
+        summary_lines.pop(0)
+    if not summary_lines:
+        return turns
+    return [{"role": SUMMARY_ROLE, "content": "\n".join(summary_lines)}] + turns
+
+
+class SessionStore:
+
+    def __init__(self, max_sessions: int = 10000, ttl_s: float = 86400, db_path: Optional[str] = None,
+                 budget_tokens: int = 1500):
+        self.max_sessions = max_sessions
+        self.ttl_s = ttl_s
+        self.budget_tokens = budget_tokens
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+                self._db = sqlite3.connect(db_path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, messages TEXT NOT NULL, updated REAL NOT NULL)"
+                )
+                self._db.commit()
+            except Exception as e:
+                print(f"Warning: Session database {db_path} unavailable, keeping sessions in memory only: {e}")
+                self._db = None
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    def _load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        session = self._sessions.get(session_id)
+        if session is None and self._db is not None:
+            row = self._db.execute("SELECT messages, updated FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row:
+                session = {"messages": json.loads(row[0]), "updated": row[1]}
+        if session is not None and time.time() - session["updated"] > self.ttl_s:
+            self._delete(session_id)
+            return None
+        return session
+
+    def _delete(self, session_id: str):
+        self._sessions.pop(session_id, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            self._db.commit()
+
+    def history(self, session_id: str) -> List[Dict[str, Any]]:
+        """The stored (compacted) messages of a session; empty for unknown or expired sessions."""
+        with self._lock:
+            session = self._load(session_id)
+            return [dict(m) for m in session["messages"]] if session else []
+
+    def append(self, session_id: str, *messages: Dict[str, Any]):
+        with self._lock:
+            session = self._load(session_id) or {"messages": []}
+            session["messages"] = compact(session["messages"] + list(messages), self.budget_tokens)
+            session["updated"] = time.time()
+            self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+            # Evicted sessions stay in the database (if any) and are reloaded on their next turn
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            SESSIONS_IN_MEMORY.set(len(self._sessions))
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO sessions (id, messages, updated) VALUES (?, ?, ?)",
+                    (session_id, json.dumps(session["messages"], ensure_ascii=False, default=str), session["updated"]),
+                )
+                self._db.commit()
+
+    def clear(self, session_id: str):
+        with self._lock:
+            self._delete(session_id)
+
+
+session_store = SessionStore(
+    max_sessions=settings.SESSION_MAX_SESSIONS,
+    ttl_s=settings.SESSION_TTL_S,
+    db_path=settings.SESSION_DB_PATH,
+    budget_tokens=settings.HISTORY_TOKEN_BUDGET,
+)
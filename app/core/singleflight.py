@@ -0,0 +1,105 @@
+"""
+Single-flight coalescing of identical concurrent requests.
+
+When several callers ask the same thing at the same time (e.g. a dashboard suggestion clicked by many
+operators at shift start), only the first one executes; the others wait for it and receive the same
+result, or the same exception. Nothing is cached: once the execution finishes the key is released.
+"""
+import hashlib
+import re
+import threading
+import unicodedata
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter, Gauge
+
+from app.core.config import settings
+from app.core.sessions import render_history
+
+COALESCED_REQUESTS = Counter(
+    "willog_coalesced_requests_total", "Requests answered by another in-flight execution (executions saved)"
+)
+COALESCED_EXECUTIONS = Counter(
+    "willog_coalesced_executions_total", "Executions whose result was shared with at least one other request"
+)
+INFLIGHT_KEYS = Gauge("willog_singleflight_inflight", "Distinct requests currently executing")
+
+_PUNCT_RE = re.compile(r"[\s?!.。？！~]+$")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """Case/width/whitespace-insensitive form; trailing punctuation is dropped ("통계?" == "통계")."""
+    text = unicodedata.normalize("NFKC", question or "").casefold()
+    text = _SPACE_RE.sub(" ", text).strip()
+    return _PUNCT_RE.sub("", text)
+
+
+def request_key(question: str, chat_history: Optional[List[Dict[str, Any]]] = None) -> str:
+    """
+    Coalescing key: the normalized question plus everything else the answer depends on, i.e. the
+    history exactly as the agents render it (summary plus the recent turns within HISTORY_TOKEN_BUDGET)
+    and today's date (relative periods like "최근 1주일").
+    """
+    parts = [date.today().isoformat(), normalize_question(question),
+             render_history(chat_history, settings.HISTORY_TOKEN_BUDGET)]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def do(self, key: str, fn: Callable[[], Any], poll: Optional[Callable[[], None]] = None) -> Tuple[Any, bool]:
+        """
+        Runs fn() unless an execution for `key` is already in flight, in which case waits for it.
+        Returns (result, shared), where shared is True for callers that did not execute fn themselves.
+        While waiting, `poll()` is called periodically and may raise to stop waiting (e.g. cancellation).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            COALESCED_REQUESTS.inc()
+            while not call.done.wait(0.1):
+                if poll is not None:
+                    poll()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        INFLIGHT_KEYS.inc()
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                if call.waiters:
+                    COALESCED_EXECUTIONS.inc()
+            INFLIGHT_KEYS.dec()
+            call.done.set()
+        return call.result, False
+
+    def inflight(self) -> int:
+        with self._lock:
+            return len(self._calls)
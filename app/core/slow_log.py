@@ -0,0 +1,155 @@
+"""
+Bounded on-disk log of slow requests.
+
+Requests whose trace exceeds SLOW_REQUEST_THRESHOLD_S are appended as JSON lines by a background
+writer thread, so the request itself only pays for a non-blocking queue put. The file rotates at
+SLOW_LOG_MAX_BYTES and keeps SLOW_LOG_BACKUPS older files, bounding disk usage.
+"""
+import json
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from prometheus_client import Counter
+
+from app.core.config import settings
+
+SLOW_REQUESTS = Counter("willog_slow_requests_total", "Requests over the slow-request threshold", ["agent"])
+SLOW_LOG_DROPPED = Counter("willog_slow_log_dropped_total", "Slow-request entries dropped because the writer queue was full")
+
+
+class SlowRequestLog:
+
+    def __init__(self, path: str, threshold_s: float, max_bytes: int = 5_000_000, backups: int = 3,
+                 queue_size: int = 1000):
+        self.path = path
+        self.threshold_s = threshold_s
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=queue_size)
+        self._file_lock = threading.Lock()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+
+    # --- Recording (request path) ---
+
+    def maybe_record(self, trace) -> bool:
+        """Queues the trace if it is over the threshold. Never blocks and never raises."""
+        if self.threshold_s is None or self.threshold_s < 0 or trace.duration_s < self.threshold_s:
+            return False
+        try:
+            entry = self._entry(trace)
+            SLOW_REQUESTS.labels(entry["agent"] or "unknown").inc()
+            self._ensure_writer()
+            self._queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            SLOW_LOG_DROPPED.inc()
+        except Exception as e:
+            print(f"Warning: Could not record slow request: {e}")
+        return False
+
+    @staticmethod
+    def _entry(trace) -> Dict[str, Any]:
+        data = trace.as_dict()
+        queries = data.get("queries") or []
+        data["logged_at"] = datetime.now(timezone.utc).isoformat()
+        data["job_ids"] = [q["job_id"] for q in queries if q.get("job_id")]
+        data["bytes_processed"] = sum(q.get("bytes_processed") or 0 for q in queries)
+        return data
+
+    def _ensure_writer(self):
+        if self._writer is not None:
+            return
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="slow-log-writer", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            entry = self._queue.get()
+            try:
+                self._append(entry)
+            except Exception as e:
+                print(f"Warning: Slow request log write failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _append(self, entry: Dict[str, Any]):
+        line = json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+        with self._file_lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            if os.path.exists(self.path) and os.path.getsize(self.path) + len(line) > self.max_bytes:
+                self._rotate()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def _rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def flush(self):
+        """Blocks until queued entries are on disk (tests/admin export)."""
+        if self._writer is not None:
+            self._queue.join()
+
+    # --- Reading (admin path) ---
+
+    def entries(self, limit: int = 100, agent: Optional[str] = None, min_duration_s: Optional[float] = None,
+                since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Newest-first entries across the current file and its backups, with optional filters."""
+        paths = [self.path] + [f"{self.path}.{i}" for i in range(1, self.backups + 1)]
+        results = []
+        with self._file_lock:
+            for path in paths:
+                if not os.path.exists(path):
+                    continue
+                with open(path, encoding="utf-8") as f:
+                    lines = f.readlines()
+                for line in reversed(lines):
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if agent and entry.get("agent") != agent:
+                        continue
+                    if min_duration_s is not None and entry.get("duration_s", 0) < min_duration_s:
+                        continue
+                    if since is not None and entry.get("started", 0) < since:
+                        continue
+                    results.append(entry)
+                    if len(results) >= limit:
+                        return results
+        return results
+
+
+def to_corpus(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Converts slow-log entries to the question corpus format used by scripts/bench_pipeline.py."""
+    corpus, seen = [], set()
+    for entry in entries:
+        question = entry.get("question")
+        if not question or question in seen:
+            continue
+        seen.add(question)
+        item = {"id": f"slow-{len(corpus) + 1}", "question": question}
+        if entry.get("agent"):
+            item["expected_agent"] = entry["agent"]
+        corpus.append(item)
+    return corpus
+
+
+slow_log = SlowRequestLog(
+    settings.SLOW_LOG_PATH,
+    settings.SLOW_REQUEST_THRESHOLD_S,
+    max_bytes=settings.SLOW_LOG_MAX_BYTES,
+    backups=settings.SLOW_LOG_BACKUPS,
+)
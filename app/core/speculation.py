@@ -0,0 +1,67 @@
+"""
+Speculative execution of pipeline steps that usually follow the current one.
+
+`Speculation(name, fn)` starts fn() right away in a background thread, inside a copy of the caller's
+context (request trace, job progress) and under a child cancellation scope. Once the step it depended
+on has finished, the caller either `join()`s it, getting fn's result (or exception) with part or all of
+its latency already spent, or `discard()`s it, which cancels the scope so fn stops at its next
+cancellation check (no further LLM retries, no BigQuery job).
+
+Outcomes are counted in willog_speculations_total{name, outcome}: "used" speculations saved the
+overlapped time (willog_speculation_saved_seconds_total), "discarded" ones cost an extra backend call.
+"""
+import concurrent.futures
+import contextvars
+import time
+from typing import Any, Callable, Optional
+
+from prometheus_client import Counter
+
+from app.core import cancellation
+from app.core.config import settings
+
+SPECULATIONS = Counter("willog_speculations_total", "Speculative executions by outcome", ["name", "outcome"])
+SPECULATION_SAVED = Counter(
+    "willog_speculation_saved_seconds_total", "Latency hidden behind the step a used speculation overlapped", ["name"]
+)
+
+DISCARDED = "speculation discarded"
+
+_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=settings.LLM_MAX_CONCURRENCY, thread_name_prefix="speculation"
+)
+
+
+class Speculation:
+
+    def __init__(self, name: str, fn: Callable[[], Any]):
+        self.name = name
+        self.scope = cancellation.CancelScope(parent=cancellation.current_scope())
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        context = contextvars.copy_context()
+
+        def run():
+            try:
+                with cancellation.active(self.scope):
+                    return fn()
+            finally:
+                self.finished = time.perf_counter()
+                self.scope.close()
+
+        self._future = _executor.submit(context.run, run)
+        SPECULATIONS.labels(name, "started").inc()
+
+    def join(self) -> Any:
+        """fn's result (or its exception); the time it ran alongside the caller is counted as saved."""
+        joined = time.perf_counter()
+        try:
+            return self._future.result()
+        finally:
+            SPECULATIONS.labels(self.name, "used").inc()
+            SPECULATION_SAVED.labels(self.name).inc(min(joined, self.finished or joined) - self.started)
+
+    def discard(self):
+        """Cancels fn (a call already sent to a backend still completes, its result is dropped)."""
+        self.scope.cancel(DISCARDED)
+        SPECULATIONS.labels(self.name, "discarded").inc()
@@ -0,0 +1,212 @@
+"""
+Precomputed answers for the suggestion buttons.
+
+Most users start by clicking one of the configured suggestions (settings.SUGGESTIONS), so their answers
+(SQL, result rows, synthesized text) are computed ahead of time by `SuggestionWarmer` and served from
+`suggestion_store` by the Orchestrator, together with the time they were refreshed. The store is a JSON
+file, so answers warmed by one process (the API, scripts/sync_data.py) are served by the others (the
+Streamlit UI). Entries are served only while fresher than SUGGESTION_MAX_AGE_S and from the same day,
+since several suggestions are relative ("최근 1주일", "이번 달").
+
+Warm runs respect the BigQuery cost guard: each query runs under `max_bytes_billed`, and a run stops
+warming (keeping the previous answers) once SUGGESTION_MAX_BYTES_PER_RUN has been spent.
+"""
+import io
+import json
+import os
+import threading
+import time
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from prometheus_client import Counter
+
+from app.core.config import settings
+from app.core.singleflight import normalize_question
+
+SUGGESTIONS_SERVED = Counter("willog_suggestions_served_total", "Questions answered from precomputed suggestions")
+SUGGESTION_WARMS = Counter("willog_suggestion_warms_total", "Suggestion warm attempts by outcome", ["outcome"])
+
+
+def _encode_frame(df) -> Optional[str]:
+    return None if df is None else df.to_json(orient="table", date_format="iso", index=False)
+
+
+def _decode_frame(raw: Optional[str]):
+    if raw is None:
+        return None
+    import pandas as pd
+    return pd.read_json(io.StringIO(raw), orient="table")
+
+
+class SuggestionStore:
+
+    def __init__(self, path: str, max_age_s: float = 6 * 3600):
+        self.path = path
+        self.max_age_s = max_age_s
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._frames: Dict[str, Any] = {}
+        self._mtime = None
+
+    def _reload(self):
+        # Picks up answers written by another process; cheap stat when nothing changed
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self._entries = json.load(f).get("entries", {})
+            self._frames = {}
+            self._mtime = mtime
+        except Exception as e:
+            print(f"Warning: Could not read suggestion store {self.path}: {e}")
+
+    def _fresh(self, entry: Optional[Dict[str, Any]]) -> bool:
+        if entry is None:
+            return False
+        refreshed = entry["refreshed"]
+        return time.time() - refreshed <= self.max_age_s and datetime.fromtimestamp(refreshed).date() == date.today()
+
+    def entry(self, question: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._reload()
+            return self._entries.get(normalize_question(question))
+
+    def refreshed(self, question: str) -> Optional[float]:
+        """When the answer to `question` was precomputed, or None if there is no fresh one."""
+        entry = self.entry(question)
+        return entry["refreshed"] if self._fresh(entry) else None
+
+    def get(self, question: str) -> Optional[Dict[str, Any]]:
+        """The precomputed result for `question` (Orchestrator result shape plus `refreshed`), if fresh."""
+        key = normalize_question(question)
+        with self._lock:
+            self._reload()
+            entry = self._entries.get(key)
+            if not self._fresh(entry):
+                return None
+            if key not in self._frames:
+                self._frames[key] = _decode_frame(entry.get("data"))
+            data = self._frames[key]
+        SUGGESTIONS_SERVED.inc()
+        return {
+            "text": entry["text"], "data": data, "sql": entry.get("sql"), "agent": entry.get("agent"),
+            "refreshed": entry["refreshed"],
+        }
+
+    def put(self, question: str, result: Dict[str, Any], bytes_processed: int = 0):
+        key = normalize_question(question)
+        with self._lock:
+            self._reload()
+            self._entries[key] = {
+                "question": question,
+                "text": result.get("text") or "",
+                "sql": result.get("sql"),
+                "agent": result.get("agent"),
+                "data": _encode_frame(result.get("data")),
+                "refreshed": time.time(),
+                "bytes_processed": bytes_processed,
+            }
+            self._frames.pop(key, None)
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"version": 1, "entries": self._entries}, f, ensure_ascii=False)
+            os.replace(self.path + ".tmp", self.path)
+            self._mtime = os.path.getmtime(self.path)
+
+
+def _bytes_processed(result: Dict[str, Any]) -> int:
+    trace = result.get("trace")
+    return sum(q.get("bytes_processed") or 0 for q in (trace.queries if trace is not None else []))
+
+
+class SuggestionWarmer:
+    """Runs every suggestion through `runner` (Orchestrator.run without precomputed answers) into the store."""
+
+    def __init__(self, runner: Callable[[str], Dict[str, Any]], store: SuggestionStore, suggestions: List[str],
+                 interval_s: float = 3600, max_bytes_per_query: Optional[int] = None,
+                 max_bytes_per_run: Optional[int] = None):
+        self.runner = runner
+        self.store = store
+        self.suggestions = suggestions
+        self.interval_s = interval_s
+        self.max_bytes_per_query = max_bytes_per_query
+        self.max_bytes_per_run = max_bytes_per_run
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def warm(self) -> Dict[str, Any]:
+        from packages.bq_wrapper.client import max_bytes_billed
+
+        summary = {"warmed": [], "failed": [], "skipped": [], "bytes_processed": 0}
+        for question in self.suggestions:
+            if self._stop.is_set():
+                break
+            limit = self.max_bytes_per_query
+            if self.max_bytes_per_run:
+                remaining = self.max_bytes_per_run - summary["bytes_processed"]
+                previous = self.store.entry(question)
+                # Keep the previous answer rather than exceed the run's budget
+                if remaining <= 0 or (previous and previous.get("bytes_processed", 0) > remaining):
+                    summary["skipped"].append(question)
+                    SUGGESTION_WARMS.labels("skipped").inc()
+                    continue
+                limit = min(limit, remaining) if limit else remaining
+            try:
+                with max_bytes_billed(limit):
+                    result = self.runner(question)
+            except Exception as e:
+                print(f"Warning: Could not warm suggestion '{question}': {e}")
+                summary["failed"].append(question)
+                SUGGESTION_WARMS.labels("failed").inc()
+                continue
+            spent = _bytes_processed(result)
+            summary["bytes_processed"] += spent
+            # A SQL answer without rows is an error message; don't serve it for the next hours
+            if result.get("agent") == "SQL_AGENT" and result.get("data") is None:
+                summary["failed"].append(question)
+                SUGGESTION_WARMS.labels("failed").inc()
+                continue
+            self.store.put(question, result, spent)
+            summary["warmed"].append(question)
+            SUGGESTION_WARMS.labels("warmed").inc()
+        return summary
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                summary = self.warm()
+                print(f"Suggestions warmed: {len(summary['warmed'])}/{len(self.suggestions)} "
+                      f"({summary['bytes_processed'] / 1e9:.2f} GB processed)")
+            except Exception as e:
+                print(f"Warning: Suggestion warm run failed: {e}")
+            self._stop.wait(self.interval_s)
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="suggestion-warmer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+
+def suggestion_warmer(orchestrator) -> SuggestionWarmer:
+    """A warmer over the configured suggestions that runs them through `orchestrator`."""
+    return SuggestionWarmer(
+        lambda question: orchestrator.run(question, deadline_s=settings.REQUEST_DEADLINE_S, precomputed=False),
+        suggestion_store,
+        settings.SUGGESTIONS,
+        interval_s=settings.SUGGESTION_REFRESH_INTERVAL_S,
+        max_bytes_per_query=settings.SUGGESTION_MAX_BYTES_PER_QUERY,
+        max_bytes_per_run=settings.SUGGESTION_MAX_BYTES_PER_RUN,
+    )
+
+
+suggestion_store = SuggestionStore(settings.SUGGESTION_STORE_PATH, max_age_s=settings.SUGGESTION_MAX_AGE_S)
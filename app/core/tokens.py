@@ -0,0 +1,9 @@
+def estimate_tokens(text: str) -> int:
+    """
+    Offline prompt-token estimate: ~4 ASCII characters per token, ~1 token per Hangul/other character.
+    Good enough for budgets and for tracking prompt growth without calling the tokenizer API.
+    """
+    if not text:
+        return 0
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return int((len(text) - non_ascii) / 4 + non_ascii)
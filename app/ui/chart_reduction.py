@@ -0,0 +1,119 @@
+"""
+Server-side data reduction for charts, so figure build time and payload stay bounded whatever the row count.
+
+- `lttb_indices(x, y, n_out)`: Largest-Triangle-Three-Buckets downsampling of one series. The first and last
+  points are kept; each of the n_out - 2 buckets in between keeps the point forming the largest triangle with
+  the previously kept point and the mean of the next bucket, which preserves peaks and the overall shape.
+  The buckets are laid out as one padded (n_out x bucket width) matrix; only the chain of kept points is a loop.
+- `downsample_series(df, x_col, y_cols, max_points)`: LTTB on every y column, keeping the union of the points.
+- `bin_points(df, lat_col, lon_col, max_cells)`: dense lat/lon points binned into a grid of at most max_cells
+  cells, one row per non-empty cell at the centroid of its points, with the cell's point count in `points`
+  (its weight), numeric columns averaged and other columns taken from the cell's first point.
+"""
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+POINTS = "points"
+
+
+def _numeric_x(values: pd.Series) -> np.ndarray:
+    """x as float64: datetimes (or date strings) as nanoseconds, numbers as is, anything else by position."""
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        return values.to_numpy(dtype="float64", na_value=np.nan)
+    converted = values if pd.api.types.is_datetime64_any_dtype(values) else pd.to_datetime(values, errors="coerce")
+    missing = converted.isna().to_numpy()
+    if missing.all():
+        return np.arange(len(values), dtype="float64")
+    if converted.dt.tz is not None:
+        converted = converted.dt.tz_convert(None)
+    nanoseconds = converted.to_numpy(dtype="datetime64[ns]").astype("int64").astype("float64")
+    return np.where(missing, np.nan, nanoseconds)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indices (ascending) of the n_out points LTTB keeps; x must be sorted. All indices if n_out >= len(x)."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype="float64") - x[0]
+    y = np.asarray(y, dtype="float64")
+    finite = np.isfinite(y)
+    y = np.where(finite, y, np.nanmean(y) if finite.any() else 0.0)
+
+    # n_out - 2 buckets over the interior points 1 .. n-2, each with at least one point
+    edges = np.linspace(1, n - 1, n_out - 1).astype("int64")
+    starts, ends = edges[:-1], edges[1:]
+    counts = ends - starts
+    x_sums, y_sums = np.concatenate([[0.0], np.cumsum(x)]), np.concatenate([[0.0], np.cumsum(y)])
+    # The third vertex of bucket i: the mean of bucket i + 1, and the last point for the last bucket
+    next_x = np.append(((x_sums[ends] - x_sums[starts]) / counts)[1:], x[-1])
+    next_y = np.append(((y_sums[ends] - y_sums[starts]) / counts)[1:], y[-1])
+
+    candidates = starts[:, None] + np.arange(counts.max())
+    padding = candidates >= ends[:, None]
+    candidates = np.minimum(candidates, n - 1)
+    bucket_x, bucket_y = x[candidates], y[candidates]
+
+    selected = np.empty(n_out, dtype="int64")
+    selected[0], selected[-1] = 0, n - 1
+    ax, ay = x[0], y[0]
+    for i in range(len(starts)):
+        # Twice the triangle area; the padding of short buckets never wins
+        area = np.abs((ax - next_x[i]) * (bucket_y[i] - ay) - (ax - bucket_x[i]) * (next_y[i] - ay))
+        area[padding[i]] = -1.0
+        chosen = candidates[i, area.argmax()]
+        selected[i + 1] = chosen
+        ax, ay = x[chosen], y[chosen]
+    return selected
+
+
+def downsample_series(df: pd.DataFrame, x_col: str, y_cols: List[str], max_points: int) -> pd.DataFrame:
+    """df sorted by x_col and reduced to at most max_points rows per y column (the union of their LTTB points)."""
+    x = _numeric_x(df[x_col])
+    order = np.argsort(x, kind="stable")
+    if len(df) <= max_points:
+        return df.iloc[order]
+    x = x[order]
+    keep = np.unique(np.concatenate([
+        lttb_indices(x, df[column].to_numpy(dtype="float64", na_value=np.nan)[order], max_points)
+        for column in y_cols
+    ]))
+    return df.iloc[order[keep]]
+
+
+def bin_points(df: pd.DataFrame, lat_col: str, lon_col: str, max_cells: int) -> pd.DataFrame:
+    """One row per occupied cell of a lat/lon grid of at most max_cells cells (see the module docstring)."""
+    lat = df[lat_col].to_numpy(dtype="float64", na_value=np.nan)
+    lon = df[lon_col].to_numpy(dtype="float64", na_value=np.nan)
+    located = np.isfinite(lat) & np.isfinite(lon)
+    df, lat, lon = df[located], lat[located], lon[located]
+    if df.empty:
+        return df.assign(**{POINTS: pd.Series(dtype="int64")})
+
+    side = max(1, int(np.sqrt(max_cells)))
+    lat_index = _grid_index(lat, side)
+    lon_index = _grid_index(lon, side)
+    cells, first, inverse, points = np.unique(
+        lat_index * side + lon_index, return_index=True, return_inverse=True, return_counts=True
+    )
+
+    binned = df.iloc[first].reset_index(drop=True)
+    for column in df.columns:
+        if pd.api.types.is_numeric_dtype(df[column]) and not pd.api.types.is_bool_dtype(df[column]):
+            values = df[column].to_numpy(dtype="float64", na_value=np.nan)
+            present = np.isfinite(values)
+            sums = np.bincount(inverse, weights=np.where(present, values, 0.0), minlength=len(cells))
+            counts = np.bincount(inverse, weights=present, minlength=len(cells))
+            with np.errstate(invalid="ignore", divide="ignore"):
+                binned[column] = sums / counts
+    binned[POINTS] = points
+    return binned
+
+
+def _grid_index(values: np.ndarray, side: int) -> np.ndarray:
+    low, high = values.min(), values.max()
+    if high <= low:
+        return np.zeros(len(values), dtype="int64")
+    return np.minimum(((values - low) / (high - low) * side).astype("int64"), side - 1)
@@ -7,7 +7,12 @@ from io import StringIO
 # Add project root to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 
+from datetime import datetime
+
 from app.agents.orchestrator import Orchestrator
+from app.core.config import settings
+from app.core.sessions import assistant_turn, session_store
+from app.core.suggestions import suggestion_warmer
 from app.ui.visualization import detect_chart_type
 
 # --- Page Config & Styling ---
@@ -97,7 +102,11 @@ st.markdown("""
 # --- Helper Functions (Cached for Performance) ---
 @st.cache_resource
 def get_orchestrator():
-    return Orchestrator()
+    orchestrator = Orchestrator()
+    if settings.SUGGESTION_WARMER_ENABLED:
+        # One background warmer per UI process (cache_resource), refreshing the suggestion answers
+        suggestion_warmer(orchestrator).start()
+    return orchestrator
 
 if "orchestrator" not in st.session_state:
     # Initial Loading UI with Progress Bar
@@ -128,6 +137,10 @@ if "orchestrator" not in st.session_state:
 # --- State Management ---
 if "messages" not in st.session_state:
     st.session_state.messages = []
+# Conversation context for the agents (compacted, with previous SQL/result shapes) lives in the session store;
+# st.session_state.messages only holds what is displayed
+if "session_id" not in st.session_state:
+    st.session_state.session_id = session_store.new_id()
 
 # Initialize widget_input if not present to avoid widget creation error
 if "widget_input" not in st.session_state:
@@ -137,8 +150,11 @@ if "query_input" not in st.session_state:
     st.session_state.query_input = ""
 
 # --- Helper Functions ---
-def process_message():
+def process_message(approximate=None):
     """Callback for text input on_change or search button click"""
+    # Sidebar toggle unless the caller decides (the "exact" re-run of an approximate answer)
+    if approximate is None:
+        approximate = st.session_state.get("approximate", False)
     # Sync query_input with widget_input (bound by key)
     if "widget_input" in st.session_state:
         st.session_state.query_input = st.session_state.widget_input
@@ -151,15 +167,24 @@ def process_message():
 
     old_stdout = sys.stdout
     sys.stdout = mystdout = StringIO()
+    result_payload = None
     
     try:
         with st.spinner("데이터를 분석하고 있습니다..."):
             # Result is now a dict: {'text': ..., 'data': ..., 'sql': ...}
-            # Pass history excluding the most recent user message
-            result_payload = st.session_state.orchestrator.run(prompt, st.session_state.messages[:-1])
+            session_id = st.session_state.session_id
+            result_payload = st.session_state.orchestrator.run(
+                prompt, session_store.history(session_id), approximate=approximate
+            )
+            if isinstance(result_payload, dict):
+                session_store.append(session_id, {"role": "user", "content": prompt}, assistant_turn(result_payload))
             
             if isinstance(result_payload, dict):
                 response_text = result_payload.get("text", "")
+                if result_payload.get("refreshed"):
+                    # Precomputed suggestion answer: say how fresh it is
+                    refreshed_at = datetime.fromtimestamp(result_payload["refreshed"]).strftime("%m/%d %H:%M")
+                    response_text += f"\n\n_🕒 {refreshed_at} 기준 데이터_"
                 data_df = result_payload.get("data")
                 # Attempt to generate a chart
                 chart_fig = detect_chart_type(data_df)
@@ -179,12 +204,20 @@ def process_message():
         "role": "assistant", 
         "content": response_text,
         "debug": debug_logs,
-        "chart": chart_fig
+        "chart": chart_fig,
+        # Approximate answers offer an exact re-run of the same question
+        "exact_prompt": prompt if isinstance(result_payload, dict) and result_payload.get("approximation") else None
     })
     # Clear both state variables to reset widget
     st.session_state.query_input = ""
     st.session_state.widget_input = "" 
 
+def rerun_exact(text):
+    """Callback for the exact re-run button under an approximate answer"""
+    st.session_state.widget_input = text
+    st.session_state.query_input = text
+    process_message(approximate=False)
+
 def set_query_callback(text):
     """Callback for suggested question buttons"""
     # Directly update the widget state key
@@ -218,24 +251,8 @@ with st.container():
     # --- Suggested Questions (3x4 Grid) ---
     st.markdown("<div style='height: 30px;'></div>", unsafe_allow_html=True)
     
-    suggestions = [
-        # Row 1: 기본 통계
-        "📉 상하이행 총 운송건수 및 파손율",
-        "📊 포장 타입별 파손율 비교",
-        "🛳️ 해상 운송 5G 이상 충격 비율",
-        # Row 2: 시간 기반 분석
-        "📅 이번 달 전체 운송 건수",
-        "🚨 최근 1주일 High Risk 운송 건",
-        "📈 최근 30일 일별 충격 발생 추이",
-        # Row 3: 국가/지역 분석
-        "🇨🇳 중국행 화물 평균 충격 강도",
-        "🇻🇳 베트남행 온도 이탈 건수",
-        "🌍 국가별 운송 현황 요약",
-        # Row 4: 심층 분석
-        "🔥 충격 리스크 히트맵 Top 10 지역",
-        "⚠️ 누적 피로도 Top 5 운송 건",
-        "❄️ 영하 온도 + 충격 동시 발생 건수"
-    ]
+    # Configurable (settings.SUGGESTIONS); answers are precomputed by the warmer, see app/core/suggestions.py
+    suggestions = settings.SUGGESTIONS
 
     st.markdown('<div class="suggestion-btn">', unsafe_allow_html=True)
     
@@ -259,9 +276,13 @@ st.markdown("<hr style='margin-top: 20px; margin-bottom: 20px; border-top: 1px s
 # --- Results Area (Reversed Order) ---
 if st.session_state.messages:
     # Display Newest FIRST
-    for message in reversed(st.session_state.messages):
+    for idx, message in reversed(list(enumerate(st.session_state.messages))):
         with st.chat_message(message["role"], avatar="🧑‍💻" if message["role"] == "user" else "🤖"):
             st.markdown(message["content"])
+
+            if message.get("exact_prompt"):
+                st.button("🎯 정확한 값으로 다시 조회", key=f"exact_{idx}", on_click=rerun_exact,
+                          args=(message["exact_prompt"],))
             
             # Display Chart if available
             if message.get("chart"):
@@ -274,9 +295,13 @@ if st.session_state.messages:
 # --- Sidebar ---
 with st.sidebar:
     st.header("설정")
+    st.toggle("⚡ 근사 조회 (표본 기반, 신뢰구간 포함)", key="approximate",
+              help=f"센서 로그 집계를 약 {settings.APPROX_SAMPLE_PERCENT:g}% 표본으로 빠르게 추정합니다. 답변 아래 버튼으로 정확한 값을 다시 조회할 수 있습니다.")
     if st.button("🗑️ 대화 기록 초기화", use_container_width=True):
         st.session_state.messages = []
         st.session_state.query_input = ""
+        session_store.clear(st.session_state.session_id)
+        st.session_state.session_id = session_store.new_id()
         st.rerun()
     st.markdown("---")
     st.markdown("**Version**: 0.4.0")
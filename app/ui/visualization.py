@@ -3,6 +3,9 @@ import plotly.express as px
 import plotly.graph_objects as go
 import streamlit as st
 
+from app.core.config import settings
+from app.ui.chart_reduction import POINTS, bin_points, downsample_series
+
 def detect_chart_type(df: pd.DataFrame):
     """
     Analyzes the DataFrame and returns a Plotly figure if a suitable chart type is found.
@@ -23,17 +26,28 @@ def detect_chart_type(df: pd.DataFrame):
         # Determine size/color metrics if available
         size_col = next((c for c in df.columns if c.lower() in ['count', 'total', 'risk_score', 'high_impact_events']), None)
         color_col = next((c for c in df.columns if c.lower() in ['risk_score', 'damage_rate', 'avg_shock_g', 'location_label']), None)
-        
-        fig = px.scatter_mapbox(
-            df, 
+        title = "Geospatial Analysis"
+
+        # Dense points are binned into weighted cells (sized by the number of points in them)
+        plot_df = df
+        if len(df) > settings.CHART_MAP_MAX_CELLS:
+            plot_df = bin_points(df, lat_col, lon_col, settings.CHART_MAP_MAX_CELLS)
+            size_col = POINTS
+            title += f" ({len(df):,} points in {len(plot_df):,} cells)"
+
+        # Recent plotly releases draw maps with MapLibre (scatter_map) and no longer ship scatter_mapbox
+        scatter_map = getattr(px, "scatter_map", None)
+        style = {"map_style": "carto-positron"} if scatter_map else {"mapbox_style": "carto-positron"}
+        fig = (scatter_map or px.scatter_mapbox)(
+            plot_df, 
             lat=lat_col, 
             lon=lon_col,
             size=size_col,
             color=color_col,
-            hover_data=df.columns,
-            zoom=3 if len(df) > 1 else 10,
-            mapbox_style="carto-positron",
-            title="Geospatial Analysis"
+            hover_data=plot_df.columns,
+            zoom=3 if len(plot_df) > 1 else 10,
+            title=title,
+            **style
         )
         fig.update_layout(margin={"r":0,"t":40,"l":0,"b":0})
         return fig
@@ -53,12 +67,19 @@ def detect_chart_type(df: pd.DataFrame):
         numeric_cols = [c for c in numeric_cols if 'lat' not in c.lower() and 'lon' not in c.lower()]
         
         if numeric_cols:
+            # Long series are downsampled (LTTB) and drawn with WebGL, without markers
+            plot_df = downsample_series(df, date_col, numeric_cols, settings.CHART_MAX_POINTS)
+            webgl = len(plot_df) > settings.CHART_WEBGL_THRESHOLD
+            title = "Time Series Trends"
+            if len(plot_df) < len(df):
+                title += f" ({len(plot_df):,} of {len(df):,} points)"
             fig = px.line(
-                df, 
+                plot_df, 
                 x=date_col, 
                 y=numeric_cols, 
-                markers=True,
-                title="Time Series Trends"
+                markers=not webgl,
+                render_mode="webgl" if webgl else "svg",
+                title=title
             )
             return fig
 
@@ -0,0 +1,87 @@
+import hashlib
+import io
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+
+# Inputs that change from run to run without changing the request (excluded from cassette keys)
+VOLATILE_KEYS = {"current_date"}
+
+
+class CassetteMiss(KeyError):
+    """Raised in replay mode when a stage input was never recorded."""
+
+
+def _encode(value: Any) -> Any:
+    try:
+        import pandas as pd
+        if isinstance(value, pd.DataFrame):
+            return {"__dataframe__": value.to_json(orient="table", date_format="iso", index=False)}
+    except ImportError:
+        pass
+    return value
+
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, dict) and "__dataframe__" in value:
+        import pandas as pd
+        return pd.read_json(io.StringIO(value["__dataframe__"]), orient="table")
+    return value
+
+
+def cassette_key(payload: Any) -> str:
+    """Stable hash of a stage input (dict inputs drop VOLATILE_KEYS; SQL is whitespace-normalized)."""
+    if isinstance(payload, dict):
+        payload = {k: v for k, v in payload.items() if k not in VOLATILE_KEYS}
+    elif isinstance(payload, str):
+        payload = " ".join(payload.split())
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:24]
+
+
+class Cassette:
+    """
+    Recorded stage responses (LLM outputs, BigQuery result frames) keyed by stage and input hash.
+    Stored as a single JSON file so fixtures can be reviewed and committed alongside the corpus.
+    """
+
+    def __init__(self, path: str, mode: str = "replay"):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self._entries = json.load(f).get("entries", {})
+        elif mode == "replay":
+            raise FileNotFoundError(f"Cassette not found: {path} (run with --mode record first)")
+
+    def lookup(self, stage: str, payload: Any) -> Dict[str, Any]:
+        entry = self._entries.get(stage, {}).get(cassette_key(payload))
+        if entry is None:
+            raise CassetteMiss(f"{stage}: no recorded response for input {cassette_key(payload)}")
+        return {"response": _decode(entry["response"]), "latency_s": entry.get("latency_s", 0.0)}
+
+    def get(self, stage: str, payload: Any) -> Optional[Dict[str, Any]]:
+        try:
+            return self.lookup(stage, payload)
+        except CassetteMiss:
+            return None
+
+    def record(self, stage: str, payload: Any, response: Any, latency_s: float):
+        with self._lock:
+            self._entries.setdefault(stage, {})[cassette_key(payload)] = {
+                "response": _encode(response),
+                "latency_s": round(latency_s, 4),
+            }
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._lock:
+            data = {"version": 1, "entries": self._entries}
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(self.path + ".tmp", self.path)
@@ -0,0 +1,244 @@
+"""
+Local stand-ins for Vertex AI and BigQuery with configurable latency and failure rates.
+Used by the load generator (scripts/load_test_chat.py) so the API can be exercised without any cloud service.
+"""
+import contextlib
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+
+class SimulatedBackendError(RuntimeError):
+    """Raised by the fakes to model quota / availability errors (message mimics a 429)."""
+
+
+class LatencyModel:
+    """
+    Log-normal latency around `median_ms`, plus occasional spikes of `spike_ms`
+    (probability `spike_rate`) to model tail latency.
+    """
+
+    def __init__(self, median_ms: float = 0, sigma: float = 0.3, spike_rate: float = 0.0, spike_ms: float = 0,
+                 seed: Optional[int] = None):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.spike_rate = spike_rate
+        self.spike_ms = spike_ms
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        """Seconds for one call."""
+        with self._lock:
+            delay = self.median_ms * self._rng.lognormvariate(0, self.sigma) if self.median_ms else 0.0
+            if self.spike_rate and self._rng.random() < self.spike_rate:
+                delay += self.spike_ms
+        return delay / 1000
+
+    def roll(self, rate: float) -> bool:
+        with self._lock:
+            return rate > 0 and self._rng.random() < rate
+
+
+class FakeChain:
+    """Replaces an agent chain: sleeps per the latency model, fails at `failure_rate`, else answers."""
+
+    def __init__(self, respond: Callable[[dict], str], latency: LatencyModel, failure_rate: float = 0.0):
+        self.respond = respond
+        self.latency = latency
+        self.failure_rate = failure_rate
+
+    def invoke(self, payload, *args, **kwargs):
+        from app.core.admission import stage_slot
+
+        # Holds an LLM slot like the real (registry) model calls do
+        with stage_slot("llm"):
+            time.sleep(self.latency.sample())
+            if self.latency.roll(self.failure_rate):
+                raise SimulatedBackendError("429 Resource exhausted (simulated)")
+        return self.respond(payload)
+
+
+class FakeChatModel:
+    """
+    Replaces a ChatVertexAI client behind the registry (app/core/clients.py), so the LLM call policy
+    (rate limit, retries, hedging) is exercised: returns AIMessages after a latency-model delay.
+    """
+
+    def __init__(self, latency: LatencyModel, failure_rate: float = 0.0, respond: Callable[[object], str] = None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.respond = respond or (lambda prompt: "SQL_AGENT")
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, prompt, *args, **kwargs):
+        from langchain_core.messages import AIMessage
+
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency.sample())
+        if self.latency.roll(self.failure_rate):
+            raise SimulatedBackendError("429 Resource exhausted (simulated)")
+        return AIMessage(content=self.respond(prompt))
+
+
+class FakeBigQuery:
+    """Replaces the SQL agent's BigQueryWrapper with a fixed small result."""
+
+    def __init__(self, latency: LatencyModel, failure_rate: float = 0.0, rows: int = 10):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.rows = rows
+        self.cancelled_jobs = 0
+        self.client = self
+        self.available = True
+
+    def run_query(self, query: str, *args, **kwargs):
+        import pandas as pd
+        from app.core import cancellation
+        from app.core.admission import stage_slot
+
+        with stage_slot("bigquery"):
+            # Cancelling the request's scope ends the simulated job early, like client.cancel_job
+            cancelled = threading.Event()
+            scope = cancellation.current_scope()
+            unregister = scope.on_cancel(cancelled.set) if scope else (lambda: None)
+            try:
+                if cancelled.wait(self.latency.sample()):
+                    self.cancelled_jobs += 1
+                    raise cancellation.Cancelled(f"{scope.reason} (simulated job cancelled)")
+            finally:
+                unregister()
+            if self.latency.roll(self.failure_rate):
+                raise SimulatedBackendError("403 Quota exceeded: too many concurrent queries (simulated)")
+        return pd.DataFrame({
+            "transport_mode": [["air", "truck", "ocean+ferry", "ocean+rail"][i % 4] for i in range(self.rows)],
+            "total_shipments": [100 + i for i in range(self.rows)],
+            "damage_rate": [round(0.01 * (i % 7), 3) for i in range(self.rows)],
+        })
+
+
+class FakeBigQueryClient:
+    """
+    Replaces the google.cloud.bigquery client behind BigQueryWrapper, modelling both execution paths:
+    - query() creates a job: insert round trip plus job scheduling overhead, result() waits for execution,
+      to_dataframe() downloads the rows (one more round trip per page);
+    - query_and_wait() with optional job creation: one round trip plus execution, the first page of rows inline;
+      larger results get a job and page like the job path.
+    The latencies are model parameters, not measurements of BigQuery.
+    """
+
+    def __init__(self, rtt: LatencyModel, execution: LatencyModel, job_overhead: LatencyModel, rows: int = 10,
+                 page_rows: int = 10000, rows_for: Callable[[str], int] = None):
+        self.rtt = rtt
+        self.execution = execution
+        self.job_overhead = job_overhead
+        self.page_rows = page_rows
+        self.rows_for = rows_for or (lambda query: rows)
+        self.jobs_created = 0
+        self.inline_results = 0
+        self.job_configs = []
+        self._lock = threading.Lock()
+
+    def _frame(self, rows: int):
+        import pandas as pd
+        return pd.DataFrame({"transport_mode": ["air", "truck", "ocean+ferry", "ocean+rail"] * (rows // 4 + 1)})[:rows]
+
+    def _pages(self, rows: int) -> int:
+        return max(1, -(-rows // self.page_rows))
+
+    def query(self, query: str, job_config=None, **kwargs):
+        with self._lock:
+            self.jobs_created += 1
+            self.job_configs.append(job_config)
+        time.sleep(self.rtt.sample() + self.job_overhead.sample())
+        return _FakeJob(self, self.rows_for(query))
+
+    def query_and_wait(self, query: str, job_config=None, max_results=None, **kwargs):
+        rows = self.rows_for(query)
+        with self._lock:
+            self.job_configs.append(job_config)
+            if rows > self.page_rows:
+                self.jobs_created += 1
+            else:
+                self.inline_results += 1
+        time.sleep(self.rtt.sample() + self.execution.sample())
+        return _FakeRowIterator(self, rows, job_id="job_short" if rows > self.page_rows else None)
+
+    def cancel_job(self, job_id, location=None):
+        pass
+
+
+class _FakeRowIterator:
+    def __init__(self, client: FakeBigQueryClient, rows: int, job_id: Optional[str] = None):
+        self._client = client
+        self.total_rows = rows
+        self.job_id = job_id
+        self.total_bytes_processed = 1024 * rows
+        self.slot_millis = 10
+        self.cache_hit = False
+
+    def to_dataframe(self, **kwargs):
+        # The first page came with the response; the others cost a round trip each
+        for _ in range(self._client._pages(self.total_rows) - 1):
+            time.sleep(self._client.rtt.sample())
+        return self._client._frame(self.total_rows)
+
+
+class _FakeJob(_FakeRowIterator):
+    location = "asia-northeast3"
+    query_plan = []
+
+    def __init__(self, client: FakeBigQueryClient, rows: int):
+        super().__init__(client, rows, job_id="job_standard")
+
+    def result(self, timeout=None):
+        time.sleep(self._client.execution.sample() + self._client.rtt.sample())
+        return self
+
+    def to_dataframe(self, **kwargs):
+        for _ in range(self._client._pages(self.total_rows)):
+            time.sleep(self._client.rtt.sample())
+        return self._client._frame(self.total_rows)
+
+
+FAKE_SQL = (
+    "SELECT transport_mode, SUM(total_shipments) AS total_shipments, AVG(damage_rate) AS damage_rate\n"
+    "FROM `willog-prod-data-gold.rag.mart_quality_matrix`\nGROUP BY 1"
+)
+
+
+def _fake_route(payload: dict) -> str:
+    from app.agents.router import mock_router
+    return mock_router(payload.get("question", ""))
+
+
+STAGE_RESPONSES = {
+    "router": _fake_route,
+    "sql_generation": lambda payload: f"```sql\n{FAKE_SQL}\n```",
+    "synthesis": lambda payload: "운송 모드별 총 운송 건수와 파손율을 조회했습니다. (simulated)",
+    "retrieval": lambda payload: "[용어 정의] 요청하신 용어에 대한 설명입니다. (simulated)",
+    "general": lambda payload: "안녕하세요! Willog Intelligent Assistant입니다. (simulated)",
+}
+
+
+@contextlib.contextmanager
+def stub_backends(llm_latency: LatencyModel, bq_latency: LatencyModel, llm_failure_rate: float = 0.0,
+                  bq_failure_rate: float = 0.0, rows: int = 10):
+    """Swaps every LLM chain and the SQL agent's BigQuery wrapper in this process for fakes."""
+    from app.agents import sql_agent
+    from packages.bench.harness import stage_targets
+
+    originals = []
+    try:
+        for stage, owner, attr in stage_targets():
+            originals.append((owner, attr, getattr(owner, attr)))
+            setattr(owner, attr, FakeChain(STAGE_RESPONSES[stage], llm_latency, llm_failure_rate))
+        originals.append((sql_agent, "bq_client", sql_agent.bq_client))
+        sql_agent.bq_client = FakeBigQuery(bq_latency, bq_failure_rate, rows)
+        yield
+    finally:
+        for owner, attr, original in reversed(originals):
+            setattr(owner, attr, original)
@@ -0,0 +1,316 @@
+"""
+Record/replay benchmark harness for the full question pipeline (router -> agent -> BigQuery -> synthesis).
+
+In record mode the agents' chains and the SQL agent's BigQuery wrapper are called for real and every
+response is stored in a cassette. In replay mode the same stage objects answer from the cassette, so a
+question corpus can be run offline, concurrently and deterministically while per-stage latency, prompt
+tokens and SQL correctness are collected into a JSON report that can be diffed between commits.
+benchmarks/cassettes/smoke.json (recorded from packages.bench.fakes) replays benchmarks/smoke_corpus.json.
+"""
+import contextlib
+import contextvars
+import difflib
+import io
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from app.core.tokens import estimate_tokens
+from packages.bench.cassette import Cassette
+from packages.bench.stats import summarize
+
+STAGES = ["router", "sql_generation", "sql_execution", "synthesis", "retrieval", "general"]
+
+# Per-question timings; a ContextVar so stages run on speculation, branch and part threads (which copy the
+# caller's context) are credited to their question
+_run_state: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("bench_run_state", default=None)
+
+
+def _render_prompt(chain, payload) -> str:
+    first = getattr(chain, "first", None)  # RunnableSequence: prompt | llm | parser
+    if first is None or not isinstance(payload, dict):
+        return ""
+    try:
+        return first.invoke(payload).to_string()
+    except Exception:
+        return ""
+
+
+def _note(stage: str, elapsed: float, tokens: int = 0):
+    state = _run_state.get()
+    if state is None:
+        return
+    with state["lock"]:
+        state["stages"][stage] = state["stages"].get(stage, 0.0) + elapsed
+        if tokens:
+            state["prompt_tokens"][stage] = state["prompt_tokens"].get(stage, 0) + tokens
+
+
+class _ChainStage:
+    """Stands in for an agent chain: records or replays its responses and times the call."""
+
+    def __init__(self, stage: str, chain, cassette: Cassette, replay_latency: bool):
+        self.stage = stage
+        self.chain = chain
+        self.cassette = cassette
+        self.replay_latency = replay_latency
+
+    def invoke(self, payload, *args, **kwargs):
+        tokens = estimate_tokens(_render_prompt(self.chain, payload))
+        start = time.perf_counter()
+        if self.cassette.mode == "record":
+            response = self.chain.invoke(payload, *args, **kwargs)
+            self.cassette.record(self.stage, payload, response, time.perf_counter() - start)
+        else:
+            entry = self.cassette.lookup(self.stage, payload)
+            if self.replay_latency:
+                time.sleep(entry["latency_s"])
+            response = entry["response"]
+        _note(self.stage, time.perf_counter() - start, tokens)
+        return response
+
+
+class _QueryStage:
+    """Stands in for the SQL agent's BigQueryWrapper (run_query is recorded/replayed)."""
+
+    def __init__(self, wrapper, cassette: Cassette, replay_latency: bool):
+        self.wrapper = wrapper
+        self.cassette = cassette
+        self.replay_latency = replay_latency
+
+    @property
+    def available(self) -> bool:
+        return self.cassette.mode == "replay" or self.wrapper.available
+
+    def __getattr__(self, name):
+        return getattr(self.wrapper, name)
+
+    def run_query(self, query: str, *args, **kwargs):
+        start = time.perf_counter()
+        if self.cassette.mode == "record":
+            result = self.wrapper.run_query(query, *args, **kwargs)
+            self.cassette.record("sql_execution", query, result, time.perf_counter() - start)
+        else:
+            entry = self.cassette.lookup("sql_execution", query)
+            if self.replay_latency:
+                time.sleep(entry["latency_s"])
+            result = entry["response"]
+        _note("sql_execution", time.perf_counter() - start)
+        return result
+
+
+def stage_targets():
+    """(stage, owner object/module, attribute) for every chain the pipeline calls."""
+    from app.agents import general_agent, retrieval_agent, router, sql_agent
+    return [
+        ("router", router, "router_chain"),
+        ("sql_generation", sql_agent.agent, "chain"),
+        ("synthesis", sql_agent.agent, "synthesis_chain"),
+        ("retrieval", retrieval_agent.retrieval_agent, "chain"),
+        ("general", general_agent.general_agent, "chain"),
+    ]
+
+
+@contextlib.contextmanager
+def instrument_pipeline(cassette: Cassette, replay_latency: bool = False):
+    """Swaps the pipeline's chains and BigQuery wrapper for recording/replaying stand-ins."""
+    from app.agents import sql_agent
+
+    originals = []
+    try:
+        for stage, owner, attr in stage_targets():
+            chain = getattr(owner, attr)
+            originals.append((owner, attr, chain))
+            if chain is not None:
+                setattr(owner, attr, _ChainStage(stage, chain, cassette, replay_latency))
+        query_stage = _QueryStage(sql_agent.bq_client, cassette, replay_latency)
+        originals.append((sql_agent, "bq_client", sql_agent.bq_client))
+        sql_agent.bq_client = query_stage
+        yield query_stage
+    finally:
+        for owner, attr, original in reversed(originals):
+            setattr(owner, attr, original)
+
+
+# --- Correctness helpers ---
+
+def normalize_sql(sql: Optional[str]) -> str:
+    return " ".join((sql or "").split()).rstrip(";").strip().lower()
+
+
+def frames_match(actual, expected) -> bool:
+    """Result equality ignoring column names, row order and float noise."""
+    import pandas as pd
+
+    if actual is None or expected is None:
+        return actual is None and expected is None
+    if actual.shape != expected.shape:
+        return False
+
+    def canonical(df):
+        df = df.copy()
+        df.columns = range(df.shape[1])
+        order = df.astype(str).sort_values(list(df.columns)).index
+        return df.loc[order].reset_index(drop=True)
+
+    try:
+        pd.testing.assert_frame_equal(
+            canonical(actual), canonical(expected), check_dtype=False, check_exact=False, rtol=1e-6
+        )
+        return True
+    except AssertionError:
+        return False
+
+
+def _run_question(orchestrator, item: Dict[str, Any], query_stage) -> Dict[str, Any]:
+    state = {"stages": {}, "prompt_tokens": {}, "lock": threading.Lock()}
+    token = _run_state.set(state)
+    start = time.perf_counter()
+    result, error = {}, None
+    try:
+        result = orchestrator.run(item["question"], item.get("history") or [])
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        _run_state.reset(token)
+    elapsed = time.perf_counter() - start
+
+    record = {
+        "id": item.get("id"),
+        "question": item["question"],
+        "agent": result.get("agent"),
+        "latency_s": elapsed,
+        # Copies: a discarded speculation may still be finishing on its own thread
+        "stages": dict(state["stages"]),
+        "prompt_tokens": dict(state["prompt_tokens"]),
+        "sql": result.get("sql"),
+        "rows": len(result["data"]) if result.get("data") is not None else None,
+        "error": error,
+    }
+    if item.get("expected_agent"):
+        record["agent_match"] = record["agent"] == item["expected_agent"]
+    if item.get("expected_sql"):
+        record["sql_match"] = normalize_sql(record["sql"]) == normalize_sql(item["expected_sql"])
+        if not record["sql_match"]:
+            record["sql_diff"] = list(difflib.unified_diff(
+                (item["expected_sql"] or "").strip().splitlines(),
+                (record["sql"] or "").strip().splitlines(),
+                "expected", "generated", lineterm="",
+            ))
+        try:
+            expected_df = query_stage.run_query(item["expected_sql"])
+            record["result_match"] = frames_match(result.get("data"), expected_df)
+        except Exception as e:
+            record["result_match"] = False
+            record["result_error"] = f"{type(e).__name__}: {e}"
+    return record
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def run_corpus(
+    corpus: List[Dict[str, Any]],
+    cassette: Cassette,
+    concurrency: int = 4,
+    repeat: int = 1,
+    replay_latency: bool = False,
+    verbose: bool = False,
+) -> Dict[str, Any]:
+    """Runs every corpus question (repeat times) through the Orchestrator and returns the JSON report."""
+    from app.agents.orchestrator import Orchestrator
+
+    orchestrator = Orchestrator()
+    items = [item for _ in range(repeat) for item in corpus]
+    # Concurrent record runs would race on identical inputs; recording is done serially
+    workers = 1 if cassette.mode == "record" else concurrency
+
+    log = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    started = time.perf_counter()
+    with log, instrument_pipeline(cassette, replay_latency) as query_stage:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            records = list(pool.map(lambda item: _run_question(orchestrator, item, query_stage), items))
+    wall = time.perf_counter() - started
+    if cassette.mode == "record":
+        cassette.save()
+
+    stages = {}
+    tokens = {}
+    for stage in STAGES:
+        values = [r["stages"][stage] for r in records if stage in r["stages"]]
+        if values:
+            stages[stage] = summarize(values)
+        counts = [r["prompt_tokens"][stage] for r in records if stage in r["prompt_tokens"]]
+        if counts:
+            tokens[stage] = {"total": sum(counts), "mean": sum(counts) / len(counts)}
+
+    def ratio(key):
+        checked = [r[key] for r in records if key in r]
+        return {"checked": len(checked), "matched": sum(checked)} if checked else None
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "mode": cassette.mode,
+            "cassette": cassette.path,
+            "concurrency": workers,
+            "questions": len(items),
+            "replay_latency": replay_latency,
+        },
+        "summary": {
+            "wall_time_s": wall,
+            "throughput_qps": len(items) / wall if wall else 0.0,
+            "end_to_end": summarize(r["latency_s"] for r in records),
+            "stages": stages,
+            "prompt_tokens": tokens,
+            "errors": sum(1 for r in records if r["error"]),
+            "agent_match": ratio("agent_match"),
+            "sql_match": ratio("sql_match"),
+            "result_match": ratio("result_match"),
+        },
+        "questions": records,
+    }
+
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.10):
+    """
+    Returns (lines, regressed): a human-readable diff of two reports and whether any p50/p95 latency
+    or prompt-token total grew by more than `threshold`, or correctness dropped.
+    """
+    lines, regressed = [], False
+    base, cur = baseline["summary"], current["summary"]
+    lines.append(f"baseline {baseline['meta'].get('commit')} -> current {current['meta'].get('commit')}")
+
+    def delta(name, old, new):
+        nonlocal regressed
+        if old is None or new is None:
+            return
+        change = (new - old) / old if old else 0.0
+        flag = ""
+        if change > threshold:
+            flag, regressed = "  <-- regression", True
+        lines.append(f"  {name:<36} {old:>10.4f} -> {new:>10.4f} ({change:+.1%}){flag}")
+
+    for pct in ("p50", "p95"):
+        delta(f"end_to_end.{pct}", base["end_to_end"].get(pct), cur["end_to_end"].get(pct))
+    for stage in STAGES:
+        for pct in ("p50", "p95"):
+            delta(f"{stage}.{pct}", base["stages"].get(stage, {}).get(pct), cur["stages"].get(stage, {}).get(pct))
+    for stage in STAGES:
+        delta(f"prompt_tokens.{stage}", base["prompt_tokens"].get(stage, {}).get("total"),
+              cur["prompt_tokens"].get(stage, {}).get("total"))
+    for key in ("agent_match", "sql_match", "result_match"):
+        old, new = base.get(key), cur.get(key)
+        if old and new:
+            lines.append(f"  {key:<36} {old['matched']}/{old['checked']} -> {new['matched']}/{new['checked']}")
+            if new["matched"] / max(new["checked"], 1) < old["matched"] / max(old["checked"], 1):
+                regressed = True
+    return lines, regressed
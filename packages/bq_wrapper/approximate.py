@@ -0,0 +1,256 @@
+"""
+Approximate execution of exploratory aggregate queries, with confidence intervals.
+
+`plan(sql, ...)` rewrites an eligible query instead of running it over every partition:
+- "sample": a single-table aggregate (COUNT/COUNTIF/SUM/AVG and ratios of them, grouped or not) reads a
+  TABLESAMPLE SYSTEM sample of the table, also grouped into `replicates` disjoint sub-samples by a hash of
+  the shipment code. `combine()` turns the per-replicate rows back into one estimate per group (counts and
+  sums scaled up by the sampling rate) with a confidence interval from the spread between replicates
+  (columns `<name>_ci_low` / `<name>_ci_high`). Replicates split by shipment, so the interval accounts for
+  sensor logs of one shipment being correlated. It does not model that TABLESAMPLE SYSTEM reads whole storage
+  blocks: intervals of counts and sums come out too narrow (scripts/bench_approximate.py measures coverage),
+  ratios and averages much less so.
+- "sketch": COUNT(DISTINCT x), which a sample cannot estimate, becomes APPROX_COUNT_DISTINCT(x) (HyperLogLog++)
+  over the full data (same bytes, far less slot time and shuffle); no interval is reported.
+Anything else (joins, CTEs, window functions, LIMIT, HAVING, MIN/MAX, unnamed expressions, other tables)
+returns None and runs exactly.
+"""
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from packages.bq_wrapper.sql_lexer import referenced_tables, split_segments
+
+# Two-sided 95% Student t quantiles by degrees of freedom (replicates - 1); beyond the table, the normal quantile
+_T_95 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262, 10: 2.228,
+         11: 2.201, 12: 2.179, 13: 2.160, 14: 2.145, 15: 2.131, 19: 2.093, 24: 2.064, 29: 2.045}
+
+REPLICATE = "_replicate"
+
+_AGGREGATE_RE = re.compile(r"\b([A-Z_]+)\s*\(", re.IGNORECASE)
+_AGGREGATES = {"COUNT", "COUNTIF", "SUM", "AVG", "MIN", "MAX", "ANY_VALUE", "ARRAY_AGG", "STRING_AGG",
+               "STDDEV", "STDDEV_SAMP", "STDDEV_POP", "VARIANCE", "VAR_SAMP", "VAR_POP", "LOGICAL_OR",
+               "LOGICAL_AND", "APPROX_COUNT_DISTINCT", "APPROX_QUANTILES", "APPROX_TOP_COUNT", "CORR"}
+_ESTIMABLE = {"COUNT", "COUNTIF", "SUM", "AVG"}
+_ADDITIVE = {"COUNT", "COUNTIF", "SUM"}
+_INELIGIBLE_RE = re.compile(
+    r"\b(JOIN|WITH|UNION|OVER|HAVING|LIMIT|QUALIFY|TABLESAMPLE|SELECT\s+DISTINCT)\b", re.IGNORECASE
+)
+_COUNT_DISTINCT_RE = re.compile(r"\bCOUNT\s*\(\s*DISTINCT\b", re.IGNORECASE)
+_SAFE_DIVIDE_RE = re.compile(r"\bSAFE_DIVIDE\s*\(", re.IGNORECASE)
+_ALIAS_RE = re.compile(r"\s+AS\s+`?(\w+)`?\s*$", re.IGNORECASE)
+_COLUMN_RE = re.compile(r"^\s*(?:\w+\.)*`?(\w+)`?\s*$")
+_CLAUSE_RE = re.compile(r"\b(FROM|WHERE|GROUP\s+BY|ORDER\s+BY)\b", re.IGNORECASE)
+_TABLE_RE = re.compile(
+    r"\s*(`[^`]+`|[\w.\-]+)(\s+(?:AS\s+)?(?!WHERE\b|GROUP\b|ORDER\b|TABLESAMPLE\b)[A-Za-z_]\w*)?", re.IGNORECASE
+)
+
+
+def _mask(sql: str) -> str:
+    """The SQL with string literals blanked (same length), so keyword positions can be searched safely."""
+    return "".join(text if kind in ("code", "ident") else " " * len(text) for kind, text in split_segments(sql))
+
+
+def _without_comments(sql: str) -> str:
+    return "".join(" " if kind == "comment" else text for kind, text in split_segments(sql)).strip().rstrip(";")
+
+
+def _top_level(masked: str, pattern: re.Pattern, start: int = 0):
+    """Matches of pattern at parenthesis depth 0."""
+    depth, pos, matches = 0, start, []
+    for match in pattern.finditer(masked, start):
+        depth += masked.count("(", pos, match.start()) - masked.count(")", pos, match.start())
+        pos = match.start()
+        if depth == 0:
+            matches.append(match)
+    return matches
+
+
+def _split_select_list(sql: str, masked: str, start: int, end: int) -> List[str]:
+    items, depth, item_start = [], 0, start
+    for i in range(start, end):
+        if masked[i] == "(":
+            depth += 1
+        elif masked[i] == ")":
+            depth -= 1
+        elif masked[i] == "," and depth == 0:
+            items.append(sql[item_start:i].strip())
+            item_start = i + 1
+    items.append(sql[item_start:end].strip())
+    return items
+
+
+def _aggregates(masked: str) -> set:
+    return {name.upper() for name in _AGGREGATE_RE.findall(masked)} & _AGGREGATES
+
+
+def _closing(masked: str, open_index: int) -> int:
+    depth = 0
+    for i in range(open_index, len(masked)):
+        depth += {"(": 1, ")": -1}.get(masked[i], 0)
+        if depth == 0:
+            return i
+    return len(masked)
+
+
+def _divisions(masked: str) -> List[Tuple[str, str]]:
+    """(dividend, divisor) of every SAFE_DIVIDE and `/`: for `/`, the term before it and the factor after it."""
+    pairs = []
+    for match in _SAFE_DIVIDE_RE.finditer(masked):
+        arguments = _split_select_list(masked, masked, match.end(), _closing(masked, match.end() - 1))
+        if len(arguments) == 2:
+            pairs.append((arguments[0], arguments[1]))
+    for i in (i for i, char in enumerate(masked) if char == "/"):
+        depth, start = 0, i
+        while start > 0:
+            char = masked[start - 1]
+            if char == ")":
+                depth += 1
+            elif char == "(":
+                if depth == 0:
+                    break
+                depth -= 1
+            elif depth == 0 and char in "+-,":
+                break
+            start -= 1
+        depth, end = 0, i + 1
+        while end < len(masked):
+            char = masked[end]
+            if char == "(":
+                depth += 1
+            elif char == ")":
+                if depth == 0:
+                    break
+                depth -= 1
+            elif depth == 0 and char in "+-,*/" and masked[i + 1:end].strip():
+                break
+            end += 1
+        pairs.append((masked[start:i], masked[i + 1:end]))
+    return pairs
+
+
+def _classify(expression: str) -> Optional[str]:
+    """'group' (no aggregate), 'additive' (a count or sum, scales with the sample), 'ratio' (scale-free) or None."""
+    masked = _mask(expression)
+    functions = _aggregates(masked)
+    if not functions:
+        return "group"
+    if not functions <= _ESTIMABLE or _COUNT_DISTINCT_RE.search(masked):
+        return None
+    # Only an aggregate over an aggregate cancels the sampling rate; SUM(x) / 1000 or COUNT(*) / 7 still scales
+    if functions == {"AVG"} or any(_aggregates(a) and _aggregates(b) for a, b in _divisions(masked)):
+        return "ratio"
+    return "additive" if functions <= _ADDITIVE else None
+
+
+def _sketch(sql: str, masked: str) -> str:
+    parts, pos = [], 0
+    for match in _COUNT_DISTINCT_RE.finditer(masked):
+        parts.append(sql[pos:match.start()] + "APPROX_COUNT_DISTINCT(")
+        pos = match.end()
+    return "".join(parts) + sql[pos:]
+
+
+def plan(sql: str, tables: List[str], sample_percent: float = 10.0, replicates: int = 10,
+         key_column: str = "code") -> Optional[Dict[str, Any]]:
+    """The approximate rewrite of sql (see the module docstring), or None if it must run exactly."""
+    sql = _without_comments(sql)
+    masked = _mask(sql)
+    referenced = referenced_tables(sql)
+    if len(referenced) != 1 or not referenced <= {t.lower() for t in tables}:
+        return None
+    if len(re.findall(r"\bSELECT\b", masked, re.IGNORECASE)) != 1:
+        return None
+
+    if _COUNT_DISTINCT_RE.search(masked):
+        return {"method": "sketch", "sql": _sketch(sql, masked), "table": referenced.pop()}
+
+    if _INELIGIBLE_RE.search(masked):
+        return None
+    clauses = {re.sub(r"\s+", " ", m.group(1).upper()): m for m in _top_level(masked, _CLAUSE_RE)}
+    select = re.search(r"\bSELECT\b", masked, re.IGNORECASE)
+    if "FROM" not in clauses or select.end() > clauses["FROM"].start():
+        return None
+
+    columns = []
+    for item in _split_select_list(sql, masked, select.end(), clauses["FROM"].start()):
+        alias = _ALIAS_RE.search(_mask(item)) or _COLUMN_RE.match(item)
+        kind = _classify(item[:alias.start()] if alias and alias.re is _ALIAS_RE else item)
+        if not alias or kind is None:
+            return None
+        columns.append({"name": alias.group(1), "kind": kind})
+    if not any(column["kind"] != "group" for column in columns):
+        return None
+
+    # FROM <table> [alias] TABLESAMPLE ..., plus the replicate column and grouping (combine() sorts by the groups)
+    table = _TABLE_RE.match(sql, clauses["FROM"].end())
+    end = clauses["ORDER BY"].start() if "ORDER BY" in clauses else len(sql)
+    replicate = f"ABS(MOD(FARM_FINGERPRINT(CAST({key_column} AS STRING)), {int(replicates)}))"
+    rewritten = (
+        sql[:clauses["FROM"].start()].rstrip() + f", {replicate} AS {REPLICATE}\n"
+        + sql[clauses["FROM"].start():table.end()] + f" TABLESAMPLE SYSTEM ({sample_percent:g} PERCENT)"
+        + sql[table.end():end].rstrip()
+        + (f", {REPLICATE}" if "GROUP BY" in clauses else f"\nGROUP BY {REPLICATE}")
+    )
+    return {
+        "method": "sample",
+        "sql": rewritten,
+        "table": referenced.pop(),
+        "sample_percent": sample_percent,
+        "replicates": int(replicates),
+        "columns": columns,
+    }
+
+
+def _t_quantile(df: int) -> float:
+    if df <= 0:
+        return float("nan")
+    known = [k for k in _T_95 if k <= df]
+    return _T_95[max(known)] if df <= max(_T_95) else 1.96
+
+
+def combine(df: pd.DataFrame, approx_plan: Dict[str, Any]) -> pd.DataFrame:
+    """One row per group with the estimates and their 95% intervals, from the per-replicate rows of a sample plan."""
+    if approx_plan.get("method") != "sample" or df is None:
+        return df
+    replicates = approx_plan["replicates"]
+    scale = 100.0 / approx_plan["sample_percent"]
+    groups = [c["name"] for c in approx_plan["columns"] if c["kind"] == "group"]
+    estimated = [c for c in approx_plan["columns"] if c["kind"] != "group"]
+
+    rows = []
+    for key, group in (df.groupby(groups, dropna=False, sort=True) if groups else [((), df)]):
+        key = key if isinstance(key, tuple) else (key,)
+        row = dict(zip(groups, key))
+        for column in estimated:
+            values = pd.to_numeric(group[column["name"]], errors="coerce")
+            if column["kind"] == "additive":
+                # A replicate without rows for this group contributed zero
+                values = values.fillna(0).tolist() + [0.0] * (replicates - len(values))
+                values = pd.Series(values) * replicates * scale
+            else:
+                values = values.dropna()
+            n = len(values)
+            estimate = values.mean() if n else float("nan")
+            half_width = _t_quantile(n - 1) * values.std(ddof=1) / n ** 0.5 if n > 1 else float("nan")
+            row[column["name"]] = estimate
+            row[f"{column['name']}_ci_low"] = estimate - half_width
+            row[f"{column['name']}_ci_high"] = estimate + half_width
+        rows.append(row)
+
+    order = []
+    for column in approx_plan["columns"]:
+        order.append(column["name"])
+        if column["kind"] != "group":
+            order += [f"{column['name']}_ci_low", f"{column['name']}_ci_high"]
+    return pd.DataFrame(rows, columns=order)
+
+
+def describe(approx_plan: Dict[str, Any]) -> str:
+    """The note appended to an approximate answer."""
+    if approx_plan["method"] == "sketch":
+        return ("ℹ️ 근사 결과: 고유 건수는 APPROX_COUNT_DISTINCT(HyperLogLog++)로 추정한 값입니다. "
+                "정확한 값이 필요하면 근사 조회를 끄고 다시 요청해 주세요.")
+    return (f"ℹ️ 근사 결과: {approx_plan['table']}의 약 {approx_plan['sample_percent']:g}% 표본으로 추정한 값이며, "
+            f"`*_ci_low` ~ `*_ci_high` 열이 95% 신뢰구간입니다. 정확한 값이 필요하면 근사 조회를 끄고 다시 요청해 주세요.")
@@ -1,21 +1,229 @@
+import concurrent.futures
+import contextlib
+import contextvars
+import hashlib
+import re
+import threading
+from typing import Dict, Optional
 
-from google.cloud import bigquery
 from app.core.config import settings
+from app.core import cancellation, metrics
+from app.core.admission import stage_slot
+from packages.bq_wrapper.local_engine import LocalEngine
+from packages.bq_wrapper.sql_lexer import referenced_tables
+
+# BigQuery label values: lowercase letters, digits, underscores and dashes
+_LABEL_RE = re.compile(r"[^a-z0-9_-]")
+
+_bytes_limit: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("max_bytes_billed", default=None)
+
+
+@contextlib.contextmanager
+def max_bytes_billed(limit: Optional[int]):
+    """
+    Cost guard for the BigQuery jobs started in this context (e.g. by background warmers): a job that would
+    bill more than `limit` bytes fails without being charged. Tighter than BQ_MAX_BYTES_BILLED, never looser.
+    """
+    token = _bytes_limit.set(limit)
+    try:
+        yield
+    finally:
+        _bytes_limit.reset(token)
+
+
+def _job_bytes_limit() -> Optional[int]:
+    limits = [limit for limit in (_bytes_limit.get(), settings.BQ_MAX_BYTES_BILLED) if limit]
+    return min(limits) if limits else None
+
 
 class BigQueryWrapper:
 
     def __init__(self):
-        try:
-            self.client = bigquery.Client(project=settings.PROJECT_ID, location=settings.BQ_LOCATION)
-        except Exception as e:
-            print(f"Warning: BigQuery client could not be initialized (Missing Creds?): {e}")
-            self.client = None
+        # The google.cloud.bigquery client (and its credential lookup) is created on first use, see `client`
+        self._client = None
+        self._client_initialized = False
+        self._client_lock = threading.Lock()
         self.dataset_id = f"{settings.PROJECT_ID}.{settings.DATASET_ID}"
 
+        self.local_engine = None
+        if settings.LOCAL_ENGINE_ENABLED:
+            self.local_engine = LocalEngine(
+                settings.LOCAL_SNAPSHOT_DIR,
+                tables=settings.LOCAL_SNAPSHOT_TABLES,
+                max_age_hours=settings.LOCAL_SNAPSHOT_MAX_AGE_HOURS,
+            )
+            if not self.local_engine.enabled:
+                print("Warning: duckdb is not installed; local mart snapshots are disabled.")
+                self.local_engine = None
+
+    @property
+    def client(self):
+        if not self._client_initialized:
+            with self._client_lock:
+                if not self._client_initialized:
+                    from google.api_core import exceptions as api_exceptions
+                    from google.auth import exceptions as auth_exceptions
+                    from google.cloud import bigquery
+                    try:
+                        # Optional job creation applies to query_and_wait (the short-query path) only
+                        self._client = bigquery.Client(
+                            project=settings.PROJECT_ID, location=settings.BQ_LOCATION,
+                            default_job_creation_mode=(
+                                None if settings.BQ_QUERY_MODE == "standard" else "JOB_CREATION_OPTIONAL"
+                            ),
+                        )
+                    # Missing credentials or an unreachable metadata server only: a library too old for these
+                    # arguments (TypeError) must fail loudly instead of silently disabling BigQuery
+                    except (auth_exceptions.GoogleAuthError, api_exceptions.GoogleAPIError, OSError) as e:
+                        print(f"Warning: BigQuery client could not be initialized (Missing Creds?): {e}")
+                        self._client = None
+                    self._client_initialized = True
+        return self._client
+
+    @property
+    def available(self) -> bool:
+        """True if queries can be answered by BigQuery or, offline, by local snapshots."""
+        return self.client is not None or bool(self.local_engine and self.local_engine.tables())
+
     def run_query(self, query: str):
-        if not self.client:
+        # Small/rollup marts are served from local Parquet snapshots when possible.
+        # Without BigQuery (offline dev/tests) stale snapshots are still better than nothing.
+        if self.local_engine and self.local_engine.can_run(query, allow_stale=self.client is None):
+            try:
+                df = self.local_engine.run_query(query)
+                metrics.record_query("local", rows=len(df))
+                return df
+            except Exception as e:
+                if not self.client:
+                    raise
+                print(f"Warning: Local engine failed, falling back to BigQuery: {e}")
+
+        client = self.client
+        if not client:
             raise RuntimeError("BigQuery client is not initialized.")
-        query_job = self.client.query(query)
-        return query_job.to_dataframe()
+        with stage_slot("bigquery"):
+            cancellation.check_cancelled()
+            # The job itself gets the request's remaining time, so BigQuery stops it even if we can't
+            timeout_s = cancellation.remaining(settings.BQ_JOB_TIMEOUT_S)
+            from google.cloud import bigquery
+            job_config = bigquery.QueryJobConfig(
+                job_timeout_ms=max(1, int(timeout_s * 1000)),
+                use_query_cache=settings.BQ_USE_QUERY_CACHE,
+                labels=_job_labels(),
+            )
+            if _job_bytes_limit():
+                job_config.maximum_bytes_billed = _job_bytes_limit()
+            if _short_query_eligible(query):
+                df = self._run_short(client, query, job_config, timeout_s)
+                if df is not None:
+                    return df
+            return self._run_job(client, query, job_config, cancellation.remaining(settings.BQ_JOB_TIMEOUT_S))
+
+    def _run_short(self, client, query: str, job_config, timeout_s: float):
+        """
+        Runs the query through jobs.query with optional job creation (see `client`): BigQuery answers small
+        queries inline without creating a job, saving the job insert, polling and result download round trips.
+        Returns None when the result is too large for this path (the caller re-runs it as a standard job).
+        """
+        try:
+            rows = client.query_and_wait(
+                query, job_config=job_config, wait_timeout=timeout_s, api_timeout=timeout_s,
+                max_results=settings.BQ_SHORT_QUERY_MAX_ROWS,
+            )
+            if rows.total_rows is not None and rows.total_rows > settings.BQ_SHORT_QUERY_MAX_ROWS:
+                print(f"Warning: {rows.total_rows} rows is too large for the short-query path, running a standard job")
+                metrics.BQ_SHORT_QUERY_FALLBACKS.inc()
+                return None
+            df = rows.to_dataframe(create_bqstorage_client=False)
+        except Exception as e:
+            # Without a job id there is nothing to cancel: the call is bounded by the request's remaining time
+            if cancellation.is_cancelled():
+                raise cancellation.Cancelled(cancellation.current_scope().reason) from e
+            raise
+        metrics.record_query(
+            "bigquery_short",
+            job_id=rows.job_id,
+            bytes_processed=rows.total_bytes_processed,
+            slot_ms=rows.slot_millis,
+            cache_hit=getattr(rows, "cache_hit", None),
+            rows=len(df),
+        )
+        return df
+
+    def _run_job(self, client, query: str, job_config, timeout_s: float):
+        query_job = client.query(query, job_config=job_config)
+        # Cancelling the request (deadline, client disconnect, DELETE /api/jobs/{id}) also cancels the job
+        unregister = _cancel_on_scope(client, query_job)
+        try:
+            query_job.result(timeout=timeout_s)
+            df = query_job.to_dataframe(timeout=cancellation.remaining(settings.BQ_JOB_TIMEOUT_S))
+        except Exception as e:
+            if cancellation.is_cancelled():
+                raise cancellation.Cancelled(cancellation.current_scope().reason) from e
+            if isinstance(e, concurrent.futures.TimeoutError):
+                _cancel_job(client, query_job, "job timeout")
+            raise
+        finally:
+            unregister()
+        metrics.record_query(
+            "bigquery",
+            job_id=query_job.job_id,
+            bytes_processed=query_job.total_bytes_processed,
+            slot_ms=query_job.slot_millis,
+            cache_hit=query_job.cache_hit,
+            rows=len(df),
+            plan=_plan_summary(query_job),
+        )
+        return df
+
+def _short_query_eligible(query: str) -> bool:
+    mode = settings.BQ_QUERY_MODE
+    if mode == "short":
+        return True
+    if mode == "auto":
+        tables = referenced_tables(query)
+        return bool(tables) and tables <= {t.lower() for t in settings.BQ_SHORT_QUERY_TABLES}
+    return False
+
+def _job_labels() -> Dict[str, str]:
+    """Job labels for cost attribution: the agent and a hash of the question of the request being served."""
+    labels = {"app": "willog-assistant"}
+    trace = metrics.current_trace()
+    if trace is not None:
+        if trace.agent:
+            labels["agent"] = _LABEL_RE.sub("_", trace.agent.lower())[:63]
+        labels["question_hash"] = hashlib.sha256(trace.question.encode("utf-8")).hexdigest()[:16]
+    return labels
+
+def _cancel_job(client, query_job, reason):
+    try:
+        client.cancel_job(query_job.job_id, location=query_job.location)
+        metrics.BQ_CANCELLED.inc()
+        print(f"Cancelled BigQuery job {query_job.job_id} ({reason})")
+    except Exception as e:
+        print(f"Warning: Could not cancel BigQuery job {query_job.job_id}: {e}")
+
+def _cancel_on_scope(client, query_job):
+    scope = cancellation.current_scope()
+    if scope is None:
+        return lambda: None
+    return scope.on_cancel(lambda: _cancel_job(client, query_job, scope.reason))
+
+def _plan_summary(query_job):
+    """Compact per-stage view of the job's query plan (kept only on the request trace / slow log)."""
+    try:
+        return [
+            {
+                "name": step.name,
+                "records_read": step.records_read,
+                "records_written": step.records_written,
+                "shuffle_output_bytes": step.shuffle_output_bytes,
+                "compute_ms_max": step.compute_ms_max,
+                "wait_ms_max": step.wait_ms_max,
+            }
+            for step in query_job.query_plan
+        ]
+    except Exception:
+        return None
 
 bq_client = BigQueryWrapper()
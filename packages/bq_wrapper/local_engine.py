@@ -0,0 +1,277 @@
+import json
+import os
+import re
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+
+try:
+    import duckdb
+except ImportError:  # Optional dependency: without it every query goes to BigQuery
+    duckdb = None
+
+from packages.bq_wrapper.sql_lexer import code_only, referenced_tables, split_segments
+
+MANIFEST_FILE = "_manifest.json"
+
+# BigQuery constructs whose DuckDB equivalent differs semantically (or does not exist).
+# Queries containing them are never run locally, even if translation would succeed.
+UNSUPPORTED_PATTERNS = [
+    r"\bAPPROX_QUANTILES\s*\(",
+    r"\bAPPROX_TOP_COUNT\s*\(",
+    r"\bUNNEST\s*\(",
+    r"\bSTRUCT\s*[(<]",
+    r"\bARRAY_AGG\s*\(",
+    r"\bST_\w+\s*\(",
+    r"\bSAFE\.",
+    r"\bDAYOFWEEK\b",
+    r"\bWEEK\s*\(",
+    r"\bFORMAT_TIMESTAMP\s*\(",
+    r"\bPARSE_(DATE|TIMESTAMP|DATETIME)\s*\(",
+    r"\bFOR\s+SYSTEM_TIME\b",
+    r"\bINFORMATION_SCHEMA\b",
+]
+_UNSUPPORTED_RE = re.compile("|".join(UNSUPPORTED_PATTERNS), re.IGNORECASE)
+
+# CREATE TABLE <name> [PARTITION BY ...] [CLUSTER BY ...] AS -> the options are dropped locally
+_DDL_OPTIONS_RE = re.compile(
+    r"^(\s*CREATE\s+(?:OR\s+REPLACE\s+)?TABLE\s+\S+)(.*?)(\bAS\b)",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+# --- Lexing helpers ---
+
+def _split_args(text: str) -> List[str]:
+    """Splits a function argument list on top-level commas."""
+    args, depth, current = [], 0, []
+    for kind, seg in split_segments(text):
+        if kind != "code":
+            current.append(seg)
+            continue
+        for ch in seg:
+            if ch == "(":
+                depth += 1
+            elif ch == ")":
+                depth -= 1
+            if ch == "," and depth == 0:
+                args.append("".join(current).strip())
+                current = []
+            else:
+                current.append(ch)
+    args.append("".join(current).strip())
+    return args
+
+
+# --- Function rewrites (BigQuery -> DuckDB) ---
+
+def _date_part(arg: str) -> str:
+    return "'" + arg.strip().lower() + "'"
+
+
+def _trunc(value: str, part: str) -> str:
+    """BigQuery *_TRUNC: WEEK starts on Sunday there (DuckDB's 'week' on Monday, as BigQuery's ISOWEEK)."""
+    part = part.strip().upper()
+    if part == "WEEK":
+        return f"(DATE_TRUNC('week', ({value}) + INTERVAL 1 DAY) - INTERVAL 1 DAY)"
+    return f"DATE_TRUNC({_date_part('WEEK' if part == 'ISOWEEK' else part)}, {value})"
+
+
+_FUNCTION_REWRITES = {
+    "SAFE_DIVIDE": lambda a: f"(({a[0]}) / NULLIF(({a[1]}), 0))",
+    "COUNTIF": lambda a: f"COUNT_IF({a[0]})",
+    "DATE_TRUNC": lambda a: f"CAST({_trunc(a[0], a[1])} AS DATE)",
+    "DATETIME_TRUNC": lambda a: _trunc(a[0], a[1]),
+    "TIMESTAMP_TRUNC": lambda a: _trunc(a[0], a[1]),
+    "DATE_SUB": lambda a: f"CAST(({a[0]}) - {a[1]} AS DATE)",
+    "DATE_ADD": lambda a: f"CAST(({a[0]}) + {a[1]} AS DATE)",
+    "TIMESTAMP_SUB": lambda a: f"(({a[0]}) - {a[1]})",
+    "TIMESTAMP_ADD": lambda a: f"(({a[0]}) + {a[1]})",
+    "DATE_DIFF": lambda a: f"DATE_DIFF({_date_part(a[2])}, {a[1]}, {a[0]})",
+    "TIMESTAMP_DIFF": lambda a: f"DATE_DIFF({_date_part(a[2])}, {a[1]}, {a[0]})",
+    "FORMAT_DATE": lambda a: f"STRFTIME({a[1]}, {a[0]})",
+    "LOGICAL_OR": lambda a: f"BOOL_OR({a[0]})",
+    "LOGICAL_AND": lambda a: f"BOOL_AND({a[0]})",
+    "REGEXP_CONTAINS": lambda a: f"REGEXP_MATCHES({a[0]}, {a[1]})",
+    # Different hash values: only good for bucketing (e.g. the replicates of packages/bq_wrapper/approximate.py)
+    "FARM_FINGERPRINT": lambda a: f"CAST(HASH({a[0]}) >> 1 AS BIGINT)",
+    "CURRENT_TIMESTAMP": lambda a: "CURRENT_TIMESTAMP",
+    "CURRENT_DATETIME": lambda a: "CAST(CURRENT_TIMESTAMP AS TIMESTAMP)",
+}
+_FUNCTION_RE = re.compile(r"\b(" + "|".join(_FUNCTION_REWRITES) + r")\s*\(", re.IGNORECASE)
+
+
+def _find_closing_paren(sql: str, open_idx: int) -> int:
+    depth = 0
+    for pos, ch in _iter_code_chars(sql, open_idx):
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+            if depth == 0:
+                return pos
+    raise ValueError("Unbalanced parentheses in SQL")
+
+
+def _iter_code_chars(sql: str, start: int):
+    """Yields (index, char) for characters outside string literals, starting at `start`."""
+    offset = 0
+    for kind, seg in split_segments(sql):
+        seg_end = offset + len(seg)
+        if seg_end > start and kind == "code":
+            for k in range(max(start - offset, 0), len(seg)):
+                yield offset + k, seg[k]
+        offset = seg_end
+
+
+def _rewrite_functions(sql: str) -> str:
+    pos = 0
+    while True:
+        match = _FUNCTION_RE.search(sql, pos)
+        if not match:
+            return sql
+        # Skip matches that fall inside string literals / comments
+        if _in_literal(sql, match.start()):
+            pos = match.end()
+            continue
+        open_idx = match.end() - 1
+        close_idx = _find_closing_paren(sql, open_idx)
+        inner = _rewrite_functions(sql[open_idx + 1:close_idx])
+        args = _split_args(inner) if inner.strip() else []
+        replacement = _FUNCTION_REWRITES[match.group(1).upper()](args)
+        sql = sql[:match.start()] + replacement + sql[close_idx + 1:]
+        pos = match.start() + len(replacement)
+
+
+def _in_literal(sql: str, idx: int) -> bool:
+    offset = 0
+    for kind, seg in split_segments(sql):
+        if offset <= idx < offset + len(seg):
+            return kind != "code"
+        offset += len(seg)
+    return False
+
+
+def translate_bigquery_sql(sql: str) -> str:
+    """
+    Translates a BigQuery Standard SQL statement into DuckDB SQL.
+    - Fully qualified table names (`project.dataset.table`) become bare local view names.
+    - Double-quoted string literals become single-quoted; backtick identifiers become double-quoted.
+    - Dialect functions (SAFE_DIVIDE, COUNTIF, DATE_TRUNC, DATE_SUB, ...) are rewritten.
+    - DDL-only clauses (PARTITION BY / CLUSTER BY on CREATE TABLE) are dropped.
+    """
+    parts = []
+    for kind, text in split_segments(sql.strip().rstrip(";")):
+        if kind == "ident":
+            name = text.strip("`")
+            parts.append(name.split(".")[-1] if "." in name else f'"{name}"')
+        elif kind == "string" and text.startswith('"'):
+            body = text[1:-1].replace('\\"', '"').replace("'", "''")
+            parts.append(f"'{body}'")
+        elif kind == "comment":
+            parts.append(" ")
+        else:
+            parts.append(text)
+    translated = "".join(parts)
+    translated = _DDL_OPTIONS_RE.sub(r"\1 \3", translated, count=1)
+    return _rewrite_functions(translated)
+
+
+def write_manifest(snapshot_dir: str, row_counts: Dict[str, int], source: str = "bigquery"):
+    """Records which snapshots exist, when they were exported and where they came from."""
+    manifest = {
+        "exported_at": datetime.now(timezone.utc).isoformat(),
+        "source": source,
+        "tables": {name: {"rows": int(rows)} for name, rows in row_counts.items()},
+    }
+    tmp_path = os.path.join(snapshot_dir, MANIFEST_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(snapshot_dir, MANIFEST_FILE))
+
+
+class LocalEngine:
+    """
+    Embedded DuckDB engine over Parquet snapshots of the marts (written by scripts/sync_data.py).
+    Queries touching only snapshotted tables run locally; anything else is left to BigQuery.
+    """
+
+    def __init__(self, snapshot_dir: str, tables: Optional[List[str]] = None, max_age_hours: float = 24):
+        self.snapshot_dir = snapshot_dir
+        self.allowed_tables = {t.lower() for t in tables} if tables else None
+        self.max_age_hours = max_age_hours
+        self._lock = threading.Lock()
+        self._conn = None
+        self._manifest_mtime = None
+        self._manifest = {}
+
+    @property
+    def enabled(self) -> bool:
+        return duckdb is not None
+
+    def _refresh(self):
+        """(Re)opens the DuckDB views whenever the snapshot manifest changes on disk."""
+        manifest_path = os.path.join(self.snapshot_dir, MANIFEST_FILE)
+        try:
+            mtime = os.path.getmtime(manifest_path)
+        except OSError:
+            self._conn, self._manifest, self._manifest_mtime = None, {}, None
+            return
+        if mtime == self._manifest_mtime:
+            return
+        with self._lock:
+            if mtime == self._manifest_mtime:
+                return
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            conn = duckdb.connect(database=":memory:")
+            for name in manifest.get("tables", {}):
+                path = os.path.join(self.snapshot_dir, name)
+                source = f"{path}/**/*.parquet" if os.path.isdir(path) else f"{path}.parquet"
+                conn.execute(
+                    f"CREATE VIEW {name} AS SELECT * FROM read_parquet('{source}', hive_partitioning = true)"
+                )
+            self._conn, self._manifest, self._manifest_mtime = conn, manifest, mtime
+
+    def tables(self) -> Set[str]:
+        if not self.enabled:
+            return set()
+        self._refresh()
+        names = set(self._manifest.get("tables", {}))
+        if self.allowed_tables is not None:
+            names &= self.allowed_tables
+        return names
+
+    def snapshot_age_hours(self) -> Optional[float]:
+        exported_at = self._manifest.get("exported_at")
+        if not exported_at:
+            return None
+        delta = datetime.now(timezone.utc) - datetime.fromisoformat(exported_at)
+        return delta.total_seconds() / 3600
+
+    def can_run(self, sql: str, allow_stale: bool = False) -> bool:
+        """True if every referenced table has a (fresh enough) snapshot and no unsupported construct is used."""
+        available = self.tables()
+        if not available:
+            return False
+        if not allow_stale and self.max_age_hours:
+            age = self.snapshot_age_hours()
+            if age is None or age > self.max_age_hours:
+                return False
+        if _UNSUPPORTED_RE.search(code_only(sql)):
+            return False
+        needed = referenced_tables(sql)
+        return bool(needed) and needed <= available
+
+    def run_query(self, sql: str):
+        """Translates and runs a BigQuery-dialect query, returning a pandas DataFrame."""
+        self._refresh()
+        if self._conn is None:
+            raise RuntimeError(f"No local snapshots found in {self.snapshot_dir}")
+        translated = translate_bigquery_sql(sql)
+        # A cursor is an independent connection to the same database, safe to use per thread
+        cursor = self._conn.cursor()
+        try:
+            return cursor.execute(translated).df()
+        finally:
+            cursor.close()
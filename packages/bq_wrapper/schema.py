@@ -1,54 +1,434 @@
+"""
+Schema catalog of the marts, served to SQL prompt building and SQL validation.
 
-from typing import Dict, List
-
-# Define the schema for the tables as we expect them to exist in BigQuery
-# consistent with the PDF requirements.
-
-TABLE_SCHEMAS: Dict[str, str] = {
-    "view_transport_stats": """
-    CREATE TABLE view_transport_stats (
-        date DATE,
-        destination STRING,
-        product STRING,
-        transport_mode STRING,
-        transport_path STRING,
-        total_volume INT64,
-        transport_count INT64,
-        issue_count INT64
-    );
-    -- Description: Contains daily transport volume and issue counts aggregated by destination, product, and mode.
-    """,
-    "view_issue_stats": """
-    CREATE TABLE view_issue_stats (
-        transport_mode STRING,
-        package_type STRING,
-        destination STRING,
-        path_segment STRING,
-        deviation_rate_5g FLOAT64,
-        deviation_rate_10g FLOAT64,
-        cumulative_shock FLOAT64,
-        shock_count INT64
-    );
-    -- Description: Aggregated statistics on transport issues, including deviation rates (shocks > 5G/10G) and shock counts.
-    """,
-    "view_sensor_stats": """
-    CREATE TABLE view_sensor_stats (
-        date DATE,
-        transport_mode STRING,
-        destination STRING,
-        avg_temp FLOAT64,
-        min_temp FLOAT64,
-        max_temp FLOAT64,
-        avg_humidity FLOAT64,
-        shock_alert_count INT64
-    );
-    -- Description: Summary of sensor data (temperature, humidity) and shock alerts for transport conditions.
-    """
+The catalog holds every table's columns and types, row count, partition range and the distinct values
+of the low-cardinality columns listed in SCHEMA_ENUM_COLUMNS (transport_mode, risk_level, ...). It is
+loaded from BigQuery metadata (`__TABLES__`, INFORMATION_SCHEMA.COLUMNS / PARTITIONS) plus one small
+ARRAY_AGG query per table, and kept in SCHEMA_CATALOG_PATH so every process and restart reuses it.
+
+Requests never wait for BigQuery: `snapshot()` returns the catalog in memory (or on disk, or the
+built-in description below), and once it is older than SCHEMA_CATALOG_TTL_S a background refresh
+compares the tables' last-modified times (a free metadata query) and reloads only if a mart was rebuilt.
+"""
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from packages.bq_wrapper.sql_lexer import CTE_RE, split_segments
+
+FORMAT_VERSION = 1
+
+# Descriptions for the prompt (titles, purposes, column notes) and the schema used until the first load
+TABLES: Dict[str, Dict[str, Any]] = {
+    "mart_logistics_master": {
+        "title": "Fact Table",
+        "purpose": "Master transport stats, volume, damage rates, RISK LEVELS, FATIGUE.",
+        "partition_column": "departure_date",
+        "columns": [
+            ("code", "STRING", "Shipment ID"),
+            ("departure_date", "DATE", "Partition Key - use for time filtering (e.g., \"이번 달\", \"최근 1주일\")"),
+            ("arrival_date", "DATE", "Arrival Date (CRITICAL for \"운송 건수\" / active shipments queries)"),
+            ("pol", "STRING", "Port of loading code"),
+            ("destination", "STRING", "Port code (e.g., 'CNSHG')"),
+            ("product", "STRING", None),
+            ("transport_mode", "STRING", "Raw data is lowercase. 'ocean' often appears in composites."),
+            ("package_type", "STRING", "Packaging type"),
+            ("receive_name", "STRING", "Transport Route Name (Mapped from 'receiver_name'). e.g. 'Customer A'. Use for \"운송경로\"."),
+            ("category_filter", "STRING", None),
+            ("cumulative_shock_index", "FLOAT64", "\"Fatigue\" or \"Cumulative Stress\" score"),
+            ("max_shock_g", "FLOAT64", None),
+            ("avg_shock_g", "FLOAT64", None),
+            ("temp_excursion_duration_min", "INT64", "Minutes outside valid temp range"),
+            ("is_damaged", "BOOL", "Damage flag"),
+            ("risk_level", "STRING", None),
+        ],
+    },
+    "mart_sensor_detail": {
+        "title": "Big Data / Granular",
+        "purpose": "Dynamic Threshold Queries (e.g. \"Shock > 7G\"), Multi-variable Correlation, Directional Analysis.",
+        "partition_column": "event_date",
+        "columns": [
+            ("event_date", "DATE", "Partition Key - use for time filtering"),
+            ("event_timestamp", "TIMESTAMP", None),
+            ("code", "STRING", "Shipment ID (Join Key)"),
+            ("destination", "STRING", "Destination port code."),
+            ("destination_country", "STRING", None),
+            ("transport_mode", "STRING", "Copied from master."),
+            ("receive_name", "STRING", "Copied from master."),
+            ("temperature", "FLOAT64", None),
+            ("humidity", "FLOAT64", None),
+            ("shock_g", "FLOAT64", None),
+            ("acc_resultant", "FLOAT64", None),
+            ("acc_x", "FLOAT64", "Directional acceleration"),
+            ("acc_y", "FLOAT64", "Directional acceleration"),
+            ("acc_z", "FLOAT64", "Directional acceleration"),
+            ("tilt_x", "FLOAT64", "Tilt angle"),
+            ("tilt_y", "FLOAT64", "Tilt angle"),
+            ("lat", "FLOAT64", "Geolocation"),
+            ("lon", "FLOAT64", "Geolocation"),
+            ("status", "STRING", None),
+            ("location_fin_corrected", "STRING", "Transport Segment / Corrected Location Name. Use for \"운송구간\"."),
+        ],
+    },
+    "mart_risk_heatmap": {
+        "title": "Geospatial",
+        "purpose": "\"Heatmap\", \"Risk Map\", \"Where do shocks occur?\".",
+        "partition_column": None,
+        "columns": [
+            ("lat_center", "FLOAT64", None),
+            ("lon_center", "FLOAT64", None),
+            ("location_label", "STRING", None),
+            ("total_logs", "INT64", None),
+            ("avg_shock_intensity", "FLOAT64", None),
+            ("max_shock_intensity", "FLOAT64", None),
+            ("high_impact_events", "INT64", None),
+            ("risk_score", "FLOAT64", None),
+        ],
+    },
+    "mart_quality_matrix": {
+        "title": "Benchmarking",
+        "purpose": "Compare Performance (A vs B), Benchmarking Packaging/Routes.",
+        "partition_column": None,
+        "columns": [
+            ("transport_mode", "STRING", None),
+            ("package_type", "STRING", None),
+            ("route", "STRING", "'<pol>-<destination>'"),
+            ("total_shipments", "INT64", None),
+            ("damage_rate", "FLOAT64", None),
+            ("avg_fatigue_score", "FLOAT64", None),
+            ("safety_score", "FLOAT64", None),
+        ],
+    },
+}
+
+BUILTIN_VALUES = {
+    "transport_mode": ["air", "ocean+ferry", "ocean+rail", "truck"],
+    "risk_level": ["Low", "Medium", "High", "Critical"],
+    "destination_country": ["China", "Japan", "Vietnam", "Korea", "USA", "Other"],
+    "status": ["Static", "Moving"],
 }
 
-def get_table_info() -> str:
-    """Returns the formatted schema information for the LLM."""
-    info = ""
-    for table_name, schema in TABLE_SCHEMAS.items():
-        info += f"Table: {table_name}\n{schema}\n\n"
-    return info
+_ALIAS_RE = re.compile(r"\b(?:FROM|JOIN)\s+([A-Za-z_][\w.\-]*)(?:\s+(?:AS\s+)?([A-Za-z_]\w*))?", re.IGNORECASE)
+_QUALIFIED_RE = re.compile(r"\b([A-Za-z_]\w*)\.([A-Za-z_]\w*)\b")
+_COMPARISON_RE = re.compile(r"(?:\b([A-Za-z_]\w*)\.)?\b([A-Za-z_]\w*)\s*(?:=|!=|<>)\s*$|"
+                            r"(?:\b([A-Za-z_]\w*)\.)?\b([A-Za-z_]\w*)\s+(?:NOT\s+)?IN\s*\([^()]*$", re.IGNORECASE)
+_NOT_ALIASES = {
+    "where", "on", "join", "left", "right", "inner", "outer", "full", "cross", "group", "order", "limit",
+    "having", "union", "using", "window", "qualify", "tablesample", "for", "unnest", "select", "with",
+}
+
+
+def builtin_catalog() -> Dict[str, Any]:
+    """The catalog as described in code, used until one has been loaded from BigQuery."""
+    tables = {}
+    for name, table in TABLES.items():
+        enum_columns = settings.SCHEMA_ENUM_COLUMNS.get(name, [])
+        tables[name] = {
+            "rows": None,
+            "modified": None,
+            "partition_column": table["partition_column"],
+            "partitions": None,
+            "columns": {
+                column: {"type": dtype, "values": BUILTIN_VALUES.get(column) if column in enum_columns else None}
+                for column, dtype, _ in table["columns"]
+            },
+        }
+    return {"version": FORMAT_VERSION, "source": "builtin", "loaded": None, "checked": None, "tables": tables}
+
+
+def _partition_date(partition_id: Optional[str]) -> Optional[str]:
+    if partition_id and len(partition_id) == 8 and partition_id.isdigit():
+        return f"{partition_id[:4]}-{partition_id[4:6]}-{partition_id[6:]}"
+    return partition_id
+
+
+def _quote(value: str) -> str:
+    return "'" + str(value).replace("'", "\\'") + "'"
+
+
+class SchemaCatalog:
+
+    def __init__(self, path: Optional[str], dataset_id: str, tables: List[str], ttl_s: float = 3600,
+                 run_query: Optional[Callable[[str], Any]] = None, available: Optional[Callable[[], bool]] = None):
+        self.path = path
+        self.dataset_id = dataset_id
+        self.tables = tables
+        self.ttl_s = ttl_s
+        self._run_query = run_query
+        self._available = available
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._catalog: Optional[Dict[str, Any]] = None
+        self._prompt: Optional[Tuple[Any, str]] = None
+
+    # --- Backend (BigQuery metadata by default) ---
+
+    def _query(self, sql: str):
+        if self._run_query is not None:
+            return self._run_query(sql)
+        from packages.bq_wrapper.client import bq_client
+        return bq_client.run_query(sql)
+
+    def _backend_available(self) -> bool:
+        if self._available is not None:
+            return self._available()
+        from packages.bq_wrapper.client import bq_client
+        return bq_client.client is not None
+
+    def _in_list(self) -> str:
+        return ", ".join(_quote(t) for t in self.tables)
+
+    def _table_versions(self) -> Dict[str, Dict[str, Any]]:
+        """Row count and last-modified time of every table (metadata only, nothing billed)."""
+        df = self._query(
+            f"SELECT table_id, row_count, last_modified_time FROM `{self.dataset_id}.__TABLES__` "
+            f"WHERE table_id IN ({self._in_list()})"
+        )
+        return {
+            row.table_id: {"rows": int(row.row_count), "modified": int(row.last_modified_time)}
+            for row in df.itertuples(index=False)
+        }
+
+    def _load(self, versions: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        from packages.bq_wrapper.client import max_bytes_billed
+
+        tables: Dict[str, Dict[str, Any]] = {
+            name: {**versions[name], "partition_column": None, "partitions": None, "columns": {}}
+            for name in self.tables if name in versions
+        }
+        columns = self._query(
+            f"SELECT table_name, column_name, data_type, is_partitioning_column "
+            f"FROM `{self.dataset_id}.INFORMATION_SCHEMA.COLUMNS` WHERE table_name IN ({self._in_list()}) "
+            f"ORDER BY table_name, ordinal_position"
+        )
+        for row in columns.itertuples(index=False):
+            if row.table_name not in tables:
+                continue
+            tables[row.table_name]["columns"][row.column_name] = {"type": row.data_type, "values": None}
+            if row.is_partitioning_column == "YES":
+                tables[row.table_name]["partition_column"] = row.column_name
+
+        partitions = self._query(
+            f"SELECT table_name, MIN(partition_id) AS first_partition, MAX(partition_id) AS last_partition "
+            f"FROM `{self.dataset_id}.INFORMATION_SCHEMA.PARTITIONS` WHERE table_name IN ({self._in_list()}) "
+            f"AND partition_id NOT IN ('__NULL__', '__UNPARTITIONED__') GROUP BY 1"
+        )
+        for row in partitions.itertuples(index=False):
+            if row.table_name in tables:
+                tables[row.table_name]["partitions"] = [_partition_date(row.first_partition),
+                                                        _partition_date(row.last_partition)]
+
+        # Distinct values of the low-cardinality columns, from recent partitions only, within the cost guard
+        limit = settings.SCHEMA_ENUM_MAX_VALUES
+        for name, table in tables.items():
+            enum_columns = [c for c in settings.SCHEMA_ENUM_COLUMNS.get(name, []) if c in table["columns"]]
+            if not enum_columns:
+                continue
+            where = ""
+            if table["partition_column"] and table["partitions"]:
+                where = (f" WHERE {table['partition_column']} >= DATE_SUB(DATE '{table['partitions'][1]}', "
+                         f"INTERVAL {settings.SCHEMA_STATS_RECENT_DAYS} DAY)")
+            select = ", ".join(
+                f"ARRAY_AGG(DISTINCT CAST({c} AS STRING) IGNORE NULLS LIMIT {limit + 1}) AS {c}" for c in enum_columns
+            )
+            try:
+                with max_bytes_billed(settings.SCHEMA_STATS_MAX_BYTES):
+                    row = self._query(f"SELECT {select} FROM `{self.dataset_id}.{name}`{where}").iloc[0]
+            except Exception as e:
+                print(f"Warning: Could not load column values of {name}: {e}")
+                continue
+            for column in enum_columns:
+                values = sorted(str(v) for v in row[column])
+                # More than `limit` values: not a low-cardinality column after all
+                table["columns"][column]["values"] = values if len(values) <= limit else None
+
+        now = time.time()
+        return {"version": FORMAT_VERSION, "source": "bigquery", "loaded": now, "checked": now, "tables": tables}
+
+    # --- Cache ---
+
+    def _read(self) -> Optional[Dict[str, Any]]:
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                catalog = json.load(f)
+            return catalog if catalog.get("version") == FORMAT_VERSION else None
+        except Exception as e:
+            print(f"Warning: Could not read schema catalog {self.path}: {e}")
+            return None
+
+    def _write(self, catalog: Dict[str, Any]):
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(catalog, f, ensure_ascii=False)
+            os.replace(self.path + ".tmp", self.path)
+        except Exception as e:
+            print(f"Warning: Could not write schema catalog {self.path}: {e}")
+
+    def refresh(self, force: bool = False) -> Dict[str, Any]:
+        """
+        Re-checks the tables' versions and reloads the catalog if a table changed (or `force`).
+        Talks to BigQuery; requests use `snapshot()`, which never does.
+        """
+        current = self._catalog or self._read()
+        versions = self._table_versions()
+        unchanged = (
+            current is not None and current.get("source") == "bigquery" and set(versions) == set(current["tables"])
+            and all(current["tables"][name].get("modified") == v["modified"] for name, v in versions.items())
+        )
+        if unchanged and not force:
+            catalog = {**current, "checked": time.time()}
+        else:
+            catalog = self._load(versions)
+        with self._lock:
+            self._catalog = catalog
+        self._write(catalog)
+        return catalog
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                if self._backend_available():
+                    self.refresh()
+            except Exception as e:
+                print(f"Warning: Schema catalog refresh failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, name="schema-catalog-refresh", daemon=True).start()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """The current catalog, without waiting on BigQuery (a stale one triggers a background refresh)."""
+        catalog = self._catalog
+        if catalog is None:
+            catalog = self._read() or builtin_catalog()
+            with self._lock:
+                self._catalog = self._catalog or catalog
+                catalog = self._catalog
+        checked = catalog.get("checked")
+        if checked is None or time.time() - checked > self.ttl_s:
+            self._refresh_in_background()
+        return catalog
+
+    # --- Consumers ---
+
+    def prompt_text(self) -> str:
+        """The "Available tables" section of the SQL prompt (rendered once per catalog)."""
+        catalog = self.snapshot()
+        if self._prompt is not None and self._prompt[0] is catalog:
+            return self._prompt[1]
+        text = render_tables(catalog, self.dataset_id)
+        self._prompt = (catalog, text)
+        return text
+
+    def validate(self, sql: str) -> List[str]:
+        """
+        Problems the catalog can prove before the query runs: unknown tables, unknown `alias.column`
+        references, and comparisons with values a low-cardinality column does not contain.
+        """
+        tables = self.snapshot()["tables"]
+        # Same length as `sql`: literals and comments blanked, backticks dropped
+        code = "".join(text if kind == "code" else f" {text[1:-1]} " if kind == "ident" else " " * len(text)
+                       for kind, text in split_segments(sql))
+        ctes = {name.lower() for name in CTE_RE.findall(code)}
+        problems = []
+
+        aliases: Dict[str, Optional[str]] = {}
+        for reference, alias in _ALIAS_RE.findall(code):
+            name = reference.split(".")[-1]
+            if name.lower() in ctes or reference.lower().startswith("unnest"):
+                continue
+            if name not in tables:
+                if "." in reference and reference.split(".")[-2] == self.dataset_id.split(".")[-1]:
+                    problems.append(f"Unknown table `{reference}` (tables: {', '.join(sorted(tables))})")
+                aliases[name] = None
+                if alias and alias.lower() not in _NOT_ALIASES:
+                    aliases[alias] = None
+                continue
+            aliases[name] = name
+            if alias and alias.lower() not in _NOT_ALIASES:
+                aliases[alias] = name
+
+        for qualifier, column in _QUALIFIED_RE.findall(code):
+            table = aliases.get(qualifier)
+            if table and column not in tables[table]["columns"]:
+                problems.append(f"Column `{column}` does not exist in {table} (referenced as {qualifier}.{column})")
+
+        referenced = {t for t in aliases.values() if t}
+        position = 0
+        for kind, text in split_segments(sql):
+            if kind == "string":
+                match = _COMPARISON_RE.search(code[max(0, position - 200):position])
+                if match:
+                    qualifier, column = (match.group(1), match.group(2)) if match.group(2) else (match.group(3), match.group(4))
+                    candidates = [aliases.get(qualifier)] if qualifier else referenced
+                    known = [tables[t]["columns"].get(column, {}).get("values") for t in candidates if t]
+                    known = [values for values in known if values]
+                    value = text[1:-1]
+                    if known and all(value not in values for values in known):
+                        problem = f"{column} has no value {_quote(value)} (values: {', '.join(map(_quote, known[0]))})"
+                        if problem not in problems:
+                            problems.append(problem)
+            position += len(text)
+        return list(dict.fromkeys(problems))
+
+
+def render_tables(catalog: Dict[str, Any], dataset_id: str) -> str:
+    lines = []
+    for number, (name, table) in enumerate(catalog["tables"].items(), start=1):
+        described = TABLES.get(name, {})
+        notes = {column: note for column, _, note in described.get("columns", [])}
+        title = f" ({described['title']})" if described.get("title") else ""
+        lines.append(f"{number}. `{dataset_id}.{name}`{title}")
+        if described.get("purpose"):
+            lines.append(f"   - Purpose: {described['purpose']}")
+        facts = []
+        if table.get("rows") is not None:
+            facts.append(f"{table['rows']:,} rows")
+        if table.get("partition_column") and table.get("partitions"):
+            first, last = table["partitions"]
+            facts.append(f"data from {first} to {last} ({table['partition_column']})")
+        if facts:
+            lines.append(f"   - Size: {', '.join(facts)}")
+        described_columns, others = [], []
+        for column, info in table["columns"].items():
+            note = notes.get(column)
+            values = info.get("values")
+            if values:
+                listed = ", ".join(_quote(v) for v in values)
+                note = f"{listed}{' (' + note + ')' if note else ''}"
+            if note:
+                described_columns.append(f"     - {column} ({info['type']}): {note}")
+            else:
+                others.append(f"{column} ({info['type']})")
+        if not described_columns:
+            lines.append(f"   - Columns: {', '.join(others)}")
+        else:
+            lines.append("   - Columns:")
+            lines.extend(described_columns)
+            if others:
+                lines.append(f"     - Other columns: {', '.join(others)}")
+        lines.append("")
+    return "\n".join(lines).rstrip()
+
+
+schema_catalog = SchemaCatalog(
+    settings.SCHEMA_CATALOG_PATH,
+    f"{settings.PROJECT_ID}.{settings.DATASET_ID}",
+    settings.SCHEMA_TABLES,
+    ttl_s=settings.SCHEMA_CATALOG_TTL_S,
+)
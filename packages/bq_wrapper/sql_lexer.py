@@ -0,0 +1,76 @@
+"""
+Lexing helpers for BigQuery Standard SQL, shared by the local engine's translation, the schema catalog's
+validation and the approximate-query rewrite: splitting a statement into code, string literals,
+backtick identifiers and comments, and finding the tables it reads.
+"""
+import re
+from typing import Set
+
+TABLE_REF_RE = re.compile(r"\b(?:FROM|JOIN)\s+([A-Za-z_][\w.\-]*)", re.IGNORECASE)
+CTE_RE = re.compile(r"(?:\bWITH|,)\s*([A-Za-z_]\w*)\s+AS\s*\(", re.IGNORECASE)
+
+
+def split_segments(sql: str):
+    """
+    Splits SQL into (kind, text) segments where kind is 'code', 'string', 'ident' or 'comment'.
+    BigQuery strings may use single or double quotes; identifiers use backticks.
+    """
+    segments = []
+    i, n, start = 0, len(sql), 0
+    while i < n:
+        ch = sql[i]
+        if ch in ("'", '"', "`"):
+            if start < i:
+                segments.append(("code", sql[start:i]))
+            j = i + 1
+            while j < n and sql[j] != ch:
+                j += 2 if sql[j] == "\\" else 1
+            kind = "ident" if ch == "`" else "string"
+            segments.append((kind, sql[i:j + 1]))
+            i = start = j + 1
+        elif sql.startswith("--", i) or ch == "#":
+            if start < i:
+                segments.append(("code", sql[start:i]))
+            j = sql.find("\n", i)
+            j = n if j == -1 else j
+            segments.append(("comment", sql[i:j]))
+            i = start = j
+        elif sql.startswith("/*", i):
+            if start < i:
+                segments.append(("code", sql[start:i]))
+            j = sql.find("*/", i + 2)
+            j = n if j == -1 else j + 2
+            segments.append(("comment", sql[i:j]))
+            i = start = j
+        else:
+            i += 1
+    if start < n:
+        segments.append(("code", sql[start:]))
+    return segments
+
+
+def code_only(sql: str) -> str:
+    """Returns the SQL with string literals blanked and comments removed (for pattern checks)."""
+    parts = []
+    for kind, text in split_segments(sql):
+        if kind == "code":
+            parts.append(text)
+        elif kind == "ident":
+            parts.append(text.strip("`"))
+        elif kind == "string":
+            parts.append("''")
+        else:
+            parts.append(" ")
+    return "".join(parts)
+
+
+def referenced_tables(sql: str) -> Set[str]:
+    """Returns the bare names of tables referenced in FROM/JOIN clauses (CTE names excluded)."""
+    code = code_only(sql)
+    ctes = {m.group(1).lower() for m in CTE_RE.finditer(code)}
+    tables = set()
+    for match in TABLE_REF_RE.finditer(code):
+        name = match.group(1).split(".")[-1].lower()
+        if name not in ctes:
+            tables.add(name)
+    return tables
@@ -0,0 +1,276 @@
+"""
+Seeded synthetic data shaped like the raw BigQuery tables consumed by scripts/sync_data.py:
+`corning_transport` (one row per shipment), `corning_merged` (10-minute sensor logs) and
+`view_category`. Data is produced chunk by chunk so memory stays bounded at any scale.
+"""
+import os
+import shutil
+from datetime import datetime
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+LOG_INTERVAL_MIN = 10
+
+# Port code -> (label, lat, lon)
+PORTS = {
+    "KRPUS": ("Busan", 35.10, 129.04),
+    "KRICN": ("Incheon", 37.46, 126.60),
+    "CNSHG": ("Shanghai", 31.23, 121.47),
+    "CNNBG": ("Ningbo", 29.87, 121.55),
+    "CNRZH": ("Rizhao", 35.38, 119.53),
+    "CNLYG": ("Lianyungang", 34.74, 119.45),
+    "JPOSA": ("Osaka", 34.65, 135.43),
+    "VNSGN": ("Ho Chi Minh", 10.77, 106.70),
+    "VNHPH": ("Haiphong", 20.86, 106.68),
+    "USLAX": ("Los Angeles", 33.74, -118.26),
+}
+
+# pol, pod, intermediate waypoints (lat, lon, label), allowed transport modes, relative weight
+ROUTES = [
+    ("KRPUS", "CNSHG", [(33.5, 125.5, "Yellow Sea")], ["ocean+ferry", "ocean+rail"], 0.22),
+    ("KRICN", "CNSHG", [(34.5, 124.0, "Yellow Sea")], ["air"], 0.06),
+    ("KRPUS", "CNNBG", [(32.0, 125.0, "East China Sea")], ["ocean+ferry"], 0.08),
+    ("KRPUS", "CNRZH", [(35.5, 123.0, "Yellow Sea")], ["ocean+ferry", "ocean+rail"], 0.07),
+    ("KRPUS", "CNLYG", [(35.0, 123.5, "Yellow Sea")], ["ocean+ferry"], 0.06),
+    ("KRPUS", "JPOSA", [(34.2, 131.0, "Korea Strait"), (33.9, 133.5, "Seto Inland Sea")], ["ocean+ferry", "truck"], 0.16),
+    ("KRPUS", "VNSGN", [(22.0, 118.0, "South China Sea"), (13.0, 110.5, "South China Sea")], ["ocean+ferry"], 0.14),
+    ("KRPUS", "VNHPH", [(24.0, 119.0, "Taiwan Strait"), (20.5, 108.5, "Gulf of Tonkin")], ["ocean+ferry"], 0.09),
+    ("KRICN", "VNSGN", [(20.0, 115.0, "South China Sea")], ["air"], 0.04),
+    ("KRPUS", "USLAX", [(40.0, 160.0, "North Pacific"), (38.0, -150.0, "North Pacific")], ["ocean+rail"], 0.08),
+]
+
+# Transit time range in days per transport mode, and probability that a log carries a shock event
+MODE_PROFILES = {
+    "air": {"days": (1, 2), "shock_p": 0.010},
+    "truck": {"days": (1, 3), "shock_p": 0.015},
+    "ocean+ferry": {"days": (3, 9), "shock_p": 0.006},
+    "ocean+rail": {"days": (5, 14), "shock_p": 0.008},
+}
+
+PRODUCTS = ["Display Glass Substrate", "Cover Glass", "Optical Fiber", "Pharma Glass Vial", "Ceramic Substrate"]
+PACKAGES = {"Wooden Crate": 0.4, "Steel Rack": 0.3, "Pallet": 0.8, "Cardboard Box": 1.5}  # damage fragility
+RECEIVERS = [f"Customer {c}" for c in "ABCDEFGH"]
+CATEGORIES = ["Fragile", "General", "Temperature Sensitive"]
+SEGMENTS = ["출발지 내륙운송", "출발항 대기", "본선 운송", "도착항 대기", "도착지 내륙운송"]
+SEGMENT_BOUNDS = np.array([0.05, 0.12, 0.88, 0.95])  # progress fractions separating SEGMENTS
+
+
+def expected_logs_per_shipment() -> float:
+    """Mean number of sensor logs per shipment implied by the route/mode mix (for sizing runs)."""
+    total = 0.0
+    weights = np.array([r[4] for r in ROUTES])
+    weights = weights / weights.sum()
+    for (_, _, _, modes, _), w in zip(ROUTES, weights):
+        for mode in modes:
+            lo, hi = MODE_PROFILES[mode]["days"]
+            total += w / len(modes) * (lo + hi) / 2 * 24 * 60 / LOG_INTERVAL_MIN
+    return total
+
+
+def _route_polylines():
+    """Per route: array of (lat, lon) points and the label of each point."""
+    polylines = []
+    for pol, pod, waypoints, _, _ in ROUTES:
+        points = [(PORTS[pol][1], PORTS[pol][2], PORTS[pol][0])] + waypoints + [(PORTS[pod][1], PORTS[pod][2], PORTS[pod][0])]
+        coords = np.array([(lat, lon) for lat, lon, _ in points])
+        # Unwrap the antimeridian so interpolation follows the Pacific rather than crossing Eurasia
+        coords[:, 1] = np.degrees(np.unwrap(np.radians(coords[:, 1])))
+        polylines.append((coords, [label for _, _, label in points]))
+    return polylines
+
+
+def _interpolate(coords: np.ndarray, frac: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Positions along a polyline at the given progress fractions; also returns the nearest point index."""
+    seg_count = len(coords) - 1
+    pos = frac * seg_count
+    seg = np.minimum(pos.astype(np.int64), seg_count - 1)
+    t = pos - seg
+    lat = coords[seg, 0] + (coords[seg + 1, 0] - coords[seg, 0]) * t
+    lon = coords[seg, 1] + (coords[seg + 1, 1] - coords[seg, 1]) * t
+    nearest = np.where(t < 0.5, seg, seg + 1)
+    return lat, (lon + 180) % 360 - 180, nearest
+
+
+def _month(ts: np.ndarray) -> np.ndarray:
+    return np.datetime_as_string(ts.astype("datetime64[M]"), unit="M")
+
+
+def _generate_chunk(
+    rng: np.random.Generator,
+    code_offset: int,
+    count: int,
+    start_ts: np.datetime64,
+    end_ts: np.datetime64,
+    polylines,
+) -> Tuple[pa.Table, pa.Table, pa.Table]:
+    weights = np.array([r[4] for r in ROUTES])
+    route_idx = rng.choice(len(ROUTES), size=count, p=weights / weights.sum())
+    modes = np.array([rng.choice(ROUTES[r][3]) for r in route_idx])
+    pol = np.array([ROUTES[r][0] for r in route_idx])
+    pod = np.array([ROUTES[r][1] for r in route_idx])
+
+    span_min = int((end_ts - start_ts) / np.timedelta64(1, "m"))
+    departure = start_ts + rng.integers(0, span_min, size=count).astype("timedelta64[m]")
+    lo_days = np.array([MODE_PROFILES[m]["days"][0] for m in modes])
+    hi_days = np.array([MODE_PROFILES[m]["days"][1] for m in modes])
+    transit_min = (rng.uniform(lo_days, hi_days) * 24 * 60).astype(np.int64)
+    arrival = departure + transit_min.astype("timedelta64[m]")
+
+    # Logs stop at the end of the window; shipments still moving have no arrival yet
+    observed_min = np.minimum(transit_min, ((end_ts - departure) / np.timedelta64(1, "m")).astype(np.int64))
+    n_logs = np.maximum(observed_min // LOG_INTERVAL_MIN, 1)
+    in_transit = arrival > end_ts
+
+    # --- Sensor logs (vectorized over every log row of the chunk) ---
+    owner = np.repeat(np.arange(count), n_logs)
+    starts = np.concatenate(([0], np.cumsum(n_logs)[:-1]))
+    step = np.arange(len(owner)) - np.repeat(starts, n_logs)
+    total_steps = np.maximum(transit_min // LOG_INTERVAL_MIN, 1)
+    frac = np.clip(step / total_steps[owner], 0, 1)
+    device_dt = departure[owner] + (step * LOG_INTERVAL_MIN).astype("timedelta64[m]")
+
+    lat = np.empty(len(owner))
+    lon = np.empty(len(owner))
+    location = np.empty(len(owner), dtype=object)
+    route_of_log = route_idx[owner]
+    for r, (coords, labels) in enumerate(polylines):
+        mask = route_of_log == r
+        if mask.any():
+            lat[mask], lon[mask], nearest = _interpolate(coords, frac[mask])
+            location[mask] = np.array(labels, dtype=object)[nearest]
+    lat += rng.normal(0, 0.02, len(owner))
+    lon += rng.normal(0, 0.02, len(owner))
+    segment_idx = np.searchsorted(SEGMENT_BOUNDS, frac)
+    segment = np.array(SEGMENTS, dtype=object)[segment_idx]
+
+    # Temperature: seasonal + diurnal cycle, with rare excursion episodes per shipment
+    day_of_year = (device_dt.astype("datetime64[D]") - device_dt.astype("datetime64[Y]")).astype(np.int64)
+    hour = (device_dt.astype("datetime64[h]") - device_dt.astype("datetime64[D]")).astype(np.int64)
+    season = 12 * np.cos(2 * np.pi * (day_of_year - 200) / 365)
+    south = np.isin(pod, ["VNSGN", "VNHPH"])[owner]
+    temperature = 14 + season + 10 * south + 3 * np.sin(2 * np.pi * (hour - 9) / 24) + rng.normal(0, 1.5, len(owner))
+    excursion = rng.random(count) < 0.08
+    excursion_center = rng.random(count)
+    near_episode = excursion[owner] & (np.abs(frac - excursion_center[owner]) < 0.05)
+    temperature += np.where(near_episode, np.sign(temperature - 12) * rng.uniform(8, 15, len(owner)), 0)
+    humidity = np.clip(55 + 20 * south + rng.normal(0, 10, len(owner)), 5, 100)
+
+    # Shock: background vibration plus events that cluster at handling segments (ports, loading)
+    shock_p = np.array([MODE_PROFILES[m]["shock_p"] for m in modes])[owner]
+    handling = (segment_idx == 1) | (segment_idx == 3)
+    event = rng.random(len(owner)) < shock_p * np.where(handling, 4.0, 1.0)
+    shock_high = np.abs(rng.normal(0.3, 0.25, len(owner)))
+    shock_high += np.where(event, rng.lognormal(1.3, 0.5, len(owner)), 0)
+
+    static = handling & (rng.random(len(owner)) < 0.7)
+    acc = np.where(static, np.abs(rng.normal(0.05, 0.04, len(owner))), np.abs(rng.normal(0.45, 0.2, len(owner))))
+    acc = np.maximum(acc, shock_high * 0.3)
+    direction = rng.normal(0, 1, (len(owner), 3))
+    direction /= np.linalg.norm(direction, axis=1, keepdims=True)
+    tilt_x = rng.normal(0, 3, len(owner)) + np.where(rng.random(len(owner)) < 0.002, rng.normal(0, 50, len(owner)), 0)
+    tilt_y = rng.normal(0, 3, len(owner)) + np.where(rng.random(len(owner)) < 0.002, rng.normal(0, 50, len(owner)), 0)
+
+    # --- Shipment facts; damage probability grows with the worst shock and package fragility ---
+    max_shock = np.maximum.reduceat(shock_high, starts)
+    package = rng.choice(list(PACKAGES), size=count)
+    fragility = np.array([PACKAGES[p] for p in package])
+    damage_p = np.clip(0.002 * fragility * np.exp(max_shock / 4), 0, 0.9)
+    is_damaged = rng.random(count) < damage_p
+
+    codes = np.array([f"WLG{code_offset + i:09d}" for i in range(count)], dtype=object)
+    arrival_col = pa.array(arrival.astype("datetime64[us]"), mask=in_transit)
+
+    transport = pa.table({
+        "code": codes,
+        "pol": pol,
+        "pod": pod,
+        "product_name": rng.choice(PRODUCTS, size=count),
+        "package": package,
+        "shipmode": modes,
+        "receiver_name": rng.choice(RECEIVERS, size=count),
+        "departure_time": departure.astype("datetime64[us]"),
+        "arrival_time": arrival_col,
+        "is_damaged": is_damaged,
+        "month": _month(departure),
+    })
+    category = pa.table({
+        "code": codes,
+        "filter": rng.choice(CATEGORIES, size=count),
+        "month": _month(departure),
+    })
+    merged = pa.table({
+        "code": codes[owner],
+        "pod": pod[owner],
+        "device_datetime": device_dt.astype("datetime64[us]"),
+        "temperature": np.round(temperature, 2),
+        "humidity": np.round(humidity, 1),
+        "shock_high": np.round(shock_high, 3),
+        "acc": np.round(acc, 3),
+        "accx": np.round(acc * direction[:, 0], 3),
+        "accy": np.round(acc * direction[:, 1], 3),
+        "accz": np.round(acc * direction[:, 2], 3),
+        "tiltx": np.round(tilt_x, 2),
+        "tilty": np.round(tilt_y, 2),
+        "lat": np.round(lat, 5),
+        "lon": np.round(lon, 5),
+        "location": location,
+        "location_fin_corrected": segment,
+        "month": _month(device_dt),
+    })
+    return transport, merged, category
+
+
+def iter_chunks(
+    shipments: int,
+    seed: int = 42,
+    start: str = "2025-10-01",
+    end: str = "2026-01-01",
+    chunk_shipments: int = 2000,
+) -> Iterator[Tuple[pa.Table, pa.Table, pa.Table]]:
+    """
+    Yields (corning_transport, corning_merged, view_category) Arrow tables chunk by chunk.
+    Each chunk is seeded from (seed, chunk index), so output is reproducible for a given chunk size.
+    """
+    start_ts = np.datetime64(start, "m")
+    end_ts = np.datetime64(end, "m")
+    polylines = _route_polylines()
+    for chunk_idx, offset in enumerate(range(0, shipments, chunk_shipments)):
+        rng = np.random.default_rng([seed, chunk_idx])
+        count = min(chunk_shipments, shipments - offset)
+        yield _generate_chunk(rng, offset, count, start_ts, end_ts, polylines)
+
+
+def generate(
+    out_dir: str,
+    shipments: int,
+    seed: int = 42,
+    start: str = "2025-10-01",
+    end: str = "2026-01-01",
+    chunk_shipments: int = 2000,
+    progress: Optional[Callable] = None,
+) -> Dict[str, int]:
+    """
+    Writes the raw tables under `out_dir/<table>/month=YYYY-MM/part-*.parquet`.
+    Only one chunk is held in memory at a time. Returns row counts per table.
+    """
+    row_counts = {"corning_transport": 0, "corning_merged": 0, "view_category": 0}
+    for name in row_counts:
+        shutil.rmtree(os.path.join(out_dir, name), ignore_errors=True)
+    started = datetime.now()
+    chunks = iter_chunks(shipments, seed, start, end, chunk_shipments)
+    for chunk_idx, (transport, merged, category) in enumerate(chunks):
+        for name, table in (("corning_transport", transport), ("corning_merged", merged), ("view_category", category)):
+            pq.write_to_dataset(
+                table,
+                root_path=os.path.join(out_dir, name),
+                partition_cols=["month"],
+                basename_template=f"part-{chunk_idx:06d}-{{i}}.parquet",
+                compression="zstd",
+            )
+            row_counts[name] += table.num_rows
+        if progress:
+            progress(chunk_idx, row_counts, (datetime.now() - started).total_seconds())
+    return row_counts
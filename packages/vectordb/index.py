@@ -0,0 +1,273 @@
+"""
+Local retrieval index for the glossary / SOP corpus.
+
+BM25 over Korean-aware terms: Hangul (and Han) runs are split into character bigrams, so "일탈률은" and
+"일탈률" share terms without a morphological analyzer; Latin words and numbers are kept whole ("5g",
+"high"). Optionally, embeddings computed offline are stored next to the lexical index and fused with
+BM25 by reciprocal rank when the caller passes a query embedding.
+
+On disk an index is a directory of flat arrays (.npy, opened with mmap_mode="r") plus a blob of chunk
+records, so loading is O(1): nothing is parsed or copied until a search touches it. The index path is a
+symlink to the current version directory, swapped atomically by `save`.
+
+    meta.json              counts, BM25 parameters, embedding dimension
+    term_hashes.npy        sorted uint64 hashes of the vocabulary
+    indptr.npy             postings range of each term (CSR)
+    postings_doc.npy       chunk ids, grouped by term
+    postings_tf.npy        term frequencies, aligned with postings_doc
+    doc_len.npy            terms per chunk
+    records.bin            UTF-8 JSON chunk records, back to back
+    record_offsets.npy     byte offsets of the records (n + 1)
+    embeddings.npy         optional (n, dim) float32, L2-normalized
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+import time
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.tokens import estimate_tokens
+
+FORMAT_VERSION = 1
+
+_TOKEN_RE = re.compile(r"[0-9a-z]+|[가-힣]+|[ㄱ-ㆎ]+|[一-鿿]+")
+_hash_cache: Dict[str, int] = {}
+
+
+def analyze(text: str) -> List[str]:
+    """Index terms of `text`: character bigrams of Hangul/Han runs, whole Latin words and numbers."""
+    terms = []
+    for token in _TOKEN_RE.findall(unicodedata.normalize("NFKC", text or "").casefold()):
+        if token[0].isascii() or len(token) == 1:
+            terms.append(token)
+        else:
+            terms.extend(token[i:i + 2] for i in range(len(token) - 1))
+    return terms
+
+
+def term_hash(term: str) -> int:
+    value = _hash_cache.get(term)
+    if value is None:
+        value = int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+        if len(_hash_cache) < 1_000_000:
+            _hash_cache[term] = value
+    return value
+
+
+def chunk_terms(text: str) -> Tuple[np.ndarray, np.ndarray]:
+    """(term hashes, term frequencies) of one chunk, the unit the index is built from."""
+    counts = Counter(analyze(text))
+    hashes = np.fromiter((term_hash(t) for t in counts), dtype=np.uint64, count=len(counts))
+    return hashes, np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+class BM25Index:
+    """
+    Build with `BM25Index.build(chunks)` (chunks are dicts with at least "text"; every other key is kept
+    and returned with the hit), persist with `save(path)`, reopen with `BM25Index.load(path)`.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: Dict[str, Any], records: np.ndarray):
+        self.meta = meta
+        self.term_hashes = arrays["term_hashes"]
+        self.indptr = arrays["indptr"]
+        self.postings_doc = arrays["postings_doc"]
+        self.postings_tf = arrays["postings_tf"]
+        self.doc_len = arrays["doc_len"]
+        self.record_offsets = arrays["record_offsets"]
+        self.embeddings = arrays.get("embeddings")
+        self._records = records
+        self.k1 = meta["k1"]
+        self.b = meta["b"]
+        self.avgdl = meta["avgdl"] or 1.0
+
+    def __len__(self) -> int:
+        return int(self.meta["n_docs"])
+
+    @classmethod
+    def build(cls, chunks: Iterable[Dict[str, Any]], embeddings: Optional[np.ndarray] = None,
+              k1: float = 1.2, b: float = 0.75) -> "BM25Index":
+        chunks = list(chunks)
+        return cls.from_terms(chunks, [chunk_terms(chunk["text"]) for chunk in chunks], embeddings, k1, b)
+
+    @classmethod
+    def from_terms(cls, chunks: Sequence[Dict[str, Any]], terms: Sequence[Tuple[np.ndarray, np.ndarray]],
+                   embeddings: Optional[np.ndarray] = None, k1: float = 1.2, b: float = 0.75) -> "BM25Index":
+        """Builds from precomputed `chunk_terms` (e.g. cached per chunk by the ingestion pipeline)."""
+        hashes, docs, tfs, doc_len, blobs = [], [], [], [], []
+        for doc_id, (chunk, (term_hashes, term_tfs)) in enumerate(zip(chunks, terms)):
+            hashes.append(term_hashes)
+            docs.append(np.full(len(term_hashes), doc_id, dtype=np.int32))
+            tfs.append(term_tfs)
+            doc_len.append(float(term_tfs.sum()))
+            blobs.append(json.dumps(chunk, ensure_ascii=False).encode("utf-8"))
+
+        n_docs = len(doc_len)
+        all_hashes = np.concatenate(hashes) if hashes else np.zeros(0, dtype=np.uint64)
+        all_docs = np.concatenate(docs) if docs else np.zeros(0, dtype=np.int32)
+        all_tfs = np.concatenate(tfs) if tfs else np.zeros(0, dtype=np.float32)
+        order = np.lexsort((all_docs, all_hashes))
+        sorted_hashes = all_hashes[order]
+        term_hashes, starts = np.unique(sorted_hashes, return_index=True)
+
+        offsets = np.zeros(n_docs + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(blob) for blob in blobs])
+        arrays = {
+            "term_hashes": term_hashes,
+            "indptr": np.append(starts, len(sorted_hashes)).astype(np.int64),
+            "postings_doc": all_docs[order],
+            "postings_tf": all_tfs[order],
+            "doc_len": np.asarray(doc_len, dtype=np.float32),
+            "record_offsets": offsets,
+        }
+        if embeddings is not None:
+            if len(embeddings) != n_docs:
+                raise ValueError(f"{len(embeddings)} embeddings for {n_docs} chunks")
+            arrays["embeddings"] = _normalize_rows(embeddings)
+        meta = {
+            "version": FORMAT_VERSION,
+            "n_docs": n_docs,
+            "n_terms": len(term_hashes),
+            "avgdl": float(np.mean(doc_len)) if n_docs else 0.0,
+            "k1": k1,
+            "b": b,
+            "dim": int(arrays["embeddings"].shape[1]) if embeddings is not None else None,
+        }
+        return cls(arrays, meta, np.frombuffer(b"".join(blobs), dtype=np.uint8))
+
+    def save(self, path: str):
+        """
+        Writes the index to a new versioned directory next to `path` ("<path>.v<n>") and points the `path`
+        symlink at it with one atomic rename, so readers see either the previous index or the new one,
+        never a missing or half-written one. The previous version is kept for readers still loading it;
+        older ones are removed.
+        """
+        path = path.rstrip("/")
+        version_dir = f"{path}.v{time.time_ns()}"
+        os.makedirs(version_dir)
+        arrays = {
+            "term_hashes": self.term_hashes, "indptr": self.indptr, "postings_doc": self.postings_doc,
+            "postings_tf": self.postings_tf, "doc_len": self.doc_len, "record_offsets": self.record_offsets,
+        }
+        if self.embeddings is not None:
+            arrays["embeddings"] = self.embeddings
+        for name, array in arrays.items():
+            np.save(os.path.join(version_dir, f"{name}.npy"), np.ascontiguousarray(array))
+        with open(os.path.join(version_dir, "records.bin"), "wb") as f:
+            f.write(np.asarray(self._records).tobytes())
+        with open(os.path.join(version_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(self.meta, f)
+
+        previous = os.path.realpath(path) if os.path.islink(path) else None
+        if os.path.isdir(path) and not os.path.islink(path):
+            # An index saved before versioning: a plain directory cannot be replaced by a rename
+            os.replace(path, f"{path}.v0")
+            previous = os.path.realpath(f"{path}.v0")
+        link = f"{path}.link-{os.getpid()}"
+        if os.path.lexists(link):
+            os.remove(link)
+        os.symlink(os.path.basename(version_dir), link)
+        os.replace(link, path)
+
+        keep = {os.path.realpath(version_dir), previous}
+        prefix = os.path.basename(path) + ".v"
+        for name in os.listdir(os.path.dirname(path) or "."):
+            candidate = os.path.join(os.path.dirname(path), name)
+            if name.startswith(prefix) and os.path.realpath(candidate) not in keep:
+                shutil.rmtree(candidate, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """Memory-maps an index written by `save` (resolving the symlink once, so all files are one version)."""
+        path = os.path.realpath(path)
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported index version {meta.get('version')} in {path}")
+        names = ["term_hashes", "indptr", "postings_doc", "postings_tf", "doc_len", "record_offsets"]
+        if meta.get("dim"):
+            names.append("embeddings")
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in names}
+        records_path = os.path.join(path, "records.bin")
+        if os.path.getsize(records_path):
+            records = np.memmap(records_path, dtype=np.uint8, mode="r")
+        else:
+            records = np.zeros(0, dtype=np.uint8)
+        return cls(arrays, meta, records)
+
+    def record(self, doc_id: int) -> Dict[str, Any]:
+        start, end = self.record_offsets[doc_id], self.record_offsets[doc_id + 1]
+        return json.loads(bytes(self._records[start:end]).decode("utf-8"))
+
+    def bm25_scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self), dtype=np.float32)
+        n_docs = len(self)
+        for term in set(analyze(query)):
+            h = np.uint64(term_hash(term))
+            i = int(np.searchsorted(self.term_hashes, h))
+            if i >= len(self.term_hashes) or self.term_hashes[i] != h:
+                continue
+            start, end = int(self.indptr[i]), int(self.indptr[i + 1])
+            docs = self.postings_doc[start:end]
+            tf = self.postings_tf[start:end]
+            df = end - start
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_len[docs] / self.avgdl)
+            # Postings hold each chunk at most once per term, so the fancy-indexed add is exact
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    @staticmethod
+    def _top(scores: np.ndarray, n: int, matched_only: bool = True) -> np.ndarray:
+        candidates = np.flatnonzero(scores > 0) if matched_only else np.arange(len(scores))
+        if len(candidates) > n:
+            candidates = candidates[np.argpartition(-scores[candidates], n - 1)[:n]]
+        return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+    def search(self, query: str, k: int = 5, token_budget: Optional[int] = None,
+               query_embedding: Optional[np.ndarray] = None, rrf_k: int = 60) -> List[Dict[str, Any]]:
+        """
+        The best `k` chunks for `query` (records plus "score"), best first. With `token_budget`, chunks
+        are taken in rank order while they fit in the budget (a chunk too large to fit is skipped).
+        """
+        if not len(self):
+            return []
+        pool = k * 4 if token_budget else k
+        scores = self.bm25_scores(query)
+        ranked = self._top(scores, pool)
+        if query_embedding is not None and self.embeddings is not None:
+            query_vector = _normalize_rows(np.asarray(query_embedding).reshape(1, -1))[0]
+            dense = np.asarray(self.embeddings @ query_vector)
+            fused: Dict[int, float] = {}
+            for ranking in (ranked, self._top(dense, pool, matched_only=False)):
+                for rank, doc_id in enumerate(ranking):
+                    fused[int(doc_id)] = fused.get(int(doc_id), 0.0) + 1.0 / (rrf_k + rank + 1)
+            ranked = sorted(fused, key=fused.get, reverse=True)[:pool]
+            scores = fused
+
+        hits, used = [], 0
+        for doc_id in ranked:
+            record = self.record(int(doc_id))
+            if token_budget is not None:
+                cost = estimate_tokens(record.get("text", ""))
+                if used + cost > token_budget:
+                    continue
+                used += cost
+            record["score"] = float(scores[int(doc_id)])
+            hits.append(record)
+            if len(hits) == k:
+                break
+        return hits
@@ -0,0 +1,271 @@
+"""
+Incremental ingestion of Markdown / PDF documents into the retrieval index.
+
+Every file is split into chunks (Markdown by heading, then by paragraph up to a token limit; PDF by
+page and paragraph), each chunk is identified by the SHA-256 of its title and text, and its analyzed
+terms are cached by that hash in a SQLite store. A run only parses files whose size/mtime (and then
+content hash) changed, parsing and analyzing them in a process pool, and only stores terms for chunks
+whose hash is new; the index is rebuilt from the cached terms only when the chunk set actually changed. Re-ingesting an
+unchanged corpus therefore costs one stat() per file.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.tokens import estimate_tokens
+from packages.vectordb.index import BM25Index, chunk_terms
+
+SUPPORTED_EXTENSIONS = (".md", ".markdown", ".pdf")
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+
+
+def _split_paragraphs(text: str) -> List[str]:
+    """Blank-line separated paragraphs; fenced code blocks stay in one piece."""
+    paragraphs, current, in_fence = [], [], False
+    for line in text.splitlines():
+        if line.strip().startswith("```"):
+            in_fence = not in_fence
+        if not line.strip() and not in_fence:
+            if current:
+                paragraphs.append("\n".join(current))
+                current = []
+            continue
+        current.append(line)
+    if current:
+        paragraphs.append("\n".join(current))
+    return paragraphs
+
+
+def _pack(title: str, paragraphs: List[str], max_tokens: int) -> List[str]:
+    """Groups consecutive paragraphs into chunk bodies of at most `max_tokens` (a longer paragraph stays whole)."""
+    bodies, current, used = [], [], estimate_tokens(title)
+    for paragraph in paragraphs:
+        cost = estimate_tokens(paragraph)
+        if current and used + cost > max_tokens:
+            bodies.append("\n\n".join(current))
+            current, used = [], estimate_tokens(title)
+        current.append(paragraph)
+        used += cost
+    if current:
+        bodies.append("\n\n".join(current))
+    return bodies
+
+
+def markdown_sections(text: str) -> List[Tuple[str, str]]:
+    """(heading path, body) per section, e.g. ("Data Mart Design > 2. Mart 테이블 상세 설계", "...")."""
+    sections, path, body, in_fence = [], [], [], False
+    for line in text.splitlines():
+        if line.strip().startswith("```"):
+            in_fence = not in_fence
+        match = None if in_fence else _HEADING_RE.match(line)
+        if match:
+            if "\n".join(body).strip():
+                sections.append((" > ".join(path), "\n".join(body).strip()))
+            level = len(match.group(1))
+            path = path[:level - 1] + [match.group(2)]
+            body = []
+        else:
+            body.append(line)
+    if "\n".join(body).strip():
+        sections.append((" > ".join(path), "\n".join(body).strip()))
+    return sections
+
+
+def pdf_sections(path: str) -> List[Tuple[str, str]]:
+    from pypdf import PdfReader
+
+    name = os.path.basename(path)
+    return [
+        (f"{name} p.{number}", text.strip())
+        for number, text in enumerate((page.extract_text() or "" for page in PdfReader(path).pages), start=1)
+        if text.strip()
+    ]
+
+
+def chunk_hash(title: str, text: str) -> str:
+    return hashlib.sha256(f"{title}\x1f{text}".encode("utf-8")).hexdigest()
+
+
+def parse_file(path: str, source: str, max_tokens: int = 400) -> List[Dict[str, Any]]:
+    """Chunks of one document with their analyzed terms (runs in a worker process)."""
+    if path.lower().endswith(".pdf"):
+        sections = pdf_sections(path)
+    else:
+        with open(path, encoding="utf-8") as f:
+            sections = markdown_sections(f.read())
+    chunks = []
+    for title, body in sections:
+        for text in _pack(title, _split_paragraphs(body), max_tokens):
+            text = f"{title}\n{text}" if title else text
+            chunks.append({"id": f"{source}#{len(chunks)}", "title": title, "text": text, "source": source,
+                           "hash": chunk_hash(title, text), "terms": chunk_terms(text)})
+    return chunks
+
+
+def _parse_or_error(path: str, source: str, max_tokens: int) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+    """(chunks, None), or (None, error) for a file that cannot be read, so one bad file does not fail the run."""
+    try:
+        return parse_file(path, source, max_tokens), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def discover(paths: Iterable[str]) -> List[str]:
+    """Supported files under `paths` (files or directories), sorted."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                found.extend(os.path.join(root, n) for n in names if n.lower().endswith(SUPPORTED_EXTENSIONS))
+        elif path.lower().endswith(SUPPORTED_EXTENSIONS) and os.path.exists(path):
+            found.append(path)
+    return sorted(set(os.path.normpath(p) for p in found))
+
+
+class Ingestor:
+    """Keeps the chunk/term store at `store_path` and the index at `index_dir` in sync with a document set."""
+
+    def __init__(self, store_path: str, index_dir: str, max_tokens: int = 400, workers: Optional[int] = None):
+        self.index_dir = index_dir
+        self.max_tokens = max_tokens
+        self.workers = workers
+        os.makedirs(os.path.dirname(store_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(store_path)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS files (source TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha256 TEXT);
+            CREATE TABLE IF NOT EXISTS chunks (source TEXT NOT NULL, ordinal INTEGER NOT NULL, hash TEXT NOT NULL,
+                                               record TEXT NOT NULL, PRIMARY KEY (source, ordinal));
+            CREATE TABLE IF NOT EXISTS terms (hash TEXT PRIMARY KEY, term_hashes BLOB NOT NULL, tfs BLOB NOT NULL);
+        """)
+
+    def _stored_hashes(self, source: str) -> List[str]:
+        return [row[0] for row in self._db.execute(
+            "SELECT hash FROM chunks WHERE source = ? ORDER BY ordinal", (source,)
+        )]
+
+    def _replace_chunks(self, source: str, chunks: List[Dict[str, Any]], summary: Dict[str, Any]) -> bool:
+        """Stores a source's chunks; terms are stored only for chunks never seen before. True if anything changed."""
+        old = self._stored_hashes(source)
+        new = [chunk["hash"] for chunk in chunks]
+        if old == new:
+            summary["chunks_unchanged"] += len(new)
+            return False
+        unchanged = set(old) & set(new)
+        summary["chunks_unchanged"] += len(unchanged)
+        summary["chunks_removed"] += len(set(old) - unchanged)
+        self._db.execute("DELETE FROM chunks WHERE source = ?", (source,))
+        for ordinal, chunk in enumerate(chunks):
+            record = {k: v for k, v in chunk.items() if k not in ("hash", "terms")}
+            self._db.execute("INSERT INTO chunks (source, ordinal, hash, record) VALUES (?, ?, ?, ?)",
+                             (source, ordinal, chunk["hash"], json.dumps(record, ensure_ascii=False)))
+            if chunk["hash"] in unchanged:
+                continue
+            if self._db.execute("SELECT 1 FROM terms WHERE hash = ?", (chunk["hash"],)).fetchone() is None:
+                term_hashes, tfs = chunk.get("terms") or chunk_terms(chunk["text"])
+                self._db.execute("INSERT INTO terms (hash, term_hashes, tfs) VALUES (?, ?, ?)",
+                                 (chunk["hash"], term_hashes.tobytes(), tfs.tobytes()))
+            summary["chunks_added"] += 1
+        return True
+
+    def _remove_source(self, source: str, summary: Dict[str, Any]):
+        summary["chunks_removed"] += len(self._stored_hashes(source))
+        self._db.execute("DELETE FROM chunks WHERE source = ?", (source,))
+        self._db.execute("DELETE FROM files WHERE source = ?", (source,))
+
+    def _rebuild_index(self):
+        self._db.execute("DELETE FROM terms WHERE hash NOT IN (SELECT hash FROM chunks)")
+        records, terms = [], []
+        rows = self._db.execute(
+            "SELECT c.record, t.term_hashes, t.tfs FROM chunks c JOIN terms t ON t.hash = c.hash "
+            "ORDER BY c.source, c.ordinal"
+        )
+        for record, term_hashes, tfs in rows:
+            records.append(json.loads(record))
+            terms.append((np.frombuffer(term_hashes, dtype=np.uint64), np.frombuffer(tfs, dtype=np.float32)))
+        BM25Index.from_terms(records, terms).save(self.index_dir)
+        return len(records)
+
+    def ingest(self, paths: Iterable[str], extra_chunks: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+               full: bool = False) -> Dict[str, Any]:
+        """
+        Brings the index in line with the documents under `paths` plus `extra_chunks` ({source: chunks},
+        e.g. the built-in glossary). Sources no longer present are removed. `full` re-parses every file.
+        Files that cannot be read or parsed keep their previous chunks and are listed in summary["failed"].
+        """
+        start = time.perf_counter()
+        summary = {"files_parsed": 0, "files_unchanged": 0, "files_removed": 0, "chunks_added": 0,
+                   "chunks_removed": 0, "chunks_unchanged": 0, "chunks_indexed": None, "failed": {}, "elapsed_s": 0.0}
+        files = {os.path.relpath(path): path for path in discover(paths)}
+        stored = {row[0]: row[1:] for row in self._db.execute("SELECT source, size, mtime_ns, sha256 FROM files")}
+
+        to_parse = []
+        for source, path in files.items():
+            try:
+                stat = os.stat(path)
+                previous = stored.get(source)
+                if not full and previous and previous[:2] == (stat.st_size, stat.st_mtime_ns):
+                    summary["files_unchanged"] += 1
+                    continue
+                sha256 = _file_sha256(path)
+            except OSError as e:
+                summary["failed"][source] = f"{type(e).__name__}: {e}"
+                continue
+            if not full and previous and previous[2] == sha256:
+                # Touched but not modified: remember the new stat, nothing to parse
+                self._db.execute("UPDATE files SET size = ?, mtime_ns = ? WHERE source = ?",
+                                 (stat.st_size, stat.st_mtime_ns, source))
+                summary["files_unchanged"] += 1
+                continue
+            to_parse.append((source, path, stat, sha256))
+
+        changed = False
+        if to_parse:
+            if len(to_parse) > 1 and self.workers != 1:
+                with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                    parsed = list(pool.map(_parse_or_error, [p for _, p, _, _ in to_parse],
+                                           [s for s, _, _, _ in to_parse], [self.max_tokens] * len(to_parse)))
+            else:
+                parsed = [_parse_or_error(path, source, self.max_tokens) for source, path, _, _ in to_parse]
+            for (source, _, stat, sha256), (chunks, error) in zip(to_parse, parsed):
+                if error:
+                    # Keep the file's previous chunks (and stat, so the next run retries it)
+                    summary["failed"][source] = error
+                    continue
+                changed |= self._replace_chunks(source, chunks, summary)
+                self._db.execute("INSERT OR REPLACE INTO files (source, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+                                 (source, stat.st_size, stat.st_mtime_ns, sha256))
+                summary["files_parsed"] += 1
+
+        for source, chunks in (extra_chunks or {}).items():
+            chunks = [dict(chunk, hash=chunk_hash(chunk.get("title", ""), chunk["text"])) for chunk in chunks]
+            changed |= self._replace_chunks(source, chunks, summary)
+
+        known = set(files) | set(extra_chunks or {})
+        stored_sources = self._db.execute("SELECT source FROM chunks UNION SELECT source FROM files").fetchall()
+        for (source,) in stored_sources:
+            if source not in known:
+                self._remove_source(source, summary)
+                summary["files_removed"] += 1
+                changed = True
+
+        if changed or full or not os.path.exists(os.path.join(self.index_dir, "meta.json")):
+            summary["chunks_indexed"] = self._rebuild_index()
+        self._db.commit()
+        summary["elapsed_s"] = round(time.perf_counter() - start, 4)
+        return summary
@@ -0,0 +1,103 @@
+import argparse
+import os
+import re
+import statistics
+import sys
+import time
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.core.config import settings
+from packages.bq_wrapper import approximate
+from packages.bq_wrapper.local_engine import LocalEngine
+from packages.bq_wrapper.schema import TABLES
+
+SENSOR = "`willog-prod-data-gold.rag.mart_sensor_detail`"
+
+# Exploratory questions over mart_sensor_detail as the SQL agent writes them
+CASES = [
+    ("해상 운송 5G 이상 충격 비율",
+     f"SELECT SAFE_DIVIDE(COUNTIF(shock_g >= 5), COUNT(*)) * 100 AS shock_5g_ratio, COUNT(*) AS log_count "
+     f"FROM {SENSOR} WHERE transport_mode LIKE 'ocean%'"),
+    ("국가별 평균 습도",
+     f"SELECT destination_country, AVG(humidity) AS avg_humidity FROM {SENSOR} GROUP BY 1 ORDER BY 2 DESC"),
+    ("운송 모드별 영하 온도 로그 수",
+     f"SELECT transport_mode, COUNTIF(temperature < 0) AS freezing_logs FROM {SENSOR} GROUP BY 1"),
+    ("영하 온도 운송 건수",
+     f"SELECT COUNT(DISTINCT code) AS shipments FROM {SENSOR} WHERE temperature < 0"),
+]
+
+# Logical bytes BigQuery bills per value, by column type (STRING: 2 + UTF-8 length)
+_TYPE_BYTES = {"INT64": 8, "FLOAT64": 8, "NUMERIC": 16, "BOOL": 1, "DATE": 8, "TIMESTAMP": 8, "DATETIME": 8}
+
+
+def _estimated_bytes(engine: LocalEngine, sql: str) -> int:
+    """Bytes a full scan of the referenced sensor columns would bill (no partition filter in the cases)."""
+    expressions = []
+    for name, data_type, _ in TABLES["mart_sensor_detail"]["columns"]:
+        if re.search(rf"\b{name}\b", sql):
+            expressions.append(f"SUM(2 + STRLEN(COALESCE({name}, '')))" if data_type == "STRING"
+                               else f"COUNT(*) * {_TYPE_BYTES.get(data_type, 8)}")
+    return int(engine.run_query(f"SELECT {' + '.join(expressions)} AS b FROM {SENSOR}")["b"][0])
+
+
+def _sampled_fraction(engine: LocalEngine, percent: float) -> float:
+    total = engine.run_query(f"SELECT COUNT(*) AS n FROM {SENSOR}")["n"][0]
+    sampled = engine.run_query(f"SELECT COUNT(*) AS n FROM {SENSOR} TABLESAMPLE SYSTEM ({percent:g} PERCENT)")["n"][0]
+    return sampled / total
+
+
+def _timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Accuracy / bytes trade-off of approximate mode on local (e.g. synthetic) mart_sensor_detail snapshots."
+    )
+    parser.add_argument("--snapshot-dir", default=settings.LOCAL_SNAPSHOT_DIR,
+                        help="Snapshots with mart_sensor_detail (scripts/generate_synthetic_data.py --build-marts)")
+    parser.add_argument("--percent", type=float, nargs="+", default=[settings.APPROX_SAMPLE_PERCENT])
+    parser.add_argument("--trials", type=int, default=20, help="Sampled runs per query and sample size")
+    args = parser.parse_args()
+
+    engine = LocalEngine(args.snapshot_dir)
+    if "mart_sensor_detail" not in engine.tables():
+        print(f"❌ No mart_sensor_detail snapshot in {args.snapshot_dir}")
+        sys.exit(1)
+
+    for percent in args.percent:
+        fraction = _sampled_fraction(engine, percent)
+        print(f"\n📊 TABLESAMPLE {percent:g}% ({fraction:.1%} of rows read), {settings.APPROX_REPLICATES} replicates, "
+              f"{args.trials} trials")
+        print(f"{'question':<24}{'method':>8}{'rel err':>9}{'ci cover':>10}{'exact MB':>10}{'approx MB':>11}"
+              f"{'exact ms':>10}{'approx ms':>11}")
+        for question, sql in CASES:
+            plan = approximate.plan(sql, settings.APPROX_TABLES, percent, settings.APPROX_REPLICATES)
+            exact, exact_s = _timed(lambda: engine.run_query(sql))
+            exact_bytes = _estimated_bytes(engine, sql)
+            errors, covered, checked, timings = [], 0, 0, []
+            for _ in range(args.trials):
+                raw, elapsed = _timed(lambda: engine.run_query(plan["sql"]))
+                timings.append(elapsed)
+                estimate = approximate.combine(raw, plan)
+                groups = [c["name"] for c in plan.get("columns", []) if c["kind"] == "group"]
+                merged = exact.merge(estimate, on=groups, suffixes=("", "_est")) if groups else exact.join(estimate, rsuffix="_est")
+                for column in [c for c in exact.columns if c not in groups]:
+                    truth, guess = merged[column], merged[f"{column}_est"]
+                    errors += ((guess - truth).abs() / truth.abs()).tolist()
+                    if f"{column}_ci_low" in merged:
+                        covered += int(((merged[f"{column}_ci_low"] <= truth) & (truth <= merged[f"{column}_ci_high"])).sum())
+                        checked += len(merged)
+            approx_bytes = exact_bytes * fraction if plan["method"] == "sample" else exact_bytes
+            coverage = f"{covered / checked:.0%}" if checked else "n/a"
+            print(f"{question:<24}{plan['method']:>8}{statistics.mean(errors):>9.2%}{coverage:>10}"
+                  f"{exact_bytes / 1024 ** 2:>10.1f}{approx_bytes / 1024 ** 2:>11.1f}"
+                  f"{exact_s * 1000:>10.0f}{statistics.median(timings) * 1000:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.core.config import settings
+from app.ui.visualization import detect_chart_type
+
+
+def _time_series(rows: int, rng) -> pd.DataFrame:
+    return pd.DataFrame({
+        "event_date": pd.date_range("2025-10-01", periods=rows, freq="min"),
+        "avg_shock_g": np.abs(np.cumsum(rng.normal(0, 0.1, rows))) + rng.exponential(0.2, rows),
+        "avg_temperature": 4 + np.cumsum(rng.normal(0, 0.02, rows)),
+    })
+
+
+def _locations(rows: int, rng) -> pd.DataFrame:
+    # Sensor positions around a few ports
+    ports = np.array([[31.2, 121.5], [35.1, 129.0], [10.8, 106.7], [1.3, 103.8], [22.3, 114.2]])
+    centers = ports[rng.integers(0, len(ports), rows)]
+    return pd.DataFrame({
+        "lat": centers[:, 0] + rng.normal(0, 0.8, rows),
+        "lon": centers[:, 1] + rng.normal(0, 0.8, rows),
+        "risk_score": rng.random(rows) * 100,
+    })
+
+
+def _measure(df: pd.DataFrame):
+    """Build time, JSON serialization time, JSON size and the number of points drawn."""
+    started = time.perf_counter()
+    fig = detect_chart_type(df)
+    built = time.perf_counter() - started
+    payload = len(fig.to_json())
+    serialized = time.perf_counter() - started - built
+    points = sum(len(trace.lat if trace.type.endswith("map") else trace.x) for trace in fig.data)
+    return built, serialized, payload, points
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Figure build time and JSON payload of detect_chart_type, with and without data reduction."
+    )
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--unreduced-max-rows", type=int, default=100_000,
+                        help="Skip the unreduced figure above this many rows")
+    args = parser.parse_args()
+    rng = np.random.default_rng(7)
+    limits = (settings.CHART_MAX_POINTS, settings.CHART_MAP_MAX_CELLS)
+    for make in (_time_series, _locations):
+        detect_chart_type(make(100, rng))  # plotly's lazy imports
+
+    print(f"📊 CHART_MAX_POINTS={limits[0]}, CHART_MAP_MAX_CELLS={limits[1]}, "
+          f"CHART_WEBGL_THRESHOLD={settings.CHART_WEBGL_THRESHOLD}")
+    print(f"{'chart':<6}{'rows':>11}{'mode':>11}{'build ms':>10}{'JSON ms':>9}{'JSON KB':>10}{'points':>10}")
+    for name, make in [("line", _time_series), ("map", _locations)]:
+        for rows in args.rows:
+            df = make(rows, rng)
+            for mode in ["unreduced", "reduced"]:
+                if mode == "unreduced":
+                    if rows > args.unreduced_max_rows:
+                        continue
+                    settings.CHART_MAX_POINTS = settings.CHART_MAP_MAX_CELLS = rows + 1
+                else:
+                    settings.CHART_MAX_POINTS, settings.CHART_MAP_MAX_CELLS = limits
+                built, serialized, payload, points = _measure(df)
+                print(f"{name:<6}{rows:>11,}{mode:>11}{built * 1000:>10.0f}{serialized * 1000:>9.0f}"
+                      f"{payload / 1024:>10,.0f}{points:>10,}")
+    settings.CHART_MAX_POINTS, settings.CHART_MAP_MAX_CELLS = limits
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.agents.sql_agent import agent, split_parts
+from packages.bq_wrapper.client import bq_client
+
+MASTER = "`willog-prod-data-gold.rag.mart_logistics_master`"
+
+# Comparison questions as the SQL agent writes them without decomposition (one query) and with it (`-- part:` blocks)
+CASES = [
+    {
+        "question": "이번 달 출고 건수와 운송 건수 비교",
+        "monolithic": f"""
+SELECT
+    COUNT(DISTINCT CASE WHEN departure_date BETWEEN '{{start}}' AND '{{end}}' THEN code END) AS departed_count,
+    COUNT(DISTINCT CASE WHEN departure_date <= '{{end}}' AND (arrival_date >= '{{start}}' OR arrival_date IS NULL) THEN code END) AS active_transport_count
+FROM {MASTER}
+WHERE departure_date <= '{{end}}'""",
+        "decomposed": f"""
+-- part: 출고 건수
+SELECT COUNT(DISTINCT code) AS departed_count FROM {MASTER}
+WHERE departure_date BETWEEN '{{start}}' AND '{{end}}'
+-- part: 운송 건수
+SELECT COUNT(DISTINCT code) AS active_transport_count FROM {MASTER}
+WHERE departure_date <= '{{end}}' AND (arrival_date >= '{{start}}' OR arrival_date IS NULL)""",
+    },
+    {
+        "question": "지난달 대비 이번 달 파손율",
+        "monolithic": f"""
+SELECT
+    AVG(CASE WHEN departure_date BETWEEN '{{prev_start}}' AND '{{prev_end}}' THEN IF(is_damaged, 1, 0) END) AS prev_damage_rate,
+    AVG(CASE WHEN departure_date BETWEEN '{{start}}' AND '{{end}}' THEN IF(is_damaged, 1, 0) END) AS damage_rate
+FROM {MASTER}
+WHERE departure_date BETWEEN '{{prev_start}}' AND '{{end}}'""",
+        "decomposed": f"""
+-- part: 지난달
+SELECT AVG(IF(is_damaged, 1, 0)) AS damage_rate FROM {MASTER}
+WHERE departure_date BETWEEN '{{prev_start}}' AND '{{prev_end}}'
+-- part: 이번 달
+SELECT AVG(IF(is_damaged, 1, 0)) AS damage_rate FROM {MASTER}
+WHERE departure_date BETWEEN '{{start}}' AND '{{end}}'""",
+    },
+    {
+        "question": "이번 달 해상 vs 항공 평균 충격",
+        "monolithic": f"""
+SELECT
+    AVG(CASE WHEN transport_mode LIKE 'ocean%' THEN max_shock_g END) AS ocean_avg_shock,
+    AVG(CASE WHEN transport_mode = 'air' THEN max_shock_g END) AS air_avg_shock
+FROM {MASTER}
+WHERE departure_date BETWEEN '{{start}}' AND '{{end}}'""",
+        "decomposed": f"""
+-- part: 해상
+SELECT AVG(max_shock_g) AS avg_shock FROM {MASTER}
+WHERE departure_date BETWEEN '{{start}}' AND '{{end}}' AND transport_mode LIKE 'ocean%'
+-- part: 항공
+SELECT AVG(max_shock_g) AS avg_shock FROM {MASTER}
+WHERE departure_date BETWEEN '{{start}}' AND '{{end}}' AND transport_mode = 'air'""",
+    },
+]
+
+
+def _month_bounds(month: str):
+    import pandas as pd
+    start = pd.Timestamp(f"{month}-01")
+    prev_start = start - pd.DateOffset(months=1)
+    return {
+        "start": start.date().isoformat(),
+        "end": (start + pd.offsets.MonthEnd(0)).date().isoformat(),
+        "prev_start": prev_start.date().isoformat(),
+        "prev_end": (start - pd.Timedelta(days=1)).date().isoformat(),
+    }
+
+
+def _dry_run_bytes(sql: str):
+    """Bytes BigQuery would process (None without a BigQuery client)."""
+    if not bq_client.client:
+        return None
+    from google.cloud import bigquery
+    job_config = bigquery.QueryJobConfig(dry_run=True, use_query_cache=False)
+    return bq_client.client.query(sql, job_config=job_config).total_bytes_processed
+
+
+def _median_s(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def _mb(value):
+    return "n/a" if value is None else f"{value / 1024 ** 2:,.1f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare comparison questions run as one query vs as concurrent sub-queries (latency, bytes)."
+    )
+    parser.add_argument("--month", default="2025-11", help="'이번 달' of the questions (YYYY-MM)")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per query; the median is reported")
+    args = parser.parse_args()
+
+    if not bq_client.available:
+        print("❌ Neither BigQuery nor local snapshots are available (see scripts/sync_data.py)")
+        sys.exit(1)
+    backend = "BigQuery" if bq_client.client else "local snapshots"
+    print(f"📊 {backend}, median of {args.repeat} runs (bytes from BigQuery dry runs)")
+    print(f"{'question':<28}{'mono ms':>10}{'parts ms':>10}{'mono MB':>10}{'parts MB':>10}")
+
+    bounds = _month_bounds(args.month)
+    for case in CASES:
+        monolithic = case["monolithic"].format(**bounds)
+        decomposed = case["decomposed"].format(**bounds)
+        mono_s = _median_s(lambda: bq_client.run_query(monolithic), args.repeat)
+        parts_s = _median_s(lambda: agent._execute(decomposed), args.repeat)
+        mono_bytes = _dry_run_bytes(monolithic)
+        part_bytes = [_dry_run_bytes(part) for _, part in split_parts(decomposed)]
+        parts_bytes = None if None in part_bytes else sum(part_bytes)
+        print(f"{case['question']:<28}{mono_s * 1000:>10.1f}{parts_s * 1000:>10.1f}"
+              f"{_mb(mono_bytes):>10}{_mb(parts_bytes):>10}")
+
+
+if __name__ == "__main__":
+    main()
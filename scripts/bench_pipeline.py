@@ -0,0 +1,72 @@
+import argparse
+import json
+import os
+import sys
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from packages.bench.cassette import Cassette
+from packages.bench.harness import compare_reports, run_corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the question pipeline with recorded (cassette) LLM and BigQuery responses."
+    )
+    parser.add_argument("--corpus", default="benchmarks/corpus.json")
+    parser.add_argument("--cassette", default="benchmarks/cassettes/pipeline.json")
+    parser.add_argument("--mode", choices=["replay", "record"], default="replay",
+                        help="record calls Vertex AI / BigQuery for real and stores responses")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=1, help="Run the corpus N times")
+    parser.add_argument("--replay-latency", action="store_true",
+                        help="Sleep for the recorded backend latency on replay (default: measure local overhead only)")
+    parser.add_argument("--output", default=None, help="Write the JSON report here")
+    parser.add_argument("--compare", default=None, help="Baseline JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative growth that counts as a regression")
+    parser.add_argument("--verbose", action="store_true", help="Show pipeline logs")
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding="utf-8") as f:
+        corpus = json.load(f)
+
+    cassette = Cassette(args.cassette, mode=args.mode)
+    report = run_corpus(
+        corpus, cassette, concurrency=args.concurrency, repeat=args.repeat,
+        replay_latency=args.replay_latency, verbose=args.verbose,
+    )
+    summary = report["summary"]
+
+    print(f"📊 {report['meta']['questions']} questions in {summary['wall_time_s']:.2f}s "
+          f"({summary['throughput_qps']:.1f} q/s, errors: {summary['errors']})")
+    print(f"{'stage':<16}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'tokens':>10}")
+    rows = [("end_to_end", summary["end_to_end"])] + list(summary["stages"].items())
+    for name, stats in rows:
+        tokens = summary["prompt_tokens"].get(name, {}).get("total", "")
+        print(f"{name:<16}{stats['count']:>7}{stats['p50'] * 1000:>10.1f}{stats['p95'] * 1000:>10.1f}"
+              f"{stats['p99'] * 1000:>10.1f}{tokens:>10}")
+    for key in ("agent_match", "sql_match", "result_match"):
+        if summary[key]:
+            print(f"{key}: {summary[key]['matched']}/{summary[key]['checked']}")
+    for record in report["questions"]:
+        if record.get("sql_diff"):
+            print(f"\n❌ SQL differs for {record['id'] or record['question']}:")
+            print("\n".join(record["sql_diff"]))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+        print(f"\n💾 Report written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        lines, regressed = compare_reports(baseline, report, args.threshold)
+        print("\n" + "\n".join(lines))
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from packages.bench.stats import summarize
+from packages.vectordb.index import BM25Index
+
+PARTICLES = ["", "", "은", "는", "이", "가", "을", "를", "의", "에서", "으로", "과"]
+
+
+def _syllable(rng):
+    return chr(0xAC00 + rng.randrange(11172))
+
+
+def synthetic_corpus(n_chunks, vocab_size=20000, seed=7):
+    """
+    Korean-like chunks: words of 2-4 random syllables drawn with a Zipf-like skew, with particles
+    attached. Each chunk also gets a distinctive title word, as a glossary or SOP section would.
+    """
+    rng = random.Random(seed)
+    vocab = ["".join(_syllable(rng) for _ in range(rng.randint(2, 4))) for _ in range(vocab_size)]
+    weights = [1.0 / (rank + 1) for rank in range(vocab_size)]
+    chunks = []
+    for i in range(n_chunks):
+        title = "".join(_syllable(rng) for _ in range(3))
+        words = rng.choices(vocab, weights=weights, k=rng.randint(40, 120))
+        body = " ".join(w + rng.choice(PARTICLES) for w in words)
+        chunks.append({"id": i, "title": title, "text": f"[{title}] {body}", "source": f"doc-{i // 20}.md"})
+    return chunks
+
+
+def make_queries(chunks, n_queries, with_title, seed=11):
+    """
+    (query, relevant chunk id) pairs with the particles changed, so matching relies on the bigrams
+    shared by inflected forms. Title queries name the chunk's distinctive word plus two body words
+    (a glossary lookup); content queries only use three body words, which other chunks share too.
+    """
+    rng = random.Random(seed)
+    queries = []
+    for chunk in rng.sample(chunks, n_queries):
+        words = sorted({w.rstrip("".join(PARTICLES)) for w in chunk["text"].split()[1:]})
+        picked = rng.sample(words, 2 if with_title else 3)
+        if with_title:
+            picked.insert(0, chunk["title"])
+        query = " ".join(w + rng.choice(PARTICLES) for w in picked) + " 알려줘"
+        queries.append((query, chunk["id"]))
+    return queries
+
+
+def linear_scan(chunks, query):
+    """Baseline: the previous approach (substring match of every query word against every chunk)."""
+    words = query.split()
+    return [c["id"] for c in chunks if any(w in c["text"] for w in words)]
+
+
+def _recall(index, queries, k, token_budget, latencies):
+    hits_at_1 = hits_at_k = 0
+    for query, relevant in queries:
+        start = time.perf_counter()
+        hits = index.search(query, k=k, token_budget=token_budget)
+        latencies.append(time.perf_counter() - start)
+        ids = [h["id"] for h in hits]
+        hits_at_1 += bool(ids) and ids[0] == relevant
+        hits_at_k += relevant in ids
+    return {"recall@1": round(hits_at_1 / len(queries), 3), f"recall@{k}": round(hits_at_k / len(queries), 3)}
+
+
+def run(n_chunks, n_queries, k, token_budget, baseline):
+    chunks = synthetic_corpus(n_chunks)
+    query_sets = {
+        "title_queries": make_queries(chunks, n_queries, with_title=True),
+        "content_queries": make_queries(chunks, n_queries, with_title=False),
+    }
+
+    start = time.perf_counter()
+    index = BM25Index.build(chunks)
+    build_s = time.perf_counter() - start
+
+    result = {"chunks": n_chunks, "build_s": round(build_s, 2)}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "index")
+        index.save(path)
+        result["index_mb"] = round(sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) / 1e6, 1)
+        start = time.perf_counter()
+        index = BM25Index.load(path)
+        result["load_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+        latencies = []
+        for name, queries in query_sets.items():
+            result[name] = _recall(index, queries, k, token_budget, latencies)
+        result["search_ms"] = {
+            key: round(value * 1000, 2) for key, value in summarize(latencies).items() if key != "count"
+        }
+
+    if baseline:
+        queries = query_sets["title_queries"][:20]
+        start = time.perf_counter()
+        for query, _ in queries:
+            linear_scan(chunks, query)
+        result["linear_scan_ms"] = round((time.perf_counter() - start) / len(queries) * 1000, 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the local retrieval index on synthetic Korean chunks.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--token-budget", type=int, default=1500)
+    parser.add_argument("--baseline", action="store_true", help="Also time the previous linear substring scan")
+    parser.add_argument("--output", default=None, help="Write the JSON results here")
+    args = parser.parse_args()
+
+    results = []
+    for n_chunks in args.sizes:
+        print(f"🔍 {n_chunks} chunks...")
+        result = run(n_chunks, args.queries, args.k, args.token_budget, args.baseline)
+        results.append(result)
+        print(json.dumps(result, ensure_ascii=False))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.core.config import settings
+from packages.bench.fakes import FakeBigQueryClient, LatencyModel
+from packages.bq_wrapper.client import BigQueryWrapper
+
+# Small-result queries as the SQL agent writes them for the suggestion questions
+QUERIES = [
+    "SELECT package_type, AVG(damage_rate) AS damage_rate "
+    "FROM `willog-prod-data-gold.rag.mart_quality_matrix` GROUP BY 1 ORDER BY 2 DESC",
+    "SELECT transport_mode, SUM(total_shipments) AS total_shipments "
+    "FROM `willog-prod-data-gold.rag.mart_quality_matrix` GROUP BY 1",
+    "SELECT location_label, risk_score FROM `willog-prod-data-gold.rag.mart_risk_heatmap` "
+    "ORDER BY risk_score DESC LIMIT 10",
+]
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _run(wrapper: BigQueryWrapper, runs: int):
+    timings = []
+    for i in range(runs):
+        started = time.perf_counter()
+        wrapper.run_query(QUERIES[i % len(QUERIES)])
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Latency of small-result queries on the standard job path vs the short-query path, against "
+                    "a local stand-in of the BigQuery client (packages/bench/fakes.py) modelling both."
+    )
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--rtt-ms", type=float, default=40, help="Median API round trip")
+    parser.add_argument("--execution-ms", type=float, default=150, help="Median query execution")
+    parser.add_argument("--job-overhead-ms", type=float, default=250, help="Median job insert/scheduling overhead")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"📊 {args.runs} small-result queries, RTT {args.rtt_ms:g} ms, execution {args.execution_ms:g} ms, "
+          f"job overhead {args.job_overhead_ms:g} ms (model parameters)")
+    print(f"{'mode':<10}{'p50 ms':>10}{'p95 ms':>10}{'jobs':>8}")
+    for mode in ["standard", "short"]:
+        settings.BQ_QUERY_MODE = mode
+        fake = FakeBigQueryClient(
+            LatencyModel(args.rtt_ms, seed=args.seed),
+            LatencyModel(args.execution_ms, seed=args.seed + 1),
+            LatencyModel(args.job_overhead_ms, sigma=0.5, seed=args.seed + 2),
+        )
+        wrapper = BigQueryWrapper()
+        wrapper.local_engine = None
+        wrapper._client, wrapper._client_initialized = fake, True
+        wrapper.run_query(QUERIES[0])  # imports google.cloud.bigquery
+        fake.jobs_created = 0
+        timings = _run(wrapper, args.runs)
+        print(f"{mode:<10}{_percentile(timings, 0.5) * 1000:>10.0f}{_percentile(timings, 0.95) * 1000:>10.0f}"
+              f"{fake.jobs_created:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import argparse
+import os
+import sys
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from packages.synthetic.generator import expected_logs_per_shipment, generate
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate seeded synthetic corning_transport / corning_merged / view_category Parquet data."
+    )
+    parser.add_argument("--out", default="data/synthetic", help="Output directory for the raw tables")
+    parser.add_argument("--shipments", type=int, default=None, help="Number of shipments to generate")
+    parser.add_argument("--target-rows", type=int, default=None, help="Approximate number of sensor log rows (sets --shipments)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--start", default="2025-10-01", help="First departure date (inclusive)")
+    parser.add_argument("--end", default="2026-01-01", help="End of the observation window (exclusive)")
+    parser.add_argument("--chunk-shipments", type=int, default=2000, help="Shipments per chunk (bounds memory)")
+    parser.add_argument(
+        "--build-marts", action="store_true",
+        help="Also build the marts locally with DuckDB (scripts/sync_data.py --local) into the snapshot dir",
+    )
+    parser.add_argument("--snapshot-dir", default=None, help="Snapshot dir for --build-marts (default: settings.LOCAL_SNAPSHOT_DIR)")
+    args = parser.parse_args()
+
+    per_shipment = expected_logs_per_shipment()
+    shipments = args.shipments
+    if shipments is None:
+        shipments = int(args.target_rows / per_shipment) if args.target_rows else 1000
+    print(f"🎲 Generating {shipments:,} shipments (~{int(shipments * per_shipment):,} sensor logs) -> {args.out}")
+
+    def report(chunk_idx, row_counts, elapsed):
+        rate = row_counts["corning_merged"] / elapsed if elapsed else 0
+        print(
+            f"   chunk {chunk_idx + 1}: {row_counts['corning_transport']:,} shipments, "
+            f"{row_counts['corning_merged']:,} logs ({rate:,.0f} rows/s)"
+        )
+
+    row_counts = generate(
+        args.out, shipments, seed=args.seed, start=args.start, end=args.end,
+        chunk_shipments=args.chunk_shipments, progress=report,
+    )
+    print("✅ Done: " + ", ".join(f"{name}={rows:,}" for name, rows in row_counts.items()))
+
+    if args.build_marts:
+        from scripts.sync_data import build_local_marts
+        build_local_marts(args.out, args.snapshot_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import argparse
+import os
+import sys
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.agents.glossary import GLOSSARY_SOURCE, glossary_chunks
+from app.core.config import settings
+from packages.vectordb.ingest import Ingestor
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Chunk Markdown/PDF documents into the retrieval index (only changed chunks are re-indexed)."
+    )
+    parser.add_argument("paths", nargs="*", help=f"Files or directories (default: {settings.RETRIEVAL_SOURCES})")
+    parser.add_argument("--index-dir", default=settings.RETRIEVAL_INDEX_DIR)
+    parser.add_argument("--store", default=settings.RETRIEVAL_STORE_PATH, help="Chunk/term cache (SQLite)")
+    parser.add_argument("--chunk-tokens", type=int, default=settings.RETRIEVAL_CHUNK_TOKENS)
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes (default: CPU count)")
+    parser.add_argument("--full", action="store_true", help="Re-parse every file and rebuild the index")
+    args = parser.parse_args()
+
+    ingestor = Ingestor(args.store, args.index_dir, max_tokens=args.chunk_tokens, workers=args.workers)
+    summary = ingestor.ingest(args.paths or settings.RETRIEVAL_SOURCES, extra_chunks={GLOSSARY_SOURCE: glossary_chunks()},
+                              full=args.full)
+
+    print(f"📄 Files: {summary['files_parsed']} parsed, {summary['files_unchanged']} unchanged, "
+          f"{summary['files_removed']} removed")
+    print(f"🧩 Chunks: {summary['chunks_added']} added, {summary['chunks_removed']} removed, "
+          f"{summary['chunks_unchanged']} unchanged")
+    for source, error in summary["failed"].items():
+        print(f"⚠️ Skipped {source} (previous chunks kept): {error}")
+    if summary["chunks_indexed"] is None:
+        print(f"✅ Index already up to date ({summary['elapsed_s'] * 1000:.1f} ms)")
+    else:
+        print(f"✅ Indexed {summary['chunks_indexed']} chunks into {args.index_dir} in {summary['elapsed_s']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import socket
+import sys
+import threading
+import time
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from packages.bench.stats import summarize
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_local_server(port: int):
+    """Runs app.api.main:app with uvicorn in a background thread of this process."""
+    import uvicorn
+    from app.api.main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+async def virtual_user(client, conversations, weights, stop_at, results, think_time, timeout, rng,
+                       protocol="session"):
+    """Replays weighted multi-turn conversations until the stage ends."""
+    while time.monotonic() < stop_at:
+        conversation = rng.choices(conversations, weights)[0]
+        await replay_conversation(client, conversation, stop_at, results, think_time, timeout, rng, protocol)
+
+
+async def replay_conversation(client, conversation, stop_at, results, think_time, timeout, rng, protocol="session"):
+    """
+    Sends the turns of one conversation. protocol "session" sends only the new message plus the session id
+    of the previous answer; "messages" is the legacy client resending the whole history every turn.
+    """
+    messages, session_id = [], None
+    for turn in conversation["turns"]:
+        if time.monotonic() >= stop_at:
+            return
+        if protocol == "session":
+            payload = {"message": turn, "session_id": session_id} if session_id else {"message": turn}
+        else:
+            messages.append({"role": "user", "content": turn})
+            payload = {"messages": messages}
+        start = time.perf_counter()
+        try:
+            response = await client.post("/api/chat", json=payload, timeout=timeout)
+            status = response.status_code
+            body = response.json() if status == 200 else {}
+        except Exception as e:
+            status, body = type(e).__name__, {}
+        results.append((time.perf_counter() - start, status))
+        if status != 200:
+            return
+        session_id = body.get("session_id") or session_id
+        messages.append({"role": "assistant", "content": body.get("answer", "")})
+        if think_time:
+            await asyncio.sleep(rng.expovariate(1 / think_time))
+
+
+async def run_stage(base_url, concurrency, duration, conversations, think_time, timeout, seed, protocol="session"):
+    import httpx
+
+    weights = [c.get("weight", 1) for c in conversations]
+    results = []
+    stop_at = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            virtual_user(client, conversations, weights, stop_at, results, think_time, timeout,
+                         random.Random(seed * 1000 + i), protocol)
+            for i in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - started
+
+    ok = [latency for latency, status in results if status == 200]
+    statuses = {}
+    for _, status in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "throughput_rps": len(ok) / elapsed if elapsed else 0.0,
+        "error_rate": (len(results) - len(ok)) / len(results) if results else 0.0,
+        "statuses": statuses,
+        "latency": summarize(ok),
+    }
+
+
+def find_saturation(levels, min_gain=0.10):
+    """First concurrency level after which adding users raises throughput by less than `min_gain`."""
+    for prev, cur in zip(levels, levels[1:]):
+        if cur["throughput_rps"] < prev["throughput_rps"] * (1 + min_gain):
+            return prev["concurrency"]
+    return None
+
+
+def max_concurrency_within_slo(levels, slo_p95_ms, max_error_rate):
+    passing = [
+        level["concurrency"] for level in levels
+        if level["latency"].get("p95", float("inf")) * 1000 <= slo_p95_ms and level["error_rate"] <= max_error_rate
+    ]
+    return max(passing) if passing else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /api/chat with a weighted mix of multi-turn conversations.")
+    parser.add_argument("--url", default=None, help="Target an already running server instead of an in-process one with stubs")
+    parser.add_argument("--conversations", default="benchmarks/conversations.json")
+    parser.add_argument("--ramp", default="1,2,4,8,16,32", help="Comma-separated concurrency levels")
+    parser.add_argument("--stage-duration", type=float, default=15, help="Seconds per concurrency level")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean seconds between turns of a conversation")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--protocol", choices=["session", "messages"], default="session",
+                        help="session: session id + new message per turn; messages: legacy full-history resend")
+    parser.add_argument("--llm-latency-ms", type=float, default=800, help="Median simulated LLM call latency")
+    parser.add_argument("--llm-sigma", type=float, default=0.3, help="Log-normal spread of LLM latency")
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--bq-latency-ms", type=float, default=1200, help="Median simulated BigQuery latency")
+    parser.add_argument("--bq-sigma", type=float, default=0.4)
+    parser.add_argument("--bq-failure-rate", type=float, default=0.0)
+    parser.add_argument("--rows", type=int, default=10, help="Rows returned by the simulated BigQuery")
+    parser.add_argument("--slo-p95-ms", type=float, default=10000)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None, help="Write the JSON report here")
+    parser.add_argument("--verbose", action="store_true", help="Show pipeline logs")
+    args = parser.parse_args()
+
+    with open(args.conversations, encoding="utf-8") as f:
+        conversations = json.load(f)
+    ramp = [int(x) for x in args.ramp.split(",")]
+    out = sys.stdout
+
+    stack = contextlib.ExitStack()
+    if not args.verbose:
+        stack.enter_context(contextlib.redirect_stdout(open(os.devnull, "w")))
+    base_url = args.url
+    if base_url is None:
+        from packages.bench.fakes import LatencyModel, stub_backends
+        stack.enter_context(stub_backends(
+            LatencyModel(args.llm_latency_ms, args.llm_sigma, seed=args.seed),
+            LatencyModel(args.bq_latency_ms, args.bq_sigma, seed=args.seed + 1),
+            llm_failure_rate=args.llm_failure_rate, bq_failure_rate=args.bq_failure_rate, rows=args.rows,
+        ))
+        port = _free_port()
+        server, thread = start_local_server(port)
+        stack.callback(thread.join, 5)
+        stack.callback(setattr, server, "should_exit", True)
+        base_url = f"http://127.0.0.1:{port}"
+
+    levels = []
+    with stack:
+        print(f"🚦 Load testing {base_url}/api/chat, ramp {ramp}, {args.stage_duration:.0f}s per level", file=out)
+        print(f"{'users':>6}{'req':>7}{'rps':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}", file=out)
+        for concurrency in ramp:
+            level = asyncio.run(run_stage(
+                base_url, concurrency, args.stage_duration, conversations, args.think_time, args.timeout, args.seed,
+                args.protocol,
+            ))
+            levels.append(level)
+            lat = level["latency"]
+            print(
+                f"{concurrency:>6}{level['requests']:>7}{level['throughput_rps']:>8.2f}"
+                f"{lat.get('p50', 0) * 1000:>10.0f}{lat.get('p95', 0) * 1000:>10.0f}{lat.get('p99', 0) * 1000:>10.0f}"
+                f"{level['error_rate']:>9.1%}",
+                file=out,
+            )
+
+    report = {
+        "target": base_url if args.url else "in-process (stubbed LLM/BigQuery)",
+        "config": vars(args),
+        "levels": levels,
+        "saturation_concurrency": find_saturation(levels),
+        "max_concurrency_within_slo": max_concurrency_within_slo(levels, args.slo_p95_ms, args.max_error_rate),
+        "peak_throughput_rps": max((level["throughput_rps"] for level in levels), default=0.0),
+    }
+    print(f"\n📈 Peak throughput: {report['peak_throughput_rps']:.2f} req/s", file=out)
+    print(f"🧱 Saturation point: {report['saturation_concurrency'] or 'not reached'} concurrent users", file=out)
+    print(f"🎯 Max users within SLO (p95 <= {args.slo_p95_ms:.0f}ms, errors <= {args.max_error_rate:.0%}): "
+          f"{report['max_concurrency_within_slo']}", file=out)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 Report written to {args.output}", file=out)
+
+
+if __name__ == "__main__":
+    main()
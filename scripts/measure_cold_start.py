@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Add project root to sys.path
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+# Runs in a fresh interpreter per sample so nothing is already imported or cached.
+PROBE = r"""
+import contextlib, io, json, sys, time
+sys.path.insert(0, {root!r})
+timings = {{}}
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    import app.api.main as main
+timings["import_s"] = time.perf_counter() - start
+
+from fastapi.testclient import TestClient
+from packages.bench.fakes import LatencyModel, stub_backends
+
+with contextlib.redirect_stdout(io.StringIO()), TestClient(main.app) as client:
+    t = time.perf_counter()
+    client.get("/health")
+    timings["first_health_s"] = time.perf_counter() - t
+    # First chat request with the LLM/BigQuery calls stubbed out: measures the app's own cold path
+    with stub_backends(LatencyModel(0), LatencyModel(0)):
+        t = time.perf_counter()
+        client.post("/api/chat", json={{"messages": [{{"role": "user", "content": "운송 모드별 파손율 통계"}}]}})
+        timings["first_chat_s"] = time.perf_counter() - t
+    if {warm_up}:
+        from app.core import clients
+        t = time.perf_counter()
+        clients.warm_up()
+        timings["warm_up_s"] = time.perf_counter() - t
+timings["time_to_first_request_s"] = time.perf_counter() - start
+print(json.dumps(timings))
+"""
+
+
+def run_probe(warm_up: bool) -> dict:
+    code = PROBE.format(root=PROJECT_ROOT, warm_up=warm_up)
+    out = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def heaviest_imports(module: str, top: int):
+    """(cumulative seconds, module) for the slowest imports reported by `python -X importtime`."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=PROJECT_ROOT,
+                         capture_output=True, text=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time:  <self us> | <cumulative us> | <indented module name>"
+        _, cumulative_us, name = [part.strip() for part in line.split(":", 1)[1].split("|")]
+        rows.append((int(cumulative_us) / 1e6, name))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure API import time and time-to-first-request in fresh processes.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warm-up", action="store_true",
+                        help="Also time clients.warm_up() (creates the Vertex AI and BigQuery clients)")
+    parser.add_argument("--top", type=int, default=10, help="Show the N slowest imports (-X importtime)")
+    parser.add_argument("--output", default=None, help="Write the JSON results here")
+    args = parser.parse_args()
+
+    samples = [run_probe(args.warm_up) for _ in range(args.runs)]
+    results = {key: statistics.median(s[key] for s in samples) for key in samples[0]}
+
+    print(f"⏱️ Cold start over {args.runs} fresh processes (median):")
+    for key, value in results.items():
+        print(f"  {key:<26}{value * 1000:>10.0f} ms")
+
+    if args.top:
+        print(f"\n🐢 Slowest imports of app.api.main (cumulative):")
+        for seconds, name in heaviest_imports("app.api.main", args.top):
+            print(f"  {seconds * 1000:>8.0f} ms  {name}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"runs": args.runs, "median": results, "samples": samples}, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
 
 from google.cloud import bigquery
+import argparse
+import re
+import shutil
 import sys
 import os
 
@@ -7,33 +10,15 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from app.core.config import settings
+from packages.bq_wrapper.local_engine import translate_bigquery_sql, write_manifest
 
-def sync_whitepaper_mart():
+RAW_TABLES = ["corning_transport", "corning_merged", "view_category"]
+
+def get_mart_tasks(dataset_id):
     """
-    Builds the Advanced Data Mart defined in the Whitepaper.
-    FIXED: Syntax errors in BigQuery SQL (Comment interference, alias visibility).
+    Returns the mart build tasks (CREATE OR REPLACE TABLE statements) in dependency order.
+    Shared by the BigQuery build and the local DuckDB build (build_local_marts).
     """
-    client = bigquery.Client(project=settings.PROJECT_ID)
-    dataset_id = f"{settings.PROJECT_ID}.{settings.DATASET_ID}"
-    
-    print(f"🚀 Building Whitepaper Data Mart in: {dataset_id}")
-    
-    # Check dataset existence
-    try:
-        client.get_dataset(dataset_id)
-    except:
-        print(f"Error: Dataset {dataset_id} not found.")
-        return
-
-    # Drop existing tables to avoid clustering spec conflicts
-    tables_to_drop = ["mart_sensor_detail"]  # Tables with changed clustering
-    for table_name in tables_to_drop:
-        try:
-            client.delete_table(f"{dataset_id}.{table_name}", not_found_ok=True)
-            print(f"🗑️ Dropped existing table: {table_name}")
-        except Exception as e:
-            print(f"Warning: Could not drop {table_name}: {e}")
-
     # 1. Mart Logistics Master
     q_master = f"""
     CREATE OR REPLACE TABLE `{dataset_id}.mart_logistics_master`
@@ -203,6 +188,36 @@ def sync_whitepaper_mart():
         }
     ]
 
+    return tasks
+
+def sync_whitepaper_mart():
+    """
+    Builds the Advanced Data Mart defined in the Whitepaper.
+    FIXED: Syntax errors in BigQuery SQL (Comment interference, alias visibility).
+    """
+    client = bigquery.Client(project=settings.PROJECT_ID)
+    dataset_id = f"{settings.PROJECT_ID}.{settings.DATASET_ID}"
+    
+    print(f"🚀 Building Whitepaper Data Mart in: {dataset_id}")
+    
+    # Check dataset existence
+    try:
+        client.get_dataset(dataset_id)
+    except:
+        print(f"Error: Dataset {dataset_id} not found.")
+        return
+
+    # Drop existing tables to avoid clustering spec conflicts
+    tables_to_drop = ["mart_sensor_detail"]  # Tables with changed clustering
+    for table_name in tables_to_drop:
+        try:
+            client.delete_table(f"{dataset_id}.{table_name}", not_found_ok=True)
+            print(f"🗑️ Dropped existing table: {table_name}")
+        except Exception as e:
+            print(f"Warning: Could not drop {table_name}: {e}")
+
+    tasks = get_mart_tasks(dataset_id)
+
     for task in tasks:
         name = task["table_name"]
         query = task["query"]
@@ -219,5 +234,133 @@ def sync_whitepaper_mart():
         except Exception as e:
             print(f"❌ Failed to build {name}: {e}")
 
+    if settings.LOCAL_ENGINE_ENABLED:
+        export_mart_snapshots(client, dataset_id)
+
+def export_mart_snapshots(client, dataset_id, snapshot_dir=None, tables=None):
+    """
+    Exports the small/rollup marts to local Parquet so the embedded engine
+    (packages/bq_wrapper/local_engine.py) can answer eligible queries without a BigQuery job.
+    Files are written to a temp path and swapped in atomically; the manifest is written last.
+    """
+    import pyarrow.parquet as pq
+
+    snapshot_dir = snapshot_dir or settings.LOCAL_SNAPSHOT_DIR
+    tables = tables or settings.LOCAL_SNAPSHOT_TABLES
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    row_counts = {}
+    for name in tables:
+        print(f"💾 Exporting snapshot of {name}...")
+        try:
+            arrow_table = client.list_rows(f"{dataset_id}.{name}").to_arrow()
+            path = os.path.join(snapshot_dir, f"{name}.parquet")
+            pq.write_table(arrow_table, path + ".tmp", compression="zstd")
+            os.replace(path + ".tmp", path)
+            row_counts[name] = arrow_table.num_rows
+            print(f"   -> {arrow_table.num_rows} rows -> {path}")
+        except Exception as e:
+            print(f"❌ Failed to export {name}: {e}")
+
+    if row_counts:
+        write_manifest(snapshot_dir, row_counts)
+
+def build_local_marts(raw_dir, snapshot_dir=None):
+    """
+    Builds every mart with DuckDB from local raw Parquet (e.g. scripts/generate_synthetic_data.py output)
+    using the same SQL as the BigQuery build, and writes them as local engine snapshots.
+    Results are streamed to Parquet with COPY so memory stays bounded for large inputs.
+    """
+    import duckdb
+
+    snapshot_dir = snapshot_dir or settings.LOCAL_SNAPSHOT_DIR
+    dataset_id = f"{settings.PROJECT_ID}.{settings.DATASET_ID}"
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    print(f"🚀 Building marts locally from {raw_dir} -> {snapshot_dir}")
+    conn = duckdb.connect()
+    conn.execute("SET preserve_insertion_order = false")
+    for name in RAW_TABLES:
+        conn.execute(
+            f"CREATE VIEW {name} AS SELECT * FROM "
+            f"read_parquet('{os.path.join(raw_dir, name)}/**/*.parquet', hive_partitioning = true)"
+        )
+
+    row_counts = {}
+    for task in get_mart_tasks(dataset_id):
+        name = task["table_name"]
+        print(f"🏗️ Building {name} ({task['description']})...")
+        # CREATE OR REPLACE TABLE <name> AS <select>  ->  COPY (<select>) TO <snapshot>
+        select_sql = re.sub(
+            r"^\s*CREATE\s+OR\s+REPLACE\s+TABLE\s+\S+\s+AS\b", "",
+            translate_bigquery_sql(task["query"]), flags=re.IGNORECASE,
+        )
+        path = os.path.join(snapshot_dir, name)
+        shutil.rmtree(path, ignore_errors=True)
+        if name == "mart_sensor_detail":
+            # Granular logs: partitioned like the BigQuery table
+            conn.execute(f"COPY ({select_sql}) TO '{path}' (FORMAT PARQUET, COMPRESSION ZSTD, PARTITION_BY (event_date))")
+            source = f"{path}/**/*.parquet"
+        else:
+            conn.execute(f"COPY ({select_sql}) TO '{path}.parquet' (FORMAT PARQUET, COMPRESSION ZSTD)")
+            source = f"{path}.parquet"
+        # Later marts (e.g. mart_quality_matrix) read from the ones written before them
+        conn.execute(f"CREATE OR REPLACE VIEW {name} AS SELECT * FROM read_parquet('{source}', hive_partitioning = true)")
+        row_counts[name] = conn.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+        print(f"✅ {name} built successfully.\n   -> Rows: {row_counts[name]}")
+
+    write_manifest(snapshot_dir, row_counts, source=f"local:{raw_dir}")
+    return row_counts
+
+def refresh_schema_catalog():
+    """Reloads the schema catalog (columns, row counts, partitions, column values) of the rebuilt marts."""
+    from packages.bq_wrapper.schema import schema_catalog
+
+    print("📚 Refreshing schema catalog...")
+    try:
+        catalog = schema_catalog.refresh(force=True)
+        print(f"✅ Schema catalog: {len(catalog['tables'])} tables -> {settings.SCHEMA_CATALOG_PATH}")
+    except Exception as e:
+        print(f"❌ Failed to refresh schema catalog: {e}")
+
+def refresh_entities():
+    """Reloads the ports, modes, products and carriers the entity resolver matches from the new marts."""
+    from app.core.entities import entity_resolver
+    from packages.bq_wrapper.client import bq_client
+
+    print("🔤 Refreshing entity catalog...")
+    counts = entity_resolver.refresh(bq_client.run_query)
+    print(f"✅ Entity catalog: {', '.join(f'{count} {kind}' for kind, count in counts.items())} "
+          f"-> {settings.ENTITY_CATALOG_PATH}")
+
+def warm_suggestions():
+    """Recomputes the suggestion answers over the freshly built marts (within the BigQuery cost guard)."""
+    from app.agents.orchestrator import Orchestrator
+    from app.core.suggestions import suggestion_warmer
+
+    print("🔥 Warming suggestion answers...")
+    summary = suggestion_warmer(Orchestrator()).warm()
+    print(f"✅ Warmed {len(summary['warmed'])}/{len(settings.SUGGESTIONS)} suggestions "
+          f"({summary['bytes_processed'] / 1e9:.2f} GB processed)")
+    for question in summary["failed"]:
+        print(f"❌ Failed: {question}")
+    for question in summary["skipped"]:
+        print(f"⏭️ Skipped (bytes budget): {question}")
+
 if __name__ == "__main__":
-    sync_whitepaper_mart()
+    parser = argparse.ArgumentParser(description="Build the Whitepaper data marts.")
+    parser.add_argument("--local", metavar="RAW_DIR", help="Build marts with DuckDB from local raw Parquet instead of BigQuery")
+    parser.add_argument("--snapshot-dir", default=None, help="Where local mart snapshots are written")
+    parser.add_argument("--no-warm", action="store_true", help="Don't precompute the suggestion answers afterwards")
+    args = parser.parse_args()
+
+    if args.local:
+        build_local_marts(args.local, args.snapshot_dir)
+    else:
+        sync_whitepaper_mart()
+        refresh_schema_catalog()
+
+    refresh_entities()
+
+    if not args.no_warm:
+        warm_suggestions()
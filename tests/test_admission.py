@@ -0,0 +1,114 @@
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from fastapi.testclient import TestClient
+
+    from app.api import routes
+    from app.api.main import app
+    from app.core import cancellation
+    from app.core.admission import AdmissionController, Overloaded, StageLimiter, stage_has_capacity
+
+
+def test_requests_beyond_the_bounded_queue_are_rejected_with_retry_after():
+    admission = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout_s=5)
+
+    async def scenario():
+        release, admitted = asyncio.Event(), []
+
+        async def request(name):
+            async with admission.admit():
+                admitted.append(name)
+                await release.wait()
+
+        first = asyncio.create_task(request("first"))
+        await asyncio.sleep(0.01)
+        queued = asyncio.create_task(request("queued"))
+        await asyncio.sleep(0.01)
+        with pytest.raises(Overloaded) as rejected:
+            await request("rejected")
+        assert admitted == ["first"] and admission._waiting == 1
+
+        release.set()
+        await asyncio.gather(first, queued)
+        return admitted, rejected.value
+
+    admitted, rejected = asyncio.run(scenario())
+    assert admitted == ["first", "queued"]
+    assert rejected.reason == "queue full" and rejected.retry_after >= 1
+
+
+def test_queued_requests_give_up_after_the_queue_timeout():
+    admission = AdmissionController(max_concurrent=1, max_queue=5, queue_timeout_s=0.05)
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def hold():
+            async with admission.admit():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0.01)
+        try:
+            async with admission.admit():
+                pass
+        finally:
+            release.set()
+            await holder
+
+    with pytest.raises(Overloaded, match="queue timeout"):
+        asyncio.run(scenario())
+    assert admission._waiting == 0 and admission._running == 0
+
+
+def test_chat_endpoint_answers_429_with_retry_after_when_overloaded(monkeypatch):
+    admission = AdmissionController(max_concurrent=1, max_queue=0, queue_timeout_s=5)
+    monkeypatch.setattr(admission, "_semaphore", lambda: asyncio.Semaphore(0))  # every slot taken
+    monkeypatch.setattr(routes, "request_admission", admission)
+
+    response = TestClient(app).post("/api/chat", json={"messages": [{"role": "user", "content": "운송 건수"}]})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_stage_limiter_reports_capacity_and_never_waits_past_the_deadline():
+    limiter = StageLimiter("test", 2)
+    assert limiter.has_capacity() and stage_has_capacity("llm")
+
+    release, holding = threading.Event(), threading.Barrier(3)
+
+    def hold():
+        with limiter.slot():
+            holding.wait(1)
+            release.wait(1)
+
+    holders = [threading.Thread(target=hold) for _ in range(2)]
+    for thread in holders:
+        thread.start()
+    holding.wait(1)
+    assert not limiter.has_capacity()  # speculation would be skipped now
+
+    with cancellation.scope(0.05), pytest.raises(cancellation.Cancelled, match=cancellation.DEADLINE_EXCEEDED):
+        with limiter.slot():
+            pass
+    release.set()
+    for thread in holders:
+        thread.join()
+    assert limiter.has_capacity()
+
+    # An already cancelled request does not queue at all
+    cancelled = cancellation.CancelScope()
+    cancelled.cancel("cancelled by client")
+    with cancellation.active(cancelled), pytest.raises(cancellation.Cancelled):
+        with limiter.slot():
+            pass
+    assert limiter.has_capacity()
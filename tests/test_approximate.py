@@ -0,0 +1,81 @@
+import contextlib
+import io
+import os
+import sys
+from unittest.mock import MagicMock
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from app.agents import sql_agent
+    from packages.bq_wrapper import approximate
+
+SENSOR = "`willog-prod-data-gold.rag.mart_sensor_detail`"
+TABLES = ["mart_sensor_detail"]
+RATIO = (f"SELECT transport_mode, SAFE_DIVIDE(COUNTIF(shock_g >= 5), COUNT(*)) * 100 AS shock_ratio, "
+         f"COUNT(*) AS logs FROM {SENSOR} s WHERE s.event_date >= '2025-11-01' GROUP BY 1 ORDER BY 2 DESC")
+
+
+def test_eligible_aggregates_are_rewritten_and_others_run_exactly():
+    plan = approximate.plan(RATIO, TABLES, sample_percent=5, replicates=8)
+    assert plan["method"] == "sample"
+    assert f"{SENSOR} s TABLESAMPLE SYSTEM (5 PERCENT) WHERE" in plan["sql"]
+    assert plan["sql"].rstrip().endswith("GROUP BY 1, _replicate") and "ORDER BY" not in plan["sql"]
+    assert [c["kind"] for c in plan["columns"]] == ["group", "ratio", "additive"]
+
+    distinct = approximate.plan(f"SELECT COUNT(DISTINCT code) AS n FROM {SENSOR} WHERE temperature < 0", TABLES)
+    assert distinct["method"] == "sketch" and "APPROX_COUNT_DISTINCT( code)" in distinct["sql"]
+
+    for sql in [f"SELECT MAX(shock_g) AS m FROM {SENSOR}",
+                f"SELECT COUNT(*) AS n FROM {SENSOR} GROUP BY code ORDER BY n DESC LIMIT 5",
+                f"SELECT COUNT(*) FROM {SENSOR}",
+                "SELECT COUNT(*) AS n FROM `willog-prod-data-gold.rag.mart_logistics_master`"]:
+        assert approximate.plan(sql, TABLES) is None, sql
+
+
+def test_aggregates_scaled_by_constants_stay_additive():
+    plan = approximate.plan(f"SELECT transport_mode, SUM(shock_g)/1000 AS total_k, COUNT(*) / 7 AS per_day, "
+                            f"SAFE_DIVIDE(SUM(shock_g), 1000) AS safe_k, ROUND(SUM(shock_g) * 100 / COUNT(*), 1) "
+                            f"AS mean_x100, SUM(shock_g) / NULLIF(COUNT(*), 0) AS mean FROM {SENSOR} GROUP BY 1",
+                            TABLES)
+    assert [c["kind"] for c in plan["columns"]] == ["group", "additive", "additive", "additive", "ratio", "ratio"]
+
+
+def test_replicates_combine_into_scaled_estimates_with_intervals():
+    plan = approximate.plan(RATIO, TABLES, sample_percent=10, replicates=10)
+    rng = np.random.default_rng(0)
+    # 10% sample of 1,000,000 ocean logs with a 2% ratio, split into 10 replicates
+    raw = pd.DataFrame({
+        "transport_mode": "ocean", "_replicate": range(10),
+        "shock_ratio": 2 + rng.normal(0, 0.1, 10), "logs": 10_000 + rng.normal(0, 100, 10).round(),
+    })
+    result = approximate.combine(raw, plan)
+    assert list(result.columns) == ["transport_mode", "shock_ratio", "shock_ratio_ci_low", "shock_ratio_ci_high",
+                                    "logs", "logs_ci_low", "logs_ci_high"]
+    row = result.iloc[0]
+    assert row["shock_ratio_ci_low"] < 2 < row["shock_ratio_ci_high"]
+    assert row["logs_ci_low"] < 1_000_000 < row["logs_ci_high"]
+
+
+def test_sql_agent_runs_the_approximate_rewrite_when_asked(monkeypatch):
+    bq = MagicMock(available=True)
+    bq.run_query.return_value = pd.DataFrame({
+        "transport_mode": ["ocean"] * 10, "shock_ratio": [2.0] * 10, "logs": [100] * 10, "_replicate": range(10),
+    })
+    monkeypatch.setattr(sql_agent, "bq_client", bq)
+    agent = sql_agent.SQLAgent()
+    agent.synthesis_chain = MagicMock()
+    agent.synthesis_chain.invoke.return_value = "해상 운송 충격 비율은 약 2%입니다."
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = agent.process_query("해상 5G 이상 충격 비율", generated_sql=RATIO, approximate=True)
+    assert "TABLESAMPLE" in bq.run_query.call_args.args[0]
+    assert result["result"]["logs"].tolist() == [10_000.0]
+    assert result["approximation"]["method"] == "sample" and "95% 신뢰구간" in result["natural_response"]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        agent.process_query("해상 5G 이상 충격 비율", generated_sql=RATIO)
+    assert bq.run_query.call_args.args[0] == RATIO
@@ -0,0 +1,101 @@
+import contextlib
+import copy
+import io
+import json
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from app.core.config import settings
+    from packages.bench.cassette import Cassette, CassetteMiss, cassette_key
+    from packages.bench.fakes import LatencyModel, stub_backends
+    from packages.bench.harness import compare_reports, frames_match, run_corpus
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+# Recorded from packages.bench.fakes.stub_backends (run_corpus in record mode), so it replays offline
+SMOKE_CASSETTE = os.path.join(ROOT, "benchmarks", "cassettes", "smoke.json")
+SMOKE_CORPUS = os.path.join(ROOT, "benchmarks", "smoke_corpus.json")
+SQL_QUESTION = {"id": "sql-1", "question": "상하이행 운송 건수 통계", "expected_agent": "SQL_AGENT"}
+
+
+def test_stages_on_speculation_threads_are_recorded(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "SPECULATIVE_SQL", "on")
+    cassette = Cassette(str(tmp_path / "cassette.json"), mode="record")
+    with stub_backends(LatencyModel(20, sigma=0), LatencyModel(0)):
+        report = run_corpus([SQL_QUESTION], cassette)
+    [record] = report["questions"]
+    assert record["error"] is None and record["agent_match"]
+    assert {"router", "sql_generation", "sql_execution", "synthesis"} <= set(record["stages"])
+    assert report["summary"]["stages"]["sql_generation"]["count"] == 1
+
+
+def _smoke_corpus():
+    with open(SMOKE_CORPUS, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_cassette_keys_are_stable():
+    payload = {"question": "상하이행 파손율", "chat_history": "", "current_date": "2026-01-01"}
+    # Committed cassettes are keyed by this hash: changing how it is computed invalidates all of them
+    assert cassette_key(payload) == "188ad3e76c9315c9bd710711"
+    assert cassette_key({"current_date": "2027-12-31", "chat_history": "", "question": "상하이행 파손율"}) == \
+        cassette_key(payload)
+    assert cassette_key("SELECT 1") == cassette_key("  SELECT\n    1 ") == "b57001b2119079ff31e7e898"
+    assert cassette_key({**payload, "question": "호치민행 파손율"}) != cassette_key(payload)
+
+
+def test_committed_cassette_replays_offline():
+    report = run_corpus(_smoke_corpus(), Cassette(SMOKE_CASSETTE), concurrency=2)
+    summary = report["summary"]
+    assert summary["errors"] == 0
+    assert summary["agent_match"] == {"checked": 3, "matched": 3}
+    assert summary["sql_match"] == summary["result_match"] == {"checked": 1, "matched": 1}
+
+
+def test_recorded_responses_replay_identically(tmp_path):
+    path = str(tmp_path / "cassette.json")
+    with stub_backends(LatencyModel(0), LatencyModel(0)):
+        recorded = run_corpus(_smoke_corpus(), Cassette(path, mode="record"))
+    replayed = run_corpus(_smoke_corpus(), Cassette(path))
+
+    def answers(report):
+        return [(r["id"], r["agent"], r["sql"], r["rows"], r["error"]) for r in report["questions"]]
+
+    assert answers(replayed) == answers(recorded)
+    frame = Cassette(path).lookup("sql_execution", recorded["questions"][0]["sql"])["response"]
+    assert isinstance(frame, pd.DataFrame) and len(frame) == recorded["questions"][0]["rows"]
+    with pytest.raises(CassetteMiss):
+        Cassette(path).lookup("router", {"question": "녹화되지 않은 질문"})
+
+
+def test_frames_match_ignores_names_row_order_and_float_noise():
+    expected = pd.DataFrame({"mode": ["air", "ocean"], "rate": [0.1, 0.2]})
+    assert frames_match(pd.DataFrame({"m": ["ocean", "air"], "r": [0.2 + 1e-12, 0.1]}), expected)
+    assert not frames_match(pd.DataFrame({"mode": ["air", "ocean"], "rate": [0.1, 0.3]}), expected)
+    assert not frames_match(expected.head(1), expected)
+    assert frames_match(None, None) and not frames_match(None, expected)
+
+
+def test_compare_reports_flags_latency_token_and_correctness_regressions():
+    baseline = run_corpus(_smoke_corpus(), Cassette(SMOKE_CASSETTE))
+    lines, regressed = compare_reports(baseline, copy.deepcopy(baseline))
+    assert not regressed and "end_to_end.p50" in lines[1]
+
+    slower = copy.deepcopy(baseline)
+    slower["summary"]["end_to_end"]["p95"] *= 1.5
+    lines, regressed = compare_reports(baseline, slower)
+    assert regressed and any(line.startswith("  end_to_end.p95") and "regression" in line for line in lines)
+
+    wrong = copy.deepcopy(baseline)
+    wrong["summary"]["sql_match"] = {"checked": 1, "matched": 0}
+    assert compare_reports(baseline, wrong)[1]
+
+    more_tokens = copy.deepcopy(baseline)
+    more_tokens["summary"]["prompt_tokens"]["router"] = {"total": 100, "mean": 100}
+    baseline["summary"]["prompt_tokens"]["router"] = {"total": 50, "mean": 50}
+    assert compare_reports(baseline, more_tokens)[1]
@@ -0,0 +1,53 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.ui.chart_reduction import POINTS, bin_points, downsample_series, lttb_indices
+from app.ui.visualization import detect_chart_type
+
+
+def test_lttb_keeps_the_shape_of_long_series():
+    rng = np.random.default_rng(1)
+    y = np.cumsum(rng.normal(size=50_000))
+    y[31_337] += 500  # a single spike must survive
+    kept = lttb_indices(np.arange(len(y), dtype="float64"), y, 500)
+    assert len(kept) == 500 and kept[0] == 0 and kept[-1] == len(y) - 1
+    assert (np.diff(kept) > 0).all() and 31_337 in kept
+
+    df = pd.DataFrame({
+        "event_date": pd.date_range("2025-10-01", periods=len(y), freq="min").astype(str)[::-1],
+        "avg_shock_g": y[::-1],
+        "avg_temperature": rng.normal(size=len(y)),
+    })
+    reduced = downsample_series(df, "event_date", ["avg_shock_g", "avg_temperature"], 500)
+    assert len(reduced) <= 1000 and reduced["event_date"].is_monotonic_increasing
+    assert reduced["avg_shock_g"].max() == df["avg_shock_g"].max()
+
+
+def test_dense_points_are_binned_into_weighted_cells_and_drawn_bounded():
+    rng = np.random.default_rng(2)
+    rows = 40_000
+    df = pd.DataFrame({
+        "lat": rng.normal(31.2, 1.0, rows),
+        "lon": rng.normal(121.5, 1.0, rows),
+        "risk_score": rng.random(rows) * 100,
+        "location_label": "Shanghai",
+    })
+    df.loc[0, "lat"] = np.nan
+    binned = bin_points(df, "lat", "lon", 400)
+    assert len(binned) <= 400 and binned[POINTS].sum() == rows - 1
+    assert binned["risk_score"].between(0, 100).all() and (binned["location_label"] == "Shanghai").all()
+
+    fig = detect_chart_type(df)
+    assert len(fig.data[0].lat) <= 2500 and "cells" in fig.layout.title.text
+
+    series = pd.DataFrame({"event_date": pd.date_range("2025-10-01", periods=rows, freq="min"),
+                           "avg_shock_g": rng.random(rows)})
+    fig = detect_chart_type(series)
+    assert fig.data[0].type == "scattergl" and len(fig.data[0].x) <= 2000
+    small = detect_chart_type(series.head(100))
+    assert small.data[0].type == "scatter" and len(small.data[0].x) == 100
@@ -0,0 +1,59 @@
+import contextlib
+import io
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from fastapi.testclient import TestClient
+
+    from app.agents import sql_agent
+    from app.agents.orchestrator import Orchestrator
+    from app.api.main import app
+    from app.core import cancellation
+    from app.core.config import settings
+    from packages.bench.fakes import LatencyModel, stub_backends
+
+QUESTION = "운송 모드별 파손율 통계"
+
+
+def test_child_scope_inherits_parent_deadline_and_cancellation():
+    parent = cancellation.CancelScope(deadline_s=5)
+    with cancellation.active(parent), cancellation.scope(deadline_s=60) as child:
+        assert child.remaining() <= 5
+        assert cancellation.remaining(1.0) == 1.0
+        parent.cancel(cancellation.CLIENT_DISCONNECTED)
+        assert child.cancelled and child.reason == cancellation.CLIENT_DISCONNECTED
+        with pytest.raises(cancellation.Cancelled):
+            cancellation.check_cancelled()
+    parent.close()
+
+
+def test_chat_deadline_cancels_bigquery_job(monkeypatch):
+    monkeypatch.setattr(settings, "REQUEST_DEADLINE_S", 0.5)
+    client = TestClient(app)
+    with contextlib.redirect_stdout(io.StringIO()), stub_backends(LatencyModel(0), LatencyModel(5000)):
+        fake_bq = sql_agent.bq_client
+        started = time.perf_counter()
+        response = client.post("/api/chat", json={"messages": [{"role": "user", "content": QUESTION}]})
+        elapsed = time.perf_counter() - started
+    assert response.status_code == 504
+    assert elapsed < 2
+    assert fake_bq.cancelled_jobs == 1
+
+
+def test_cancelling_the_caller_scope_stops_the_pipeline():
+    scope = cancellation.CancelScope()
+    threading.Timer(0.3, scope.cancel, [cancellation.CLIENT_DISCONNECTED]).start()
+    with contextlib.redirect_stdout(io.StringIO()), stub_backends(LatencyModel(0), LatencyModel(5000)):
+        fake_bq = sql_agent.bq_client
+        started = time.perf_counter()
+        with cancellation.active(scope), pytest.raises(cancellation.Cancelled):
+            Orchestrator().run(QUESTION)
+    assert time.perf_counter() - started < 1.5
+    assert fake_bq.cancelled_jobs == 1
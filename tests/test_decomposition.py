@@ -0,0 +1,69 @@
+import contextlib
+import io
+import os
+import sys
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from app.agents import sql_agent
+
+MASTER = "`willog-prod-data-gold.rag.mart_logistics_master`"
+DECOMPOSED = f"""```sql
+-- part: 출고 건수
+SELECT COUNT(DISTINCT code) AS departed_count FROM {MASTER} WHERE departure_date BETWEEN '2025-11-01' AND '2025-11-30';
+-- part: 운송 건수
+SELECT COUNT(DISTINCT code) AS active_transport_count FROM {MASTER} WHERE departure_date <= '2025-11-30'
+```"""
+
+
+class SlowBigQuery:
+    available = True
+
+    def __init__(self):
+        self.queries = []
+        self.lock = threading.Lock()
+
+    def run_query(self, sql):
+        with self.lock:
+            self.queries.append(sql)
+        time.sleep(0.3)
+        column = "departed_count" if "BETWEEN" in sql else "active_transport_count"
+        return pd.DataFrame({column: [len(sql)]})
+
+
+def test_comparison_question_runs_sub_queries_concurrently_and_combines_them(monkeypatch):
+    bq = SlowBigQuery()
+    monkeypatch.setattr(sql_agent, "bq_client", bq)
+    agent = sql_agent.SQLAgent()
+    agent.chain = MagicMock()
+    agent.chain.invoke.return_value = DECOMPOSED
+    agent.synthesis_chain = MagicMock()
+    agent.synthesis_chain.invoke.return_value = "출고 1건, 운송 2건입니다."
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = agent.process_query("이번 달 출고 건수와 운송 건수 비교")
+    elapsed = time.perf_counter() - started
+
+    assert "Comparison Questions" in agent.chain.invoke.call_args.args[0]["decomposition"]
+    assert len(bq.queries) == 2 and not any("part:" in q or q.endswith(";") for q in bq.queries)
+    assert elapsed < 0.55  # both 300 ms jobs at once
+    assert list(result["result"].columns) == ["departed_count", "active_transport_count"]
+    assert result["error"] is None
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        agent.process_query("이번 달 출고 건수")
+    assert agent.chain.invoke.call_args.args[0]["decomposition"] == ""
+
+
+def test_parts_with_the_same_columns_are_labelled():
+    same = sql_agent.combine_parts([("10월", pd.DataFrame({"n": [1]})), ("11월", pd.DataFrame({"n": [2]}))])
+    assert list(same.columns) == ["10월 n", "11월 n"]
+    stacked = sql_agent.combine_parts([("air", pd.DataFrame({"d": [1, 2]})), ("truck", pd.DataFrame({"d": [3]}))])
+    assert stacked["part"].tolist() == ["air", "air", "truck"]
@@ -0,0 +1,66 @@
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.core.entities import EntityResolver
+
+
+def _values(resolver, question):
+    return [(e["kind"], e["value"], e["match"]) for e in resolver.resolve(question)]
+
+
+def test_aliases_typos_and_korean_suffixes_resolve_to_codes():
+    resolver = EntityResolver()
+    assert _values(resolver, "Sanghai 출고 건수") == [("port", "CNSHG", "exact")]
+    assert _values(resolver, "Shagnhai 파손율") == [("port", "CNSHG", "fuzzy")]
+    assert _values(resolver, "오사카항으로 가는 화물") == [("port", "JPOSA", "exact")]
+    assert _values(resolver, "샹하이 운송") == [("port", "CNSHG", "fuzzy")]  # jamo: one vowel off
+    assert _values(resolver, "VN SGN 도착 건수와 베트남행 습도") == [
+        ("port", "VNSGN", "exact"), ("country", "Vietnam", "exact"),
+    ]
+    assert _values(resolver, "해상 운송 5G 이상 충격 비율") == [("mode", "ocean", "exact")]
+    # Short codes only in upper case; unrelated words stay unresolved
+    assert _values(resolver, "us 데이터 최근 1주일 High Risk 운송 건") == []
+    # Two-syllable aliases match exactly only: 일반 is not 일본, 선반 is not 선박
+    assert _values(resolver, "일반 화물 파손율 알려줘") == []
+    assert _values(resolver, "선반 포장 충격 건수") == []
+
+    annotation = resolver.annotate(resolver.resolve("상해행 총 운송건수"))
+    assert "destination = 'CNSHG'" in annotation and resolver.annotate([]) == "(none)"
+
+
+def test_refresh_adds_mart_values_and_is_shared_through_the_catalog_file(tmp_path):
+    def run_query(sql):
+        column = sql.split()[2]
+        return pd.DataFrame({"value": {
+            "destination": ["CNSHG", "JPTYO"], "transport_mode": ["air", "truck"],
+            "product": ["Cover Glass", "Smart Glass"], "receive_name": ["Customer A", "Customer B"],
+        }[column]})
+
+    path = str(tmp_path / "entities.json")
+    counts = EntityResolver(path).refresh(run_query)
+    assert counts["port"] == 2 and counts["country"] == 2
+
+    resolver = EntityResolver(path)
+    assert _values(resolver, "JPTYO 파손율") == [("port", "JPTYO", "exact")]
+    assert _values(resolver, "고객사 B 경로의 Smart Glas") == [
+        ("carrier", "Customer B", "exact"), ("product", "Smart Glass", "fuzzy"),
+    ]
+    # Equally close to Customer A and B: no filter rather than a wrong one
+    assert _values(resolver, "customer 현황") == []
+
+
+def test_resolution_is_sub_millisecond():
+    resolver = EntityResolver()
+    questions = ["🇨🇳 중국행 화물 평균 충격 강도", "호찌민으로 항공 운송된 커버글라스의 온도 이탈 건수",
+                 "Lianyungan 과 Ningpo 의 최근 1주일 출고 건수 비교", "포장 타입별 파손율 비교"]
+    resolver.resolve(questions[0])
+    start = time.perf_counter()
+    for _ in range(100):
+        for question in questions:
+            resolver.resolve(question)
+    assert (time.perf_counter() - start) / 400 < 0.001
@@ -0,0 +1,78 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from packages.vectordb.index import BM25Index
+from packages.vectordb.ingest import Ingestor, markdown_sections
+
+GUIDE = """# 운송 가이드
+
+## 동절기 운송 지침
+영하 구간에서는 보온 포장을 사용합니다.
+
+## 충격 대응
+5G 이상 충격이 발생하면 화물 상태를 점검합니다.
+"""
+
+
+def test_markdown_sections_follow_heading_paths():
+    assert markdown_sections(GUIDE) == [
+        ("운송 가이드 > 동절기 운송 지침", "영하 구간에서는 보온 포장을 사용합니다."),
+        ("운송 가이드 > 충격 대응", "5G 이상 충격이 발생하면 화물 상태를 점검합니다."),
+    ]
+
+
+def test_reingestion_only_touches_changed_chunks(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "guide.md").write_text(GUIDE, encoding="utf-8")
+    (docs / "other.md").write_text("# 기타\n\n습도 기준은 60% 이하입니다.\n", encoding="utf-8")
+    index_dir = str(tmp_path / "index")
+    ingestor = Ingestor(str(tmp_path / "store.sqlite3"), index_dir, workers=1)
+
+    first = ingestor.ingest([str(docs)])
+    assert (first["files_parsed"], first["chunks_added"], first["chunks_indexed"]) == (2, 3, 3)
+
+    again = ingestor.ingest([str(docs)])
+    assert (again["files_parsed"], again["files_unchanged"], again["chunks_indexed"]) == (0, 2, None)
+
+    (docs / "guide.md").write_text(GUIDE.replace("5G", "7G"), encoding="utf-8")
+    changed = ingestor.ingest([str(docs)])
+    assert (changed["files_parsed"], changed["chunks_added"], changed["chunks_removed"]) == (1, 1, 1)
+    assert changed["chunks_unchanged"] == 1
+    assert "7G" in BM25Index.load(index_dir).search("충격 대응", k=1)[0]["text"]
+
+    (docs / "other.md").unlink()
+    removed = ingestor.ingest([str(docs)], extra_chunks={"glossary": [{"id": "g", "title": "습도", "text": "습도 정의"}]})
+    assert removed["files_removed"] == 1 and removed["chunks_indexed"] == 3
+    assert BM25Index.load(index_dir).search("습도", k=1)[0]["id"] == "g"
+
+
+def test_unreadable_files_keep_their_chunks_and_are_reported(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "guide.md").write_text(GUIDE, encoding="utf-8")
+    (docs / "other.md").write_text("# 기타\n\n습도 기준은 60% 이하입니다.\n", encoding="utf-8")
+    index_dir = str(tmp_path / "index")
+    ingestor = Ingestor(str(tmp_path / "store.sqlite3"), index_dir)
+    assert ingestor.ingest([str(docs)])["chunks_indexed"] == 3
+
+    # A Markdown file re-saved in CP949 and a PDF pypdf cannot read: the rest of the run still commits
+    (docs / "guide.md").write_bytes(GUIDE.replace("5G", "7G").encode("cp949"))
+    (docs / "broken.pdf").write_bytes(b"not a pdf")
+    (docs / "other.md").write_text("# 기타\n\n습도 기준은 50% 이하입니다.\n", encoding="utf-8")
+    summary = ingestor.ingest([str(docs)])
+    assert sorted(os.path.basename(source) for source in summary["failed"]) == ["broken.pdf", "guide.md"]
+    assert "UnicodeDecodeError" in next(e for s, e in summary["failed"].items() if s.endswith("guide.md"))
+    assert summary["files_parsed"] == 1 and summary["chunks_indexed"] == 3
+
+    index = BM25Index.load(index_dir)
+    assert "5G" in index.search("충격 대응", k=1)[0]["text"]
+    assert "50%" in index.search("습도 기준", k=1)[0]["text"]
+
+    # Fixed files are picked up on the next run
+    (docs / "guide.md").write_text(GUIDE.replace("5G", "7G"), encoding="utf-8")
+    (docs / "broken.pdf").unlink()
+    fixed = ingestor.ingest([str(docs)])
+    assert fixed["failed"] == {} and "7G" in BM25Index.load(index_dir).search("충격 대응", k=1)[0]["text"]
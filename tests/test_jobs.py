@@ -0,0 +1,88 @@
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from fastapi.testclient import TestClient
+
+    from app.agents import sql_agent
+    from app.api.main import app
+    from app.core.jobs import JobManager
+    from packages.bench.fakes import LatencyModel, stub_backends
+
+QUESTION = {"messages": [{"role": "user", "content": "운송 모드별 파손율 통계"}]}
+
+
+def _poll(client, job_id, until, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        body = client.get(f"/api/jobs/{job_id}").json()
+        if until(body):
+            return body
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not reach the expected state: {body}")
+
+
+def test_job_completes_with_partial_and_final_results():
+    client = TestClient(app)
+    with contextlib.redirect_stdout(io.StringIO()), stub_backends(LatencyModel(0), LatencyModel(300)):
+        submitted = client.post("/api/jobs", json=QUESTION)
+        assert submitted.status_code == 202
+        job_id = submitted.json()["job_id"]
+
+        running = _poll(client, job_id, lambda b: b["stage"] == "sql_generated")
+        assert running["status"] == "running"
+        assert "FROM" in running["partial"]["sql"]
+
+        done = _poll(client, job_id, lambda b: b["status"] == "succeeded")
+    assert done["partial"]["rows"] == 10
+    assert done["result"]["agent"] == "SQL_AGENT"
+    assert len(done["result"]["data"]) == 10
+
+
+def test_cancel_stops_job_and_its_bigquery_job():
+    client = TestClient(app)
+    with contextlib.redirect_stdout(io.StringIO()), stub_backends(LatencyModel(0), LatencyModel(5000)):
+        fake_bq = sql_agent.bq_client
+        job_id = client.post("/api/jobs", json=QUESTION).json()["job_id"]
+        _poll(client, job_id, lambda b: b["stage"] == "sql_generated")
+
+        started = time.time()
+        assert client.delete(f"/api/jobs/{job_id}").status_code == 200
+        cancelled = _poll(client, job_id, lambda b: b["status"] == "cancelled")
+    assert time.time() - started < 2
+    assert cancelled["result"] is None
+    assert fake_bq.cancelled_jobs == 1
+
+
+def test_finished_jobs_expire_after_ttl():
+    manager = JobManager(lambda question, chat_history=None: {"text": question}, workers=1, ttl_s=0.05)
+    job = manager.submit("안녕")
+    for _ in range(100):
+        if job.done:
+            break
+        time.sleep(0.01)
+    assert manager.get(job.id) is job
+    time.sleep(0.1)
+    assert manager.get(job.id) is None
+
+
+def test_approximate_jobs_pass_the_flag_and_return_the_approximation(monkeypatch):
+    from app.api import jobs as jobs_api
+    calls = []
+
+    def run(question, chat_history=None, approximate=False):
+        calls.append(approximate)
+        return {"text": "약 3.2%", "data": None, "sql": "SELECT 1", "agent": "SQL_AGENT",
+                "approximation": {"method": "sample", "table": "mart_sensor_detail", "sample_percent": 10.0}}
+
+    monkeypatch.setattr(jobs_api.orchestrator, "run", run)
+    client = TestClient(app)
+    submitted = client.post("/api/jobs", json={**QUESTION, "approximate": True})
+    done = _poll(client, submitted.json()["job_id"], lambda b: b["status"] == "succeeded")
+    assert calls == [True]
+    assert done["result"]["approximation"]["method"] == "sample"
@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from app.core import clients
+from app.core.config import Settings
+from app.core.llm_cache import LLMCache
+from packages.bench.fakes import FakeChatModel, LatencyModel
+
+
+def _chain(handle):
+    return ChatPromptTemplate.from_template("{question}") | handle | StrOutputParser()
+
+
+def test_cached_handle_answers_repeated_prompts_locally(monkeypatch, tmp_path):
+    cache = LLMCache(str(tmp_path / "llm_cache.sqlite3"), ttls={"router": 60})
+    fake = FakeChatModel(LatencyModel(0), respond=lambda prompt: "GENERAL_AGENT")
+    monkeypatch.setattr(clients, "llm_cache", cache)
+    monkeypatch.setattr(clients, "get_llm", lambda *args, **kwargs: fake)
+
+    chain = _chain(clients.llm(temperature=0, cache="router"))
+    assert [chain.invoke({"question": q}) for q in ("안녕", "안녕", "고마워")] == ["GENERAL_AGENT"] * 3
+    assert fake.calls == 2
+    # Different model parameters are a different key
+    _chain(clients.llm(temperature=0, cache="router", max_output_tokens=16)).invoke({"question": "안녕"})
+    assert fake.calls == 3
+
+    stats = cache.stats()["agents"]["router"]
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 3, 3)
+    # Persistent: a new process (new cache object) still hits
+    assert LLMCache(str(tmp_path / "llm_cache.sqlite3")).get("router", clients.cache_key(
+        ChatPromptTemplate.from_template("{question}").invoke({"question": "안녕"}), clients.DEFAULT_MODEL, 0.0, {}
+    )) == {"content": "GENERAL_AGENT"}
+
+
+def test_sampling_handles_are_cached_only_when_opted_in(monkeypatch):
+    # By default no sampling agent is opted in: the general and retrieval agents answer fresh
+    defaults = Settings(_env_file=None)
+    assert defaults.LLM_CACHE_OPT_IN == []
+    monkeypatch.setattr(clients.settings, "LLM_CACHE_OPT_IN", defaults.LLM_CACHE_OPT_IN)
+    assert clients.llm(temperature=0.6, cache="general").cache is None
+    assert clients.llm(temperature=0.2, cache="retrieval").cache is None
+
+    monkeypatch.setattr(clients.settings, "LLM_CACHE_OPT_IN", ["general"])
+    assert clients.llm(temperature=0.6, cache="general").cache == "general"
+    assert clients.llm(temperature=0.2, cache="retrieval").cache is None
+    assert clients.llm(temperature=0, cache="retrieval").cache == "retrieval"
+    assert clients.llm(temperature=0).cache is None
+
+
+def test_ttl_expiry_and_lru_size_eviction():
+    cache = LLMCache(None, max_bytes=200, ttls={"general": 0.05})
+    cache.put("general", "greeting", {"content": "안녕하세요"})
+    time.sleep(0.1)
+    assert cache.get("general", "greeting") is None
+
+    for i in range(10):
+        cache.put("router", f"k{i}", {"content": "SQL_AGENT"})
+        cache.get("router", "k0")  # keep k0 recently used
+    assert cache.stats()["bytes"] <= 200
+    assert cache.get("router", "k0") is not None
+    assert cache.get("router", "k1") is None
+    assert cache.get("router", "k9") is not None
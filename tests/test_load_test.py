@@ -0,0 +1,93 @@
+import asyncio
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import time
+
+import httpx
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from packages.bench.fakes import FakeBigQuery, FakeChain, LatencyModel, SimulatedBackendError
+from scripts.load_test_chat import find_saturation, max_concurrency_within_slo, replay_conversation
+
+CONVERSATION = {"turns": ["지난주 상하이행 파손율", "그중 해상 운송만", "전월과 비교해줘"]}
+
+
+def _level(concurrency, rps, p95_s, error_rate=0.0):
+    return {"concurrency": concurrency, "throughput_rps": rps, "error_rate": error_rate, "latency": {"p95": p95_s}}
+
+
+def test_latency_model_is_seeded_log_normal_with_spikes():
+    samples = [LatencyModel(200, sigma=0.3, seed=1).sample() for _ in range(3)]
+    assert len(set(samples)) == 1  # same seed, same first sample
+
+    model = LatencyModel(200, sigma=0.3, seed=2)
+    delays = [model.sample() for _ in range(4000)]
+    assert statistics.median(delays) == pytest.approx(0.2, rel=0.05)
+    assert statistics.stdev([math.log(d) for d in delays]) == pytest.approx(0.3, rel=0.1)
+    assert LatencyModel(50, sigma=0).sample() == 0.05 and LatencyModel(0).sample() == 0.0
+
+    spiky = LatencyModel(10, sigma=0, spike_rate=0.2, spike_ms=1000, seed=3)
+    spikes = sum(spiky.sample() > 0.5 for _ in range(4000))
+    assert spikes / 4000 == pytest.approx(0.2, abs=0.03)
+
+
+def test_fakes_fail_at_their_configured_rate():
+    chain = FakeChain(lambda payload: "SQL_AGENT", LatencyModel(0, seed=4), failure_rate=0.25)
+    failures = 0
+    for _ in range(2000):
+        try:
+            assert chain.invoke({"question": "q"}) == "SQL_AGENT"
+        except SimulatedBackendError:
+            failures += 1
+    assert failures / 2000 == pytest.approx(0.25, abs=0.03)
+
+    bq = FakeBigQuery(LatencyModel(0, seed=5), failure_rate=1.0, rows=3)
+    with pytest.raises(SimulatedBackendError):
+        bq.run_query("SELECT 1")
+    assert len(FakeBigQuery(LatencyModel(0), rows=3).run_query("SELECT 1")) == 3
+
+
+def test_saturation_and_slo_limits_of_a_ramp():
+    levels = [_level(1, 2.0, 0.8), _level(2, 3.9, 0.9), _level(4, 7.5, 1.2), _level(8, 8.0, 3.5),
+              _level(16, 8.1, 9.0, error_rate=0.02)]
+    assert find_saturation(levels) == 4  # 4 -> 8 users adds under 10% throughput
+    assert find_saturation(levels[:3]) is None
+    assert max_concurrency_within_slo(levels, slo_p95_ms=4000, max_error_rate=0.01) == 8
+    assert max_concurrency_within_slo(levels, slo_p95_ms=10000, max_error_rate=0.05) == 16
+    assert max_concurrency_within_slo(levels, slo_p95_ms=500, max_error_rate=0.01) is None
+
+
+def _replay(protocol):
+    payloads = []
+
+    def handler(request):
+        payloads.append(json.loads(request.content))
+        return httpx.Response(200, json={"answer": f"answer {len(payloads)}", "session_id": "s-1"})
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://test") as client:
+            results = []
+            await replay_conversation(client, CONVERSATION, time.monotonic() + 60, results, 0, 5, random.Random(0),
+                                      protocol)
+            return results
+
+    results = asyncio.run(run())
+    assert [status for _, status in results] == [200] * len(payloads)
+    return payloads
+
+
+def test_virtual_users_send_only_the_new_message_in_session_mode():
+    assert _replay("session") == [
+        {"message": "지난주 상하이행 파손율"},
+        {"message": "그중 해상 운송만", "session_id": "s-1"},
+        {"message": "전월과 비교해줘", "session_id": "s-1"},
+    ]
+    legacy = _replay("messages")
+    assert [len(payload["messages"]) for payload in legacy] == [1, 3, 5]
+    assert legacy[-1]["messages"][1] == {"role": "assistant", "content": "answer 1"}
@@ -0,0 +1,91 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from packages.bq_wrapper.local_engine import (
+    LocalEngine,
+    translate_bigquery_sql,
+    write_manifest,
+)
+from packages.bq_wrapper.sql_lexer import referenced_tables
+
+duckdb = pytest.importorskip("duckdb")
+
+
+def test_translate_dialect_functions():
+    sql = """
+    SELECT transport_mode,
+        SAFE_DIVIDE(COUNTIF(risk_level IN ('High', "Critical")), COUNT(*)) as ratio
+    FROM `willog-prod-data-gold.rag.mart_logistics_master`
+    WHERE departure_date >= DATE_SUB(DATE_TRUNC(CURRENT_DATE(), MONTH), INTERVAL 7 DAY)
+    GROUP BY 1
+    """
+    translated = translate_bigquery_sql(sql)
+    assert "SAFE_DIVIDE" not in translated
+    assert "COUNT_IF(risk_level IN ('High', 'Critical'))" in translated
+    assert "DATE_TRUNC('month', CURRENT_DATE())" in translated
+    assert "FROM mart_logistics_master" in translated
+
+
+def test_translate_ignores_function_names_in_literals():
+    translated = translate_bigquery_sql("SELECT 'SAFE_DIVIDE(a, b)' as label FROM t")
+    assert "'SAFE_DIVIDE(a, b)'" in translated
+
+
+def test_translate_drops_ddl_options():
+    sql = "CREATE OR REPLACE TABLE `p.d.m` PARTITION BY d CLUSTER BY a, b AS SELECT 1 as x"
+    assert translate_bigquery_sql(sql) == "CREATE OR REPLACE TABLE m AS SELECT 1 as x"
+
+
+def test_referenced_tables_excludes_ctes():
+    sql = """
+    WITH base AS (SELECT * FROM `willog-prod-data-gold.rag.mart_quality_matrix`)
+    SELECT * FROM base JOIN rag.mart_risk_heatmap h ON TRUE
+    """
+    assert referenced_tables(sql) == {"mart_quality_matrix", "mart_risk_heatmap"}
+
+
+def test_local_engine_runs_eligible_queries(tmp_path):
+    df = pd.DataFrame({
+        "transport_mode": ["air", "air", "truck"],
+        "package_type": ["box", "pallet", "box"],
+        "damage_rate": [0.1, 0.0, 0.3],
+    })
+    df.to_parquet(tmp_path / "mart_quality_matrix.parquet")
+    write_manifest(str(tmp_path), {"mart_quality_matrix": len(df)})
+
+    engine = LocalEngine(str(tmp_path), tables=["mart_quality_matrix", "mart_risk_heatmap"])
+    sql = """
+    SELECT transport_mode, COUNTIF(damage_rate > 0) as damaged
+    FROM `willog-prod-data-gold.rag.mart_quality_matrix`
+    GROUP BY 1 ORDER BY 1
+    """
+    assert engine.can_run(sql)
+    result = engine.run_query(sql)
+    assert result["damaged"].tolist() == [1, 1]
+
+    # Tables without a snapshot and unsupported constructs stay on BigQuery
+    assert not engine.can_run("SELECT * FROM `willog-prod-data-gold.rag.mart_sensor_detail`")
+    assert not engine.can_run(
+        "SELECT APPROX_QUANTILES(damage_rate, 4) FROM `willog-prod-data-gold.rag.mart_quality_matrix`"
+    )
+
+
+def test_week_truncation_starts_on_sunday_like_bigquery(tmp_path):
+    # 2025-11-02 is a Sunday: BigQuery's WEEK starts there, DuckDB's 'week' on Monday 2025-11-03
+    df = pd.DataFrame({"code": ["a", "b", "c", "d"],
+                       "departure_date": pd.to_datetime(["2025-11-01", "2025-11-02", "2025-11-03", "2025-11-08"])})
+    df.to_parquet(tmp_path / "mart_logistics_master.parquet")
+    write_manifest(str(tmp_path), {"mart_logistics_master": len(df)})
+
+    engine = LocalEngine(str(tmp_path), tables=["mart_logistics_master"])
+    result = engine.run_query(
+        "SELECT code, DATE_TRUNC(departure_date, WEEK) AS week, DATE_TRUNC(departure_date, ISOWEEK) AS isoweek "
+        "FROM `willog-prod-data-gold.rag.mart_logistics_master` ORDER BY code"
+    )
+    assert [str(d)[:10] for d in result["week"]] == ["2025-10-26", "2025-11-02", "2025-11-02", "2025-11-02"]
+    assert [str(d)[:10] for d in result["isoweek"]] == ["2025-10-27", "2025-10-27", "2025-11-03", "2025-11-03"]
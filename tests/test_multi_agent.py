@@ -0,0 +1,59 @@
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from app.agents import sql_agent
+    from app.agents.orchestrator import Orchestrator
+    from app.agents.router import SQL_AND_RETRIEVAL
+    from app.core.config import settings
+    from packages.bench.fakes import LatencyModel, stub_backends
+
+QUESTION = "지난주 파손율과 그 기준을 알려줘"
+
+
+def _timed(question):
+    started = time.perf_counter()
+    result = Orchestrator().run(question, precomputed=False)
+    return result, time.perf_counter() - started
+
+
+def test_mixed_question_runs_sql_and_retrieval_concurrently(monkeypatch):
+    monkeypatch.setattr(settings, "SPECULATIVE_SQL", "off")
+    with contextlib.redirect_stdout(io.StringIO()), stub_backends(LatencyModel(300, sigma=0), LatencyModel(0)):
+        result, elapsed = _timed(QUESTION)
+    assert result["agent"] == SQL_AND_RETRIEVAL and result["sql"]
+    assert "운송 모드별" in result["text"] and "📘 기준 및 정의" in result["text"]
+    # routing + max(generation + synthesis, retrieval) = 900 ms, not the 1.2 s of both agents in turn
+    assert elapsed < 1.15
+
+
+def test_slow_branch_is_cut_at_its_deadline(monkeypatch):
+    monkeypatch.setattr(settings, "SPECULATIVE_SQL", "off")
+    monkeypatch.setattr(settings, "AGENT_BRANCH_DEADLINE_S", 0.5)
+    with contextlib.redirect_stdout(io.StringIO()), stub_backends(LatencyModel(50, sigma=0), LatencyModel(5000)):
+        fake_bq = sql_agent.bq_client
+        result, elapsed = _timed(QUESTION)
+    assert elapsed < 2 and fake_bq.cancelled_jobs == 1
+    assert result["sql"] is None and "📘 기준 및 정의" in result["text"]
+    assert "데이터 조회 결과를 시간 내에 받지 못했습니다" in result["text"]
+
+
+def test_background_jobs_give_branches_the_job_deadline(monkeypatch):
+    from app.core.jobs import JobManager
+
+    monkeypatch.setattr(settings, "SPECULATIVE_SQL", "off")
+    monkeypatch.setattr(settings, "AGENT_BRANCH_DEADLINE_S", 0.5)
+    manager = JobManager(lambda question, chat_history=None: Orchestrator().run(question, precomputed=False),
+                         workers=1, deadline_s=30)
+    with contextlib.redirect_stdout(io.StringIO()), stub_backends(LatencyModel(50, sigma=0), LatencyModel(1000, sigma=0)):
+        job = manager.submit(QUESTION)
+        deadline = time.time() + 10
+        while not job.done and time.time() < deadline:
+            time.sleep(0.02)
+    assert job.status == "succeeded", job.error
+    assert job.result["sql"] and "시간 내에 받지 못했습니다" not in job.result["text"]
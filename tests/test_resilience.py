@@ -0,0 +1,95 @@
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.core import clients
+from app.core.resilience import DeadlineExceeded, LatencyTracker, ResilientCaller, TokenBucket
+from packages.bench.fakes import FakeChatModel, LatencyModel, SimulatedBackendError
+
+
+def _timed(caller, fn, n):
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        caller.call(fn)
+        latencies.append(time.perf_counter() - start)
+    return sorted(latencies)
+
+
+def test_hedging_cuts_latency_spikes():
+    # ~10ms calls with a 15% chance of a 400ms spike
+    def make_fake():
+        return FakeChatModel(LatencyModel(10, sigma=0.1, spike_rate=0.15, spike_ms=400, seed=3))
+
+    plain_fake, hedged_fake = make_fake(), make_fake()
+    plain = _timed(ResilientCaller(hedge=False), lambda: plain_fake.invoke("q"), 60)
+    tracker = LatencyTracker()
+    for _ in range(20):
+        tracker.observe(0.01)
+    hedged = _timed(ResilientCaller(hedge=True, hedge_min_delay_s=0.03, tracker=tracker),
+                    lambda: hedged_fake.invoke("q"), 60)
+
+    assert plain[-1] > 0.35
+    # A spike on the first attempt is covered by the hedge unless both attempts spike
+    assert hedged[int(0.9 * len(hedged))] < 0.2
+    assert hedged_fake.calls > 60
+
+
+def test_quota_errors_are_retried_with_backoff():
+    attempts = []
+
+    def flaky():
+        attempts.append(time.monotonic())
+        if len(attempts) < 3:
+            raise SimulatedBackendError("429 Resource exhausted (simulated)")
+        return "ok"
+
+    caller = ResilientCaller(max_retries=3, backoff_base_s=0.02, backoff_max_s=0.1)
+    assert caller.call(flaky) == "ok"
+    assert len(attempts) == 3
+    # Backoff doubles: [0.01, 0.02]s, then [0.02, 0.04]s
+    assert attempts[1] - attempts[0] >= 0.01
+    assert attempts[2] - attempts[1] >= 0.02
+
+    def invalid():
+        attempts.append(time.monotonic())
+        raise ValueError("bad prompt")
+
+    # Non-quota errors are not retried
+    attempts.clear()
+    with pytest.raises(ValueError):
+        ResilientCaller(max_retries=3).call(invalid)
+    assert len(attempts) == 1
+
+
+def test_deadline_abandons_stuck_call():
+    caller = ResilientCaller(deadline_s=0.1)
+    start = time.perf_counter()
+    with pytest.raises(DeadlineExceeded):
+        caller.call(lambda: time.sleep(1))
+    assert time.perf_counter() - start < 0.5
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=50, capacity=5)
+    start = time.perf_counter()
+    for _ in range(15):
+        bucket.acquire()
+    # 5 burst tokens, then 10 more at 50/s
+    assert time.perf_counter() - start >= 0.18
+    assert bucket.acquire(timeout=0) is False
+
+
+def test_registry_handle_applies_policy_inside_a_chain(monkeypatch):
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.prompts import ChatPromptTemplate
+
+    fake = FakeChatModel(LatencyModel(0), respond=lambda prompt: "GENERAL_AGENT")
+    monkeypatch.setattr(clients, "get_llm", lambda *args, **kwargs: fake)
+    chain = ChatPromptTemplate.from_template("{question}") | clients.llm(temperature=0) | StrOutputParser()
+    assert chain.invoke({"question": "안녕"}) == "GENERAL_AGENT"
+    assert fake.calls == 1
@@ -0,0 +1,105 @@
+import contextlib
+import io
+import os
+import sys
+from unittest.mock import MagicMock
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from app.agents import sql_agent
+    from packages.bq_wrapper.schema import SchemaCatalog
+
+DATASET = "willog-prod-data-gold.rag"
+TABLES = ["mart_logistics_master", "mart_quality_matrix"]
+
+
+class FakeMetadata:
+    """Answers the catalog's metadata queries like BigQuery would, counting them."""
+
+    def __init__(self):
+        self.modified = 1000
+        self.queries = []
+
+    def __call__(self, sql):
+        self.queries.append(sql)
+        if "__TABLES__" in sql:
+            return pd.DataFrame({"table_id": TABLES, "row_count": [120_000, 48],
+                                 "last_modified_time": [self.modified, self.modified]})
+        if "INFORMATION_SCHEMA.COLUMNS" in sql:
+            rows = [("mart_logistics_master", "departure_date", "DATE", "YES"),
+                    ("mart_logistics_master", "code", "STRING", "NO"),
+                    ("mart_logistics_master", "transport_mode", "STRING", "NO"),
+                    ("mart_logistics_master", "risk_level", "STRING", "NO"),
+                    ("mart_quality_matrix", "transport_mode", "STRING", "NO"),
+                    ("mart_quality_matrix", "damage_rate", "FLOAT64", "NO")]
+            return pd.DataFrame(rows, columns=["table_name", "column_name", "data_type", "is_partitioning_column"])
+        if "INFORMATION_SCHEMA.PARTITIONS" in sql:
+            return pd.DataFrame({"table_name": ["mart_logistics_master"], "first_partition": ["20250101"],
+                                 "last_partition": ["20251231"]})
+        if "mart_logistics_master" in sql:
+            assert "departure_date >= DATE_SUB(DATE '2025-12-31'" in sql
+            return pd.DataFrame({"transport_mode": [["truck", "air"]], "risk_level": [["Low", "High"]]})
+        return pd.DataFrame({"transport_mode": [["air", "truck"]]})
+
+
+def test_catalog_loads_stats_caches_on_disk_and_reloads_only_on_new_mart_versions(tmp_path):
+    path = str(tmp_path / "schema.json")
+    fake = FakeMetadata()
+    catalog = SchemaCatalog(path, DATASET, TABLES, run_query=fake).refresh()
+    master = catalog["tables"]["mart_logistics_master"]
+    assert master["rows"] == 120_000 and master["partitions"] == ["2025-01-01", "2025-12-31"]
+    assert master["columns"]["transport_mode"]["values"] == ["air", "truck"]
+
+    # Another process serves the cached catalog without a single query
+    def unreachable(sql):
+        raise AssertionError(sql)
+    cached = SchemaCatalog(path, DATASET, TABLES, run_query=unreachable)
+    assert "data from 2025-01-01 to 2025-12-31" in cached.prompt_text()
+    assert "'air', 'truck'" in cached.prompt_text()
+
+    # Unchanged marts: one metadata query; a rebuilt mart: full reload
+    fake.queries.clear()
+    SchemaCatalog(path, DATASET, TABLES, run_query=fake).refresh()
+    assert len(fake.queries) == 1
+    fake.modified = 2000
+    SchemaCatalog(path, DATASET, TABLES, run_query=fake).refresh()
+    assert len(fake.queries) > 2
+
+
+def test_validation_flags_unknown_tables_columns_and_values(tmp_path):
+    catalog = SchemaCatalog(str(tmp_path / "schema.json"), DATASET, TABLES, run_query=FakeMetadata())
+    catalog.refresh()
+    master = f"`{DATASET}.mart_logistics_master`"
+    assert catalog.validate(f"SELECT COUNT(*) FROM {master} t WHERE t.transport_mode LIKE 'ocean%'") == []
+    assert catalog.validate(f"SELECT t.product FROM {master} t") == [
+        "Column `product` does not exist in mart_logistics_master (referenced as t.product)"
+    ]
+    problems = catalog.validate(f"SELECT code FROM {master} WHERE transport_mode IN ('air', 'ocean') -- 'x'")
+    assert problems == ["transport_mode has no value 'ocean' (values: 'air', 'truck')"]
+    assert catalog.validate(f"SELECT * FROM `{DATASET}.view_transport_stats`")[0].startswith("Unknown table")
+
+
+def test_sql_agent_regenerates_sql_rejected_by_the_catalog(monkeypatch, tmp_path):
+    catalog = SchemaCatalog(str(tmp_path / "schema.json"), DATASET, TABLES, run_query=FakeMetadata())
+    catalog.refresh()
+    monkeypatch.setattr(sql_agent, "schema_catalog", catalog)
+    bq = MagicMock(available=True)
+    bq.run_query.return_value = pd.DataFrame({"n": [3]})
+    monkeypatch.setattr(sql_agent, "bq_client", bq)
+
+    agent = sql_agent.SQLAgent()
+    good = f"SELECT COUNT(*) AS n FROM `{DATASET}.mart_logistics_master` WHERE transport_mode LIKE 'ocean%'"
+    agent.chain = MagicMock()
+    agent.chain.invoke.side_effect = [good.replace("LIKE 'ocean%'", "= 'ocean'"), good]
+    agent.synthesis_chain = MagicMock()
+    agent.synthesis_chain.invoke.return_value = "3건입니다."
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = agent.process_query("해상 운송 건수")
+    assert result["generated_sql"] == good and result["error"] is None
+    feedback = agent.chain.invoke.call_args_list[1].args[0]["question"]
+    assert "transport_mode has no value 'ocean'" in feedback
+    bq.run_query.assert_called_once_with(good)
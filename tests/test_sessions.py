@@ -0,0 +1,73 @@
+import contextlib
+import io
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.core.sessions import SUMMARY_ROLE, SessionStore, compact, render_history
+from app.core.tokens import estimate_tokens
+
+SQL = "SELECT transport_mode, AVG(damage_rate) AS damage_rate FROM `willog-prod-data-gold.rag.mart_quality_matrix` GROUP BY 1"
+
+
+def _turns(n):
+    messages = []
+    for i in range(n):
+        messages.append({"role": "user", "content": f"{i}번째 질문: 운송 모드별 파손율을 월별로 자세히 보여줘 " * 3})
+        messages.append({
+            "role": "assistant", "content": "운송 모드별 파손율을 조회했습니다. " * 10, "agent": "SQL_AGENT",
+            "sql": SQL, "result": {"rows": 4, "columns": ["transport_mode", "damage_rate"]},
+        })
+    return messages
+
+
+def test_compaction_keeps_history_under_budget_with_sql_metadata():
+    compacted = compact(_turns(20), budget_tokens=800)
+
+    assert compacted[0]["role"] == SUMMARY_ROLE
+    assert "SQL: SELECT transport_mode" in compacted[0]["content"]
+    assert "4 rows (transport_mode, damage_rate)" in compacted[0]["content"]
+    assert compacted[-1]["role"] == "assistant" and compacted[-1]["sql"] == SQL
+    assert estimate_tokens(render_history(compacted, 10 ** 9)) <= 800
+    # Compacting again (next turn) is stable and stays under the budget
+    again = compact(compacted + _turns(1), budget_tokens=800)
+    assert estimate_tokens(render_history(again, 10 ** 9)) <= 800
+
+
+def test_render_history_prefers_recent_turns_within_budget():
+    rendered = render_history(_turns(10), budget_tokens=300)
+    assert "9번째 질문" in rendered
+    assert "0번째 질문" not in rendered
+    assert "[SQL] SELECT" in rendered
+
+
+def test_store_lru_evicts_to_database_and_expires(tmp_path):
+    store = SessionStore(max_sessions=1, ttl_s=3600, db_path=str(tmp_path / "sessions.sqlite3"))
+    store.append("a", {"role": "user", "content": "첫 질문"})
+    store.append("b", {"role": "user", "content": "다른 세션"})
+    # "a" left the in-memory LRU but is reloaded from the database
+    assert store.history("a") == [{"role": "user", "content": "첫 질문"}]
+
+    reopened = SessionStore(db_path=str(tmp_path / "sessions.sqlite3"), ttl_s=0)
+    assert reopened.history("b") == []
+
+
+def test_chat_api_keeps_history_server_side():
+    with contextlib.redirect_stdout(io.StringIO()):
+        from fastapi.testclient import TestClient
+
+        from app.api.main import app
+        from app.core.sessions import session_store
+        from packages.bench.fakes import LatencyModel, stub_backends
+
+    client = TestClient(app)
+    with contextlib.redirect_stdout(io.StringIO()), stub_backends(LatencyModel(0), LatencyModel(0)):
+        first = client.post("/api/chat", json={"message": "운송 모드별 파손율 통계"}).json()
+        session_id = first["session_id"]
+        second = client.post("/api/chat", json={"message": "그중 항공만 보여줘", "session_id": session_id}).json()
+
+    assert second["session_id"] == session_id
+    history = session_store.history(session_id)
+    assert [m["role"] for m in history] == ["user", "assistant", "user", "assistant"]
+    assert history[1]["sql"] and history[1]["result"]["rows"] == 10
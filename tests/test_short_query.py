@@ -0,0 +1,63 @@
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from app.core import metrics
+    from app.core.config import settings
+    from packages.bench.fakes import FakeBigQueryClient, LatencyModel
+    from packages.bq_wrapper.client import BigQueryWrapper
+
+SMALL = "SELECT transport_mode, damage_rate FROM `willog-prod-data-gold.rag.mart_quality_matrix`"
+LARGE = "SELECT code FROM `willog-prod-data-gold.rag.mart_logistics_master`"
+
+
+def _wrapper(fake):
+    wrapper = BigQueryWrapper()
+    wrapper.local_engine = None
+    wrapper._client, wrapper._client_initialized = fake, True
+    return wrapper
+
+
+def _fake(**kwargs):
+    return FakeBigQueryClient(LatencyModel(20, sigma=0), LatencyModel(50, sigma=0), LatencyModel(150, sigma=0),
+                              **kwargs)
+
+
+def _timed(wrapper, sql):
+    started = time.perf_counter()
+    df = wrapper.run_query(sql)
+    return df, time.perf_counter() - started
+
+
+def test_small_mart_queries_skip_job_creation_and_carry_labels(monkeypatch):
+    monkeypatch.setattr(settings, "BQ_QUERY_MODE", "auto")
+    fake = _fake()
+    wrapper = _wrapper(fake)
+    wrapper.run_query(SMALL)  # first call imports google.cloud.bigquery
+    with metrics.request_trace("포장 타입별 파손율 비교") as trace:
+        trace.agent = "SQL_AGENT"
+        short, short_s = _timed(wrapper, SMALL)
+    assert fake.inline_results == 2 and fake.jobs_created == 0 and len(short) == 10
+    config = fake.job_configs[-1]
+    assert config.use_query_cache is True
+    assert config.labels["agent"] == "sql_agent" and len(config.labels["question_hash"]) == 16
+    assert trace.queries[-1]["backend"] == "bigquery_short"
+
+    # Other tables keep the job path: insert + scheduling, execution + poll, download
+    _, job_s = _timed(wrapper, LARGE)
+    assert fake.jobs_created == 1
+    assert job_s - short_s > 0.15
+
+
+def test_large_short_results_fall_back_to_a_job(monkeypatch):
+    monkeypatch.setattr(settings, "BQ_QUERY_MODE", "short")
+    monkeypatch.setattr(settings, "BQ_SHORT_QUERY_MAX_ROWS", 100)
+    fake = _fake(rows=500, page_rows=100)
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = _wrapper(fake).run_query(SMALL)
+    assert len(df) == 500 and fake.jobs_created == 2  # the short call had to create one, then the standard job
@@ -0,0 +1,67 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.core.sessions import SUMMARY_ROLE
+from app.core.singleflight import SingleFlight, request_key
+
+
+def test_concurrent_duplicates_execute_once():
+    flights = SingleFlight()
+    calls = []
+    started = threading.Event()
+
+    def work():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return {"text": "answer"}
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        leader = pool.submit(flights.do, "k", work)
+        started.wait(1)
+        followers = [pool.submit(flights.do, "k", work) for _ in range(7)]
+        results = [leader.result()] + [f.result() for f in followers]
+
+    assert len(calls) == 1
+    assert [shared for _, shared in results].count(False) == 1
+    assert all(result == {"text": "answer"} for result, _ in results)
+    assert flights.inflight() == 0
+
+
+def test_errors_reach_every_waiter_and_key_is_released():
+    flights = SingleFlight()
+    started = threading.Event()
+
+    def fail():
+        started.set()
+        time.sleep(0.1)
+        raise RuntimeError("quota")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flights.do, "k", fail)
+        started.wait(1)
+        follower = pool.submit(flights.do, "k", fail)
+        for future in (leader, follower):
+            with pytest.raises(RuntimeError):
+                future.result()
+
+    assert flights.do("k", lambda: 42) == (42, False)
+
+
+def test_request_key_normalizes_question_and_includes_history():
+    assert request_key("🚨 최근 1주일 High Risk 운송 건") == request_key("  🚨 최근  1주일 high risk 운송 건?")
+    history = [{"role": "user", "content": "지난달 기준으로"}]
+    assert request_key("파손율 알려줘", history) != request_key("파손율 알려줘")
+
+    # Sessions whose recent turns match but whose summaries of earlier turns differ are different requests
+    recent = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"turn {i}"} for i in range(10)]
+    shanghai = [{"role": SUMMARY_ROLE, "content": "- 상하이행 운송만 보기로 함"}] + recent
+    hochiminh = [{"role": SUMMARY_ROLE, "content": "- 호치민행 운송만 보기로 함"}] + recent
+    assert request_key("파손율 알려줘", shanghai) != request_key("파손율 알려줘", hochiminh)
@@ -0,0 +1,113 @@
+import json
+import os
+import sys
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.api import admin
+from app.core.config import settings
+from app.core.metrics import RequestTrace
+from app.core.slow_log import SLOW_LOG_DROPPED, SlowRequestLog, to_corpus
+
+
+def _trace(question, duration_s, agent="SQL_AGENT"):
+    trace = RequestTrace(question)
+    trace.duration_s, trace.agent = duration_s, agent
+    trace.queries = [{"backend": "bigquery", "job_id": "job_1", "bytes_processed": 2048}]
+    return trace
+
+
+def test_slow_requests_are_written_in_the_background_filtered_and_exported(tmp_path):
+    log = SlowRequestLog(str(tmp_path / "logs" / "slow.jsonl"), threshold_s=1.0)
+    assert not log.maybe_record(_trace("빠른 질문", 0.5))
+    assert log.maybe_record(_trace("상하이행 파손율", 2.0))
+    assert log.maybe_record(_trace("파손 기준 설명", 3.0, agent="RETRIEVAL_AGENT"))
+    assert log.maybe_record(_trace("상하이행 파손율", 4.0))
+    log.flush()
+
+    entries = log.entries()
+    assert [e["duration_s"] for e in entries] == [4.0, 3.0, 2.0]  # newest first
+    assert entries[0]["job_ids"] == ["job_1"] and entries[0]["bytes_processed"] == 2048
+    assert [e["question"] for e in log.entries(agent="RETRIEVAL_AGENT")] == ["파손 기준 설명"]
+    assert len(log.entries(min_duration_s=2.5)) == 2 and len(log.entries(limit=1)) == 1
+    assert to_corpus(entries) == [
+        {"id": "slow-1", "question": "상하이행 파손율", "expected_agent": "SQL_AGENT"},
+        {"id": "slow-2", "question": "파손 기준 설명", "expected_agent": "RETRIEVAL_AGENT"},
+    ]
+
+    # A negative threshold disables the log
+    assert not SlowRequestLog(str(tmp_path / "off.jsonl"), threshold_s=-1).maybe_record(_trace("q", 100.0))
+
+
+def test_slow_log_rotates_at_max_bytes_and_drops_entries_when_the_writer_is_behind(tmp_path):
+    log = SlowRequestLog(str(tmp_path / "slow.jsonl"), threshold_s=0, max_bytes=2000, backups=2)
+    for i in range(20):
+        log.maybe_record(_trace(f"질문 {i}", 1.0))
+    log.flush()
+    files = sorted(os.listdir(tmp_path))
+    assert files == ["slow.jsonl", "slow.jsonl.1", "slow.jsonl.2"]
+    assert all(os.path.getsize(tmp_path / name) <= 2000 for name in files)
+    entries = log.entries(limit=100)
+    assert entries[0]["question"] == "질문 19" and len(entries) < 20  # the oldest rotated out
+
+    # The writer is stuck behind the file lock: a full queue drops entries instead of blocking the request
+    blocked = SlowRequestLog(str(tmp_path / "blocked.jsonl"), threshold_s=0, queue_size=1)
+    dropped = SLOW_LOG_DROPPED._value.get()
+    with blocked._file_lock:
+        accepted = sum(blocked.maybe_record(_trace(f"q{i}", 1.0)) for i in range(5))
+    blocked.flush()
+    assert accepted <= 2 and SLOW_LOG_DROPPED._value.get() - dropped == 5 - accepted
+    assert len(blocked.entries()) == accepted
+
+
+def _admin_client():
+    app = FastAPI()
+    app.include_router(admin.router, prefix="/api/admin")
+    return TestClient(app)
+
+
+def test_admin_endpoints_fail_closed_and_clamp_exports(monkeypatch, tmp_path):
+    client = _admin_client()
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", None)
+    for method, path in [("get", "/api/admin/slow-requests"), ("get", "/api/admin/slow-requests/export"),
+                         ("delete", "/api/admin/llm-cache")]:
+        assert getattr(client, method)(path, headers={"X-Admin-Token": ""}).status_code == 403
+
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    assert client.get("/api/admin/slow-requests", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    log = SlowRequestLog(str(tmp_path / "slow.jsonl"), threshold_s=0)
+    with open(log.path, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps({"question": f"q{i}", "duration_s": 1.0}) + "\n" for i in range(admin.MAX_ENTRIES + 5))
+    monkeypatch.setattr(admin, "slow_log", log)
+    response = client.get("/api/admin/slow-requests/export", params={"limit": 10 ** 9},
+                          headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200 and len(response.text.splitlines()) == admin.MAX_ENTRIES
+
+
+def test_requests_cut_at_their_deadline_are_still_logged(monkeypatch, tmp_path):
+    import contextlib
+    import io
+
+    import pytest
+
+    from app.core import cancellation
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        from app.agents import orchestrator
+        from packages.bench.fakes import LatencyModel, stub_backends
+
+    log = SlowRequestLog(str(tmp_path / "slow.jsonl"), threshold_s=0.2)
+    monkeypatch.setattr(orchestrator, "slow_log", log)
+    monkeypatch.setattr(settings, "SPECULATIVE_SQL", "off")
+    with contextlib.redirect_stdout(io.StringIO()), stub_backends(LatencyModel(50, sigma=0), LatencyModel(5000)):
+        with pytest.raises((cancellation.Cancelled, TimeoutError)):
+            orchestrator.Orchestrator().run("지난주 운송 모드별 파손율", deadline_s=0.5, precomputed=False)
+    log.flush()
+
+    [entry] = log.entries()
+    assert entry["question"] == "지난주 운송 모드별 파손율" and entry["duration_s"] >= 0.5
+    assert entry["outcome"] == "timeout" and entry["error"] == cancellation.DEADLINE_EXCEEDED
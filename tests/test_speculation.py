@@ -0,0 +1,45 @@
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from app.agents import orchestrator as orchestrator_module
+    from app.agents.orchestrator import Orchestrator
+    from app.agents.router import sql_confidence
+    from app.core.config import settings
+    from packages.bench.fakes import LatencyModel, stub_backends
+
+SQL_QUESTION = "상하이행 운송 건수 통계"
+
+
+def _timed(question, precomputed=False):
+    started = time.perf_counter()
+    result = Orchestrator().run(question, precomputed=precomputed)
+    return result, time.perf_counter() - started
+
+
+def test_speculative_sql_generation_overlaps_routing(monkeypatch):
+    with contextlib.redirect_stdout(io.StringIO()), stub_backends(LatencyModel(300, sigma=0), LatencyModel(0)):
+        monkeypatch.setattr(settings, "SPECULATIVE_SQL", "off")
+        sequential, sequential_s = _timed(SQL_QUESTION)
+        monkeypatch.setattr(settings, "SPECULATIVE_SQL", "auto")
+        speculative, speculative_s = _timed(SQL_QUESTION)
+    assert speculative["sql"] == sequential["sql"] and speculative["agent"] == "SQL_AGENT"
+    assert speculative["trace"].speculation == "used"
+    # routing + generation + synthesis (900 ms) becomes max(routing, generation) + synthesis (600 ms)
+    assert sequential_s - speculative_s > 0.2
+
+
+def test_speculation_is_discarded_or_skipped_off_the_sql_route(monkeypatch):
+    assert sql_confidence("안녕") < settings.SPECULATION_MIN_CONFIDENCE <= sql_confidence(SQL_QUESTION)
+    monkeypatch.setattr(orchestrator_module, "sql_confidence", lambda question: 1.0)
+    with contextlib.redirect_stdout(io.StringIO()), stub_backends(LatencyModel(100, sigma=0), LatencyModel(0)):
+        result, _ = _timed("안녕 반가워")
+        assert result["agent"] == "GENERAL_AGENT" and result["trace"].speculation == "discarded"
+        monkeypatch.setattr(orchestrator_module, "sql_confidence", lambda question: 0.0)
+        result, _ = _timed("안녕 반가워")
+        assert result["trace"].speculation == "skipped"
@@ -0,0 +1,77 @@
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from fastapi.testclient import TestClient
+
+    from app.agents import orchestrator as orchestrator_module
+    from app.api.main import app
+    from app.core.metrics import RequestTrace
+    from app.core.suggestions import SuggestionStore, SuggestionWarmer
+    from packages.bench.fakes import LatencyModel, stub_backends
+    from packages.bq_wrapper import client as bq_client_module
+
+SUGGESTIONS = ["📊 포장 타입별 파손율 비교", "🌍 국가별 운송 현황 요약"]
+
+
+def test_warmed_suggestions_are_served_without_running_the_pipeline(monkeypatch, tmp_path):
+    store = SuggestionStore(str(tmp_path / "suggestions.json"))
+    monkeypatch.setattr(orchestrator_module, "suggestion_store", store)
+    orchestrator = orchestrator_module.Orchestrator()
+    warmer = SuggestionWarmer(lambda q: orchestrator.run(q, precomputed=False), store, SUGGESTIONS)
+
+    with contextlib.redirect_stdout(io.StringIO()), stub_backends(LatencyModel(0), LatencyModel(0), rows=7):
+        summary = warmer.warm()
+    assert summary["warmed"] == SUGGESTIONS
+
+    # Backends are real again: a hit must not reach them. A second process sees the same file.
+    monkeypatch.setattr(orchestrator_module, "suggestion_store", SuggestionStore(store.path))
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = orchestrator.run("📊 포장 타입별 파손율 비교?")
+    assert result["agent"] == "SQL_AGENT" and len(result["data"]) == 7 and result["sql"]
+    assert time.time() - result["refreshed"] < 60
+    assert result["trace"].stages == {}
+    # Asked for an approximate answer, the precomputed one says it is exact
+    with contextlib.redirect_stdout(io.StringIO()):
+        approximate = orchestrator.run("📊 포장 타입별 파손율 비교", approximate=True)
+    assert "정확한 값" in approximate["text"] and not approximate.get("approximation")
+
+
+def test_stale_answers_are_not_served(tmp_path):
+    store = SuggestionStore(str(tmp_path / "suggestions.json"), max_age_s=3600)
+    store.put(SUGGESTIONS[0], {"text": "답변", "agent": "GENERAL_AGENT"})
+    assert store.get(SUGGESTIONS[0])["text"] == "답변"
+
+    store._entries[next(iter(store._entries))]["refreshed"] -= 7200
+    assert store.get(SUGGESTIONS[0]) is None
+    assert store.refreshed(SUGGESTIONS[0]) is None
+
+
+def test_warmer_respects_bytes_budget(tmp_path):
+    limits = []
+
+    def runner(question):
+        limits.append(bq_client_module._job_bytes_limit())
+        trace = RequestTrace(question)
+        trace.queries.append({"bytes_processed": 600})
+        return {"text": "ok", "data": None, "agent": "GENERAL_AGENT", "trace": trace}
+
+    store = SuggestionStore(str(tmp_path / "suggestions.json"))
+    warmer = SuggestionWarmer(runner, store, ["a", "b", "c"], max_bytes_per_query=500, max_bytes_per_run=1000)
+    summary = warmer.warm()
+
+    assert summary["warmed"] == ["a", "b"] and summary["skipped"] == ["c"]
+    assert limits == [500, 400]
+    assert bq_client_module._job_bytes_limit() is None
+
+
+def test_suggestions_endpoint_reports_freshness():
+    with contextlib.redirect_stdout(io.StringIO()):
+        body = TestClient(app).get("/api/suggestions").json()
+    assert len(body["suggestions"]) == 12
+    assert set(body["suggestions"][0]) == {"question", "refreshed"}
@@ -0,0 +1,85 @@
+import contextlib
+import io
+import os
+import sys
+
+import pyarrow.parquet as pq
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from packages.bq_wrapper.local_engine import LocalEngine
+from packages.synthetic.generator import generate, iter_chunks
+
+duckdb = pytest.importorskip("duckdb")
+
+WINDOW = {"start": "2025-12-20", "end": "2026-01-01"}
+
+# Columns (and Arrow types) of the raw tables that the mart SQL in scripts/sync_data.py reads
+RAW_SCHEMA = {
+    "corning_transport": {
+        "code": "string", "pol": "string", "pod": "string", "product_name": "string", "package": "string",
+        "shipmode": "string", "receiver_name": "string", "departure_time": "timestamp[us]",
+        "arrival_time": "timestamp[us]", "is_damaged": "bool",
+    },
+    "corning_merged": {
+        "code": "string", "pod": "string", "device_datetime": "timestamp[us]", "temperature": "double",
+        "humidity": "double", "shock_high": "double", "acc": "double", "accx": "double", "accy": "double",
+        "accz": "double", "tiltx": "double", "tilty": "double", "lat": "double", "lon": "double",
+        "location": "string", "location_fin_corrected": "string",
+    },
+    "view_category": {"code": "string", "filter": "string"},
+}
+
+
+def _read(out_dir, name):
+    table = pq.read_table(os.path.join(out_dir, name)).to_pandas()
+    keys = ["code", "device_datetime"] if name == "corning_merged" else ["code"]
+    return table.sort_values(keys).reset_index(drop=True)
+
+
+def test_same_seed_yields_identical_output(tmp_path):
+    first = list(iter_chunks(40, seed=7, chunk_shipments=15, **WINDOW))
+    again = list(iter_chunks(40, seed=7, chunk_shipments=15, **WINDOW))
+    assert all(a.equals(b) for chunk, other in zip(first, again) for a, b in zip(chunk, other))
+    assert not first[0][1].equals(next(iter_chunks(40, seed=8, chunk_shipments=15, **WINDOW))[1])
+
+    counts = [generate(str(tmp_path / run), 40, seed=7, chunk_shipments=15, **WINDOW) for run in ("a", "b")]
+    assert counts[0] == counts[1] and counts[0]["corning_transport"] == 40
+    for name in RAW_SCHEMA:
+        assert _read(str(tmp_path / "a"), name).equals(_read(str(tmp_path / "b"), name))
+
+
+def test_written_schema_builds_the_marts_the_local_engine_serves(tmp_path):
+    from scripts.sync_data import build_local_marts
+
+    raw_dir, snapshot_dir = str(tmp_path / "raw"), str(tmp_path / "snapshots")
+    generate(raw_dir, 30, chunk_shipments=10, **WINDOW)
+    for name, columns in RAW_SCHEMA.items():
+        schema = pq.read_schema(next((tmp_path / "raw" / name).rglob("*.parquet")))
+        assert {column: str(schema.field(column).type) for column in columns} == columns
+        assert (tmp_path / "raw" / name / "month=2025-12").is_dir()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        row_counts = build_local_marts(raw_dir, snapshot_dir)
+    assert row_counts["mart_logistics_master"] == 30 and row_counts["mart_sensor_detail"] > 30
+
+    engine = LocalEngine(snapshot_dir, max_age_hours=0)
+    df = engine.run_query(
+        "SELECT transport_mode, COUNT(*) AS shipments "
+        "FROM `willog-prod-data-gold.rag.mart_logistics_master` GROUP BY 1"
+    )
+    assert df["shipments"].sum() == 30
+
+
+def test_output_is_written_in_bounded_chunks(tmp_path):
+    progress = []
+    generate(str(tmp_path), 55, chunk_shipments=20, progress=lambda i, counts, s: progress.append(dict(counts)),
+             **WINDOW)
+    shipments = [counts["corning_transport"] for counts in progress]
+    assert shipments == [20, 40, 55]
+
+    # One set of part files per chunk, none holding more than a chunk of shipments
+    parts = list((tmp_path / "corning_transport").rglob("part-*.parquet"))
+    assert {path.name.split("-")[1] for path in parts} == {"000000", "000001", "000002"}
+    assert max(pq.read_metadata(path).num_rows for path in parts) <= 20
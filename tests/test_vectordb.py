@@ -0,0 +1,72 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from packages.vectordb.index import BM25Index, analyze
+
+CHUNKS = [
+    {"id": "deviation", "text": "[용어 정의] 일탈률 (Deviation Rate): 전체 로그 수 대비 충격 이벤트 발생 비율", "source": "glossary"},
+    {"id": "shipments", "text": "[용어 정의] 운송 건수: 조회기간 동안 운송 완료되거나 운송 중인 물량의 합", "source": "glossary"},
+    {"id": "winter", "text": "동절기 운송 지침: 영하 온도 구간에서는 보온 포장을 사용하고 " + "온도 로그를 확인합니다. " * 40,
+     "source": "sop.md"},
+]
+
+
+def test_analyzer_matches_inflected_korean_and_keeps_latin_words():
+    assert set(analyze("일탈률")) <= set(analyze("일탈률은 어떻게 계산해?"))
+    assert {"5g", "high", "risk"} <= set(analyze("5G 이상 High Risk"))
+
+
+def test_saved_index_is_memory_mapped_and_searchable(tmp_path):
+    BM25Index.build(CHUNKS).save(str(tmp_path / "index"))
+    index = BM25Index.load(str(tmp_path / "index"))
+
+    assert isinstance(index.postings_doc, np.memmap)
+    assert [h["id"] for h in index.search("일탈률은 어떻게 계산해?", k=1)] == ["deviation"]
+    assert index.search("deviation rate", k=1)[0]["source"] == "glossary"
+    assert index.search("전혀 관계없는 질문 xyz") == []
+    # The long SOP chunk does not fit in a small budget; the smaller matches still do
+    assert "winter" not in [h["id"] for h in index.search("운송 온도", k=3, token_budget=60)]
+    assert "winter" in [h["id"] for h in index.search("운송 온도", k=3)]
+
+
+def test_embeddings_are_fused_with_bm25(tmp_path):
+    embeddings = np.eye(3, dtype=np.float32)
+    BM25Index.build(CHUNKS, embeddings=embeddings).save(str(tmp_path / "index"))
+    index = BM25Index.load(str(tmp_path / "index"))
+
+    # No lexical match at all: the dense ranking alone decides
+    assert index.search("겨울철 주의사항", k=1, query_embedding=[0, 0, 1])[0]["id"] == "winter"
+    assert index.search("겨울철 주의사항", k=1) == []
+
+
+def test_saving_swaps_versions_atomically_and_the_agent_keeps_a_working_index(monkeypatch, tmp_path):
+    from app.agents.retrieval_agent import RetrievalAgent
+    from app.core.config import settings
+
+    path = str(tmp_path / "index")
+    BM25Index.build(CHUNKS[:1]).save(path)
+    os.replace(os.path.realpath(path), str(tmp_path / "legacy"))  # an index saved before versioning
+    os.remove(path)
+    os.replace(str(tmp_path / "legacy"), path)
+
+    monkeypatch.setattr(settings, "RETRIEVAL_INDEX_DIR", path)
+    agent = RetrievalAgent()
+    assert len(agent.index) == 1
+
+    opened = BM25Index.load(path)
+    for n in (2, 3):
+        BM25Index.build(CHUNKS[:n]).save(path)
+    assert os.path.islink(path) and len(BM25Index.load(path)) == 3
+    # The current and the previous version stay on disk; the one loaded earlier was memory-mapped
+    assert len([name for name in os.listdir(tmp_path) if name.startswith("index.v")]) == 2
+    assert opened.search("일탈률", k=1)[0]["id"] == "deviation"
+    assert len(agent.index) == 3
+
+    # A broken new version does not take the agent down: it keeps answering from the loaded index
+    BM25Index.build(CHUNKS[:2]).save(path)
+    os.remove(os.path.join(os.path.realpath(path), "records.bin"))
+    assert len(agent.index) == 3